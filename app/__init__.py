@@ -1,4 +1,9 @@
-try:
-    from .celery import app as celery_app
-except Exception:
-    celery_app = None  # 暫時避免在管理指令階段爆掉，之後再恢復
+# Celery app 延遲載入：web 行程只有在真正送出任務時才 import celery / kombu。
+# 任務模組（core.tasks、issues.tasks）會先 import celery_app，確保 task 綁定到本專案的 app。
+
+
+def __getattr__(name):
+    if name == "celery_app":
+        from .celery import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
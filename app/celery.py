@@ -1,6 +1,60 @@
+"""
+Celery 設定與佇列拓樸。
+
+佇列（各自由獨立的 worker 消化，見 docker-compose.yml）：
+    notifications  Teams 通知等短任務；數量多，prefetch 稍大、併發較高
+    scans          掃描類任務（SLA 重算、分析事實表）；單一併發，避免重疊執行
+    batch          匯出、回填等重任務；prefetch 1，長任務不佔住其他訊息
+    default        其餘未指定路由的任務（由 batch worker 一併處理）
+
+- 全域 acks_late + reject_on_worker_lost：worker 當掉時訊息會重送，任務需冪等
+  （通知任務以 core.idempotency 的 Redis key 去重）。
+- Redis broker 以 priority_steps 在同一佇列內分出優先層級，0 最優先；未指定者為 5。
+- visibility_timeout 需大於最長的 countdown / ETA，否則延遲任務會被提早重送。
+"""
 import os
+
 from celery import Celery
+from celery.signals import worker_process_init
+from kombu import Queue
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE","app.settings")
 app = Celery("app")
 app.config_from_object("django.conf:settings", namespace="CELERY")
+
+QUEUES = ("notifications", "scans", "batch", "default")
+
+app.conf.task_queues = [Queue(name) for name in QUEUES]
+app.conf.task_default_queue = "default"
+app.conf.task_routes = {
+    "core.tasks.send_issue_update_to_teams": {"queue": "notifications"},
+    "core.tasks.flush_teams_outbox": {"queue": "notifications"},
+    "core.tasks.refresh_status_intervals": {"queue": "scans"},
+    "core.tasks.generate_attachment_derivatives": {"queue": "batch"},
+    "core.tasks.archive_closed_issues": {"queue": "batch"},
+    "core.tasks.ingest_alarms": {"queue": "batch"},
+    "issues.tasks.*": {"queue": "scans"},
+}
+app.conf.task_default_priority = 5
+app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+    "visibility_timeout": int(os.environ.get("CELERY_VISIBILITY_TIMEOUT", "7200")),
+}
+app.conf.beat_schedule = {
+    # 事件觸發的重建若因 Redis / broker 問題漏掉，由定期執行補上
+    "refresh-status-intervals": {"task": "core.tasks.refresh_status_intervals", "schedule": 600.0},
+    "archive-closed-issues": {"task": "core.tasks.archive_closed_issues", "schedule": 86400.0},
+    # 接手當掉的 worker 留下、未 ACK 的告警（core/alarms.py）
+    "ingest-alarms": {"task": "core.tasks.ingest_alarms", "schedule": 120.0},
+}
+
 app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def _reset_connections(**kwargs):
+    # prefork 子行程：DB 連線由 Celery 的 Django fixup 處理，這裡補上 Redis 連線池
+    from .startup import reset_after_fork
+    reset_after_fork()
@@ -1,5 +1,4 @@
 import os
-from whitenoise.storage import CompressedManifestStaticFilesStorage
 from pathlib import Path
 
 # --- Base paths ---
@@ -38,28 +37,19 @@ if OIDC_ENABLED:
     INSTALLED_APPS += ["mozilla_django_oidc"]
 
 # --- Middleware ---
+# WhiteNoise 需緊接在 SecurityMiddleware 之後；read replica 的路由 middleware 於檔案最後插入
 MIDDLEWARE = [
-    "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.middleware.security.SecurityMiddleware",
-]
-
-# WhiteNoise（簡單服務 static；正式可加壓縮/版本化 storage）
-if WHITENOISE_ENABLED:
-    MIDDLEWARE += ["whitenoise.middleware.WhiteNoiseMiddleware"]
-
-MIDDLEWARE += [
+    *(["whitenoise.middleware.WhiteNoiseMiddleware"] if WHITENOISE_ENABLED else []),
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.throttling.ThrottleMiddleware",  # 需要 request.user；THROTTLE["ENABLED"] 為 false 時直接放行
     "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-# 可選：提供更佳的壓縮與雜湊版本管理（正式環境）
-# 僅在啟用 WhiteNoise 時設定，避免未安裝套件時爆錯
-if WHITENOISE_ENABLED and os.environ.get("WHITENOISE_MANIFEST", "false").lower() == "true":
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 # --- URL / WSGI ---
 ROOT_URLCONF = "app.urls"
 WSGI_APPLICATION = "app.wsgi.application"
@@ -98,6 +88,24 @@ else:
         }
     }
 
+# 問題時間軸（core/timeline.py）：第一頁快取於 Redis，寫入時以版本計數器失效
+TIMELINE = {
+    "PAGE_SIZE": int(os.environ.get("TIMELINE_PAGE_SIZE", "30")),
+    "CACHE_TTL": int(os.environ.get("TIMELINE_CACHE_TTL", "600")),
+}
+
+# --- Read replicas（逗號分隔、DATABASE_URL 格式；未設定時不啟用讀寫分離）---
+REPLICA_DATABASES = []
+for _i, _url in enumerate(u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()):
+    import dj_database_url  # 使用 replica 時必須安裝
+    DATABASES[f"replica_{_i}"] = {**dj_database_url.parse(_url), "TEST": {"MIRROR": "default"}}
+    REPLICA_DATABASES.append(f"replica_{_i}")
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "3"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", "2"))
+
 # --- i18n / tz ---
 LANGUAGE_CODE = "zh-hant"
 TIME_ZONE = os.environ.get("TIME_ZONE", "Asia/Taipei")
@@ -114,6 +122,66 @@ STATIC_ROOT = BASE_DIR / "staticfiles"  # 對應 compose 的 static_volume 掛
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/app/media"
 
+# collectstatic 時產生壓縮（.gz/.br）與雜湊版本檔；字串路徑只在實際使用 storage 時才 import
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        if WHITENOISE_ENABLED else "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+# SLA：資料庫沒有設定日曆 / 目標時的預設值（工作時數），見 issues/sla.py
+SLA_DEFAULTS = {
+    "WORKING_HOURS": [(d, "09:00", "12:00") for d in range(5)] + [(d, "13:00", "18:00") for d in range(5)],
+    "TARGET_HOURS": {0: 4, 1: 8, 2: 24, 3: 72},
+    "WARNING_BUSINESS_HOURS": 8,
+}
+
+# 已儲存檢視：id 清單快取在 Redis，依版本計數器失效（見 issues/saved_views.py）
+SAVED_VIEW_CACHE = {
+    "TTL": int(os.environ.get("SAVED_VIEW_CACHE_TTL", "600")),
+    "MAX_IDS": int(os.environ.get("SAVED_VIEW_MAX_IDS", "5000")),
+    "PAGE_SIZE": int(os.environ.get("SAVED_VIEW_PAGE_SIZE", "50")),
+}
+
+# 個人收件匣：未讀 / 指派清單存在 Redis，可由資料庫重建（見 issues/inbox.py）
+INBOX = {
+    "PAGE_SIZE": int(os.environ.get("INBOX_PAGE_SIZE", "50")),
+    # inbox_rebuild 時沒有已讀標記的問題，只把最近幾天的動態算成未讀
+    "REBUILD_DAYS": int(os.environ.get("INBOX_REBUILD_DAYS", "14")),
+}
+
+# core.analytics：新狀態事件寫入後延遲多久重建區間事實表（秒，期間的事件合併處理）
+ANALYTICS_REFRESH_DELAY = int(os.environ.get("ANALYTICS_REFRESH_DELAY", "30"))
+
+# 附件縮圖 / 預覽（見 core/thumbnails.py，由 batch 佇列的 worker 產生）
+ATTACHMENT_DERIVATIVES = {
+    "THUMB_SIZE": int(os.environ.get("ATTACHMENT_THUMB_SIZE", "320")),
+    "PREVIEW_SIZE": int(os.environ.get("ATTACHMENT_PREVIEW_SIZE", "1024")),
+    "MAX_PIXELS": int(os.environ.get("ATTACHMENT_MAX_PIXELS", str(80_000_000))),  # 超過視為可疑檔案
+    "LOG_PREVIEW_LINES": 60,
+    "LOG_PREVIEW_BYTES": 64 * 1024,
+    "FONT": os.environ.get("ATTACHMENT_PREVIEW_FONT", ""),  # 等寬 TTF；空白用 Pillow 內建字型（不含中文）
+}
+
+# 冷熱分層：結案 / 已解決超過 AFTER_DAYS 天的問題移到封存表（core/archive.py，beat 每日執行）
+ARCHIVE = {
+    "AFTER_DAYS": int(os.environ.get("ARCHIVE_AFTER_DAYS", "180")),
+    "BATCH_SIZE": int(os.environ.get("ARCHIVE_BATCH_SIZE", "200")),
+}
+
+# core.Issue / issues.Issue 合併的線上遷移（core/consolidation.py、manage.py consolidate_issues）
+CONSOLIDATION = {
+    "DUAL_WRITE": os.environ.get("CONSOLIDATION_DUAL_WRITE", "false").lower() == "true",
+    "BATCH_SIZE": int(os.environ.get("CONSOLIDATION_BATCH_SIZE", "500")),
+    "ROWS_PER_SEC": float(os.environ.get("CONSOLIDATION_ROWS_PER_SEC", "2000")),  # 0 為不限速
+    "VERIFY_CHUNK": int(os.environ.get("CONSOLIDATION_VERIFY_CHUNK", "1000")),
+}
+
+# manage.py backup / restore 的輸出目錄（objects/ + snapshots/）
+BACKUP_ROOT = os.environ.get("BACKUP_DIR", str(BASE_DIR / "backups"))
+
 # --- Templates（Django Admin 必備 DjangoTemplates 引擎）---
 TEMPLATES = [
     {
@@ -128,6 +196,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "issues.context_processors.inbox",
             ],
         },
     },
@@ -147,6 +216,17 @@ if API_ENABLED:
     REST_FRAMEWORK = {
         "DEFAULT_AUTHENTICATION_CLASSES": DEFAULT_AUTH_CLASSES,
         "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+        # orjson 編解碼（core.renderers；未安裝 orjson 時自動退回標準 json）
+        "DEFAULT_RENDERER_CLASSES": [
+            "core.renderers.ORJSONRenderer",
+            "rest_framework.renderers.BrowsableAPIRenderer",
+        ],
+        "DEFAULT_PARSER_CLASSES": [
+            "core.renderers.ORJSONParser",
+            "rest_framework.parsers.FormParser",
+            "rest_framework.parsers.MultiPartParser",
+        ],
+        "DEFAULT_THROTTLE_CLASSES": ["core.throttles.ApiThrottle"],
     }
 
 # --- OIDC（僅在 OIDC_ENABLED 時會被用到）---
@@ -174,6 +254,15 @@ REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_TIMEZONE = TIME_ZONE
+# 佇列 / 路由 / 優先權見 app/celery.py；以下為各 worker 共用的可靠性設定
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get("CELERY_PREFETCH_MULTIPLIER", "1"))
+CELERY_TASK_TIME_LIMIT = int(os.environ.get("CELERY_TASK_TIME_LIMIT", "1800"))
+CELERY_TASK_SOFT_TIME_LIMIT = int(os.environ.get("CELERY_TASK_SOFT_TIME_LIMIT", "1500"))
+CELERY_TASK_IGNORE_RESULT = True
+# core.idempotency：enqueue_once 的 queued 標記在這段時間內擋下重複排入；broker 遺失訊息時到期後可再排入
+IDEMPOTENCY_QUEUED_LEASE = int(os.environ.get("IDEMPOTENCY_QUEUED_LEASE", "900"))
 
 # --- App base URL & Microsoft Graph ---
 APP_BASE_URL = os.environ.get("APP_BASE_URL", "http://localhost:8080")
@@ -184,28 +273,81 @@ GRAPH = {
     "TEAM_ID": os.environ.get("TEAMS_TEAM_ID", ""),
     "CHANNEL_ID": os.environ.get("TEAMS_CHANNEL_ID", ""),
 }
-# --- WhiteNoise: ensure compressed static storage (.br/.gz on collectstatic) ---
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
-try:
-    STORAGES
-except NameError:
-    STORAGES = {}
-STORAGES["staticfiles"] = {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"}
-
-# --- enforced by script: WhiteNoise order ---
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-]
+# 可指向本機 fake Graph（python manage.py fake_graph）做節流測試
+GRAPH_BASE_URL = os.environ.get("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+GRAPH_LOGIN_BASE = os.environ.get("GRAPH_LOGIN_BASE", "https://login.microsoftonline.com")
 
-# --- enforced for Django admin ---
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
+# Teams 批次投遞：$batch 每批最多 20 則；token bucket 由所有 worker 透過 Redis 共用
+TEAMS_DELIVERY = {
+    "BATCH_SIZE": int(os.environ.get("TEAMS_BATCH_SIZE", "20")),
+    "RATE_PER_SEC": float(os.environ.get("TEAMS_RATE_PER_SEC", "4")),
+    "BURST": int(os.environ.get("TEAMS_BURST", "20")),
+    "MAX_ATTEMPTS": int(os.environ.get("TEAMS_MAX_ATTEMPTS", "6")),
+    "MAX_BACKOFF": int(os.environ.get("TEAMS_MAX_BACKOFF", "300")),
+}
+
+# 客戶端 webhook（core/webhooks.py，由 manage.py webhook_worker 投遞）
+WEBHOOKS = {
+    "CONCURRENCY": int(os.environ.get("WEBHOOKS_CONCURRENCY", "200")),  # 每個 worker 同時進行中的投遞
+    "PER_HOST": int(os.environ.get("WEBHOOKS_PER_HOST", "8")),  # 每個端點主機的連線池上限
+    "TIMEOUT": float(os.environ.get("WEBHOOKS_TIMEOUT", "10")),
+    "BATCH_SIZE": int(os.environ.get("WEBHOOKS_BATCH_SIZE", "100")),
+    "MAX_ATTEMPTS": int(os.environ.get("WEBHOOKS_MAX_ATTEMPTS", "10")),
+    "MAX_BACKOFF": int(os.environ.get("WEBHOOKS_MAX_BACKOFF", "3600")),
+    "MAX_AGE": int(os.environ.get("WEBHOOKS_MAX_AGE", "86400")),  # 秒；超過仍未送達即進入 dead
+    # 斷路器：連續 BREAKER_THRESHOLD 次失敗即暫停該端點，暫停時間由 BREAKER_COOLDOWN 起倍增
+    "BREAKER_THRESHOLD": int(os.environ.get("WEBHOOKS_BREAKER_THRESHOLD", "5")),
+    "BREAKER_COOLDOWN": int(os.environ.get("WEBHOOKS_BREAKER_COOLDOWN", "30")),
+    "BREAKER_MAX_COOLDOWN": int(os.environ.get("WEBHOOKS_BREAKER_MAX_COOLDOWN", "1800")),
+    "SIGNATURE_TOLERANCE": int(os.environ.get("WEBHOOKS_SIGNATURE_TOLERANCE", "300")),  # 接收端驗證用（秒）
+}
+
+# 請求節流（core/throttling.py）：每個使用者 / IP 與整個 web 層各一個 Redis token bucket。
+# GLOBAL_RATE 約為 gunicorn worker 每秒可處理的請求數；API 須保留 API_RESERVE 比例給頁面操作
+THROTTLE = {
+    "ENABLED": os.environ.get("THROTTLE_ENABLED", "false").lower() == "true",
+    "RATES": {
+        "interactive": os.environ.get("THROTTLE_INTERACTIVE_RATE", "120/min"),
+        "form": os.environ.get("THROTTLE_FORM_RATE", "30/min"),
+        "api": os.environ.get("THROTTLE_API_RATE", "300/min"),
+        "api_write": os.environ.get("THROTTLE_API_WRITE_RATE", "60/min"),
+        "alarms": os.environ.get("THROTTLE_ALARMS_RATE", "600/min"),  # 每次最多 ALARMS["MAX_PER_REQUEST"] 筆
+    },
+    "GLOBAL_RATE": os.environ.get("THROTTLE_GLOBAL_RATE", "40/s"),
+    "API_RESERVE": float(os.environ.get("THROTTLE_API_RESERVE", "0.25")),
+    "TRUST_X_FORWARDED_FOR": os.environ.get("THROTTLE_TRUST_X_FORWARDED_FOR", "false").lower() == "true",
+    "EXEMPT_PREFIXES": ("/static/", "/media/", "/api/"),  # /api/ 由 DRF 的 core.throttles.ApiThrottle 處理
+}
+
+# IssueEvent 經 Redis stream 由 manage.py event_writer 批次寫入（core/event_stream.py）；
+# 啟用前需先部署 event_writer，否則事件會停留在 stream 中
+EVENT_STREAM = {
+    "ENABLED": os.environ.get("EVENT_STREAM_ENABLED", "false").lower() == "true",
+    "BATCH_SIZE": int(os.environ.get("EVENT_STREAM_BATCH_SIZE", "500")),
+    "BLOCK_MS": int(os.environ.get("EVENT_STREAM_BLOCK_MS", "2000")),
+    "CLAIM_IDLE_MS": int(os.environ.get("EVENT_STREAM_CLAIM_IDLE_MS", "60000")),  # 消費者當掉後多久由他人接手
+    "MAX_DELIVERIES": int(os.environ.get("EVENT_STREAM_MAX_DELIVERIES", "5")),  # 單則事件重試幾次後移到 events:dead
+    "MAXLEN": int(os.environ.get("EVENT_STREAM_MAXLEN", "1000000")),
+    "RECENT_TTL": int(os.environ.get("EVENT_STREAM_RECENT_TTL", "600")),  # 讀到自己寫入的短期清單
+}
+
+# 設備告警匯入（POST /api/alarms/ → Redis stream → core.tasks.ingest_alarms，見 core/alarms.py）
+ALARMS = {
+    "DEDUP_WINDOW": int(os.environ.get("ALARMS_DEDUP_WINDOW", "300")),  # 秒；窗內重複告警只計數
+    "BATCH_SIZE": int(os.environ.get("ALARMS_BATCH_SIZE", "1000")),
+    "MAX_PER_REQUEST": int(os.environ.get("ALARMS_MAX_PER_REQUEST", "1000")),
+    "MAX_BACKLOG": int(os.environ.get("ALARMS_MAX_BACKLOG", "100000")),  # 超過即回 503 + Retry-After
+    "DRAIN_SECONDS": float(os.environ.get("ALARMS_DRAIN_SECONDS", "50")),  # 單次任務最長處理時間
+    "CLAIM_IDLE_MS": int(os.environ.get("ALARMS_CLAIM_IDLE_MS", "120000")),
+    "MAX_DELIVERIES": int(os.environ.get("ALARMS_MAX_DELIVERIES", "5")),  # 單則告警重試幾次後移到 alarms:dead
+    # 告警等級 → 問題優先度；未列出的等級用 DEFAULT_PRIORITY
+    "SEVERITY_PRIORITY": {"critical": "P0", "major": "P1", "minor": "P2", "warning": "P3"},
+    "DEFAULT_PRIORITY": os.environ.get("ALARMS_DEFAULT_PRIORITY", "P2"),
+}
+
+# --- Read replicas：需在 AuthenticationMiddleware 之後 ---
+if REPLICA_DATABASES:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'core.db_router.ReplicaRoutingMiddleware',
+    )
@@ -0,0 +1,33 @@
+"""
+行程啟動 / fork 相關的共用處理（gunicorn.conf.py、app/wsgi.py、app/celery.py 使用）。
+
+- warm_up()：在 gunicorn master（preload_app）先載入 URLconf、views 與模板引擎，
+  fork 出來的 worker 直接共用這些已 import 的模組（copy-on-write），不必各自再載入。
+- close_before_fork()：fork 前關閉 master 的 DB 連線，避免子行程繼承同一個 socket。
+- reset_after_fork()：子行程丟棄繼承來的 DB 連線物件（不送 terminate，以免影響其他行程）
+  並重建 Redis 連線池。
+"""
+
+
+def warm_up():
+    from django.template import engines
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns  # noqa: B018  觸發 urls / views import
+    engines.all()  # 建立模板引擎並載入各 app 的 templatetags
+
+
+def close_before_fork():
+    from django.db import connections
+
+    connections.close_all()
+
+
+def reset_after_fork():
+    from django.db import connections
+
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+    from core.redis_client import get_redis
+
+    get_redis.cache_clear()
@@ -3,11 +3,18 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.attachment_views import serve_attachment
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('attachments/<str:sha256>/<str:label>', serve_attachment, name='attachment_file'),
     path('', include('issues.urls')),
 ]
 
+# REST API（core）僅在 API_ENABLED 時掛載，避免未安裝 DRF 時 import 失敗
+if settings.API_ENABLED:
+    urlpatterns += [path('api/', include('core.urls'))]
+
 
 # 只有在 DEBUG 模式下才提供靜態文件和媒體文件
 if settings.DEBUG:
@@ -2,3 +2,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE','app.settings')
 application = get_wsgi_application()
+
+# gunicorn preload_app 時於 master 先載入 URLconf / views，worker fork 後即可服務
+if os.environ.get('DJANGO_WARM_UP', 'true').lower() == 'true':
+    from .startup import warm_up
+    warm_up()
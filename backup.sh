@@ -1,22 +1,17 @@
 #!/usr/bin/env bash
 set -euo pipefail
-APP_DIR="/srv/issue_server"
-MEDIA_DIR="/srv/issue_server/media"
-BACKUP_DIR="/srv/issue_server/backups"
-DB_CONTAINER="fae_db"
-DB_USER="$(grep -E '^DB_USER=' "$APP_DIR/.env" | cut -d'=' -f2)"
-DB_NAME="$(grep -E '^DB_NAME=' "$APP_DIR/.env" | cut -d'=' -f2)"
+# 增量備份（資料庫串流 dump + 內容定址媒體檔），實作見 core/backup.py
+# 備份輸出：容器內 BACKUP_DIR（預設 /app/backups）
+WEB_CONTAINER="${WEB_CONTAINER:-fae_issue_web}"
+KEEP_DAYS="${KEEP_DAYS:-30}"
 TS=$(date +"%Y%m%d-%H%M%S")
 
-mkdir -p "$BACKUP_DIR"
+# 1) 備份 + 保留策略：刪除 KEEP_DAYS 天前的 snapshot，回收未被引用的媒體 object
+docker exec -i "$WEB_CONTAINER" python manage.py backup --keep-days "$KEEP_DAYS"
 
-# 1) PostgreSQL 邏輯備份
-docker exec -i "$DB_CONTAINER" pg_dump -U "$DB_USER" "$DB_NAME" | gzip > "$BACKUP_DIR/db-$TS.sql.gz"
+# 2) 驗證最新 snapshot：檢查碼 + 還原到暫存資料庫
+if [[ "${VERIFY:-1}" == "1" ]]; then
+  docker exec -i "$WEB_CONTAINER" python manage.py backup --verify latest
+fi
 
-# 2) 附件備份
-tar -czf "$BACKUP_DIR/media-$TS.tar.gz" -C "$MEDIA_DIR" .
-
-# 3) 保留策略：刪除 30 天前的檔案
-find "$BACKUP_DIR" -type f -mtime +30 -delete
-
-echo "Backup done @ $TS → $BACKUP_DIR"
+echo "Backup done @ $TS"
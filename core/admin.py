@@ -0,0 +1,109 @@
+from django import forms
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import (ArchivedIssue, Project, Asset, Issue, Attachment, IssueEvent, IssueStatusInterval,
+                     WebhookSubscription)
+
+@admin.register(Project)
+class ProjectAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "customer")
+
+@admin.register(Asset)
+class AssetAdmin(admin.ModelAdmin):
+    list_display = ("id", "serial_no", "name", "project", "location")
+    list_select_related = ("project",)
+    # 序號以前綴比對（^ → istartswith），位置為包含比對；
+    # PostgreSQL 上兩者皆由 0003 的 trigram 索引支援，不再全表掃描
+    search_fields = ("^serial_no", "location")
+
+def attachment_thumbnail(obj):
+    # WebP 優先、JPEG 備援；loading=lazy 讓長清單只載入可見的縮圖
+    if "thumb.webp" not in obj.derivatives:
+        return obj.get_derivatives_status_display()
+    url = lambda label: reverse("attachment_file", args=[obj.sha256, label])
+    return format_html(
+        '<a href="{}" target="_blank"><picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" alt="{}" loading="lazy" style="max-height:80px"></picture></a>',
+        url("preview.webp"), url("thumb.webp"), url("thumb.jpg"), obj.original_name,
+    )
+attachment_thumbnail.short_description = "預覽"
+
+class AttachmentInline(admin.TabularInline):
+    model = Attachment
+    extra = 0
+    fields = ("file", "original_name", "size", attachment_thumbnail, "derivatives_status", "created_at")
+    readonly_fields = ("original_name", "size", attachment_thumbnail, "derivatives_status", "created_at")
+
+@admin.register(Issue)
+class IssueAdmin(admin.ModelAdmin):
+    inlines = [AttachmentInline]
+    list_display = ("id", "title", "project", "priority", "status", "assignee", "created_at")
+    list_filter = ("status", "priority", "project")
+    list_select_related = ("project",)
+    search_fields = ("title",)
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ("id", "issue", "original_name", "content_type", "size", attachment_thumbnail, "derivatives_status")
+    list_filter = ("derivatives_status",)
+    list_select_related = ("issue",)
+    readonly_fields = ("original_name", "content_type", "size", "sha256", "derivatives", "derivatives_status")
+admin.site.register(IssueEvent)
+
+@admin.register(IssueStatusInterval)
+class IssueStatusIntervalAdmin(admin.ModelAdmin):
+    # 由 manage.py analytics_refresh / refresh_status_intervals 產生，僅供檢視
+    list_display = ("issue", "status", "started_at", "ended_at", "duration_seconds", "project", "assignee")
+    list_filter = ("status", "project")
+    list_select_related = ("issue", "project")
+    readonly_fields = [f.name for f in IssueStatusInterval._meta.fields]
+
+@admin.register(ArchivedIssue)
+class ArchivedIssueAdmin(admin.ModelAdmin):
+    # 由 core.archive 寫入；還原以原 id 寫回主表
+    list_display = ("original_id", "source", "title", "status", "customer", "closed_at", "archived_at")
+    list_filter = ("source", "status")
+    search_fields = ("=original_id", "title", "customer")
+    date_hierarchy = "closed_at"
+    readonly_fields = [f.name for f in ArchivedIssue._meta.fields]
+    actions = ["restore_selected"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        # 清單頁不讀取快照本體（data 可能很大）
+        match = request.resolver_match
+        return qs.defer("data") if match and match.url_name.endswith("_changelist") else qs
+
+    @admin.action(description="還原選取的問題")
+    def restore_selected(self, request, queryset):
+        from .archive import ArchiveError, restore
+        restored = 0
+        for row in queryset.only("source", "original_id"):
+            try:
+                restore(row.source, row.original_id)
+                restored += 1
+            except ArchiveError as e:
+                self.message_user(request, str(e), level="warning")
+        self.message_user(request, f"已還原 {restored} 筆")
+
+class WebhookSubscriptionForm(forms.ModelForm):
+    # events 存成 JSON 清單；不勾選表示訂閱全部事件
+    events = forms.MultipleChoiceField(choices=WebhookSubscription.EVENTS, required=False,
+                                       widget=forms.CheckboxSelectMultiple, help_text="不勾選表示全部事件")
+
+    class Meta:
+        model = WebhookSubscription
+        fields = "__all__"
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    # 投遞狀態（佇列、斷路器、dead）見 manage.py webhook_worker --status
+    form = WebhookSubscriptionForm
+    list_display = ("id", "project", "url", "events", "is_active", "updated_at")
+    list_filter = ("is_active",)
+    list_select_related = ("project",)
+    search_fields = ("url", "description")
@@ -0,0 +1,427 @@
+"""
+設備告警匯入：監控系統以 POST /api/alarms/ 批次送入告警，自動轉成 core.Issue。
+
+    POST /api/alarms/ ──XADD──▶ alarms:ingest ──XREADGROUP（alarm-ingest 群組）──▶ ingest() ──▶ XACK + XDEL
+
+- 去重：每個 (asset, code) 以指紋對應一列 AlarmFingerprint。指紋已有未結案問題時不另開單：
+  距上次事件 DEDUP_WINDOW 秒內只累加次數，超過則在同一問題追加一筆 alarm 事件；
+  問題結案（或被封存）後再出現才開新問題。
+- 批次：同一批告警先依指紋合併，再以固定次數的查詢處理——資產一次查、指紋列一次讀、
+  新問題一次 bulk_create、指紋一次 upsert、事件一次寫入（event_stream.append_many）。
+  PostgreSQL 上以 advisory lock 鎖住本批指紋，多個 worker 並行時同一指紋不會開出兩張單。
+- 背壓：stream 中尚未處理的告警達到 MAX_BACKLOG 時 enqueue 拋出 Backpressure，
+  API 回 503，Retry-After 依最近的處理速率估算，由送方稍後重送。
+- 至少一次：處理完才 ACK；worker 當掉時未 ACK 的訊息由之後的任務以 XAUTOCLAIM 接手，
+  重送只會讓次數多算，不會多開問題。
+- 整批匯入失敗時改為逐筆匯入：其他告警照常 ACK，失敗的留在 pending 稍後重試；
+  同一則訊息已投遞 MAX_DELIVERIES 次仍失敗即移到 alarms:dead（保留原始告警與錯誤）。
+  資料庫連線錯誤不算個別告警的問題：整批留在 pending，任務失敗後由排程重試。
+- Redis 無法連線時 API 直接同步處理該批（最多 MAX_PER_REQUEST 筆），不遺失告警。
+  commit 之後的通知 / webhook / 列表快取失效各自獨立，失敗只記錄，不讓已寫入的請求回 500。
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import event_stream
+from .models import AlarmFingerprint, Asset, Issue
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+STREAM_KEY = "alarms:ingest"
+DEAD_KEY = "alarms:dead"
+DEAD_MAXLEN = 10000
+GROUP = "alarm-ingest"
+DRAIN_FLAG_KEY = "alarms:drain_scheduled"
+RATE_KEY = "alarms:drain_rate"  # 最近一批的處理速率（筆 / 秒），估算 Retry-After 用
+
+CLOSED_STATUSES = ("closed", "resolved")
+ALARM_EVENT = "alarm"
+DEFAULT_RETRY_AFTER = 30
+MAX_RETRY_AFTER = 300
+
+
+def _conf(name):
+    return settings.ALARMS[name]
+
+
+class InvalidAlarm(ValueError):
+    pass
+
+
+class Backpressure(Exception):
+    def __init__(self, backlog: int, retry_after: int):
+        super().__init__(f"alarm backlog {backlog} exceeds {_conf('MAX_BACKLOG')}")
+        self.backlog = backlog
+        self.retry_after = retry_after
+
+
+def fingerprint(asset_id: int, code: str) -> str:
+    return hashlib.sha1(f"{asset_id}|{code}".encode()).hexdigest()
+
+
+def normalize(raw) -> dict:
+    """
+    驗證並正規化一筆告警。asset（id）與 serial_no 擇一、code 必填；
+    severity、message、occurred_at（ISO 8601，未提供時為收到的時間）選填。
+    """
+    if not isinstance(raw, dict):
+        raise InvalidAlarm("must be an object")
+    code = str(raw.get("code") or "").strip().upper()
+    if not code or len(code) > 50:
+        raise InvalidAlarm("code is required (max 50 characters)")
+    asset, serial = raw.get("asset"), str(raw.get("serial_no") or "").strip().upper()
+    if asset in (None, ""):
+        if not serial:
+            raise InvalidAlarm("asset or serial_no is required")
+        asset = None
+    else:
+        try:
+            asset = int(asset)
+        except (TypeError, ValueError):
+            raise InvalidAlarm("asset must be an integer id")
+    occurred_at = timezone.now()
+    if raw.get("occurred_at"):
+        occurred_at = parse_datetime(str(raw["occurred_at"]))
+        if occurred_at is None:
+            raise InvalidAlarm("occurred_at must be an ISO 8601 datetime")
+        if timezone.is_naive(occurred_at):
+            occurred_at = timezone.make_aware(occurred_at)
+    return {
+        "asset": asset,
+        "serial_no": serial[:100],
+        "code": code,
+        "severity": str(raw.get("severity") or "").strip().lower()[:20],
+        "message": str(raw.get("message") or "")[:500],
+        "occurred_at": occurred_at.isoformat(),
+    }
+
+
+def validate(items) -> tuple:
+    """回傳 (正規化後的告警, [{"index", "error"}])；格式錯誤的告警不影響同批其他告警。"""
+    alarms, errors = [], []
+    for index, raw in enumerate(items):
+        try:
+            alarms.append(normalize(raw))
+        except InvalidAlarm as e:
+            errors.append({"index": index, "error": str(e)})
+    return alarms, errors
+
+
+# ---------------------------------------------------------------- 入列 / 背壓
+
+def retry_after(r, backlog: int) -> int:
+    """積壓降到 MAX_BACKLOG 八成所需的秒數；還沒有處理速率時用預設值。"""
+    rate = float(r.get(RATE_KEY) or 0)
+    if rate <= 0:
+        return DEFAULT_RETRY_AFTER
+    excess = backlog - _conf("MAX_BACKLOG") * 0.8
+    return max(1, min(MAX_RETRY_AFTER, math.ceil(excess / rate)))
+
+
+def enqueue(alarms: list) -> dict:
+    """
+    alarms 為 normalize 過的告警。回傳 {"queued", "ingested", "backlog"}；
+    積壓已達 MAX_BACKLOG 時拋出 Backpressure（整批都不收，由送方重送）。
+    """
+    try:
+        r = get_redis()
+        depth = r.xlen(STREAM_KEY)  # 處理完即 XDEL，長度就是積壓量
+    except Exception as e:
+        log.warning("alarm stream unavailable, ingesting %d alarms synchronously: %s", len(alarms), e)
+        ingest(alarms)
+        return {"queued": 0, "ingested": len(alarms), "backlog": None}
+
+    # 只看目前積壓量：單批大於上限時也能在積壓清空後收下，不會永遠被擋
+    if depth >= _conf("MAX_BACKLOG"):
+        raise Backpressure(depth, retry_after(r, depth))
+    pipe = r.pipeline()  # MULTI：整批入列或整批不入列，失敗時改為同步處理不會重複計數
+    for alarm in alarms:
+        pipe.xadd(STREAM_KEY, {"alarm": json.dumps(alarm)})
+    try:
+        pipe.execute()
+    except Exception as e:
+        log.warning("alarm stream write failed, ingesting %d alarms synchronously: %s", len(alarms), e)
+        ingest(alarms)
+        return {"queued": 0, "ingested": len(alarms), "backlog": None}
+    try:
+        schedule_drain(r)
+    except Exception as e:
+        # 告警已入列：由定期的 ingest-alarms 任務接手，不讓送方因此重送
+        log.warning("alarm drain not scheduled: %s", e)
+    return {"queued": len(alarms), "ingested": 0, "backlog": depth + len(alarms)}
+
+
+def schedule_drain(r=None, countdown: float = 0):
+    # 以 NX 旗標合併大量 enqueue；任務開始時清掉旗標，處理期間再進來的告警會另排一個並行的任務
+    r = r or get_redis()
+    if r.set(DRAIN_FLAG_KEY, 1, nx=True, ex=max(60, int(countdown) + 60)):
+        from .tasks import ingest_alarms
+        ingest_alarms.apply_async(countdown=countdown)
+
+
+def backlog(r) -> dict:
+    info = r.xpending(STREAM_KEY, GROUP)
+    return {"length": r.xlen(STREAM_KEY), "pending": info["pending"], "dead": r.xlen(DEAD_KEY),
+            "rate": float(r.get(RATE_KEY) or 0)}
+
+
+# ---------------------------------------------------------------- 消費者
+
+def ensure_group(r):
+    import redis
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def consume_once(r, consumer: str, count: int = None) -> int:
+    """讀一批（先接手閒置過久的 pending）、匯入、ACK 並刪除。回傳處理的訊息數。"""
+    count = count or _conf("BATCH_SIZE")
+    claimed = r.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_time=_conf("CLAIM_IDLE_MS"),
+                           start_id="0-0", count=count)
+    entries = [e for e in claimed[1] if e[1]]
+    if len(entries) < count:
+        for _, messages in r.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=count - len(entries)) or []:
+            entries.extend(messages)
+    if not entries:
+        return 0
+
+    started = time.monotonic()
+    parsed, done = {}, []
+    for message_id, fields in entries:
+        raw = fields.get(b"alarm", fields.get("alarm"))
+        try:
+            parsed[message_id] = json.loads(raw)
+        except (TypeError, ValueError):
+            log.error("dropping malformed alarm %s: %r", message_id, fields)
+            done.append(message_id)
+    try:
+        ingest(list(parsed.values()))
+        done.extend(parsed)
+    except (OperationalError, InterfaceError):
+        raise
+    except Exception:
+        log.exception("alarm batch of %d failed, ingesting one by one", len(parsed))
+        done.extend(_ingest_each(r, parsed))
+    if done:
+        r.xack(STREAM_KEY, GROUP, *done)
+        r.xdel(STREAM_KEY, *done)
+    r.set(RATE_KEY, len(done) / max(time.monotonic() - started, 0.001), ex=600)
+    return len(entries)
+
+
+def _ingest_each(r, parsed: dict) -> list:
+    """逐筆匯入；回傳已處理（匯入成功或移到 dead）的訊息 id。資料庫連線錯誤直接拋出。"""
+    done, failed = [], {}
+    for message_id, alarm in parsed.items():
+        try:
+            ingest([alarm])
+            done.append(message_id)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            failed[message_id] = e
+    if not failed:
+        return done
+    pipe = r.pipeline(transaction=False)
+    for message_id in failed:
+        pipe.xpending_range(STREAM_KEY, GROUP, min=message_id, max=message_id, count=1)
+    deliveries = {message_id: (info[0]["times_delivered"] if info else 0)
+                  for message_id, info in zip(failed, pipe.execute())}
+    dead = [message_id for message_id in failed if deliveries[message_id] >= _conf("MAX_DELIVERIES")]
+    if dead:
+        pipe = r.pipeline()
+        for message_id in dead:
+            error = failed[message_id]
+            log.error("alarm %s failed %d times, moving to %s: %s", message_id, deliveries[message_id], DEAD_KEY, error)
+            pipe.xadd(DEAD_KEY, {"alarm": json.dumps(parsed[message_id]), "id": message_id,
+                                 "error": f"{type(error).__name__}: {error}"[:500]},
+                      maxlen=DEAD_MAXLEN, approximate=True)
+        pipe.execute()
+        done.extend(dead)
+    for message_id in failed.keys() - set(dead):
+        log.warning("alarm %s failed (delivery %d), left pending for retry: %s",
+                    message_id, deliveries[message_id], failed[message_id])
+    return done
+
+
+def drain(consumer: str = None, max_seconds: float = None) -> int:
+    """處理積壓直到清空或超過 DRAIN_SECONDS；時間到仍有積壓時再排一次任務。回傳處理的告警數。"""
+    r = get_redis()
+    ensure_group(r)
+    consumer = consumer or event_stream.consumer_name()
+    deadline = time.monotonic() + (max_seconds or _conf("DRAIN_SECONDS"))
+    total = 0
+    while True:
+        handled = consume_once(r, consumer)
+        total += handled
+        if not handled:
+            return total
+        if time.monotonic() >= deadline:
+            schedule_drain(r)
+            return total
+
+
+# ---------------------------------------------------------------- 匯入
+
+@dataclass
+class _Group:
+    asset: Asset
+    code: str
+    times: list = field(default_factory=list)
+    severity: str = ""
+    message: str = ""
+
+
+def _resolve_assets(alarms) -> tuple:
+    ids = {a["asset"] for a in alarms if a.get("asset")}
+    serials = {a["serial_no"] for a in alarms if not a.get("asset") and a.get("serial_no")}
+    base = Asset.objects.select_related("project").only("id", "name", "project__customer").order_by("-id")
+    by_id = base.in_bulk(ids) if ids else {}
+    by_serial = {}
+    if serials:
+        # UPPER(serial_no) IN (...) 命中 core_asset_serial_upper_idx；序號重複時取 id 最小者
+        for asset in base.annotate(serial_upper=Upper("serial_no")).filter(serial_upper__in=serials):
+            by_serial[asset.serial_upper] = asset
+    return by_id, by_serial
+
+
+def _group(alarms, stats) -> dict:
+    by_id, by_serial = _resolve_assets(alarms)
+    groups = {}
+    for a in alarms:
+        asset = by_id.get(a["asset"]) if a.get("asset") else by_serial.get(a.get("serial_no"))
+        if asset is None:
+            stats["unknown_asset"] += 1
+            continue
+        key = fingerprint(asset.id, a["code"])
+        group = groups.setdefault(key, _Group(asset, a["code"]))
+        occurred_at = parse_datetime(a["occurred_at"])
+        if not group.times or occurred_at >= max(group.times):
+            group.severity, group.message = a.get("severity", ""), a.get("message", "")
+        group.times.append(occurred_at)
+    for group in groups.values():
+        group.times.sort()
+    return groups
+
+
+def _lock_fingerprints(keys):
+    # 依固定順序取 transaction 級 advisory lock，避免兩個 worker 對同一新指紋各開一張單
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(k) FROM "
+            "(SELECT hashtextextended(f, 0) AS k FROM unnest(%s::text[]) AS f ORDER BY 1) AS s",
+            [sorted(keys)],
+        )
+
+
+def _new_issue(group) -> Issue:
+    asset = group.asset
+    return Issue(
+        title=f"[{group.code}] {asset.name} {group.message}".strip()[:255],
+        description=group.message,
+        priority=_conf("SEVERITY_PRIORITY").get(group.severity, _conf("DEFAULT_PRIORITY")),
+        assignee="",
+        status="open",
+        project_id=asset.project_id,
+        asset=asset,
+        customer=asset.project.customer[:200],
+    )
+
+
+def ingest(alarms: list) -> dict:
+    """
+    匯入一批 normalize 過的告警，回傳統計：
+    alarms / created（新開問題）/ appended（追加到既有問題的事件）/ deduplicated（窗內只計數）/ unknown_asset。
+    """
+    stats = {"alarms": len(alarms), "created": 0, "appended": 0, "deduplicated": 0, "unknown_asset": 0}
+    groups = _group(alarms, stats)
+    if not groups:
+        return stats
+    window = timedelta(seconds=_conf("DEDUP_WINDOW"))
+    now = timezone.now()
+
+    with transaction.atomic():
+        _lock_fingerprints(groups)
+        existing = AlarmFingerprint.objects.in_bulk(list(groups), field_name="fingerprint")
+        open_issues = Issue.objects.only("id", "asset_id", "project_id", "priority").exclude(
+            status__in=CLOSED_STATUSES).in_bulk({fp.issue_id for fp in existing.values() if fp.issue_id})
+
+        rows, new_issues, events = [], [], []
+        for key, group in groups.items():
+            fp = existing.get(key)
+            issue = open_issues.get(fp.issue_id) if fp else None
+            if issue is None:
+                # 沒有未結案的問題：以本批第一筆告警開新問題，次數重新起算
+                issue = _new_issue(group)
+                new_issues.append(issue)
+                fp = AlarmFingerprint(fingerprint=key, asset=group.asset, code=group.code, occurrences=1,
+                                      first_seen_at=group.times[0], last_event_at=group.times[0])
+                times = group.times[1:]
+            else:
+                times = group.times
+            for occurred_at in times:
+                fp.occurrences += 1
+                if occurred_at - fp.last_event_at >= window:
+                    fp.last_event_at = occurred_at
+                    events.append((issue, ALARM_EVENT, "", occurred_at))
+                    stats["appended"] += 1
+                else:
+                    stats["deduplicated"] += 1
+            fp.issue = issue
+            fp.severity, fp.message = group.severity, group.message
+            fp.last_seen_at = max(group.times[-1], fp.last_seen_at or group.times[-1])
+            rows.append(fp)
+
+        Issue.objects.bulk_create(new_issues)
+        stats["created"] = len(new_issues)
+        for fp in rows:
+            fp.issue_id = fp.issue.pk  # 新問題在 bulk_create 後才有 id
+        AlarmFingerprint.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["fingerprint"],
+            update_fields=["issue", "severity", "message", "occurrences", "first_seen_at",
+                           "last_seen_at", "last_event_at"],
+        )
+        appended_ids = {issue.pk for issue, *_ in events} - {issue.pk for issue in new_issues}
+        if appended_ids:
+            # 有新告警的問題排到列表前面（bulk 更新不觸發 auto_now）
+            Issue.objects.filter(id__in=appended_ids).update(updated_at=now)
+        created_keys = event_stream.append_many(
+            [(issue, "created", issue.status, issue.created_at) for issue in new_issues] + events
+        )[:len(new_issues)]
+        transaction.on_commit(lambda: _after_commit(new_issues, created_keys, groups), robust=True)
+    return stats
+
+
+def _after_commit(new_issues, created_keys, groups):
+    # bulk_create / update 不觸發 post_save：通知與列表快取失效在這裡補上。
+    # 告警已 commit：任一步失敗（例如 broker 即 Redis 無法連線）只記錄，不影響其他步驟，也不讓請求回 500
+    from issues import saved_views
+    from . import webhooks
+    from .tasks import notify_issue_event
+    webhooks.publish([(issue, "created", key) for issue, key in zip(new_issues, created_keys)])
+    for issue, key in zip(new_issues, created_keys):
+        try:
+            notify_issue_event(issue, "created", key)
+        except Exception as e:
+            log.warning("alarm issue %s: notification not queued: %s", issue.pk, e)
+    try:
+        saved_views.bump_for_issue("core", {g.asset.project_id for g in groups.values()})
+    except Exception as e:
+        log.warning("alarm saved view bump failed: %s", e)
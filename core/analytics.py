@@ -0,0 +1,243 @@
+"""
+狀態停留時間 / MTTR / 未結案齡期分析。
+
+1. 事件 → 區間：對 IssueEvent（有 to_value 的狀態事件）以
+       LEAD(created_at) OVER (PARTITION BY issue_id ORDER BY created_at, id)
+   求出每一段狀態的結束時間，連續相同狀態合併後寫入 IssueStatusInterval。
+2. 增量：以事實表的 MAX(last_event_id) 為水位，只重建水位之後有新事件的問題。
+   序號與 commit 順序不一定一致，因此往回多看 OVERLAP_EVENTS 筆；重建是冪等的。
+   新事件寫入後由 refresh_status_intervals 任務（NX 旗標合併）延遲執行。
+3. 查詢只讀事實表：依 project / asset / assignee / customer 分組計算
+   count / mean / p50 / p75 / p90 / p95。PostgreSQL 使用 percentile_cont，
+   其他資料庫在 Python 端以相同的線性內插計算。
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Max, Sum, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+
+from .models import Issue, IssueEvent, IssueStatusInterval
+
+log = logging.getLogger(__name__)
+
+RESOLVED_STATUSES = ("closed", "resolved")  # 與 core.alarms.CLOSED_STATUSES 相同
+PERCENTILES = (0.5, 0.75, 0.9, 0.95)
+DIMENSIONS = {
+    "project": "project_id",
+    "asset": "asset_id",
+    "assignee": "assignee",
+    "customer": "project__customer",
+}
+OVERLAP_EVENTS = 500
+REFRESH_FLAG_KEY = "analytics:refresh_scheduled"
+
+
+# ---------------------------------------------------------------- 區間重建
+
+def _status_events():
+    return IssueEvent.objects.exclude(to_value="")
+
+
+def _window_rows(issue_ids, upto_id):
+    return (
+        _status_events()
+        .filter(issue_id__in=issue_ids, id__lte=upto_id)
+        .annotate(ended_at=Window(
+            Lead("created_at"),
+            partition_by=[F("issue_id")],
+            order_by=[F("created_at").asc(), F("id").asc()],
+        ))
+        .order_by("issue_id", "created_at", "id")
+        .values_list("id", "issue_id", "to_value", "created_at", "ended_at")
+    )
+
+
+def build_intervals(issue_ids, upto_id) -> list:
+    issues = {
+        row["id"]: row
+        # issues.Issue 的鏡像列（legacy_id 非空）不建區間，避免合併期間重複計算（core/consolidation.py）
+        for row in Issue.objects.filter(id__in=issue_ids, legacy_id__isnull=True)
+        .values("id", "created_at", "project_id", "asset_id", "assignee")
+    }
+    intervals = []
+    prev = None
+    for event_id, issue_id, status, started_at, ended_at in _window_rows(issue_ids, upto_id):
+        issue = issues.get(issue_id)
+        if issue is None:
+            continue
+        if prev is not None and prev.issue_id == issue_id and prev.status == status:
+            # 同狀態的重複事件（例如只改指派）延長上一段即可
+            prev.ended_at = ended_at
+            prev.last_event_id = event_id
+            continue
+        prev = IssueStatusInterval(
+            issue_id=issue_id,
+            status=status,
+            started_at=started_at,
+            ended_at=ended_at,
+            since_open_seconds=max(0.0, (started_at - issue["created_at"]).total_seconds()),
+            project_id=issue["project_id"],
+            asset_id=issue["asset_id"],
+            assignee=issue["assignee"] or "",
+            last_event_id=event_id,
+        )
+        intervals.append(prev)
+
+    for interval in intervals:
+        if interval.ended_at is not None:
+            interval.duration_seconds = (interval.ended_at - interval.started_at).total_seconds()
+    return intervals
+
+
+def watermark() -> int:
+    return IssueStatusInterval.objects.aggregate(m=Max("last_event_id"))["m"] or 0
+
+
+def refresh(full: bool = False, batch_size: int = 500) -> dict:
+    """
+    重建有新狀態事件的問題之區間；full=True 時重建全部。回傳處理的問題數與區間數。
+    """
+    upto_id = _status_events().aggregate(m=Max("id"))["m"] or 0
+    events = _status_events().filter(id__lte=upto_id)
+    if not full:
+        events = events.filter(id__gt=max(0, watermark() - OVERLAP_EVENTS))
+    issue_ids = sorted(set(events.values_list("issue_id", flat=True)))
+
+    total = 0
+    for i in range(0, len(issue_ids), batch_size):
+        chunk = issue_ids[i:i + batch_size]
+        intervals = build_intervals(chunk, upto_id)
+        with transaction.atomic():
+            IssueStatusInterval.objects.filter(issue_id__in=chunk).delete()
+            IssueStatusInterval.objects.bulk_create(intervals, batch_size=1000)
+        total += len(intervals)
+    return {"issues": len(issue_ids), "intervals": total, "upto_event_id": upto_id}
+
+
+def schedule_refresh():
+    """新狀態事件寫入後呼叫：ANALYTICS_REFRESH_DELAY 秒內的事件合併成一次重建。"""
+    from .redis_client import get_redis
+
+    delay = settings.ANALYTICS_REFRESH_DELAY
+    try:
+        if not get_redis().set(REFRESH_FLAG_KEY, 1, nx=True, ex=delay + 60):
+            return
+        from .tasks import refresh_status_intervals
+        refresh_status_intervals.apply_async(countdown=delay)
+    except Exception as e:
+        # 排程失敗不影響事件寫入；下一次事件或 manage.py analytics_refresh 會補上
+        log.warning("analytics refresh not scheduled: %s", e)
+
+
+# ---------------------------------------------------------------- 彙總
+
+def percentile_cont(sorted_values, p: float) -> float:
+    """與 PostgreSQL percentile_cont 相同的線性內插。"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _row(key, count, mean, pcts):
+    row = {"key": key, "count": count, "mean": round(mean, 1) if mean is not None else None}
+    for p, v in zip(PERCENTILES, pcts):
+        row[f"p{int(p * 100)}"] = round(v, 1) if v is not None else None
+    return row
+
+
+def summarize(pairs) -> list:
+    """(key, seconds) → 每個 key 一列統計，依筆數遞減排序。"""
+    groups = defaultdict(list)
+    for key, value in pairs:
+        groups[key].append(value)
+    rows = []
+    for key, values in groups.items():
+        values.sort()
+        rows.append(_row(key, len(values), sum(values) / len(values),
+                         [percentile_cont(values, p) for p in PERCENTILES]))
+    return sorted(rows, key=lambda r: (-r["count"], str(r["key"])))
+
+
+def _aggregate(qs) -> list:
+    """
+    qs 需輸出 dim / value 兩欄（每個問題一列）。PostgreSQL 直接在資料庫彙總。
+    """
+    connection = connections[qs.db]
+    if connection.vendor != "postgresql":
+        return summarize(qs.values_list("dim", "value"))
+
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT s.dim, COUNT(*), AVG(s.value), "
+            "percentile_cont(%s::float8[]) WITHIN GROUP (ORDER BY s.value) "
+            f"FROM ({sql}) s GROUP BY s.dim",
+            [list(PERCENTILES), *params],
+        )
+        rows = [_row(key, count, mean, pcts) for key, count, mean, pcts in cursor.fetchall()]
+    return sorted(rows, key=lambda r: (-r["count"], str(r["key"])))
+
+
+def _filtered(group_by, project=None, asset=None, customer=None, since=None, until=None):
+    if group_by not in DIMENSIONS:
+        raise ValueError(f"group_by must be one of {', '.join(DIMENSIONS)}")
+    qs = IssueStatusInterval.objects.all()
+    if project:
+        qs = qs.filter(project_id=project)
+    if asset:
+        qs = qs.filter(asset_id=asset)
+    if customer:
+        qs = qs.filter(project__customer=customer)
+    if since:
+        qs = qs.filter(started_at__gte=since)
+    if until:
+        qs = qs.filter(started_at__lt=until)
+    return qs.annotate(dim=F(DIMENSIONS[group_by])).order_by()
+
+
+def time_in_status(statuses, group_by="project", **filters) -> list:
+    """
+    每個問題在指定狀態（可多個）累計停留的秒數之分佈；只計已結束的區間。
+    """
+    qs = (
+        _filtered(group_by, **filters)
+        .filter(status__in=statuses, ended_at__isnull=False)
+        .values("dim", "issue_id")
+        .annotate(value=Sum("duration_seconds"))
+    )
+    return _aggregate(qs)
+
+
+def mttr(group_by="project", **filters) -> list:
+    """
+    目前為已解決狀態的問題：建立到（最後一次）解決的秒數。since / until 篩選解決時間。
+    """
+    qs = (
+        _filtered(group_by, **filters)
+        .filter(status__in=RESOLVED_STATUSES, ended_at__isnull=True)
+        .annotate(value=F("since_open_seconds"))
+        .values("dim", "value")
+    )
+    return _aggregate(qs)
+
+
+def aging(group_by="customer", now=None, **filters) -> list:
+    """
+    未結案問題自建立至今的秒數分佈（每個問題只有一段目前區間，資料量小，直接在 Python 計算）。
+    """
+    now = now or timezone.now()
+    rows = (
+        _filtered(group_by, **filters)
+        .filter(ended_at__isnull=True)
+        .exclude(status__in=RESOLVED_STATUSES)
+        .values_list("dim", "started_at", "since_open_seconds")
+    )
+    return summarize((dim, (now - started_at).total_seconds() + since_open)
+                     for dim, started_at, since_open in rows)
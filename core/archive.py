@@ -0,0 +1,290 @@
+"""
+冷熱分層：結案超過 ARCHIVE["AFTER_DAYS"] 天的問題移出主表，存進 core.ArchivedIssue。
+
+- archive_closed()：依 id 分批（每批一個交易），快照問題與其子資料後刪除原列。
+  PostgreSQL 上以 SELECT ... FOR UPDATE SKIP LOCKED 取批，與線上編輯或其他 worker 不互相等待。
+  由 archive_closed_issues 任務（batch 佇列，beat 每日）或 manage.py archive_issues 執行。
+- load()：主表查無此 id 時，由詳細頁 / API 讀取封存快照（未儲存的 model instance，唯讀）。
+- restore()：以原 id 寫回主表與子資料，並刪除封存列。
+附件檔案本身（內容雜湊路徑）不搬移；IssueStatusInterval 不建外鍵約束，封存後仍留在事實表。
+快照以 bulk_create 寫回，不觸發 post_save（不會產生新的事件或通知）；
+issues.Issue 的 core.Issue 鏡像列連同其事件與附件一併放進快照（MIRROR_LABEL），
+在刪除來源之前先刪除，雙寫的 post_delete 就不會連帶刪掉未保存的子資料；還原時以原 id 寫回。
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from . import consolidation
+from .models import ArchivedIssue
+
+log = logging.getLogger(__name__)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Source:
+    model: str                 # "app_label.Model"
+    closed_statuses: tuple
+    children: tuple            # (("app_label.Model", fk 欄位), ...)
+    summary: tuple             # (project 欄位, customer 欄位)；沒有則為 None
+    filters: tuple = ()        # 額外的候選條件 ((lookup, value), ...)
+
+
+SOURCES = {
+    ArchivedIssue.Source.CORE: Source(
+        model="core.Issue",
+        closed_statuses=("closed",),
+        children=(("core.Attachment", "issue"), ("core.IssueEvent", "issue")),
+        summary=("project_id", "project__customer"),
+        # issues.Issue 的鏡像列隨來源封存 / 還原（core/consolidation.py）
+        filters=(("legacy_id__isnull", True),),
+    ),
+    ArchivedIssue.Source.ISSUES: Source(
+        model="issues.Issue",
+        closed_statuses=("RESOLVED", "CLOSED"),
+        children=(("issues.Comment", "issue"),),
+        summary=(None, "customer"),
+    ),
+}
+
+
+MIRROR_LABEL = "core.Issue"
+
+
+def _conf(name):
+    return settings.ARCHIVE[name]
+
+
+def _source(source) -> Source:
+    try:
+        return SOURCES[source]
+    except KeyError:
+        raise ArchiveError(f"unknown archive source {source!r}")
+
+
+# ---------------------------------------------------------------- 快照
+
+def dump(obj) -> dict:
+    row = {}
+    for field in obj._meta.concrete_fields:
+        value = field.value_from_object(obj)
+        if isinstance(field, models.FileField):
+            value = value.name if value else ""
+        elif isinstance(value, datetime):
+            value = value.isoformat()  # DjangoJSONEncoder 只保留到毫秒
+        row[field.attname] = value
+    return row
+
+
+def build(model, row: dict):
+    """由快照建立 instance（欄位值經 to_python 還原型別）；不寫入資料庫。"""
+    values = {}
+    for field in model._meta.concrete_fields:
+        if field.attname in row:
+            value = row[field.attname]
+            values[field.attname] = value if value is None else field.to_python(value)
+    instance = model(**values)
+    instance._state.adding = False
+    return instance
+
+
+def _insert(model, instances):
+    """
+    bulk_create 會讓 auto_now / auto_now_add 欄位取當下時間；寫入後以 update() 改回快照中的值。
+    """
+    auto_fields = [f.attname for f in model._meta.concrete_fields
+                   if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    # pre_save 也會改寫 instance 上的值，需先記下
+    saved = [(instance, {f: getattr(instance, f) for f in auto_fields}) for instance in instances]
+    model.objects.bulk_create(instances)
+    for instance, values in saved:
+        if values:
+            model.objects.filter(pk=instance.pk).update(**values)
+            for name, value in values.items():
+                setattr(instance, name, value)
+
+
+def _candidates(spec: Source, cutoff):
+    model = apps.get_model(spec.model)
+    return (model.objects.filter(status__in=spec.closed_statuses, updated_at__lt=cutoff, **dict(spec.filters))
+            .order_by("id"))
+
+
+def _archive_ids(source, spec: Source, ids) -> int:
+    model = apps.get_model(spec.model)
+    project_field, customer_field = spec.summary
+    summary_fields = [f for f in ("id", project_field, customer_field) if f]
+    summaries = {row["id"]: row for row in model.objects.filter(id__in=ids).values(*summary_fields)}
+
+    issues = list(model.objects.filter(id__in=ids))
+    related = {issue.pk: {} for issue in issues}
+    for label, fk in spec.children:
+        child_model = apps.get_model(label)
+        for child in child_model.objects.filter(**{f"{fk}_id__in": ids}).order_by("pk"):
+            related[getattr(child, f"{fk}_id")].setdefault(label, []).append(dump(child))
+
+    if source == ArchivedIssue.Source.ISSUES:
+        for legacy_id, rows in _take_mirrors(ids).items():
+            for label, dumped in rows.items():
+                related[legacy_id].setdefault(label, []).extend(dumped)
+
+    ArchivedIssue.objects.bulk_create([
+        ArchivedIssue(
+            source=source,
+            original_id=issue.pk,
+            title=issue.title,
+            status=issue.status,
+            project_id=summaries[issue.pk].get(project_field) if project_field else None,
+            customer=(summaries[issue.pk].get(customer_field) if customer_field else "") or "",
+            closed_at=issue.updated_at,
+            data={"issue": dump(issue), "related": related[issue.pk]},
+        )
+        for issue in issues
+    ])
+    for label, fk in spec.children:
+        apps.get_model(label).objects.filter(**{f"{fk}_id__in": ids}).delete()
+    model.objects.filter(id__in=ids).delete()
+    return len(issues)
+
+
+def _take_mirrors(ids) -> dict:
+    """
+    快照並刪除 issues.Issue 的 core.Issue 鏡像列與其子資料；回傳 {來源 id: {label: [dump, ...]}}。
+    """
+    spec = SOURCES[ArchivedIssue.Source.CORE]
+    mirror_model = apps.get_model(spec.model)
+    mirrors = {m.pk: m for m in mirror_model.objects.filter(legacy_id__in=ids)}
+    if not mirrors:
+        return {}
+    out = {m.legacy_id: {MIRROR_LABEL: [dump(m)]} for m in mirrors.values()}
+    for label, fk in spec.children:
+        child_model = apps.get_model(label)
+        children = child_model.objects.filter(**{f"{fk}_id__in": mirrors}).order_by("pk")
+        for child in children:
+            out[mirrors[getattr(child, f"{fk}_id")].legacy_id].setdefault(label, []).append(dump(child))
+        children.delete()
+    mirror_model.objects.filter(pk__in=mirrors).delete()
+    return out
+
+
+def count_candidates(source=None, days: int = None) -> dict:
+    days = _conf("AFTER_DAYS") if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return {name: _candidates(spec, cutoff).count() for name, spec in SOURCES.items()
+            if not source or name == source}
+
+
+def archive_closed(source=None, days: int = None, batch_size: int = None, limit: int = None) -> dict:
+    """
+    把結案超過 days 天的問題分批移到封存表；回傳各來源封存的筆數。limit 限制單次總量。
+    """
+    days = _conf("AFTER_DAYS") if days is None else days
+    batch_size = batch_size or _conf("BATCH_SIZE")
+    cutoff = timezone.now() - timedelta(days=days)
+    result = {}
+    for name, spec in SOURCES.items():
+        if source and name != source:
+            continue
+        total, last_id = 0, 0
+        while limit is None or total < limit:
+            size = batch_size if limit is None else min(batch_size, limit - total)
+            with transaction.atomic():
+                qs = _candidates(spec, cutoff).filter(id__gt=last_id)
+                if connection.vendor == "postgresql":
+                    qs = qs.select_for_update(skip_locked=True)
+                ids = list(qs.values_list("id", flat=True)[:size])
+                if not ids:
+                    break
+                total += _archive_ids(name, spec, ids)
+            last_id = ids[-1]
+        result[name] = total
+        if total:
+            log.info("archived %d %s issues closed before %s", total, name, cutoff.date())
+    return result
+
+
+# ---------------------------------------------------------------- 讀取 / 還原
+
+def find(source, original_id):
+    return ArchivedIssue.objects.filter(source=source, original_id=original_id).first()
+
+
+def load(source, original_id):
+    """
+    回傳 (issue, {子資料 label: [instance, ...]})；不在封存表時回傳 (None, {})。
+    issue.is_archived = True，外鍵（例如 created_by）照常可讀取。
+    """
+    spec = _source(source)
+    archived = find(source, original_id)
+    if archived is None:
+        return None, {}
+    issue = build(apps.get_model(spec.model), archived.data["issue"])
+    issue.is_archived = True
+    issue.archived_at = archived.archived_at
+    related = {
+        label: [build(apps.get_model(label), row) for row in archived.data["related"].get(label, [])]
+        for label, _ in spec.children
+    }
+    return issue, related
+
+
+def search(q: str = "", source=None, limit: int = 50, user=None):
+    """user 非 staff 時只回傳其建立或被指派的問題（與 API 的 IsReporterOrManager 相同）。"""
+    qs = ArchivedIssue.objects.all()
+    if source:
+        qs = qs.filter(source=source)
+    if user is not None and not user.is_staff:
+        qs = qs.filter(models.Q(data__issue__created_by_id=user.id) | models.Q(data__issue__assigned_to_id=user.id))
+    q = (q or "").strip().lstrip("#")
+    if q.isdigit():
+        qs = qs.filter(original_id=int(q))
+    elif q:
+        qs = qs.filter(title__icontains=q)
+    return qs.defer("data")[:limit]
+
+
+def restore(source, original_id):
+    """以原 id 寫回主表；回傳還原後的問題。"""
+    spec = _source(source)
+    model = apps.get_model(spec.model)
+    with transaction.atomic():
+        archived = (ArchivedIssue.objects.select_for_update()
+                    .filter(source=source, original_id=original_id).first())
+        if archived is None:
+            raise ArchiveError(f"{source} issue {original_id} is not archived")
+        if model.objects.filter(pk=original_id).exists():
+            raise ArchiveError(f"{source} issue {original_id} already exists in the primary table")
+        issue = build(model, archived.data["issue"])
+        _insert(model, [issue])
+        labels = [label for label, _ in spec.children]
+        if source == ArchivedIssue.Source.ISSUES:
+            # 鏡像列先於其事件 / 附件寫回（外鍵）
+            labels += [MIRROR_LABEL] + [label for label, _ in SOURCES[ArchivedIssue.Source.CORE].children]
+        for label in labels:
+            child_model = apps.get_model(label)
+            _insert(child_model, [build(child_model, row) for row in archived.data["related"].get(label, [])])
+        if source == ArchivedIssue.Source.ISSUES and consolidation.dual_write_enabled():
+            consolidation.copy_ids([issue.pk])
+        archived.delete()
+        transaction.on_commit(lambda: _after_restore(source, issue))
+    return issue
+
+
+def _after_restore(source, issue):
+    # bulk_create 不觸發 signal：補做已儲存檢視版本遞增與重複偵測索引
+    from issues import saved_views
+    if source == ArchivedIssue.Source.ISSUES:
+        from issues.similarity import index_issue
+        index_issue(issue)
+        saved_views.bump_for_issue("issues")
+    else:
+        saved_views.bump_for_issue("core", [issue.project_id])
@@ -0,0 +1,181 @@
+"""
+精簡的非同步 HTTP/1.1 用戶端（asyncio streams），每個主機一組 keep-alive 連線池。
+
+webhook 投遞（core/webhooks.py）只需要 POST 一段 JSON、讀回狀態碼：不跟隨重新導向、不解壓縮，
+回應本文最多讀 max_body 位元組（超過即關閉該連線，不放回池中）。
+- 每個 (scheme, host, port) 最多 per_host 條連線同時使用，其餘請求在 semaphore 等候。
+- 從池中取出的連線可能已被對方關閉：尚未收到任何回應就斷線時，以新連線重送一次。
+- timeout 涵蓋等候連線、連線、送出與讀取回應。
+- URL 可含非 ASCII：路徑與查詢字串以百分比編碼，主機名稱以 IDNA 編碼；無法編碼時拋出 HTTPError。
+"""
+import asyncio
+import ssl
+import time
+from typing import NamedTuple
+from urllib.parse import quote, urlsplit
+
+
+class HTTPError(Exception):
+    """連線失敗、逾時或回應格式錯誤（沒有取得狀態碼）。"""
+
+
+class Response(NamedTuple):
+    status: int
+    headers: dict  # 標頭名稱皆為小寫
+    body: bytes
+
+
+# RFC 3986 中路徑 / 查詢字串可直接出現的字元；已編碼的 %XX 保持原樣
+_PATH_SAFE = "/%:@!$&'()*+,;=-._~"
+_QUERY_SAFE = _PATH_SAFE + "?"
+
+
+def _encode_target(url: str):
+    """回傳 ((scheme, host, port), Host 標頭, 請求目標)，皆為 ASCII。"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPError(f"unsupported URL: {url}")
+    try:
+        host = parts.hostname.encode("idna").decode("ascii")
+        port = parts.port
+    except (UnicodeError, ValueError) as e:
+        raise HTTPError(f"invalid URL {url!r}: {e}") from None
+    if ":" in host:  # IPv6
+        host = f"[{host}]"
+    host_header = f"{host}:{port}" if port else host
+    target = quote(parts.path or "/", safe=_PATH_SAFE)
+    if parts.query:
+        target += "?" + quote(parts.query, safe=_QUERY_SAFE)
+    return (parts.scheme, host.strip("[]"), port or (443 if parts.scheme == "https" else 80)), host_header, target
+
+
+class _Pool:
+    def __init__(self, limit):
+        self.slots = asyncio.Semaphore(limit)
+        self.idle = []  # [(reader, writer, idle_since)]
+
+
+class PooledClient:
+    def __init__(self, per_host=8, timeout=10.0, idle_timeout=60.0, max_body=64 * 1024, ssl_context=None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        self.ssl_context = ssl_context
+        self._pools = {}
+
+    async def post(self, url: str, body: bytes, headers: dict = None) -> Response:
+        key, host_header, target = _encode_target(url)
+        lines = [f"POST {target} HTTP/1.1", f"Host: {host_header}",
+                 f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        try:
+            request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        except UnicodeEncodeError as e:
+            raise HTTPError(f"header not encodable: {e}") from None
+
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _Pool(self.per_host)
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with pool.slots:
+                    return await self._send(pool, key, request)
+        except TimeoutError:
+            raise HTTPError(f"timed out after {self.timeout:g}s") from None
+
+    async def aclose(self):
+        for pool in self._pools.values():
+            for _, writer, _ in pool.idle:
+                writer.close()
+            pool.idle.clear()
+
+    def _take_idle(self, pool):
+        now = time.monotonic()
+        while pool.idle:
+            reader, writer, since = pool.idle.pop()
+            if now - since < self.idle_timeout and not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        context = None
+        if scheme == "https":
+            context = self.ssl_context or ssl.create_default_context()
+        try:
+            return await asyncio.open_connection(host, port, ssl=context)
+        except (OSError, ssl.SSLError) as e:
+            raise HTTPError(f"connect to {host}:{port} failed: {e}") from None
+
+    async def _send(self, pool, key, request):
+        conn = self._take_idle(pool)
+        reused = conn is not None
+        while True:
+            reader, writer = conn or await self._connect(key)
+            received = []
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, body, keep_alive = await self._read_response(reader, received)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                writer.close()
+                if reused and not received:
+                    conn, reused = None, False
+                    continue
+                raise HTTPError(f"{type(e).__name__}: {e}") from None
+            except BaseException:
+                # 逾時取消：連線狀態不明，不放回池中
+                writer.close()
+                raise
+            if keep_alive:
+                pool.idle.append((reader, writer, time.monotonic()))
+            else:
+                writer.close()
+            return Response(status, headers, body)
+
+    async def _read_response(self, reader, received):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionResetError("connection closed before the response")
+        received.append(line)
+        version, status, *_ = line.decode("latin-1").split(" ", 2)
+        status = int(status)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(b"", None)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if status in (204, 304) or 100 <= status < 200:
+            return status, headers, b"", keep_alive
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            body, complete = await self._read_chunked(reader)
+            return status, headers, body, keep_alive and complete
+        if "content-length" in headers:
+            length = int(headers["content-length"])
+            body = await reader.readexactly(min(length, self.max_body))
+            return status, headers, body, keep_alive and length <= self.max_body
+        # 沒有長度：讀到對方關閉為止
+        return status, headers, await reader.read(self.max_body), False
+
+    async def _read_chunked(self, reader):
+        body = bytearray()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(b"", None)
+            size = int(line.split(b";")[0].strip(), 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return bytes(body), True
+            if len(body) + size > self.max_body:
+                return bytes(body), False
+            body += (await reader.readexactly(size + 2))[:-2]
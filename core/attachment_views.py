@@ -0,0 +1,62 @@
+"""
+附件原檔與縮圖 / 預覽的下載。
+
+網址以內容雜湊定位（/attachments/<sha256>/<label>），同一路徑的內容永遠不變，
+因此回應 Cache-Control: immutable，瀏覽器一年內不再重新請求；ETag 即 sha256 + label。
+權限與 API 的 IsReporterOrManager 相同：非 staff 只能下載自己建立或被指派的問題之附件；
+issues.Issue 的鏡像列（legacy_id 非空）與其詳細頁一樣對登入者開放。看不到時回 404，不透露檔案是否存在。
+"""
+import posixpath
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.views.decorators.http import require_GET
+
+from .models import Attachment
+
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+CONTENT_TYPES = {
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+    ".txt": "text/plain; charset=utf-8",
+}
+
+
+@login_required
+@require_GET
+def serve_attachment(request, sha256, label):
+    qs = Attachment.objects.filter(sha256=sha256)
+    if not request.user.is_staff:
+        user = request.user
+        qs = qs.filter(Q(issue__created_by=user) | Q(issue__assigned_to=user) | Q(issue__legacy_id__isnull=False))
+    attachment = (qs.only("file", "original_name", "content_type", "derivatives")
+                  .order_by("id").first())
+    if attachment is None or not attachment.file:
+        raise Http404("attachment not found")
+    if label == "original":
+        name, content_type = attachment.file.name, attachment.content_type
+    else:
+        name = attachment.derivatives.get(label)
+        content_type = CONTENT_TYPES.get(posixpath.splitext(label)[1])
+    if not name:
+        raise Http404("derivative not ready")
+
+    etag = f'"{sha256}-{label}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            fp = attachment.file.storage.open(name, "rb")
+        except FileNotFoundError:
+            raise Http404("file missing from storage")
+        response = FileResponse(
+            fp,
+            content_type=content_type or "application/octet-stream",
+            as_attachment=label == "original",
+            filename=attachment.original_name or posixpath.basename(name),
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
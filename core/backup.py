@@ -0,0 +1,433 @@
+"""
+增量備份 / 還原（manage.py backup / restore 共用）。
+
+目錄結構（BACKUP_ROOT）：
+    objects/ab/<sha256>.gz|.raw    媒體檔內容，以 (SHA-256, 壓縮方式) 定址；相同內容只存一份
+    snapshots/<YYYYmmdd-HHMMSS-ffffff>/
+        manifest.json              媒體清單（各檔案的 object 名稱）、資料庫 dump 的檢查碼
+        db.dump | db.sqlite3.gz    資料庫 dump
+    .lock                          backup 與 prune 互斥（flock），prune 不會刪掉進行中備份剛引用的 object
+
+- 媒體：依上一份 manifest 的 (size, mtime_ns) 判斷檔案未變更時直接沿用雜湊，
+  不重讀檔案；object 已存在就略過，只有新內容才壓縮寫入（多執行緒並行，zlib 會釋放 GIL）。
+- 資料庫：PostgreSQL 以 pg_dump -Fc 串流寫檔（邊寫邊算雜湊，不落地暫存）；
+  SQLite 用線上 backup API 取得一致快照後再串流壓縮。
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+CHUNK = 1024 * 1024
+MANIFEST = "manifest.json"
+SNAPSHOT_FORMAT = "%Y%m%d-%H%M%S-%f"
+LEGACY_SNAPSHOT_FORMAT = "%Y%m%d-%H%M%S"  # 早期的 snapshot 名稱只到秒
+CODEC_SUFFIX = {"gzip": ".gz", "none": ".raw"}
+
+# 已壓縮的格式再壓一次只是浪費 CPU
+STORE_ONLY_SUFFIXES = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".mp4", ".mov",
+    ".zip", ".gz", ".7z", ".rar", ".pdf", ".docx", ".xlsx", ".pptx",
+}
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_root() -> Path:
+    return Path(settings.BACKUP_ROOT)
+
+
+def snapshots_dir() -> Path:
+    return backup_root() / "snapshots"
+
+
+def objects_dir() -> Path:
+    return backup_root() / "objects"
+
+
+def object_name(digest: str, codec: str) -> str:
+    # 壓縮方式是 key 的一部分：同內容的檔案依副檔名可能以不同方式儲存，兩者不可共用一個 object
+    return f"{digest[:2]}/{digest}{CODEC_SUFFIX[codec]}"
+
+
+def entry_object(entry: dict) -> str:
+    # 早期的 manifest 沒有 object 欄位，object 直接以 sha256 命名
+    return entry.get("object") or f"{entry['sha256'][:2]}/{entry['sha256']}"
+
+
+def object_path(name: str) -> Path:
+    return objects_dir() / name
+
+
+@contextmanager
+def repository_lock():
+    backup_root().mkdir(parents=True, exist_ok=True)
+    with open(backup_root() / ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def snapshot_time(name: str) -> datetime:
+    for fmt in (SNAPSHOT_FORMAT, LEGACY_SNAPSHOT_FORMAT):
+        try:
+            return datetime.strptime(name, fmt)
+        except ValueError:
+            pass
+    raise BackupError(f"unrecognised snapshot name: {name}")
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_snapshots() -> list:
+    if not snapshots_dir().exists():
+        return []
+    return sorted(p.name for p in snapshots_dir().iterdir() if (p / MANIFEST).exists())
+
+
+def load_manifest(name: str) -> dict:
+    path = snapshots_dir() / name / MANIFEST
+    if not path.exists():
+        raise BackupError(f"snapshot {name} not found")
+    return json.loads(path.read_text())
+
+
+# --- media ---
+
+def _store_object(src: Path, name: str, codec: str):
+    dest = object_path(name)
+    if dest.exists():
+        return 0
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # 同內容的檔案可能在不同執行緒同時寫入，暫存檔名需各自獨立
+    tmp = dest.with_name(f"{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(src, "rb") as fin:
+        if codec == "gzip":
+            with gzip.open(tmp, "wb", compresslevel=6) as fout:
+                shutil.copyfileobj(fin, fout, CHUNK)
+        else:
+            with open(tmp, "wb") as fout:
+                shutil.copyfileobj(fin, fout, CHUNK)
+    os.replace(tmp, dest)  # 原子替換，中斷的備份不會留下半個 object
+    return dest.stat().st_size
+
+
+def snapshot_media(media_root: Path, previous: dict, workers: int) -> tuple:
+    """
+    回傳 (media 清單, 統計)。previous 為上一份 manifest 的 media 區段。
+    """
+    entries, stats = {}, {"files": 0, "hashed": 0, "stored": 0, "stored_bytes": 0}
+    if not media_root.exists():
+        return entries, stats
+
+    to_hash = []
+    for path in media_root.rglob("*"):
+        if not path.is_file():
+            continue
+        rel = path.relative_to(media_root).as_posix()
+        st = path.stat()
+        prev = previous.get(rel)
+        entry = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "codec": "none" if path.suffix.lower() in STORE_ONLY_SUFFIXES else "gzip",
+        }
+        if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns \
+                and prev["codec"] == entry["codec"] and object_path(entry_object(prev)).exists():
+            entry["sha256"], entry["object"] = prev["sha256"], entry_object(prev)
+        else:
+            to_hash.append((path, rel))
+        entries[rel] = entry
+    stats["files"] = len(entries)
+    # 同一次備份裡內容相同的檔案只由第一個算完雜湊的執行緒寫入 object
+    claimed, claimed_lock = set(), threading.Lock()
+
+    def work(item):
+        path, rel = item
+        digest = sha256_file(path)
+        name = object_name(digest, entries[rel]["codec"])
+        with claimed_lock:
+            first = name not in claimed
+            claimed.add(name)
+        return rel, digest, name, _store_object(path, name, entries[rel]["codec"]) if first else 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for rel, digest, name, written in pool.map(work, to_hash):
+            entries[rel]["sha256"], entries[rel]["object"] = digest, name
+            stats["hashed"] += 1
+            if written:
+                stats["stored"] += 1
+                stats["stored_bytes"] += written
+    return entries, stats
+
+
+def restore_media(entries: dict, target: Path, workers: int):
+    def work(item):
+        rel, entry = item
+        dest = target / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        opener = gzip.open if entry["codec"] == "gzip" else open
+        with opener(object_path(entry_object(entry)), "rb") as fin, open(dest, "wb") as fout:
+            for chunk in iter(lambda: fin.read(CHUNK), b""):
+                h.update(chunk)
+                fout.write(chunk)
+        if h.hexdigest() != entry["sha256"]:
+            raise BackupError(f"checksum mismatch restoring {rel}")
+        os.utime(dest, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(work, entries.items()))
+
+
+def verify_media(entries: dict, workers: int) -> list:
+    """
+    解壓並重算每個 object 的雜湊；回傳有問題的路徑清單。
+    """
+    digests = {}
+    for rel, entry in entries.items():
+        digests.setdefault((entry["sha256"], entry["codec"], entry_object(entry)), []).append(rel)
+
+    def work(item):
+        (digest, codec, name), rels = item
+        path = object_path(name)
+        if not path.exists():
+            return rels
+        h = hashlib.sha256()
+        opener = gzip.open if codec == "gzip" else open
+        try:
+            with opener(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK), b""):
+                    h.update(chunk)
+        except (OSError, EOFError):
+            return rels
+        return [] if h.hexdigest() == digest else rels
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [rel for bad in pool.map(work, digests.items()) for rel in bad]
+
+
+# --- database ---
+
+def _pg_env(db: dict) -> dict:
+    env = dict(os.environ)
+    if db.get("PASSWORD"):
+        env["PGPASSWORD"] = str(db["PASSWORD"])
+    return env
+
+
+def _pg_conn_args(db: dict) -> list:
+    args = []
+    if db.get("HOST"):
+        args += ["-h", str(db["HOST"])]
+    if db.get("PORT"):
+        args += ["-p", str(db["PORT"])]
+    if db.get("USER"):
+        args += ["-U", str(db["USER"])]
+    return args
+
+
+def _pg_args(db: dict, name: str = None) -> list:
+    return ["-d", name or db["NAME"], *_pg_conn_args(db)]
+
+
+def dump_database(alias: str, dest_dir: Path) -> dict:
+    conn = connections[alias]
+    db = conn.settings_dict
+    h = hashlib.sha256()
+    if conn.vendor == "postgresql":
+        dest = dest_dir / "db.dump"
+        # -Fc：自帶壓縮、可用 pg_restore -j 平行還原
+        proc = subprocess.Popen(["pg_dump", "-Fc", "--no-owner", *_pg_args(db)],
+                                stdout=subprocess.PIPE, env=_pg_env(db))
+        with open(dest, "wb") as out:
+            for chunk in iter(lambda: proc.stdout.read(CHUNK), b""):
+                h.update(chunk)
+                out.write(chunk)
+        if proc.wait() != 0:
+            raise BackupError("pg_dump failed")
+    elif conn.vendor == "sqlite":
+        dest = dest_dir / "db.sqlite3.gz"
+        with tempfile.NamedTemporaryFile(suffix=".sqlite3") as tmp:
+            src = sqlite3.connect(str(db["NAME"]))
+            snap = sqlite3.connect(tmp.name)
+            try:
+                src.backup(snap)
+            finally:
+                snap.close()
+                src.close()
+            with open(tmp.name, "rb") as fin, gzip.open(dest, "wb", compresslevel=6) as fout:
+                for chunk in iter(lambda: fin.read(CHUNK), b""):
+                    h.update(chunk)
+                    fout.write(chunk)
+    else:
+        raise BackupError(f"unsupported database vendor: {conn.vendor}")
+    return {"vendor": conn.vendor, "file": dest.name, "sha256": h.hexdigest(),
+            "size": dest.stat().st_size}
+
+
+def _read_dump(path: Path, vendor: str):
+    opener = gzip.open if vendor == "sqlite" else open
+    with opener(path, "rb") as f:
+        yield from iter(lambda: f.read(CHUNK), b"")
+
+
+def verify_dump_checksum(snapshot: str, info: dict) -> bool:
+    h = hashlib.sha256()
+    for chunk in _read_dump(snapshots_dir() / snapshot / info["file"], info["vendor"]):
+        h.update(chunk)
+    return h.hexdigest() == info["sha256"]
+
+
+def restore_database(snapshot: str, info: dict, alias: str, target_name: str = None, jobs: int = 1):
+    """
+    還原到 alias 的資料庫（或 target_name 指定的同伺服器其他資料庫 / SQLite 檔案）。
+    """
+    conn = connections[alias]
+    db = conn.settings_dict
+    path = snapshots_dir() / snapshot / info["file"]
+    if info["vendor"] != conn.vendor:
+        raise BackupError(f"snapshot is {info['vendor']}, target is {conn.vendor}")
+    if conn.vendor == "postgresql":
+        cmd = ["pg_restore", "--clean", "--if-exists", "--no-owner", "-j", str(jobs),
+               *_pg_args(db, target_name), str(path)]
+        if subprocess.run(cmd, env=_pg_env(db)).returncode != 0:
+            raise BackupError("pg_restore failed")
+        return
+    target = Path(target_name or db["NAME"])
+    if not target_name:
+        conn.close()
+    tmp = target.with_suffix(".restoring")
+    with open(tmp, "wb") as out:
+        for chunk in _read_dump(path, "sqlite"):
+            out.write(chunk)
+    os.replace(tmp, target)
+
+
+def scratch_restore_check(snapshot: str, info: dict, alias: str) -> dict:
+    """
+    還原到暫存資料庫並做基本檢查，完成後刪除暫存資料庫。
+    """
+    conn = connections[alias]
+    db = conn.settings_dict
+    if conn.vendor == "postgresql":
+        scratch = f"{db['NAME']}_verify_{snapshot.replace('-', '_')}"
+        env = _pg_env(db)
+        conn_args = _pg_conn_args(db)
+        subprocess.run(["dropdb", "--if-exists", *conn_args, scratch], env=env, check=True)
+        subprocess.run(["createdb", *conn_args, scratch], env=env, check=True)
+        try:
+            cmd = ["pg_restore", "--no-owner", "-j", str(os.cpu_count() or 1),
+                   *_pg_args(db, scratch), str(snapshots_dir() / snapshot / info["file"])]
+            if subprocess.run(cmd, env=env).returncode != 0:
+                raise BackupError("pg_restore into scratch database failed")
+            out = subprocess.run(
+                ["psql", "-At", *_pg_args(db, scratch), "-c",
+                 "SELECT count(*) FROM information_schema.tables WHERE table_schema = 'public'"],
+                env=env, check=True, capture_output=True, text=True,
+            )
+            return {"database": scratch, "tables": int(out.stdout.strip() or 0)}
+        finally:
+            subprocess.run(["dropdb", "--if-exists", *conn_args, scratch], env=env)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        target = Path(tmpdir) / "verify.sqlite3"
+        with open(target, "wb") as out:
+            for chunk in _read_dump(snapshots_dir() / snapshot / info["file"], "sqlite"):
+                out.write(chunk)
+        check = sqlite3.connect(str(target))
+        try:
+            integrity = check.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = check.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        finally:
+            check.close()
+        if integrity != "ok":
+            raise BackupError(f"sqlite integrity_check: {integrity}")
+        return {"database": str(target), "tables": tables}
+
+
+# --- snapshot lifecycle ---
+
+def create_snapshot(alias: str = "default", include_db: bool = True, include_media: bool = True,
+                    workers: int = None) -> tuple:
+    with repository_lock():
+        return _create_snapshot(alias, include_db, include_media, workers or os.cpu_count() or 1)
+
+
+def _create_snapshot(alias, include_db, include_media, workers) -> tuple:
+    snapshots = list_snapshots()
+    previous = load_manifest(snapshots[-1]).get("media", {}) if snapshots else {}
+
+    snapshots_dir().mkdir(parents=True, exist_ok=True)
+    while True:
+        # 名稱到微秒；同一時刻的另一個備份已佔用時換下一個名稱
+        name = datetime.now().strftime(SNAPSHOT_FORMAT)
+        tmp_dir = snapshots_dir() / f".{name}.partial"
+        if not (snapshots_dir() / name).exists():
+            try:
+                tmp_dir.mkdir()
+                break
+            except FileExistsError:
+                pass
+    manifest = {"name": name, "created_at": datetime.now().isoformat(), "media": {}, "database": None}
+    stats = {}
+    try:
+        if include_media:
+            manifest["media"], stats["media"] = snapshot_media(Path(settings.MEDIA_ROOT), previous, workers)
+        if include_db:
+            manifest["database"] = dump_database(alias, tmp_dir)
+        (tmp_dir / MANIFEST).write_text(json.dumps(manifest, indent=1, sort_keys=True))
+        tmp_dir.rename(snapshots_dir() / name)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return name, stats
+
+
+def prune(keep_days: int) -> dict:
+    """
+    刪除 keep_days 天前的 snapshot（至少保留最新一份），再回收沒有被引用的 object。
+    持有與 create_snapshot 相同的鎖：進行中的備份寫完 manifest 之前不會回收。
+    """
+    with repository_lock():
+        cutoff = datetime.now() - timedelta(days=keep_days)
+        names = list_snapshots()
+        removed = 0
+        for name in names[:-1]:
+            if snapshot_time(name) < cutoff:
+                shutil.rmtree(snapshots_dir() / name)
+                removed += 1
+
+        referenced = set()
+        for name in list_snapshots():
+            referenced.update(entry_object(e) for e in load_manifest(name)["media"].values())
+        freed = 0
+        if objects_dir().exists():
+            for path in objects_dir().glob("*/*"):
+                if path.relative_to(objects_dir()).as_posix() not in referenced:
+                    freed += path.stat().st_size
+                    path.unlink()
+        return {"snapshots_removed": removed, "bytes_freed": freed}
@@ -0,0 +1,248 @@
+"""
+core.Issue 與 issues.Issue 合併（線上遷移）。
+
+統一模型為 core.Issue：事件、附件、狀態區間與 Teams 通知都掛在這張表上。
+issues.Issue 的每一列以 legacy_id（來源 id）對應一列 core.Issue（project 為空），
+欄位對應見 to_core()；狀態與優先度為一對一對應，可還原、可比對。
+
+步驟：
+1. migrate：core 0008 只加可為空的欄位，索引以 CONCURRENTLY 建立，不長時間鎖表。
+2. CONSOLIDATION_DUAL_WRITE=true 部署：issues.Issue 的 save / delete 在同一交易內
+   同步 upsert / 刪除對應的 core.Issue（issues/signals.py）。
+3. manage.py consolidate_issues backfill：依 id 由小到大分批複製既有資料，每批一個短交易；
+   進度記在 Redis，中斷後再執行即從上次的位置繼續。每秒列數受 ROWS_PER_SEC 限制，
+   replica 延遲超過 REPLICA_MAX_LAG_SECONDS 時暫停。
+4. manage.py consolidate_issues verify：依 legacy id 範圍比對兩邊的 checksum，
+   只對不一致的範圍逐筆比對；--repair 重新複製不一致的 id。
+   queryset.update() / bulk_update（例如 SLA 重算）不觸發 signal，由 verify --repair 補上。
+之後再將讀取與寫入切到 core.Issue，最後移除 issues.Issue（不在本模組範圍）。
+
+複製一律用 bulk_create(update_conflicts=True)：不觸發 core.Issue 的 post_save，
+鏡像列不會產生 IssueEvent 或 Teams 通知。切換前鏡像列不對外（API 與封存皆排除 legacy_id 非空者）。
+"""
+import hashlib
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Case, Value, When
+
+from .models import Issue
+
+log = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "consolidate:backfill"
+
+# issues.Issue.Status → core.Issue.status
+STATUS_MAP = {
+    "NEW": "open",
+    "TRIAGED": "triaged",
+    "IN_PROGRESS": "in_progress",
+    "PENDING": "pending",
+    "RESOLVED": "resolved",
+    "CLOSED": "closed",
+    "REOPENED": "reopened",
+    "ON_HOLD": "on_hold",
+}
+
+SOURCE_FIELDS = ("id", "title", "description", "priority", "status", "created_by_id", "assigned_to_id",
+                 "customer", "sla_due_at", "created_at", "updated_at")
+# 參與 checksum 的 core.Issue 欄位；assignee（使用者名稱）為衍生值，不比對
+CHECKED_FIELDS = ("title", "description", "priority", "status", "created_by_id", "assigned_to_id",
+                  "customer", "sla_due_at", "created_at", "updated_at")
+COPIED_FIELDS = CHECKED_FIELDS + ("assignee",)
+
+
+def _conf(name):
+    return settings.CONSOLIDATION[name]
+
+
+def dual_write_enabled() -> bool:
+    return _conf("DUAL_WRITE")
+
+
+def _source_model():
+    return apps.get_model("issues", "Issue")
+
+
+def to_core(row: dict) -> dict:
+    """issues.Issue 的 values() 列 → core.Issue 欄位。"""
+    return {
+        "title": row["title"],
+        "description": row["description"],
+        "priority": f"P{row['priority']}",
+        "status": STATUS_MAP.get(row["status"], row["status"].lower()),
+        "created_by_id": row["created_by_id"],
+        "assigned_to_id": row["assigned_to_id"],
+        "assignee": row.get("assigned_to__username") or "",
+        "customer": row["customer"],
+        "sla_due_at": row["sla_due_at"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+def _source_rows(ids, lock=False) -> list:
+    qs = _source_model().objects.filter(id__in=ids).order_by("id")
+    if lock and connection.vendor == "postgresql":
+        # 與雙寫互斥：正在修改的來源列 commit 後才讀，避免以舊資料覆蓋雙寫的結果
+        qs = qs.select_for_update(of=("self",))
+    return list(qs.values(*SOURCE_FIELDS, "assigned_to__username"))
+
+
+def copy_ids(ids) -> int:
+    """
+    將指定的 issues.Issue 複製到 core.Issue（upsert）；來源已不存在的 id 刪除鏡像列。
+    需在交易內呼叫；回傳複製的列數。
+    """
+    ids = list(ids)
+    rows = _source_rows(ids, lock=True)
+    found = [row["id"] for row in rows]
+    missing = set(ids) - set(found)
+    if missing:
+        Issue.objects.filter(legacy_id__in=missing).delete()
+    if not rows:
+        return 0
+    Issue.objects.bulk_create(
+        [Issue(legacy_id=row["id"], **to_core(row)) for row in rows],
+        update_conflicts=True, unique_fields=["legacy_id"], update_fields=list(COPIED_FIELDS),
+    )
+    # bulk_create 會以當下時間覆寫 auto_now / auto_now_add；一個 UPDATE 改回來源的時間
+    Issue.objects.filter(legacy_id__in=found).update(**{
+        name: Case(*[When(legacy_id=row["id"], then=Value(row[name])) for row in rows],
+                   output_field=models.DateTimeField())
+        for name in ("created_at", "updated_at")
+    })
+    return len(rows)
+
+
+# ---------------------------------------------------------------- 回填
+
+def _checkpoint(r):
+    try:
+        state = r.hgetall(CHECKPOINT_KEY)
+    except Exception as e:
+        log.warning("backfill checkpoint unavailable: %s", e)
+        return {}
+    return {k.decode(): int(v) for k, v in state.items()}
+
+
+def _save_checkpoint(r, **values):
+    try:
+        r.hset(CHECKPOINT_KEY, mapping=values)
+    except Exception as e:
+        log.warning("backfill checkpoint not saved (%s): %s", values, e)
+
+
+def reset_checkpoint():
+    from .redis_client import get_redis
+    get_redis().delete(CHECKPOINT_KEY)
+
+
+def _wait_for_replicas():
+    from .db_router import replica_lag
+    while True:
+        lag = max((replica_lag(alias) for alias in settings.REPLICA_DATABASES), default=0)
+        if lag <= settings.REPLICA_MAX_LAG_SECONDS:
+            return
+        log.info("backfill paused: replica lag %.1fs", lag)
+        time.sleep(min(lag, 10))
+
+
+def backfill(batch_size: int = None, rows_per_sec: float = None, start_id: int = None,
+             end_id: int = None, progress=None) -> dict:
+    """
+    依 id 分批複製 issues.Issue 到 core.Issue。
+
+    未指定 start_id 時由 Redis 中的進度繼續；end_id 預設為開始時來源的最大 id
+    （之後新增的列由雙寫處理，重複複製無妨）。progress(state) 於每批完成後呼叫。
+    """
+    from .redis_client import get_redis
+
+    batch_size = batch_size or _conf("BATCH_SIZE")
+    rows_per_sec = _conf("ROWS_PER_SEC") if rows_per_sec is None else rows_per_sec
+    r = get_redis()
+    saved = _checkpoint(r) if start_id is None else {}
+    last_id = saved.get("last_id", 0) if start_id is None else start_id - 1
+    if end_id is None:
+        end_id = _source_model().objects.aggregate(m=models.Max("id"))["m"] or 0
+    copied = saved.get("copied", 0)
+
+    while last_id < end_id:
+        _wait_for_replicas()
+        started = time.monotonic()
+        with transaction.atomic():
+            ids = list(_source_model().objects.filter(id__gt=last_id, id__lte=end_id)
+                       .order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            copied += copy_ids(ids)
+        last_id = ids[-1]
+        _save_checkpoint(r, last_id=last_id, copied=copied)
+        state = {"last_id": last_id, "end_id": end_id, "copied": copied}
+        if progress:
+            progress(state)
+        if rows_per_sec:
+            time.sleep(max(0.0, len(ids) / rows_per_sec - (time.monotonic() - started)))
+    return {"last_id": last_id, "end_id": end_id, "copied": copied}
+
+
+# ---------------------------------------------------------------- 驗證
+
+def _canonical(values: dict) -> bytes:
+    parts = []
+    for name in CHECKED_FIELDS:
+        value = values[name]
+        parts.append("" if value is None else value.isoformat() if hasattr(value, "isoformat") else str(value))
+    return "\x1f".join(parts).encode()
+
+
+def _digests(lo: int, hi: int) -> tuple:
+    """id 範圍 [lo, hi) 兩邊每一列的雜湊：({legacy id: digest}, {legacy id: digest})。"""
+    source = {
+        row["id"]: hashlib.sha1(_canonical(to_core(row))).hexdigest()
+        for row in _source_model().objects.filter(id__gte=lo, id__lt=hi).values(*SOURCE_FIELDS)
+    }
+    target = {
+        row["legacy_id"]: hashlib.sha1(_canonical(row)).hexdigest()
+        for row in Issue.objects.filter(legacy_id__gte=lo, legacy_id__lt=hi).values("legacy_id", *CHECKED_FIELDS)
+    }
+    return source, target
+
+
+def _range_checksum(digests: dict) -> str:
+    h = hashlib.sha1()
+    for key in sorted(digests):
+        h.update(f"{key}:{digests[key]};".encode())
+    return h.hexdigest()
+
+
+def verify(chunk_size: int = None, repair: bool = False, start_id: int = 1, end_id: int = None) -> dict:
+    """
+    依 legacy id 範圍比對 checksum；回傳範圍數、不一致的範圍與 id（來源缺少、鏡像缺少、內容不同）。
+    repair=True 時重新複製不一致的 id（每個範圍一個交易）。
+    """
+    chunk_size = chunk_size or _conf("VERIFY_CHUNK")
+    if end_id is None:
+        end_id = max(_source_model().objects.aggregate(m=models.Max("id"))["m"] or 0,
+                     Issue.objects.aggregate(m=models.Max("legacy_id"))["m"] or 0)
+    report = {"ranges": 0, "mismatched_ranges": [], "mismatched_ids": [], "repaired": 0}
+    for lo in range(start_id, end_id + 1, chunk_size):
+        hi = lo + chunk_size
+        report["ranges"] += 1
+        source, target = _digests(lo, hi)
+        if _range_checksum(source) == _range_checksum(target):
+            continue
+        ids = sorted(k for k in source.keys() | target.keys() if source.get(k) != target.get(k))
+        report["mismatched_ranges"].append((lo, hi - 1))
+        report["mismatched_ids"] += ids
+        if repair and ids:
+            with transaction.atomic():
+                copy_ids(ids)
+            report["repaired"] += len(ids)
+    if report["mismatched_ids"]:
+        log.warning("consolidation verify: %d mismatched ids in %d ranges",
+                    len(report["mismatched_ids"]), len(report["mismatched_ranges"]))
+    return report
@@ -0,0 +1,136 @@
+"""
+讀寫分離：唯讀請求的查詢送到 replica，寫入一律走 default（primary）。
+
+- ReplicaRoutingMiddleware 對 GET/HEAD/OPTIONS 開啟 replica 讀取；
+  同一請求內一旦有寫入（含 signal），後續讀取改回 primary。
+- 寫入後以 cookie 將使用者「釘」在 primary REPLICA_PIN_SECONDS 秒，確保看得到自己剛寫的資料。
+- 每個 replica 的延遲每 REPLICA_LAG_CHECK_INTERVAL 秒量測一次（行程內快取），
+  超過 REPLICA_MAX_LAG_SECONDS 或無法連線時暫停使用，全部不可用則回到 primary。
+- 請求以外（Celery、管理指令）預設讀 primary；唯讀批次可用 `with read_from_replica():`。
+- 遷移只在 primary 執行（allow_migrate）。
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+log = logging.getLogger(__name__)
+
+PRIMARY = "default"
+PIN_COOKIE = "db_pin"
+
+# {"use_replica": bool, "wrote": bool}；None 表示不在請求 / read_from_replica 範圍內
+_routing = ContextVar("db_routing", default=None)
+
+_lag_cache = {}  # alias -> (checked_at, lag_seconds)
+
+PG_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def measure_lag(alias: str) -> float:
+    conn = connections[alias]
+    if conn.vendor != "postgresql":
+        return 0.0  # 非串流複寫（例如本機兩個 SQLite）無延遲可量
+    with conn.cursor() as cursor:
+        cursor.execute(PG_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def replica_lag(alias: str) -> float:
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached and now - cached[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return cached[1]
+    try:
+        lag = measure_lag(alias)
+    except Exception as e:
+        log.warning("replica %s unavailable: %s", alias, e)
+        lag = float("inf")
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas() -> list:
+    return [a for a in settings.REPLICA_DATABASES if replica_lag(a) <= settings.REPLICA_MAX_LAG_SECONDS]
+
+
+@contextmanager
+def read_from_replica():
+    token = _routing.set({"use_replica": True, "wrote": False})
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def request_routing(use_replica: bool):
+    state = {"use_replica": use_replica, "wrote": False}
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+class ReplicaRouter:
+    # session 在登入（寫入 primary）後的下一個 GET 就會被讀取，不能容忍延遲
+    PRIMARY_ONLY_APPS = {"sessions"}
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if not state or not state["use_replica"] or state["wrote"]:
+            return PRIMARY
+        if model._meta.app_label in self.PRIMARY_ONLY_APPS:
+            return PRIMARY
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state["wrote"] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica 與 primary 為同一份資料
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replica 的 schema 由複寫自 primary 而來；migrate --database=replica_N 不做任何事
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned = float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        use_replica = request.method in self.SAFE_METHODS and not pinned
+
+        with request_routing(use_replica) as state:
+            response = self.get_response(request)
+
+        if state["wrote"] or request.method not in self.SAFE_METHODS:
+            pin = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(time.time() + pin), max_age=pin,
+                                httponly=True, samesite="Lax")
+        return response
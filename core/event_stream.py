@@ -0,0 +1,290 @@
+"""
+IssueEvent 的非同步寫入：request 只 XADD 到 Redis stream，由 event_writer 消費者批次寫入資料庫。
+
+    web  ──XADD──▶  events:issue  ──XREADGROUP（event-writer 群組）──▶  bulk_create ──▶ XACK
+
+- 至少一次：commit 之後才 XACK；消費者當掉時，未 ACK 的訊息閒置超過 CLAIM_IDLE_MS
+  由其他消費者以 XAUTOCLAIM 接手。重送以 IssueEvent.event_key（唯一）去重。
+- 整批寫入失敗時改為逐筆寫入：其他訊息照常 ACK，失敗的留在 pending 稍後重試；
+  同一則訊息已投遞 MAX_DELIVERIES 次仍失敗即移到 events:dead。資料庫連線錯誤直接拋出，
+  整批留在 pending，由 event_writer 退避後重試。
+- bulk_create 不觸發 post_save：後續處理（時間軸版本、分析重建排程）由 after_insert 補上。
+- 讀到自己的寫入：append 時同時推進 events:recent:issue:<id> / events:recent:asset:<id>
+  短期清單；時間軸讀取時與資料庫結果合併，以 event_key 去重（merge_recent）。
+- EVENT_STREAM["ENABLED"] 為 false 或 Redis 無法連線時直接同步寫入資料庫（原本的行為）。
+"""
+import json
+import logging
+import os
+import socket
+import uuid
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+STREAM_KEY = "events:issue"
+DEAD_KEY = "events:dead"
+DEAD_MAXLEN = 10000
+GROUP = "event-writer"
+RECENT_KEY = "events:recent:{}:{}"
+RECENT_KEEP = 50
+
+
+def _conf(name):
+    return settings.EVENT_STREAM[name]
+
+
+def new_key() -> str:
+    return uuid.uuid4().hex
+
+
+def _payload(issue, event_type, to_value, key, created_at) -> dict:
+    return {
+        "key": key,
+        "issue_id": str(issue.pk),
+        "asset_id": str(issue.asset_id or ""),
+        "event_type": event_type,
+        "to_value": to_value or "",
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _write_sync(payloads):
+    from .models import IssueEvent
+    IssueEvent.objects.bulk_create([_to_event(p) for p in payloads], ignore_conflicts=True)
+    after_insert(payloads)
+
+
+def append(issue, event_type: str, to_value: str = "") -> str:
+    """
+    記錄一筆事件，回傳 event_key。stream 模式在 commit 後才 XADD（rollback 的變更不留事件）。
+    """
+    key = new_key()
+    payload = _payload(issue, event_type, to_value, key, timezone.now())
+    if not _conf("ENABLED"):
+        _write_sync([payload])
+        return key
+    transaction.on_commit(lambda: publish([payload]))
+    return key
+
+
+def append_many(items) -> list:
+    """
+    批次版 append：items 為 [(issue, event_type, to_value, created_at)]，回傳對應的 event_key。
+    整批一次 bulk_create 或一次 pipeline XADD（告警匯入等大量寫入用）。
+    """
+    payloads = [_payload(issue, event_type, to_value, new_key(), created_at or timezone.now())
+                for issue, event_type, to_value, created_at in items]
+    if not payloads:
+        return []
+    if not _conf("ENABLED"):
+        _write_sync(payloads)
+    else:
+        transaction.on_commit(lambda: publish(payloads))
+    return [p["key"] for p in payloads]
+
+
+def publish(payloads):
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        for p in payloads:
+            pipe.xadd(STREAM_KEY, p, maxlen=_conf("MAXLEN"), approximate=True)
+            encoded = json.dumps(p)
+            for scope, scope_id in (("issue", p["issue_id"]), ("asset", p["asset_id"])):
+                if scope_id:
+                    recent = RECENT_KEY.format(scope, scope_id)
+                    pipe.lpush(recent, encoded)
+                    pipe.ltrim(recent, 0, RECENT_KEEP - 1)
+                    pipe.expire(recent, _conf("RECENT_TTL"))
+        pipe.execute()
+    except Exception as e:
+        # Redis 不可用：寧可同步寫入，也不能遺失事件
+        log.warning("event stream unavailable, writing %d events synchronously: %s", len(payloads), e)
+        _write_sync(payloads)
+
+
+# ---------------------------------------------------------------- 消費者
+
+def _to_event(p):
+    from .models import IssueEvent
+    return IssueEvent(
+        event_key=p["key"],
+        issue_id=int(p["issue_id"]),
+        event_type=p["event_type"],
+        to_value=p.get("to_value", ""),
+        created_at=parse_datetime(p["created_at"]),
+    )
+
+
+def after_insert(payloads):
+    # bulk_create 不觸發 post_save：狀態事件需要的後續處理在這裡補上
+    from .timeline import bump_on_commit
+    bump_on_commit("core", *{int(p["issue_id"]) for p in payloads})
+    if any(p.get("to_value") for p in payloads):
+        from .analytics import schedule_refresh
+        transaction.on_commit(schedule_refresh)  # event_writer 不在交易中，立即執行
+
+
+def ensure_group(r):
+    import redis
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _decode(fields: dict) -> dict:
+    return {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+            for k, v in fields.items()}
+
+
+def write_batch(entries) -> int:
+    """entries: [(message_id, fields)]；回傳實際新增的事件數。格式錯誤的訊息記錄後丟棄。"""
+    from .models import Issue, IssueEvent
+
+    payloads = []
+    for message_id, fields in entries:
+        p = _decode(fields)
+        try:
+            _to_event(p)
+        except (KeyError, TypeError, ValueError):
+            log.error("dropping malformed event %s: %r", message_id, p)
+            continue
+        payloads.append(p)
+    if not payloads:
+        return 0
+    # 問題在事件寫入前已被刪除：外鍵會失敗，直接略過
+    alive = set(Issue.objects.filter(id__in={int(p["issue_id"]) for p in payloads}).values_list("id", flat=True))
+    payloads = [p for p in payloads if int(p["issue_id"]) in alive]
+    keys = [p["key"] for p in payloads]
+    with transaction.atomic():
+        before = IssueEvent.objects.filter(event_key__in=keys).count()
+        IssueEvent.objects.bulk_create([_to_event(p) for p in payloads], ignore_conflicts=True,
+                                       batch_size=1000)
+    after_insert(payloads)
+    return len(payloads) - before
+
+
+def consume_once(r, consumer: str, count: int = None, block_ms: int = None) -> int:
+    """
+    讀一批（先接手閒置過久的 pending，再讀新訊息）、寫入、ACK。回傳處理的訊息數。
+    """
+    count = count or _conf("BATCH_SIZE")
+    entries = []
+    claimed = r.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_time=_conf("CLAIM_IDLE_MS"),
+                           start_id="0-0", count=count)
+    entries.extend(e for e in claimed[1] if e[1])  # 已被 MAXLEN 裁掉的訊息 fields 為空
+    if len(entries) < count:
+        # block_ms=0 表示不等待（Redis 的 BLOCK 0 是無限等待，這裡不採用）
+        block_ms = _conf("BLOCK_MS") if block_ms is None else block_ms
+        block = block_ms if block_ms and not entries else None
+        for _, messages in r.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"},
+                                        count=count - len(entries), block=block) or []:
+            entries.extend(messages)
+    if not entries:
+        return 0
+    try:
+        write_batch(entries)
+        done = [message_id for message_id, _ in entries]
+    except (OperationalError, InterfaceError):
+        raise
+    except Exception:
+        log.exception("event batch of %d failed, writing one by one", len(entries))
+        done = _write_each(r, entries)
+    if done:
+        r.xack(STREAM_KEY, GROUP, *done)
+    return len(entries)
+
+
+def _write_each(r, entries) -> list:
+    """逐筆寫入；回傳可 ACK（寫入成功或移到 dead）的訊息 id。資料庫連線錯誤直接拋出。"""
+    done, failed = [], {}
+    for message_id, fields in entries:
+        try:
+            write_batch([(message_id, fields)])
+            done.append(message_id)
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            failed[message_id] = (fields, e)
+    if not failed:
+        return done
+    pipe = r.pipeline(transaction=False)
+    for message_id in failed:
+        pipe.xpending_range(STREAM_KEY, GROUP, min=message_id, max=message_id, count=1)
+    deliveries = {message_id: (info[0]["times_delivered"] if info else 0)
+                  for message_id, info in zip(failed, pipe.execute())}
+    pipe = r.pipeline()
+    for message_id, (fields, error) in failed.items():
+        if deliveries[message_id] < _conf("MAX_DELIVERIES"):
+            log.warning("event %s failed (delivery %d), left pending for retry: %s",
+                        message_id, deliveries[message_id], error)
+            continue
+        log.error("event %s failed %d times, moving to %s: %s", message_id, deliveries[message_id], DEAD_KEY, error)
+        pipe.xadd(DEAD_KEY, {**_decode(fields), "message_id": message_id,
+                             "error": f"{type(error).__name__}: {error}"[:500]},
+                  maxlen=DEAD_MAXLEN, approximate=True)
+        done.append(message_id)
+    pipe.execute()
+    return done
+
+
+def backlog(r) -> dict:
+    info = r.xpending(STREAM_KEY, GROUP)
+    groups = {g["name"].decode() if isinstance(g["name"], bytes) else g["name"]: g
+              for g in r.xinfo_groups(STREAM_KEY)}
+    group = groups.get(GROUP, {})
+    return {"pending": info["pending"], "lag": group.get("lag"), "length": r.xlen(STREAM_KEY),
+            "dead": r.xlen(DEAD_KEY)}
+
+
+# ---------------------------------------------------------------- 讀取合併
+
+def recent(scope: str, scope_id) -> list:
+    try:
+        raw = get_redis().lrange(RECENT_KEY.format(scope, scope_id), 0, RECENT_KEEP - 1)
+    except Exception as e:
+        log.warning("recent events unavailable for %s %s: %s", scope, scope_id, e)
+        return []
+    return [json.loads(item) for item in raw]
+
+
+def merge_recent(rows: list, scope: str, scope_id, has_more: bool = False) -> list:
+    """
+    rows 為資料庫讀出的一頁事件（新到舊，含 event_key）。把尚未寫入的 stream 事件併進來，
+    以 event_key 去重；尚未寫入的事件 id 為 None。has_more 時只併入不早於本頁最後一筆的事件，
+    因此該頁可能略多於 limit 筆，但分頁游標（資料庫最後一筆）不受影響。
+    """
+    if not _conf("ENABLED"):
+        return rows
+    seen = {row["event_key"] for row in rows if row.get("event_key")}
+    floor = rows[-1]["created_at"] if has_more and rows else None
+    pending = []
+    for p in recent(scope, scope_id):
+        created_at = parse_datetime(p["created_at"])
+        if p["key"] in seen or (floor is not None and created_at < floor):
+            continue
+        seen.add(p["key"])
+        pending.append({
+            "id": None,
+            "issue_id": int(p["issue_id"]),
+            "event_type": p["event_type"],
+            "to_value": p.get("to_value", ""),
+            "event_key": p["key"],
+            "created_at": created_at,
+        })
+    if not pending:
+        return rows
+    return sorted(rows + pending, key=lambda e: e["created_at"], reverse=True)
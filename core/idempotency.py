@@ -0,0 +1,129 @@
+"""
+Celery 任務的 Redis 冪等鍵：同一個 key（例如 issue + event）只處理一次。
+
+狀態存在 idem:<task>:<key>：
+    queued:<id>     已排入佇列（enqueue_once 以 SET NX 設定，重複 enqueue 直接略過）；
+                    租約 IDEMPOTENCY_QUEUED_LEASE 秒（加上 countdown），broker 遺失訊息時到期後可再 enqueue
+    running:<id>    執行中，<id> 為 Celery task id；租約（預設為 CELERY_TASK_TIME_LIMIT）到期自動失效。
+                    acks_late + reject_on_worker_lost 下 worker 當掉時，broker 以同一個 task id 重送，
+                    可直接接手；其他 task id 的重複訊息略過
+    done            已完成，保留 TTL 秒，期間的重複訊息直接略過
+任務拋出例外時刪除 key，讓 Celery retry 或下一次 enqueue 能重新執行。
+Redis 無法連線時放行（寧可重複通知，也不要漏掉）。
+"""
+import functools
+import logging
+import uuid
+
+from django.conf import settings
+
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+KEY = "idem:{}:{}"
+DEFAULT_TTL = 24 * 3600
+
+BEGIN_LUA = """
+local v = redis.call('GET', KEYS[1])
+if v == 'done' then
+    return 0
+end
+if v and string.sub(v, 1, 8) == 'running:' and v ~= 'running:' .. ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], 'running:' .. ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+_scripts = {}
+
+
+def _begin_script(r):
+    if _scripts.get("begin_client") is not r:
+        _scripts["begin"] = r.register_script(BEGIN_LUA)
+        _scripts["begin_client"] = r
+    return _scripts["begin"]
+
+
+def _current_task_id():
+    from celery import current_task
+
+    return getattr(getattr(current_task, "request", None), "id", None)
+
+
+def begin(key: str, lease: int = None, owner: str = None) -> bool:
+    """取得執行權；已完成或其他 owner（task id）執行中時回傳 False。同一個 owner 可接手。"""
+    lease = lease or settings.CELERY_TASK_TIME_LIMIT
+    try:
+        r = get_redis()
+        return bool(_begin_script(r)(keys=[key], args=[owner or uuid.uuid4().hex, lease]))
+    except Exception as e:
+        log.warning("idempotency check skipped for %s: %s", key, e)
+        return True
+
+
+def finish(key: str, ttl: int = DEFAULT_TTL):
+    try:
+        get_redis().set(key, "done", ex=ttl)
+    except Exception as e:
+        log.warning("idempotency mark failed for %s: %s", key, e)
+
+
+def release(key: str):
+    try:
+        get_redis().delete(key)
+    except Exception as e:
+        log.warning("idempotency release failed for %s: %s", key, e)
+
+
+def idempotent(key_func, ttl: int = DEFAULT_TTL, lease: int = None):
+    """
+    任務函式的裝飾器（放在 @shared_task 之下）。key_func 以任務參數產生冪等鍵。
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+
+        def build_key(*args, **kwargs):
+            return KEY.format(name, key_func(*args, **kwargs))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = build_key(*args, **kwargs)
+            if not begin(key, lease, _current_task_id()):
+                log.info("skip duplicate %s", key)
+                return None
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                release(key)
+                raise
+            finish(key, ttl)
+            return result
+
+        wrapper.build_key = build_key
+        wrapper.idempotency_ttl = ttl
+        return wrapper
+    return decorator
+
+
+def enqueue_once(task, args=(), kwargs=None, **options) -> bool:
+    """
+    task 需以 @idempotent 裝飾；同一個 key 尚在佇列、執行中或已完成時不再 enqueue。
+    回傳是否真的送出。
+    """
+    kwargs = kwargs or {}
+    key = task.run.build_key(*args, **kwargs)
+    task_id = options.pop("task_id", None) or uuid.uuid4().hex
+    lease = settings.IDEMPOTENCY_QUEUED_LEASE + int(options.get("countdown") or 0)
+    try:
+        if not get_redis().set(key, f"queued:{task_id}", nx=True, ex=lease):
+            return False
+    except Exception as e:
+        log.warning("idempotency enqueue check skipped for %s: %s", key, e)
+    try:
+        task.apply_async(args=args, kwargs=kwargs, task_id=task_id, **options)
+    except Exception:
+        release(key)  # 沒送出就不能佔著 key，否則之後的 enqueue 會被誤判為重複
+        raise
+    return True
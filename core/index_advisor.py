@@ -0,0 +1,378 @@
+"""
+索引建議（manage.py index_advisor）：依實際查詢找出缺少、重複與沒有用到的索引。
+
+查詢來源
+- PostgreSQL：pg_stat_statements 依 total_exec_time 取前 --top 個查詢（需
+  shared_preload_libraries = 'pg_stat_statements' 並 CREATE EXTENSION pg_stat_statements），
+  以 EXPLAIN (GENERIC_PLAN) 取得計畫（PostgreSQL 16+，較舊版本無法取得計畫的查詢略過）；
+  索引使用次數取自 pg_stat_user_indexes.idx_scan（自 pg_stat_database.stats_reset 起算）。
+- SQLite（開發）：沒有查詢統計，改以 core/query_plans/ 快照中的 SQL（查詢預算測試記錄的各頁查詢）
+  為工作負載，交給 EXPLAIN QUERY PLAN；也可用 --sql-file 指定（每行一個 SQL，縮排行與 # 開頭略過，
+  與快照格式相同）。此時「未使用」代表沒有任何分析的查詢用到。
+
+判斷
+- 缺少：大表（LARGE_TABLES 或列數 >= min_rows）上的全表掃描，或為了 ORDER BY 另外排序。
+  依 WHERE 的等值欄位、再接一個範圍或排序欄位組成建議的複合索引；已有相同前綴的索引則不建議。
+- 重複：欄位為同表另一個索引的前綴（或完全相同）的非唯一索引。部分索引、運算式索引不判斷。
+- 未使用：非唯一、非主鍵，且期間內沒有被使用的索引。
+
+只分析本專案 app（core、issues）的資料表；查詢以 db_table 對回 model，欄位以 column 對回 field。
+"""
+import itertools
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections, models
+
+from .querybudget import LARGE_TABLES, PG_SEQ_SCAN, SNAPSHOT_DIR, SQLITE_SCAN, explain as explain_sqlite
+
+COLUMN = r'"(\w+)"\."(\w+)"'
+EQUALITY = re.compile(COLUMN + r"\s*(?:=|IN\b|IS NULL\b)")
+RANGE = re.compile(COLUMN + r"\s*(?:>=|<=|>|<|BETWEEN\b)")
+WHERE = re.compile(r"\bWHERE\b(.+?)(?=\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)")
+ORDER_BY = re.compile(r"\bORDER BY\b(.+?)(?=\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|\)|$)")
+PLACEHOLDER = re.compile(r"%s")
+SQLITE_USING = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+PG_USING = re.compile(r"Index (?:Only )?Scan (?:Backward )?using (\w+)|Bitmap Index Scan on (\w+)")
+PG_SORT = re.compile(r"^\s*(?:->\s*)?Sort\b")
+SQLITE_SORT = "USE TEMP B-TREE FOR ORDER BY"
+EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+MAX_COLUMNS = 3
+
+
+class AdvisorError(Exception):
+    pass
+
+
+def local_models() -> dict:
+    """db_table → model，只含本專案（BASE_DIR 下、非 site-packages）的 app。"""
+    base = str(settings.BASE_DIR)
+    tables = {}
+    for config in apps.get_app_configs():
+        if not config.path.startswith(base) or "site-packages" in config.path:
+            continue
+        for model in config.get_models():
+            if model._meta.managed and not model._meta.proxy:
+                tables[model._meta.db_table] = model
+    return tables
+
+
+def _field_names(model, columns) -> list:
+    by_column = {f.column: f.name for f in model._meta.concrete_fields}
+    return [by_column.get(c, c) for c in columns]
+
+
+def _label(model) -> str:
+    return f"{model._meta.app_label}.{model.__name__}"
+
+
+# --- 現有索引 -----------------------------------------------------------------
+
+def _partial_indexes(connection, cursor, tables) -> set:
+    if connection.vendor == "postgresql":
+        cursor.execute(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_class t ON t.oid = i.indrelid "
+            "WHERE t.relname = ANY(%s) AND (i.indpred IS NOT NULL OR i.indexprs IS NOT NULL)", [list(tables)])
+        return {row[0] for row in cursor.fetchall()}
+    if connection.vendor == "sqlite":
+        return {row[1] for table in tables for row in cursor.execute(f'PRAGMA index_list("{table}")').fetchall()
+                if row[4]}
+    return set()
+
+
+def existing_indexes(tables: dict, using="default") -> dict:
+    """db_table → [{name, columns, unique, partial, declared, hint}]；不含主鍵與 CHECK 約束。"""
+    connection = connections[using]
+    result = {}
+    with connection.cursor() as cursor:
+        partial = _partial_indexes(connection, cursor, tables)
+        for table, model in tables.items():
+            declared = {index.name for index in model._meta.indexes}
+            fk_columns = {f.column: f.name for f in model._meta.concrete_fields if f.db_index}
+            entries = []
+            for name, info in connection.introspection.get_constraints(cursor, table).items():
+                if info["primary_key"] or info["check"] or not (info["index"] or info["unique"]):
+                    continue
+                columns = info["columns"]
+                if name in declared:
+                    hint = ""
+                elif len(columns) == 1 and columns[0] in fk_columns:
+                    hint = f"set db_index=False on {_label(model)}.{fk_columns[columns[0]]}"
+                else:
+                    hint = "not in Meta.indexes; drop it with DROP INDEX CONCURRENTLY in a RunSQL migration"
+                entries.append({"name": name, "columns": columns, "unique": info["unique"],
+                                "partial": name in partial or None in columns, "declared": name in declared,
+                                "hint": hint})
+            result[table] = entries
+    return result
+
+
+def redundant_indexes(indexes: dict, tables: dict) -> list:
+    found = []
+    for table, entries in indexes.items():
+        for index in entries:
+            if index["unique"] or index["partial"]:
+                continue
+            for other in entries:
+                if other is index or other["partial"]:
+                    continue
+                n = len(index["columns"])
+                if other["columns"][:n] != index["columns"]:
+                    continue
+                # 欄位完全相同時保留唯一索引；其次移除 Meta.indexes 宣告的那個（遷移可直接移除），再依名稱
+                if len(other["columns"]) == n and not other["unique"] and \
+                        (other["declared"], index["name"]) > (index["declared"], other["name"]):
+                    continue
+                found.append({**index, "model": _label(tables[table]), "table": table,
+                              "covered_by": other["name"], "covered_columns": other["columns"]})
+                break
+    return found
+
+
+# --- 工作負載與計畫 -----------------------------------------------------------
+
+def statements_from_files(paths) -> list:
+    """快照 / SQL 檔中的 SQL（不縮排、非 # 開頭的行），相同語句只取一次。"""
+    seen, queries = set(), []
+    for path in paths:
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            if not line.strip() or line[0].isspace() or line.startswith("#") or line in seen:
+                continue
+            seen.add(line)
+            queries.append({"sql": line.replace("IN (...)", "IN (%s)"), "calls": 1, "total_ms": None})
+    return queries
+
+
+def snapshot_files(using="default") -> list:
+    return sorted((SNAPSHOT_DIR / connections[using].vendor).glob("*.txt"))
+
+
+def top_statements(using="default", top=50, min_calls=10) -> list:
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+        if cursor.fetchone() is None:
+            raise AdvisorError("pg_stat_statements is not installed: add it to shared_preload_libraries "
+                               "and run CREATE EXTENSION pg_stat_statements")
+        cursor.execute(
+            "SELECT query, calls, total_exec_time FROM pg_stat_statements "
+            "WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database()) AND calls >= %s "
+            "ORDER BY total_exec_time DESC LIMIT %s", [min_calls, top])
+        return [{"sql": sql, "calls": calls, "total_ms": total} for sql, calls, total in cursor.fetchall()]
+
+
+def _explain_postgresql(connection, sql) -> list:
+    # pg_stat_statements 的參數為 $n；SQL 檔中 Django 的 %s 依序換成 $n 再取 generic plan
+    counter = itertools.count(1)
+    sql = PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql)
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (GENERIC_PLAN, COSTS OFF) {sql}")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def query_plan(sql, using="default"):
+    """計畫文字（每行一筆）；無法取得（非查詢語句、PostgreSQL < 16、SQL 被截斷）時回傳 None。"""
+    connection = connections[using]
+    try:
+        if connection.vendor == "postgresql":
+            return _explain_postgresql(connection, sql) if sql.lstrip().upper().startswith(EXPLAINABLE) else None
+        return explain_sqlite(sql, [None] * sql.count("%s"), using) or None
+    except DatabaseError:
+        return None
+
+
+def _plan_usage(plan, vendor):
+    """(全表掃描的資料表, 用到的索引, 是否另外排序)。"""
+    scanned, used, sorts = set(), set(), False
+    for line in plan:
+        text = line.strip()
+        if vendor == "postgresql":
+            if m := PG_SEQ_SCAN.search(text):
+                scanned.add(m.group(1))
+            if m := PG_USING.search(text):
+                used.add(m.group(1) or m.group(2))
+            sorts = sorts or bool(PG_SORT.match(line))
+        else:
+            if (m := SQLITE_SCAN.match(text)) and "USING" not in m.group(2):
+                scanned.add(m.group(1))
+            if m := SQLITE_USING.search(text):
+                used.add(m.group(1))
+            sorts = sorts or text.startswith(SQLITE_SORT)
+    return scanned, used, sorts
+
+
+def _predicates(sql, table):
+    """SQL 中此資料表的等值欄位、範圍欄位、排序欄位（依出現順序、不重複）。"""
+    def columns(pattern, text):
+        return list(dict.fromkeys(c for t, c in pattern.findall(text) if t == table))
+
+    where = " ".join(WHERE.findall(sql))
+    order = " ".join(ORDER_BY.findall(sql))
+    return columns(EQUALITY, where), columns(RANGE, where), columns(re.compile(COLUMN), order)
+
+
+def suggest_columns(sql, table, full_scan, sorts) -> list:
+    equality, ranged, order = _predicates(sql, table)
+    if not full_scan and not (sorts and order):
+        return []
+    # 等值欄位在前；其後只能再接一個範圍欄位，沒有範圍條件時接排序欄位（索引順序即結果順序）
+    ranged = [c for c in ranged if c not in equality]
+    tail = ranged[:1] if ranged else [c for c in order if c not in equality]
+    return (equality + tail)[:MAX_COLUMNS]
+
+
+def _covered(columns, entries) -> bool:
+    return any(e["columns"][:len(columns)] == columns and not e["partial"] for e in entries)
+
+
+def row_estimates(tables, using="default") -> dict:
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)", [list(tables)])
+            return {name: max(0, int(rows)) for name, rows in cursor.fetchall()}
+        return {table: cursor.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+
+
+def index_scans(tables, using="default"):
+    """PostgreSQL：(index 名稱 → idx_scan, stats_reset)。"""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT indexrelname, idx_scan FROM pg_stat_user_indexes WHERE relname = ANY(%s)",
+                       [list(tables)])
+        scans = dict(cursor.fetchall())
+        cursor.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+        row = cursor.fetchone()
+    return scans, row[0] if row else None
+
+
+# --- 分析 ---------------------------------------------------------------------
+
+def analyse(using="default", top=50, min_calls=10, min_rows=10000, sql_files=None) -> dict:
+    connection = connections[using]
+    if connection.vendor not in ("postgresql", "sqlite"):
+        raise AdvisorError(f"unsupported database vendor: {connection.vendor}")
+    tables = local_models()
+    if sql_files is None and connection.vendor == "postgresql":
+        queries, source = top_statements(using, top, min_calls), "pg_stat_statements"
+    else:
+        files = sql_files or snapshot_files(using)
+        queries, source = statements_from_files(files), f"query plans ({len(files)} files)"
+    indexes = existing_indexes(tables, using)
+    rows = row_estimates(tables, using)
+    large = {t for t in tables if t in LARGE_TABLES or rows.get(t, 0) >= min_rows}
+
+    missing, used, touched, analysed, skipped = {}, set(), set(), 0, 0
+    for query in queries:
+        sql = query["sql"]
+        referenced = {t for t in tables if re.search(rf"\b{t}\b", sql)}
+        if not referenced:
+            continue
+        plan = query_plan(sql, using)
+        if plan is None:
+            skipped += 1
+            continue
+        analysed += 1
+        touched |= referenced
+        scanned, plan_used, sorts = _plan_usage(plan, connection.vendor)
+        used |= plan_used
+        for table in referenced & large:
+            model = tables[table]
+            columns = suggest_columns(sql, table, table in scanned, sorts)
+            primary = {"columns": [model._meta.pk.column], "partial": False}
+            if not columns or _covered(columns, indexes[table] + [primary]):
+                continue
+            entry = missing.setdefault((table, tuple(columns)), {
+                "model": _label(model), "table": table, "columns": columns,
+                "fields": _field_names(model, columns), "queries": 0, "calls": 0, "total_ms": 0.0,
+                "example": sql})
+            entry["queries"] += 1
+            entry["calls"] += query["calls"]
+            entry["total_ms"] += query["total_ms"] or 0.0
+
+    stats_reset = None
+    if source == "pg_stat_statements":
+        scans, stats_reset = index_scans(tables, using)
+        unused = [(table, index, scans.get(index["name"], 0)) for table, entries in indexes.items()
+                  for index in entries if index["name"] in scans and scans[index["name"]] == 0]
+    else:
+        # 計畫沒有列出的索引；只看分析的查詢實際碰到的資料表
+        unused = [(table, index, None) for table in touched for index in indexes[table]
+                  if index["name"] not in used]
+
+    return {
+        "source": source, "vendor": connection.vendor, "stats_reset": stats_reset,
+        "queries": len(queries), "analysed": analysed, "skipped": skipped,
+        "missing": sorted(missing.values(), key=lambda m: (-m["total_ms"], -m["calls"], m["table"])),
+        "redundant": redundant_indexes(indexes, tables),
+        "unused": [{**index, "model": _label(tables[table]), "table": table, "scans": scans_}
+                   for table, index, scans_ in unused if not index["unique"]],
+        "rows": rows,
+    }
+
+
+# --- 遷移 ---------------------------------------------------------------------
+
+def migration_operations(report, drop_unused=False) -> dict:
+    """app_label → 操作清單。只移除 Meta.indexes 中宣告的索引（其他見各項的 hint）。"""
+    from .migration_operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+    tables = local_models()
+    operations = defaultdict(list)
+    for item in report["missing"]:
+        model = tables[item["table"]]
+        index = models.Index(fields=item["fields"])
+        index.set_name_with_model(model)
+        operations[model._meta.app_label].append(AddIndexConcurrently(model_name=model._meta.model_name,
+                                                                      index=index))
+    removals = report["redundant"] + (report["unused"] if drop_unused else [])
+    seen = set()
+    for item in removals:
+        if not item["declared"] or item["name"] in seen:
+            continue
+        seen.add(item["name"])
+        model = tables[item["table"]]
+        operations[model._meta.app_label].append(RemoveIndexConcurrently(model_name=model._meta.model_name,
+                                                                         name=item["name"]))
+    return dict(operations)
+
+
+def write_migrations(operations: dict, name="index_advisor", dry_run=False) -> list:
+    """每個 app 寫一個 atomic = False 的遷移，回傳 (路徑, 內容)。"""
+    from django.db import migrations
+    from django.db.migrations.autodetector import MigrationAutodetector
+    from django.db.migrations.loader import MigrationLoader
+    from django.db.migrations.writer import MigrationWriter
+
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    written = []
+    for app_label, ops in operations.items():
+        leaves = loader.graph.leaf_nodes(app_label)
+        number = max((MigrationAutodetector.parse_number(leaf[1]) or 0 for leaf in leaves), default=0) + 1
+        migration = type("Migration", (migrations.Migration,), {
+            "dependencies": leaves, "operations": ops})(f"{number:04d}_{name}", app_label)
+        content = MigrationWriter(migration).as_string().replace(
+            "class Migration(migrations.Migration):\n",
+            "class Migration(migrations.Migration):\n\n    atomic = False\n", 1)
+        path = Path(MigrationWriter(migration).path)
+        if not dry_run:
+            path.write_text(content, encoding="utf-8")
+        written.append((path, content))
+    return written
+
+
+def meta_changes(operations: dict) -> list:
+    """遷移之外仍需手動改 Meta.indexes 的地方（否則下次 makemigrations 會產生反向操作）。"""
+    lines = []
+    for app_label, ops in operations.items():
+        for op in ops:
+            if hasattr(op, "index"):
+                fields = ", ".join(repr(f) for f in op.index.fields)
+                lines.append(f"{app_label}.{op.model_name}: add models.Index(fields=[{fields}], "
+                             f"name={op.index.name!r}) to Meta.indexes")
+            else:
+                lines.append(f"{app_label}.{op.model_name}: remove {op.name!r} from Meta.indexes")
+    return lines
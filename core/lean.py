@@ -0,0 +1,39 @@
+"""
+清單端點的精簡讀取路徑：以 queryset.values() 取出 dict，不建立 model instance、
+也不經過 ModelSerializer 的逐欄位 to_representation。
+
+- lean_fields：values() 的欄位名稱；外鍵用欄位名（"project"）即輸出 id，
+  與 ModelSerializer 的 PrimaryKeyRelatedField 相同。
+- ?format=stream 時以 iterator() 分批讀取並串流輸出 JSON 陣列（匯出用，不分頁）。
+- 日期時間由 renderer 直接編碼，輸出為 UTC（...Z），與 serializer 的當地時區表示為同一時刻。
+"""
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .renderers import StreamingJSONRenderer, iter_json_array
+
+STREAM_FETCH_ROWS = 2000
+
+
+class LeanListMixin:
+    lean_fields = ()
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, StreamingJSONRenderer]
+
+    def get_lean_queryset(self):
+        qs = self.filter_queryset(self.get_queryset())
+        # 只需要欄位值：去掉 select_related，避免多餘的 JOIN
+        return qs.select_related(None).prefetch_related(None).values(*self.lean_fields)
+
+    def lean_list(self, request):
+        qs = self.get_lean_queryset()
+        if getattr(request.accepted_renderer, "format", None) == StreamingJSONRenderer.format:
+            rows = qs.iterator(chunk_size=STREAM_FETCH_ROWS)
+            return StreamingHttpResponse(iter_json_array(rows), content_type="application/json")
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(list(page))
+        return Response(list(qs))
+
+    def list(self, request, *args, **kwargs):
+        return self.lean_list(request)
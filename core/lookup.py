@@ -0,0 +1,140 @@
+"""
+設備查詢：序號 typeahead 與單一設備的問題 / 事件歷史（keyset 分頁）。
+
+- 前綴查詢以 UPPER(serial_no) 範圍條件命中 core_asset_serial_upper_idx，
+  掃描條碼（完整序號）時只讀取索引中的一小段。
+- 前綴結果不足時才退回 icontains，PostgreSQL 上由 trigram 索引支援。
+- 歷史以 (created_at, id) / id 為游標，不使用 OFFSET，深頁成本固定。
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+from . import event_stream
+from .models import Asset, Issue, IssueEvent
+
+TYPEAHEAD_MIN_LENGTH = 2
+TYPEAHEAD_MAX_LIMIT = 20
+HISTORY_MAX_LIMIT = 100
+
+OPEN_STATUSES = ("open", "in_progress", "waiting_parts", "on_site")
+
+ASSET_FIELDS = ("id", "name", "serial_no", "location", "project_id", "project__name")
+ISSUE_FIELDS = ("id", "title", "priority", "status", "assignee", "created_at", "updated_at")
+EVENT_FIELDS = ("id", "issue_id", "event_type", "to_value", "event_key", "created_at")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*parts) -> str:
+    raw = "|".join(p.isoformat() if isinstance(p, datetime) else str(p) for p in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    解回 encode_cursor 的各欄位，並依 types（int / datetime）轉型。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        if len(parts) != len(types):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(p) if t is datetime else t(p) for p, t in zip(parts, types)]
+    except Exception as e:
+        raise InvalidCursor(cursor) from e
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    # "ABC" -> "ABD"：[prefix, bound) 即為所有以 prefix 開頭的字串
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def typeahead_assets(q: str, limit: int = 10) -> list:
+    """
+    依序號前綴（其次：序號或位置包含 q）找設備，回傳精簡 dict 清單。
+    """
+    q = (q or "").strip()
+    if len(q) < TYPEAHEAD_MIN_LENGTH:
+        return []
+    limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+    prefix = q.upper()
+
+    rows = list(
+        Asset.objects.annotate(serial_upper=Upper("serial_no"))
+        .filter(serial_upper__gte=prefix, serial_upper__lt=_prefix_upper_bound(prefix))
+        .filter(serial_no__istartswith=q)
+        .order_by("serial_upper", "id")
+        .values(*ASSET_FIELDS)[:limit]
+    )
+    if len(rows) < limit:
+        seen = [r["id"] for r in rows]
+        rows += list(
+            Asset.objects.filter(Q(serial_no__icontains=q) | Q(location__icontains=q))
+            .exclude(id__in=seen)
+            .order_by("serial_no", "id")
+            .values(*ASSET_FIELDS)[: limit - len(rows)]
+        )
+    return rows
+
+
+def asset_history(asset_id: int, issues_after: str = None, events_after: str = None,
+                  limit: int = 20) -> dict:
+    """
+    單一設備的問題與事件歷史。
+
+    未處理的問題（status 為 open / in_progress）走 (asset, status) 索引一次取回；
+    全部問題依 id 遞減、事件依 (created_at, id) 遞減各自以游標分頁。
+    """
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+
+    open_issues = []
+    if not (issues_after or events_after):
+        open_issues = list(
+            Issue.objects.filter(asset_id=asset_id, status__in=OPEN_STATUSES)
+            .order_by("-id").values(*ISSUE_FIELDS)
+        )
+
+    issues_qs = Issue.objects.filter(asset_id=asset_id)
+    if issues_after:
+        (last_id,) = decode_cursor(issues_after, int)
+        issues_qs = issues_qs.filter(id__lt=last_id)
+    issues = list(issues_qs.order_by("-id").values(*ISSUE_FIELDS)[: limit + 1])
+    issues_next = encode_cursor(issues[limit - 1]["id"]) if len(issues) > limit else None
+
+    events, events_next = _event_page(IssueEvent.objects.filter(issue__asset_id=asset_id),
+                                      events_after, limit, "asset", asset_id)
+
+    return {
+        "open_issues": open_issues,
+        "issues": {"results": issues[:limit], "next": issues_next},
+        "events": {"results": events, "next": events_next},
+    }
+
+
+def _event_page(events_qs, after: str, limit: int, scope: str, scope_id) -> tuple:
+    if after:
+        ts, last_id = decode_cursor(after, datetime, int)
+        events_qs = events_qs.filter(created_at__lte=ts).exclude(created_at=ts, id__gte=last_id)
+    events = list(events_qs.order_by("-created_at", "-id").values(*EVENT_FIELDS)[: limit + 1])
+    events_next = None
+    if len(events) > limit:
+        last = events[limit - 1]
+        events_next = encode_cursor(last["created_at"], last["id"])
+    events = events[:limit]
+    if not after:
+        # 第一頁併入尚在 Redis stream、還沒寫進資料庫的事件（讀到自己的寫入）
+        events = event_stream.merge_recent(events, scope, scope_id, has_more=events_next is not None)
+    return events, events_next
+
+
+def issue_events(issue_id: int, after: str = None, limit: int = 20) -> dict:
+    """單一問題的事件（不含留言與附件；合併時間軸見 core.timeline），依 (created_at, id) 遞減分頁。"""
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    events, events_next = _event_page(IssueEvent.objects.filter(issue_id=issue_id), after, limit,
+                                      "issue", issue_id)
+    return {"results": events, "next": events_next}
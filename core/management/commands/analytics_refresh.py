@@ -0,0 +1,25 @@
+"""
+重建狀態區間事實表（core.analytics）。
+
+    python manage.py analytics_refresh            # 只處理水位之後有新事件的問題
+    python manage.py analytics_refresh --full     # 全部重建（例如修改事件資料後）
+"""
+from django.core.management.base import BaseCommand
+
+from core.analytics import refresh, watermark
+
+
+class Command(BaseCommand):
+    help = "Rebuild IssueStatusInterval facts from IssueEvent (incremental by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="rebuild every issue, ignoring the watermark")
+        parser.add_argument("--batch-size", type=int, default=500, help="issues per transaction")
+
+    def handle(self, *args, **opts):
+        before = watermark()
+        result = refresh(full=opts["full"], batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"rebuilt {result['intervals']} intervals for {result['issues']} issues "
+            f"(events {before} -> {result['upto_event_id']})"
+        ))
@@ -0,0 +1,46 @@
+"""
+冷熱分層：把結案已久的問題移到封存表，或還原（core.archive）。
+
+    python manage.py archive_issues                          # 依 ARCHIVE["AFTER_DAYS"] 封存
+    python manage.py archive_issues --days 365 --source core --limit 5000
+    python manage.py archive_issues --dry-run                # 只計算符合條件的筆數
+    python manage.py archive_issues --restore issues:123     # 以原 id 還原
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archive
+from core.models import ArchivedIssue
+
+
+class Command(BaseCommand):
+    help = "Move issues closed for more than N days into the archive table, or restore one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None)
+        parser.add_argument("--source", choices=ArchivedIssue.Source.values, default=None)
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--limit", type=int, default=None, help="max issues per source in this run")
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--restore", metavar="SOURCE:ID", default=None)
+
+    def handle(self, *args, **opts):
+        if opts["restore"]:
+            source, _, original_id = opts["restore"].partition(":")
+            if not original_id.isdigit():
+                raise CommandError("--restore expects SOURCE:ID, e.g. core:42")
+            try:
+                archive.restore(source, int(original_id))
+            except archive.ArchiveError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"restored {source} issue {original_id}"))
+            return
+
+        if opts["dry_run"]:
+            for name, count in archive.count_candidates(opts["source"], opts["days"]).items():
+                self.stdout.write(f"{name}: {count} issues would be archived")
+            return
+
+        result = archive.archive_closed(source=opts["source"], days=opts["days"],
+                                        batch_size=opts["batch_size"], limit=opts["limit"])
+        for name, count in result.items():
+            self.stdout.write(self.style.SUCCESS(f"{name}: archived {count} issues"))
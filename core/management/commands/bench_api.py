@@ -0,0 +1,84 @@
+"""
+比較 /api/issues/ 清單各種序列化方式的耗時與記憶體（換算為每 10k 筆）。
+
+    python manage.py bench_api --count 10000 --repeat 3
+
+測試資料在 transaction 內建立，結束時 rollback，不會留在資料庫。
+  drf       ModelSerializer(many=True) + DRF JSONRenderer（原本的路徑）
+  orjson    ModelSerializer(many=True) + ORJSONRenderer
+  lean      values() + ORJSONRenderer（LeanListMixin 的一般清單）
+  stream    values().iterator() + iter_json_array（?format=stream）
+"""
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = "Benchmark issue list serialization: DRF serializer vs orjson vs lean values() vs streaming."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            self._seed(opts["count"])
+            results = self._run(opts["count"], opts["repeat"])
+            transaction.set_rollback(True)
+
+        scale = 10000 / opts["count"]
+        base = results[0][1]
+        self.stdout.write(f"{'mode':<8} {'ms/10k':>10} {'speedup':>8} {'peak MB/10k':>12} {'bytes':>10}")
+        for name, seconds, peak, size in results:
+            self.stdout.write(f"{name:<8} {seconds * 1000 * scale:>10.1f} {base / seconds:>7.1f}x "
+                              f"{peak / 2**20 * scale:>12.1f} {size:>10}")
+
+    def _seed(self, count):
+        from core.models import Asset, Issue, Project
+
+        project = Project.objects.create(name="bench", customer="bench")
+        asset = Asset.objects.create(name="bench", serial_no="BENCH-0001", location="lab", project=project)
+        statuses = [c for c, _ in Issue.STATUS_CHOICES]
+        Issue.objects.bulk_create(
+            [Issue(title=f"bench issue {i}", priority=f"P{i % 4}", assignee=f"user{i % 20}",
+                   status=statuses[i % len(statuses)], project=project, asset=asset if i % 2 else None)
+             for i in range(count)],
+            batch_size=2000,
+        )
+
+    def _run(self, count, repeat):
+        from rest_framework.renderers import JSONRenderer
+
+        from core.models import Issue
+        from core.renderers import ORJSONRenderer, iter_json_array
+        from core.serializers import IssueSerializer
+
+        qs = Issue.objects.select_related("project", "asset").order_by("-id")
+        fields = IssueSerializer.Meta.fields
+
+        modes = [
+            ("drf", lambda: JSONRenderer().render(IssueSerializer(qs.all(), many=True).data)),
+            ("orjson", lambda: ORJSONRenderer().render(IssueSerializer(qs.all(), many=True).data)),
+            ("lean", lambda: ORJSONRenderer().render(list(qs.select_related(None).values(*fields)))),
+            # 串流時資料逐段送出；這裡只計算總長度，不把整份輸出留在記憶體
+            ("stream", lambda: sum(len(chunk) for chunk in
+                                   iter_json_array(qs.select_related(None).values(*fields).iterator(chunk_size=2000)))),
+        ]
+        results = []
+        for name, func in modes:
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                out = func()
+                best = min(best, time.perf_counter() - started)
+            size = out if isinstance(out, int) else len(out)
+
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append((name, best, peak, size))
+        return results
@@ -0,0 +1,66 @@
+"""
+IssueEvent stream 消費者：從 Redis stream 批次寫入資料庫（core.event_stream）。
+
+    python manage.py event_writer                 # 常駐；可啟動多個，同一消費者群組分工
+    python manage.py event_writer --drain         # 處理完目前積壓後結束（部署 / 停用 stream 前）
+    python manage.py event_writer --status        # 顯示積壓量
+"""
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import event_stream
+from core.redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+MAX_BACKOFF = 30
+
+
+class Command(BaseCommand):
+    help = "Consume the IssueEvent Redis stream and bulk-insert events in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consumer", default=None, help="consumer name (default: host-pid)")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--drain", action="store_true", help="exit once the stream is empty")
+        parser.add_argument("--status", action="store_true", help="print backlog and exit")
+
+    def handle(self, *args, **opts):
+        r = get_redis()
+        event_stream.ensure_group(r)
+        if opts["status"]:
+            self.stdout.write(str(event_stream.backlog(r)))
+            return
+
+        consumer = opts["consumer"] or event_stream.consumer_name()
+        stopping = []
+        # SIGTERM：處理完手上這批再結束，未 ACK 的訊息留給其他消費者接手
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+        total, errors = 0, 0
+        started = time.monotonic()
+        while not stopping:
+            close_old_connections()
+            try:
+                handled = event_stream.consume_once(r, consumer, count=opts["batch_size"],
+                                                    block_ms=0 if opts["drain"] else None)
+            except KeyboardInterrupt:
+                break
+            except Exception:
+                # 資料庫 / Redis 暫時無法連線：訊息留在 pending，退避後重試（連線由 close_old_connections 重建）
+                errors += 1
+                delay = min(MAX_BACKOFF, 2 ** errors)
+                log.exception("event writer batch failed, retrying in %ds", delay)
+                time.sleep(delay)
+                continue
+            errors = 0
+            total += handled
+            if opts["drain"] and not handled:
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f"{consumer}: {total} events in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,144 @@
+"""
+本機 fake Microsoft Graph：token endpoint + JSON $batch，模擬節流（429 + Retry-After）。
+
+    python manage.py fake_graph --port 8765 --rate 2 --burst 5
+    GRAPH_BASE_URL=http://127.0.0.1:8765/v1.0 GRAPH_LOGIN_BASE=http://127.0.0.1:8765 \\
+        celery -A app worker -l info
+
+加上 --selftest N 會在同一行程內啟動伺服器、排入 N 則訊息並同步 flush 到清空，
+最後印出投遞 / 節流統計（需要可連線的 REDIS_URL）。
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class FakeGraphState:
+    def __init__(self, rate, burst, batch_429_every):
+        self.rate = rate
+        self.burst = burst
+        self.batch_429_every = batch_429_every
+        self.tokens = float(burst)
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {"batches": 0, "delivered": 0, "throttled": 0, "batch_throttled": 0}
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self._json(200, state.stats)
+            self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if self.path.endswith("/oauth2/v2.0/token"):
+                return self._json(200, {"access_token": "fake-token", "expires_in": 3600})
+            if not self.path.endswith("/$batch"):
+                return self._json(404, {"error": "not found"})
+
+            with state.lock:
+                state.stats["batches"] += 1
+                whole = state.batch_429_every and state.stats["batches"] % state.batch_429_every == 0
+            if whole:
+                state.stats["batch_throttled"] += 1
+                return self._json(429, {"error": {"code": "TooManyRequests"}}, {"Retry-After": "2"})
+
+            responses = []
+            for sub in json.loads(raw).get("requests", []):
+                wait = state.take()
+                if wait:
+                    state.stats["throttled"] += 1
+                    responses.append({"id": sub["id"], "status": 429,
+                                      "headers": {"Retry-After": str(max(1, round(wait)))},
+                                      "body": {"error": {"code": "TooManyRequests"}}})
+                else:
+                    state.stats["delivered"] += 1
+                    responses.append({"id": sub["id"], "status": 201, "body": {"id": sub["id"]}})
+            self._json(200, {"responses": responses})
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = "Run a local fake Microsoft Graph server that throttles like Teams channel messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--rate", type=float, default=2.0, help="accepted messages per second")
+        parser.add_argument("--burst", type=int, default=5)
+        parser.add_argument("--batch-429-every", type=int, default=0,
+                            help="throttle every Nth $batch as a whole (0 = never)")
+        parser.add_argument("--selftest", type=int, default=0, metavar="N",
+                            help="enqueue N messages and drain them through the fake server")
+
+    def handle(self, *args, **opts):
+        state = FakeGraphState(opts["rate"], opts["burst"], opts["batch_429_every"])
+        server = ThreadingHTTPServer((opts["host"], opts["port"]), make_handler(state))
+        base = f"http://{opts['host']}:{server.server_address[1]}"
+
+        if not opts["selftest"]:
+            self.stdout.write(f"fake Graph listening on {base} (GRAPH_BASE_URL={base}/v1.0)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._selftest(base, opts["selftest"], state)
+        server.shutdown()
+
+    def _selftest(self, base, n, state):
+        from core import teams
+
+        settings.GRAPH_BASE_URL = f"{base}/v1.0"
+        settings.GRAPH_LOGIN_BASE = base
+        settings.GRAPH.update({k: settings.GRAPH[k] or "fake" for k in ("TENANT_ID", "CLIENT_ID",
+                                                                        "CLIENT_SECRET", "TEAM_ID", "CHANNEL_ID")})
+        r = teams.get_redis()
+        r.delete(teams.OUTBOX_KEY, teams.RETRY_KEY, teams.DEAD_KEY, teams.BUCKET_KEY)
+        for i in range(n):
+            r.rpush(teams.OUTBOX_KEY, json.dumps({"html": f"selftest #{i}", "attempt": 0}))
+
+        started = time.monotonic()
+        while True:
+            next_in = teams.flush_outbox()
+            if next_in is None:
+                break
+            time.sleep(next_in)
+        elapsed = time.monotonic() - started
+        dead = r.llen(teams.DEAD_KEY)
+        self.stdout.write(json.dumps({**state.stats, "dead": dead, "seconds": round(elapsed, 2)}))
+        if state.stats["delivered"] + dead != n:
+            self.stderr.write("delivered + dead does not match enqueued count")
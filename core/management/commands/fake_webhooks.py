@@ -0,0 +1,217 @@
+"""
+本機 webhook 接收端（stand-in receivers）：每種行為一個連接埠，驗證簽章並統計收到的投遞。
+
+    python manage.py fake_webhooks --port 8770             # ok / slow / flaky / throttled / down / gone 依序佔用 8770~
+    python manage.py fake_webhooks --selftest 200          # 同一行程內：建立訂閱、排入 200 個事件、由 worker 送完
+
+行為：ok 立即 200；slow 延遲 --slow-ms；flaky 依 --flaky-rate 回 503；throttled 超過 --rate 回 429 + Retry-After；
+down 一律 500（觸發斷路器）；gone 回 410（訂閱自動停用）。
+--selftest 會暫時建立名為 webhook-selftest 的專案與訂閱（結束時刪除），並縮短退避 / 斷路 / MAX_AGE，
+最後印出各接收端的統計與是否符合預期（需要可連線的 REDIS_URL）。
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PROFILES = ("ok", "slow", "flaky", "throttled", "down", "gone")
+SELFTEST_SECRET = "webhook-selftest-secret"
+
+
+class ReceiverState:
+    def __init__(self, profile, secret, slow_ms, flaky_rate, rate, seed):
+        self.profile = profile
+        self.secret = secret
+        self.slow_ms = slow_ms
+        self.flaky_rate = flaky_rate
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.tokens = float(rate)
+        self.ts = time.monotonic()
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def respond(self, delivery_id, signature, body):
+        """回傳 (狀態碼, 額外標頭)。"""
+        from core import webhooks
+
+        with self.lock:
+            self.stats["requests"] += 1
+            if not webhooks.verify_signature(self.secret, signature, body):
+                self.stats["bad_signature"] += 1
+                return 401, {}
+            if self.profile == "down":
+                return 500, {}
+            if self.profile == "gone":
+                return 410, {}
+            if self.profile == "flaky" and self.random.random() < self.flaky_rate:
+                self.stats["failed"] += 1
+                return 503, {}
+            if self.profile == "throttled":
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens < 1:
+                    self.stats["throttled"] += 1
+                    return 429, {"Retry-After": "1"}
+                self.tokens -= 1
+            if delivery_id in self.seen:
+                self.stats["duplicates"] += 1
+            else:
+                self.seen.add(delivery_id)
+                self.stats["delivered"] += 1
+        return 204, {}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive：驗證 worker 的連線池
+        disable_nagle_algorithm = True  # 標頭與本文分兩次寫出，否則 keep-alive 下每個回應多等 40ms（delayed ACK）
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _reply(self, status, headers=None, body=b""):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self._reply(200, {"Content-Type": "application/json"}, json.dumps(state.stats).encode())
+            self._reply(404)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if state.profile == "slow":
+                time.sleep(state.slow_ms / 1000)
+            status, headers = state.respond(self.headers.get("X-Webhook-Delivery"),
+                                            self.headers.get("X-Webhook-Signature"), body)
+            self._reply(status, headers)
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = "Run local stand-in webhook receivers (ok, slow, flaky, throttled, down, gone) and optionally a selftest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=0, help="first port (0 = pick free ports)")
+        parser.add_argument("--secret", default=SELFTEST_SECRET, help="secret the receivers verify against")
+        parser.add_argument("--slow-ms", type=int, default=200)
+        parser.add_argument("--flaky-rate", type=float, default=0.3)
+        parser.add_argument("--rate", type=float, default=50.0, help="throttled receiver: accepted per second")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--selftest", type=int, default=0, metavar="N",
+                            help="publish N events to every receiver and deliver them with the worker")
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--max-age", type=int, default=15, help="selftest: seconds before giving up on a delivery")
+
+    def handle(self, *args, **opts):
+        receivers = {}
+        for i, profile in enumerate(PROFILES):
+            state = ReceiverState(profile, opts["secret"], opts["slow_ms"], opts["flaky_rate"], opts["rate"],
+                                  opts["seed"] + i)
+            port = opts["port"] + i if opts["port"] else 0
+            server = ThreadingHTTPServer((opts["host"], port), make_handler(state))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            receivers[profile] = (state, server, f"http://{opts['host']}:{server.server_address[1]}/hook")
+
+        try:
+            if opts["selftest"]:
+                self._selftest(receivers, opts)
+                return
+            for profile, (_, _, url) in receivers.items():
+                self.stdout.write(f"{profile:>10}  {url}")
+            self.stdout.write(f"secret: {opts['secret']}  (GET /stats on each port for counters)")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+        finally:
+            for _, server, _ in receivers.values():
+                server.shutdown()
+
+    def _selftest(self, receivers, opts):
+        from core import webhooks
+        from core.models import Issue, Project, WebhookSubscription
+
+        n = opts["selftest"]
+        settings.WEBHOOKS.update({"TIMEOUT": 2, "MAX_BACKOFF": 2, "BREAKER_COOLDOWN": 1, "BREAKER_MAX_COOLDOWN": 2,
+                                  "MAX_AGE": opts["max_age"]})
+        project = Project.objects.create(name="webhook-selftest", customer="selftest")
+        try:
+            subs = {profile: WebhookSubscription.objects.create(project=project, url=url, secret=opts["secret"])
+                    for profile, (_, _, url) in receivers.items()}
+            r = webhooks.get_redis()
+            self._reset(r, subs)
+            issues = [Issue(pk=i + 1, title=f"selftest #{i}", priority="P2", assignee="", project=project)
+                      for i in range(n)]
+            queued = webhooks.publish([(issue, "created", None) for issue in issues])
+
+            started = time.monotonic()
+            stats = asyncio.run(self._deliver(r, opts["concurrency"], deadline=opts["max_age"] + 60))
+            elapsed = time.monotonic() - started
+
+            dead = Counter()
+            sub_profiles = {sub.pk: profile for profile, sub in subs.items()}
+            for raw in r.lrange(webhooks.DEAD_KEY, 0, -1):
+                profile = sub_profiles.get(json.loads(raw)["sub"])
+                if profile:
+                    dead[profile] += 1
+            report = {profile: {**state.stats, "dead": dead[profile]} for profile, (state, _, _) in receivers.items()}
+            report["worker"] = dict(stats)
+            report["queued"], report["seconds"] = queued, round(elapsed, 2)
+            self.stdout.write(json.dumps(report, indent=2))
+            self._check(report, n, WebhookSubscription.objects.filter(pk=subs["gone"].pk, is_active=True).exists())
+            self._reset(r, subs)
+        finally:
+            project.delete()
+
+    def _reset(self, r, subs):
+        from core import webhooks
+        for sub in subs.values():
+            r.delete(webhooks.BREAKER_KEY.format(sub.pk), webhooks.PROBE_KEY.format(sub.pk))
+
+    async def _deliver(self, r, concurrency, deadline):
+        from core import webhooks
+
+        stop = asyncio.Event()
+        worker = webhooks.Worker(concurrency=concurrency, idle=0.2)
+        task = asyncio.create_task(worker.run(stop))
+        until = time.monotonic() + deadline
+        while r.zcard(webhooks.QUEUE_KEY) and time.monotonic() < until:
+            await asyncio.sleep(0.2)
+        stop.set()
+        return await task
+
+    def _check(self, report, n, gone_active):
+        problems = []
+        for profile in ("ok", "slow", "flaky", "throttled"):
+            if report[profile].get("delivered", 0) != n:
+                problems.append(f"{profile}: delivered {report[profile].get('delivered', 0)} of {n}")
+        if report["down"]["dead"] != n:
+            problems.append(f"down: {report['down']['dead']} of {n} dead-lettered")
+        if report["down"]["requests"] >= n:
+            problems.append(f"down: {report['down']['requests']} requests, circuit breaker did not open")
+        if gone_active:
+            problems.append("gone: subscription still active")
+        if any(report[p].get("bad_signature") for p in PROFILES):
+            problems.append("receivers rejected signatures")
+        for problem in problems:
+            self.stderr.write(problem)
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("all receivers behaved as expected"))
@@ -0,0 +1,99 @@
+"""
+依實際查詢報告缺少、重複與未使用的索引，並可產生對應的遷移（見 core/index_advisor.py）。
+
+    python manage.py index_advisor                          # 報告
+    python manage.py index_advisor --emit-migration --dry-run
+    python manage.py index_advisor --emit-migration --drop-unused
+    python manage.py index_advisor --sql-file slow.sql      # 指定查詢，不讀 pg_stat_statements
+
+產生的遷移以 CREATE / DROP INDEX CONCURRENTLY 執行（atomic = False）；Meta.indexes 仍需依輸出手動同步。
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import index_advisor
+
+
+def _columns(columns) -> str:
+    return ", ".join(c or "(expression)" for c in columns)
+
+
+class Command(BaseCommand):
+    help = "Report missing, redundant and unused indexes from live query statistics and optionally emit a migration."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--top", type=int, default=50, help="pg_stat_statements: queries by total time")
+        parser.add_argument("--min-calls", type=int, default=10, help="pg_stat_statements: ignore rarer queries")
+        parser.add_argument("--min-rows", type=int, default=10000,
+                            help="tables with at least this many rows count as large (besides LARGE_TABLES)")
+        parser.add_argument("--sql-file", action="append", dest="sql_files",
+                            help="analyse these statements (one per line) instead of the live statistics")
+        parser.add_argument("--emit-migration", action="store_true",
+                            help="write a migration adding missing and removing redundant indexes")
+        parser.add_argument("--drop-unused", action="store_true", help="also remove unused indexes in the migration")
+        parser.add_argument("--name", default="index_advisor", help="migration name suffix")
+        parser.add_argument("--dry-run", action="store_true", help="print the migration instead of writing it")
+
+    def handle(self, *args, **opts):
+        try:
+            report = index_advisor.analyse(opts["database"], top=opts["top"], min_calls=opts["min_calls"],
+                                           min_rows=opts["min_rows"], sql_files=opts["sql_files"])
+        except index_advisor.AdvisorError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{report['source']} on {report['vendor']}: {report['queries']} queries, "
+                          f"{report['analysed']} analysed, {report['skipped']} without a plan")
+        if report["stats_reset"]:
+            self.stdout.write(f"index statistics since {report['stats_reset']:%Y-%m-%d %H:%M}")
+        self._missing(report)
+        self._redundant(report)
+        self._unused(report)
+
+        if opts["emit_migration"]:
+            self._emit(report, opts)
+
+    def _missing(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING("\nmissing indexes"))
+        for item in report["missing"]:
+            cost = f"{item['calls']} calls, {item['total_ms']:.0f} ms" if item["total_ms"] else \
+                f"{item['queries']} queries"
+            self.stdout.write(f"  {item['model']} ({', '.join(item['fields'])})  "
+                              f"rows≈{report['rows'].get(item['table'], 0)}  {cost}")
+            self.stdout.write(f"      e.g. {item['example'][:160]}")
+        if not report["missing"]:
+            self.stdout.write("  none")
+
+    def _redundant(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING("\nredundant indexes"))
+        for item in report["redundant"]:
+            self.stdout.write(f"  {item['model']} {item['name']} ({_columns(item['columns'])}) "
+                              f"covered by {item['covered_by']} ({_columns(item['covered_columns'])})")
+            if item["hint"]:
+                self.stdout.write(f"      {item['hint']}")
+        if not report["redundant"]:
+            self.stdout.write("  none")
+
+    def _unused(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING("\nunused indexes"))
+        for item in report["unused"]:
+            usage = "0 scans" if item["scans"] is not None else "not used by any analysed query"
+            self.stdout.write(f"  {item['model']} {item['name']} ({_columns(item['columns'])})  {usage}")
+            if item["hint"]:
+                self.stdout.write(f"      {item['hint']}")
+        if not report["unused"]:
+            self.stdout.write("  none")
+
+    def _emit(self, report, opts):
+        operations = index_advisor.migration_operations(report, drop_unused=opts["drop_unused"])
+        if not operations:
+            self.stdout.write("\nno migration needed")
+            return
+        for path, content in index_advisor.write_migrations(operations, opts["name"], dry_run=opts["dry_run"]):
+            if opts["dry_run"]:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n# {path}"))
+                self.stdout.write(content)
+            else:
+                self.stdout.write(self.style.SUCCESS(f"\nwrote {path}"))
+        self.stdout.write("\nupdate the models to match (otherwise makemigrations will revert it):")
+        for line in index_advisor.meta_changes(operations):
+            self.stdout.write(f"  {line}")
@@ -0,0 +1,170 @@
+"""
+重播錄下的告警檔做壓力測試（core/alarms.py）。檔案為 JSON lines（可為 .gz），每行一筆
+POST /api/alarms/ 接受的告警：{"serial_no": "...", "code": "...", "severity": "...", "occurred_at": "..."}。
+
+    python manage.py replay_alarms storm.jsonl --url https://fae.example.com/api/alarms/ --token $TOKEN
+    python manage.py replay_alarms storm.jsonl.gz --direct --speed 10      # 不經 HTTP，直接入列（含背壓）
+    python manage.py replay_alarms storm.jsonl --sync --speed 0           # 同步匯入，量測 ingest 本身
+    python manage.py replay_alarms storm.jsonl --rate 2000 --shift        # 固定每秒 2000 筆，時間平移到現在
+
+--speed 依錄製時的間隔重播（10 = 十倍速，0 = 全速）；--rate 改為固定速率。
+收到 503 / 429 時依 Retry-After 等待後重送同一批，最後輸出吞吐量、被擋次數與延遲分布。
+"""
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import alarms
+
+RETRY_STATUS = {429, 503}
+
+
+class Command(BaseCommand):
+    help = "Replay a recorded alarm file (JSON lines) against the alarm ingestion endpoint for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file")
+        parser.add_argument("--url", default="http://localhost:8000/api/alarms/")
+        parser.add_argument("--token", default=None, help="bearer token (OIDC)")
+        parser.add_argument("--direct", action="store_true", help="enqueue in-process instead of HTTP")
+        parser.add_argument("--sync", action="store_true", help="ingest in-process, bypassing the queue")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--speed", type=float, default=1.0, help="time compression; 0 = as fast as possible")
+        parser.add_argument("--rate", type=float, default=None, help="fixed alarms/s instead of recorded timing")
+        parser.add_argument("--shift", action="store_true", help="shift occurred_at so the first alarm is now")
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--max-retries", type=int, default=10)
+
+    def handle(self, *args, **opts):
+        records = self._load(opts["file"], opts["limit"])
+        if not records:
+            raise CommandError("no alarms in file")
+        if opts["shift"]:
+            offset = timezone.now() - records[0][0]
+            for ts, alarm in records:
+                alarm["occurred_at"] = (ts + offset).isoformat()
+
+        self.send = self._sender(opts)
+        self.stats = {"sent": 0, "accepted": 0, "rejected": 0, "throttled": 0, "failed": 0, "latency": []}
+        started = time.monotonic()
+        for due, batch in self._schedule(records, opts):
+            wait = started + due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._send_with_retry(batch, opts["max_retries"])
+        self._report(time.monotonic() - started)
+
+    def _load(self, path, limit) -> list:
+        opener = gzip.open if path.endswith(".gz") else open
+        records = []
+        with opener(path, "rt", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    alarm = json.loads(line)
+                except ValueError:
+                    raise CommandError(f"line {lineno}: invalid JSON")
+                ts = parse_datetime(str(alarm.get("occurred_at") or ""))
+                if ts is None:
+                    raise CommandError(f"line {lineno}: occurred_at is required for replay")
+                records.append((ts if timezone.is_aware(ts) else timezone.make_aware(ts), alarm))
+                if limit and len(records) >= limit:
+                    break
+        records.sort(key=lambda rec: rec[0])
+        return records
+
+    def _schedule(self, records, opts):
+        """依錄製時間（或固定速率）切批，產生 (相對開始的送出秒數, 告警)。"""
+        size, speed, rate = opts["batch_size"], opts["speed"], opts["rate"]
+        first = records[0][0]
+        batch, batch_start = [], None
+        for i, (ts, alarm) in enumerate(records):
+            if rate:
+                due = i / rate
+            elif speed:
+                due = (ts - first) / timedelta(seconds=1) / speed
+            else:
+                due = 0.0
+            # 錄製時間相差超過一秒的告警不併入同一批，保留原本的突發形狀
+            if batch and (len(batch) >= size or due - batch_start > 1.0):
+                yield batch_due, batch
+                batch = []
+            if not batch:
+                batch_start = due
+            batch.append(alarm)
+            batch_due = due
+        if batch:
+            yield batch_due, batch
+
+    def _sender(self, opts):
+        """回傳 send(batch) -> (status, retry_after, accepted, rejected)。"""
+        if opts["sync"] or opts["direct"]:
+            def send(batch):
+                valid, errors = alarms.validate(batch)
+                if opts["sync"]:
+                    alarms.ingest(valid)
+                    return 202, 0, len(valid), len(errors)
+                try:
+                    alarms.enqueue(valid)
+                except alarms.Backpressure as e:
+                    return 503, e.retry_after, 0, 0
+                return 202, 0, len(valid), len(errors)
+            return send
+
+        import requests
+        session = requests.Session()
+        if opts["token"]:
+            session.headers["Authorization"] = f"Bearer {opts['token']}"
+
+        def send(batch):
+            try:
+                resp = session.post(opts["url"], json={"alarms": batch}, timeout=30)
+            except requests.RequestException as e:
+                self.stderr.write(f"  request failed: {e}")
+                return 0, 1.0, 0, 0
+            if resp.status_code == 202:
+                rejected = len(resp.json().get("rejected", []))
+                return 202, 0, len(batch) - rejected, rejected
+            try:
+                retry_after = float(resp.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            if resp.status_code == 400:
+                return 400, 0, 0, len(batch)
+            return resp.status_code, retry_after, 0, 0
+        return send
+
+    def _send_with_retry(self, batch, max_retries):
+        for attempt in range(max_retries + 1):
+            t0 = time.monotonic()
+            status, retry_after, accepted, rejected = self.send(batch)
+            self.stats["latency"].append(time.monotonic() - t0)
+            if status == 202 or status == 400:
+                self.stats["sent"] += len(batch)
+                self.stats["accepted"] += accepted
+                self.stats["rejected"] += rejected
+                return
+            if status in RETRY_STATUS:
+                self.stats["throttled"] += 1
+            time.sleep(retry_after or 1.0)
+        self.stats["failed"] += len(batch)
+        self.stderr.write(self.style.WARNING(f"  gave up on a batch of {len(batch)} after {max_retries} retries"))
+
+    def _report(self, elapsed):
+        s = self.stats
+        latency = sorted(s["latency"])
+        pct = lambda p: latency[min(len(latency) - 1, int(len(latency) * p))] * 1000 if latency else 0.0
+        self.stdout.write(
+            f"  requests: {len(latency)}  throttled (429/503): {s['throttled']}  "
+            f"latency p50 {pct(0.5):.0f} ms / p95 {pct(0.95):.0f} ms / max {pct(1):.0f} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{s['accepted']} accepted, {s['rejected']} rejected, {s['failed']} failed "
+            f"in {elapsed:.1f}s ({s['accepted'] / max(elapsed, 0.001):.0f} alarms/s)"
+        ))
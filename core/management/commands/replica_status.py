@@ -0,0 +1,28 @@
+"""
+顯示各 read replica 的延遲與是否正在承接讀取。
+
+    DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3 python manage.py replica_status
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db_router import measure_lag
+
+
+class Command(BaseCommand):
+    help = "Show replication lag per read replica and whether reads are routed to it."
+
+    def handle(self, *args, **opts):
+        if not settings.REPLICA_DATABASES:
+            self.stdout.write("no replicas configured (DATABASE_REPLICA_URLS)")
+            return
+        for alias in settings.REPLICA_DATABASES:
+            try:
+                lag = measure_lag(alias)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"{alias}: unavailable ({e})"))
+                continue
+            ok = lag <= settings.REPLICA_MAX_LAG_SECONDS
+            line = f"{alias}: lag {lag:.2f}s (max {settings.REPLICA_MAX_LAG_SECONDS}s) -> " \
+                   f"{'in use' if ok else 'bypassed, reads go to primary'}"
+            self.stdout.write(self.style.SUCCESS(line) if ok else self.style.WARNING(line))
@@ -0,0 +1,62 @@
+"""
+從 manage.py backup 的 snapshot 還原。
+
+    python manage.py restore latest --media-only --media-root /tmp/media_check
+    python manage.py restore 20251020-030000 --db-only --yes
+"""
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import backup
+
+
+class Command(BaseCommand):
+    help = "Restore the database and/or media from a backup snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument("snapshot", help="snapshot name or 'latest'")
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--target-db", help="restore into this database name / SQLite path instead")
+        parser.add_argument("--db-only", action="store_true")
+        parser.add_argument("--media-only", action="store_true")
+        parser.add_argument("--media-root", help=f"default: MEDIA_ROOT ({settings.MEDIA_ROOT})")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--yes", action="store_true", help="do not ask before overwriting")
+
+    def handle(self, *args, **opts):
+        snapshot = opts["snapshot"]
+        if snapshot == "latest":
+            names = backup.list_snapshots()
+            if not names:
+                raise CommandError("no snapshots")
+            snapshot = names[-1]
+        try:
+            manifest = backup.load_manifest(snapshot)
+        except backup.BackupError as e:
+            raise CommandError(str(e))
+
+        overwrites_live = (not opts["media_only"] and not opts["target_db"]) or \
+                          (not opts["db_only"] and not opts["media_root"])
+        if overwrites_live and not opts["yes"]:
+            answer = input(f"Restore {snapshot} over the live database/media? [y/N] ")
+            if answer.lower() != "y":
+                raise CommandError("aborted")
+
+        try:
+            info = manifest.get("database")
+            if not opts["media_only"] and info:
+                if not backup.verify_dump_checksum(snapshot, info):
+                    raise CommandError("database dump checksum mismatch")
+                backup.restore_database(snapshot, info, opts["database"], opts["target_db"],
+                                        jobs=opts["workers"])
+                self.stdout.write(f"database restored from {info['file']}")
+            if not opts["db_only"]:
+                target = Path(opts["media_root"] or settings.MEDIA_ROOT)
+                backup.restore_media(manifest["media"], target, opts["workers"])
+                self.stdout.write(f"{len(manifest['media'])} media files restored to {target}")
+        except backup.BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"snapshot {snapshot} restored"))
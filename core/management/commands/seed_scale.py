@@ -0,0 +1,57 @@
+"""
+產生正式環境量級的合成資料（見 core/synthetic.py）。只在壓測 / 效能分析用的資料庫執行。
+
+    python manage.py seed_scale --issues 1000000 --web-issues 1000000 --assets 20000 --seed 7
+    python manage.py seed_scale --issues 20000 --web-issues 20000 --end 2026-10-01   # 可重現的小資料集
+    python manage.py analytics_refresh --full                                        # 之後重建狀態區間
+"""
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import ScaleSeeder
+from issues.sla import HORIZON_BACK_DAYS
+
+
+class Command(BaseCommand):
+    help = "Bulk-load synthetic projects, assets, issues, events and comments (COPY on PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--seed", type=int, default=1, help="random seed; same seed + --end = same data")
+        parser.add_argument("--end", default=None, help="YYYY-MM-DD, last day of the window (default: today)")
+        parser.add_argument("--days", type=int, default=365, help="length of the created_at window")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--projects", type=int, default=40)
+        parser.add_argument("--assets", type=int, default=4000)
+        parser.add_argument("--issues", type=int, default=100_000, help="core.Issue rows (with events)")
+        parser.add_argument("--web-issues", type=int, default=100_000, help="issues.Issue rows (with comments)")
+        parser.add_argument("--comments", type=float, default=4.0, help="mean comments per issues.Issue")
+        parser.add_argument("--max-thread", type=int, default=300, help="longest comment thread")
+        parser.add_argument("--hot-skew", type=float, default=0.9, help="Zipf exponent of issues per asset")
+        parser.add_argument("--batch-size", type=int, default=5000, help="issues per transaction")
+
+    def handle(self, *args, **opts):
+        if not 1 <= opts["days"] <= HORIZON_BACK_DAYS:
+            raise CommandError(f"--days must be between 1 and {HORIZON_BACK_DAYS} (SLA calendar horizon)")
+        if min(opts["users"], opts["projects"], opts["assets"], opts["batch_size"]) < 1:
+            raise CommandError("--users, --projects, --assets and --batch-size must be positive")
+        end = None
+        if opts["end"]:
+            try:
+                end = datetime.combine(datetime.strptime(opts["end"], "%Y-%m-%d").date(), time.min,
+                                       ZoneInfo(settings.TIME_ZONE))
+            except ValueError:
+                raise CommandError("--end must be YYYY-MM-DD")
+
+        seeder = ScaleSeeder(
+            seed=opts["seed"], end=end, days=opts["days"], users=opts["users"], projects=opts["projects"],
+            assets=opts["assets"], issues=opts["issues"], web_issues=opts["web_issues"], comments=opts["comments"],
+            max_thread=opts["max_thread"], hot_skew=opts["hot_skew"], batch_size=opts["batch_size"],
+            using=opts["database"], log=self.stdout.write)
+        counts = seeder.run()
+        for label, count in counts.items():
+            self.stdout.write(f"  {label:<20} {count:>10}")
+        self.stdout.write(self.style.SUCCESS("run `python manage.py analytics_refresh --full` to rebuild intervals"))
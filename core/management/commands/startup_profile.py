@@ -0,0 +1,87 @@
+"""
+量測 web / worker 行程啟動時各模組的 import 時間（python -X importtime）。
+
+    python manage.py startup_profile                       # web：app.wsgi（含 warm_up）
+    python manage.py startup_profile --target worker       # Celery：app.celery + 任務模組
+    python manage.py startup_profile --set API_ENABLED=true --set OIDC_ENABLED=true --top 40
+
+在獨立的子行程中執行，不受目前行程已 import 的模組影響；--repeat 取最短的一次。
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+TARGETS = {
+    "web": "import app.wsgi",
+    "worker": "from app.celery import app; app.loader.import_default_modules()",
+}
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> list:
+    """回傳 [(module, self_us, cumulative_us, depth)]。"""
+    rows = []
+    for line in stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            rows.append((name, int(self_us), int(cum_us), (len(indent) - 1) // 2))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Report per-module import time for web (app.wsgi) or worker (app.celery) startup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=sorted(TARGETS), default="web")
+        parser.add_argument("--top", type=int, default=25)
+        parser.add_argument("--sort", choices=("self", "cumulative"), default="cumulative")
+        parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                            help="environment override for the profiled process (repeatable)")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _run(self, code, env):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                              cwd=str(settings.BASE_DIR), capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            raise CommandError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+        return elapsed, proc.stderr
+
+    def handle(self, *args, **opts):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "app.settings")}
+        for item in opts["set"]:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"--set expects KEY=VALUE, got {item!r}")
+            env[key] = value
+
+        baseline = min(self._run("pass", env)[0] for _ in range(opts["repeat"]))
+        runs = [self._run(TARGETS[opts["target"]], env) for _ in range(opts["repeat"])]
+        elapsed, stderr = min(runs, key=lambda r: r[0])
+        rows = parse_importtime(stderr)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{opts['target']}: ready in {(elapsed - baseline) * 1000:.0f} ms "
+            f"(interpreter baseline {baseline * 1000:.0f} ms), {len(rows)} modules imported"
+        ))
+
+        key = 1 if opts["sort"] == "self" else 2
+        self.stdout.write(f"\n{'self ms':>9} {'cum ms':>9}  module")
+        for name, self_us, cum_us, depth in sorted(rows, key=lambda r: -r[key])[:opts["top"]]:
+            self.stdout.write(f"{self_us / 1000:>9.1f} {cum_us / 1000:>9.1f}  {name}")
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in rows:
+            packages[name.split(".")[0]] += self_us
+        self.stdout.write(f"\n{'self ms':>9}  top-level package")
+        for name, total in sorted(packages.items(), key=lambda kv: -kv[1])[:opts["top"]]:
+            self.stdout.write(f"{total / 1000:>9.1f}  {name}")
@@ -0,0 +1,49 @@
+"""
+客戶端 webhook 的投遞 worker（core/webhooks.py）：asyncio 並行 POST，連線依主機共用。
+
+    python manage.py webhook_worker                       # 常駐；可啟動多個，佇列以租約分工
+    python manage.py webhook_worker --concurrency 500 --per-host 16
+    python manage.py webhook_worker --drain               # 送完目前到期的投遞後結束
+    python manage.py webhook_worker --status              # 佇列 / dead / 斷路中的端點
+
+SIGTERM：不再取出新的投遞，等進行中的完成後結束。
+"""
+import asyncio
+import json
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import webhooks
+from core.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = "Deliver queued webhook events concurrently with pooled connections, retries and circuit breakers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None, help="deliveries in flight")
+        parser.add_argument("--per-host", type=int, default=None, help="connections per endpoint host")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--drain", action="store_true", help="exit once nothing is due")
+        parser.add_argument("--status", action="store_true", help="print queue and breaker state and exit")
+
+    def handle(self, *args, **opts):
+        if opts["status"]:
+            self.stdout.write(json.dumps(webhooks.status(get_redis()), indent=2, ensure_ascii=False))
+            return
+
+        worker = webhooks.Worker(concurrency=opts["concurrency"], per_host=opts["per_host"],
+                                 batch_size=opts["batch_size"])
+        started = time.monotonic()
+        asyncio.run(self._run(worker, opts["drain"]))
+        stats = ", ".join(f"{k} {v}" for k, v in sorted(worker.stats.items())) or "nothing delivered"
+        self.stdout.write(self.style.SUCCESS(f"{stats} in {time.monotonic() - started:.1f}s"))
+
+    async def _run(self, worker, drain):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        await worker.run(stop, drain=drain)
@@ -0,0 +1,31 @@
+"""
+遷移用的 CONCURRENTLY 索引操作（manage.py index_advisor 產生的遷移使用）。
+
+PostgreSQL 上與 django.contrib.postgres 的同名操作相同，以 CREATE / DROP INDEX CONCURRENTLY
+建立、移除索引，不擋寫入，遷移須設 atomic = False；其他資料庫（開發用 SQLite）退回一般的
+AddIndex / RemoveIndex，同一份遷移兩邊都能執行。
+"""
+from django.contrib.postgres import operations as postgres
+from django.db import migrations
+
+
+class _PostgresOnlyConcurrently:
+    plain = None
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return self.plain.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return self.plain.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class AddIndexConcurrently(_PostgresOnlyConcurrently, postgres.AddIndexConcurrently):
+    plain = migrations.AddIndex
+
+
+class RemoveIndexConcurrently(_PostgresOnlyConcurrently, postgres.RemoveIndexConcurrently):
+    plain = migrations.RemoveIndex
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:16
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# 模糊（icontains）查詢用的 trigram 索引僅在 PostgreSQL 建立；
+# 表達式需與 Django 產生的 UPPER("col"::text) LIKE ... 完全一致才會命中。
+TRGM_INDEXES = [
+    ("core_asset_serial_trgm_idx", "serial_no"),
+    ("core_asset_loc_trgm_idx", "location"),
+]
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in TRGM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON core_asset '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in TRGM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_asset_options_alter_attachment_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(django.db.models.functions.text.Upper('serial_no'), name='core_asset_serial_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(django.db.models.functions.text.Upper('location'), name='core_asset_loc_upper_idx'),
+        ),
+        # CreateExtension 在非 PostgreSQL 時自動略過
+        TrigramExtension(),
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_asset_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issueevent',
+            name='to_value',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('waiting_parts', 'Waiting Parts'), ('on_site', 'On Site'), ('closed', 'Closed')], default='open', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='IssueStatusInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('since_open_seconds', models.FloatField(default=0)),
+                ('assignee', models.CharField(blank=True, max_length=100)),
+                ('last_event_id', models.BigIntegerField()),
+                ('asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.asset')),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_intervals', to='core.issue')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.project')),
+            ],
+            options={
+                'ordering': ['issue', 'started_at'],
+                'indexes': [models.Index(fields=['status', 'project'], name='core_issues_status_44e8e0_idx'), models.Index(fields=['status', 'asset'], name='core_issues_status_4d7862_idx'), models.Index(fields=['status', 'assignee'], name='core_issues_status_d3c353_idx'), models.Index(fields=['status', 'started_at'], name='core_issues_status_254cc9_idx'), models.Index(fields=['last_event_id'], name='core_issues_last_ev_3c8a86_idx'), models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['status'], name='core_interval_current_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_attachment_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issueevent',
+            name='event_key',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='issueevent',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:52
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_issue_event_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='issuestatusinterval',
+            name='issue',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_intervals', to='core.issue'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('core', '專案問題 (core.Issue)'), ('issues', 'FAE 問題 (issues.Issue)')], max_length=10)),
+                ('original_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=20)),
+                ('project_id', models.BigIntegerField(blank=True, null=True)),
+                ('customer', models.CharField(blank=True, max_length=200)),
+                ('closed_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'ordering': ['-closed_at'],
+                'indexes': [models.Index(fields=['source', 'closed_at'], name='core_archiv_source_2117aa_idx'), models.Index(fields=['project_id'], name='core_archiv_project_feef56_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'original_id'), name='core_archivedissue_source_id_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# core_issue 為線上大表，本遷移不可長時間鎖住寫入（合併流程見 core/consolidation.py）：
+# - 新欄位皆可為空或為常數預設值，PostgreSQL 上只改 catalog，不重寫資料表
+# - 外鍵在 PostgreSQL 上先以 NOT VALID 建立再 VALIDATE，驗證期間不擋寫入
+# - 索引與 legacy_id 的唯一性以 CREATE INDEX CONCURRENTLY 建立，因此 atomic = False
+#   （中斷後重跑：IF NOT EXISTS 會略過已存在的索引；INVALID 的索引需先手動 DROP）
+INDEXES = [
+    ("core_issue_assigned_st_idx", "assigned_to_id, status", False),
+    ("core_issue_created_by_idx", "created_by_id", False),
+    ("core_issue_legacy_id_key", "legacy_id", True),
+]
+FOREIGN_KEYS = [
+    ("core_issue_created_by_id_fk", "created_by_id"),
+    ("core_issue_assigned_to_id_fk", "assigned_to_id"),
+]
+
+
+def create_indexes_and_constraints(apps, schema_editor):
+    postgres = schema_editor.connection.vendor == "postgresql"
+    for name, columns, unique in INDEXES:
+        schema_editor.execute(
+            f'CREATE {"UNIQUE " if unique else ""}INDEX {"CONCURRENTLY " if postgres else ""}'
+            f'IF NOT EXISTS {name} ON core_issue ({columns})'
+        )
+    if not postgres:
+        return
+    # 已建好的唯一索引直接轉為約束，不再掃表
+    schema_editor.execute(
+        "ALTER TABLE core_issue ADD CONSTRAINT core_issue_legacy_id_key UNIQUE USING INDEX core_issue_legacy_id_key"
+    )
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    for name, column in FOREIGN_KEYS:
+        schema_editor.execute(
+            f'ALTER TABLE core_issue ADD CONSTRAINT {name} FOREIGN KEY ({column}) '
+            f'REFERENCES "{user_table}" (id) DEFERRABLE INITIALLY DEFERRED NOT VALID'
+        )
+        schema_editor.execute(f"ALTER TABLE core_issue VALIDATE CONSTRAINT {name}")
+
+
+def drop_indexes_and_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for name in ["core_issue_legacy_id_key"] + [name for name, _ in FOREIGN_KEYS]:
+            schema_editor.execute(f"ALTER TABLE core_issue DROP CONSTRAINT IF EXISTS {name}")
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_archived_issues'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='issue',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.project'),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('waiting_parts', 'Waiting Parts'), ('on_site', 'On Site'), ('closed', 'Closed'), ('triaged', 'Triaged'), ('pending', 'Pending'), ('resolved', 'Resolved'), ('reopened', 'Reopened'), ('on_hold', 'On Hold')], default='open', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='customer',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='description',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='sla_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AddField(
+                    model_name='issue',
+                    name='assigned_to',
+                    field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='core_issues_assigned', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AddField(
+                    model_name='issue',
+                    name='created_by',
+                    field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='core_issues_created', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AddField(
+                    model_name='issue',
+                    name='legacy_id',
+                    field=models.BigIntegerField(blank=True, editable=False, null=True),
+                ),
+                migrations.RunPython(create_indexes_and_constraints, drop_indexes_and_constraints),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='issue',
+                    name='assigned_to',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='core_issues_assigned', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AddField(
+                    model_name='issue',
+                    name='created_by',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='core_issues_created', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AddField(
+                    model_name='issue',
+                    name='legacy_id',
+                    field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+                ),
+                migrations.AddIndex(
+                    model_name='issue',
+                    index=models.Index(fields=['assigned_to', 'status'], name='core_issue_assigned_st_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='issue',
+                    index=models.Index(fields=['created_by'], name='core_issue_created_by_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('code', models.CharField(max_length=50)),
+                ('severity', models.CharField(blank=True, max_length=20)),
+                ('message', models.CharField(blank=True, max_length=500)),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('first_seen_at', models.DateTimeField()),
+                ('last_seen_at', models.DateTimeField()),
+                ('last_event_at', models.DateTimeField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.asset')),
+                ('issue', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alarm_fingerprints', to='core.issue')),
+            ],
+            options={
+                'ordering': ['-last_seen_at'],
+                'indexes': [models.Index(fields=['asset', 'code'], name='core_alarmf_asset_i_dbd079_idx'), models.Index(fields=['issue'], name='core_alarmf_issue_i_567827_idx')],
+            },
+        ),
+    ]
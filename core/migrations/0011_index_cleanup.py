@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+import core.migration_operations
+
+
+class Migration(migrations.Migration):
+
+    # IssueEvent 的 Meta 先前縮排在類別外，ordering 與索引從未生效；另移除 index_advisor 找到的重複索引
+    # （與外鍵索引相同，或為複合索引的前綴）。皆為大表，以 CONCURRENTLY 執行（見 core/migration_operations.py）
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_alarm_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='issueevent',
+            options={'ordering': ['-created_at']},
+        ),
+        core.migration_operations.AddIndexConcurrently(
+            model_name='issueevent',
+            index=models.Index(fields=['issue', 'created_at'], name='core_event_issue_created_idx'),
+        ),
+        core.migration_operations.RemoveIndexConcurrently(
+            model_name='asset',
+            name='core_asset_project_8ecf57_idx',
+        ),
+        core.migration_operations.RemoveIndexConcurrently(
+            model_name='attachment',
+            name='core_attach_issue_i_aad220_idx',
+        ),
+        core.migration_operations.RemoveIndexConcurrently(
+            model_name='alarmfingerprint',
+            name='core_alarmf_issue_i_567827_idx',
+        ),
+    ]
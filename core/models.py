@@ -1,7 +1,16 @@
 # ⚠️ 以下僅為 Meta.ordering 與 indexes 片段，請合併到你現有的模型類別中。
 # 請不要移除你既有的欄位定義。
 
+import hashlib
+import mimetypes
+import os
+import secrets
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 class Project(models.Model):
     name = models.CharField(max_length=255)
@@ -26,14 +35,24 @@ class Asset(models.Model):
         ordering = ['name']
         indexes = [
             models.Index(fields=['name']),
-            models.Index(fields=['project']),
+            # 序號 / 位置前綴查詢（core.lookup 以 UPPER 範圍條件命中）
+            models.Index(Upper('serial_no'), name='core_asset_serial_upper_idx'),
+            models.Index(Upper('location'), name='core_asset_loc_upper_idx'),
         ]
 
 class Issue(models.Model):
     STATUS_CHOICES = [
         ('open', 'Open'),
         ('in_progress', 'In Progress'),
+        ('waiting_parts', 'Waiting Parts'),
+        ('on_site', 'On Site'),
         ('closed', 'Closed'),
+        # 以下對應 issues.Issue 的狀態（見 core/consolidation.py 的 STATUS_MAP）
+        ('triaged', 'Triaged'),
+        ('pending', 'Pending'),
+        ('resolved', 'Resolved'),
+        ('reopened', 'Reopened'),
+        ('on_hold', 'On Hold'),
     ]
 
     title = models.CharField(max_length=255)
@@ -42,8 +61,35 @@ class Issue(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True)
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, null=True, blank=True)
+    # 併入 issues.Issue 的欄位（見 core/consolidation.py）；legacy_id 為來源 issues.Issue 的 id
+    description = models.TextField(blank=True, default='')
+    customer = models.CharField(max_length=200, blank=True, default='')
+    sla_due_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='core_issues_created',
+                                   on_delete=models.PROTECT, null=True, blank=True, db_index=False)
+    assigned_to = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='core_issues_assigned',
+                                    on_delete=models.SET_NULL, null=True, blank=True, db_index=False)
+    legacy_id = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 記下載入時的狀態：post_save 時判斷狀態是否真的變更（core/signals.py 的 webhook 事件）
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
+    def status_changed_on_save(self, update_fields=None) -> bool:
+        """post_save 中呼叫：這次 save 是否改了狀態。未從資料庫載入（無從比較）時視為已變更。"""
+        if update_fields is not None and 'status' not in update_fields:
+            return False
+        loaded = getattr(self, '_loaded_status', None)
+        return loaded is None or loaded != self.status
 
     class Meta:
         ordering = ['-updated_at']
@@ -52,28 +98,198 @@ class Issue(models.Model):
             models.Index(fields=['updated_at']),
             models.Index(fields=['project', 'status']),
             models.Index(fields=['asset', 'status']),
+            models.Index(fields=['assigned_to', 'status'], name='core_issue_assigned_st_idx'),
+            models.Index(fields=['created_by'], name='core_issue_created_by_idx'),
         ]
 
+def attachment_upload_to(instance, filename):
+    # 以內容雜湊為目錄：相同檔案只存一份，縮圖 / 預覽放在同一目錄（見 core/thumbnails.py）
+    ext = os.path.splitext(filename)[1].lower()[:10]
+    return f"attachments/{instance.sha256[:2]}/{instance.sha256}/original{ext}"
+
 class Attachment(models.Model):
+    class Derivatives(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        READY = 'ready', 'Ready'
+        UNSUPPORTED = 'unsupported', 'Unsupported'
+        FAILED = 'failed', 'Failed'
+
     issue = models.ForeignKey('Issue', on_delete=models.CASCADE)
+    file = models.FileField(upload_to=attachment_upload_to, max_length=255, blank=True)
+    original_name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    # {label: storage name}，例如 {"thumb.webp": "attachments/ab/<sha256>/thumb.webp"}
+    derivatives = models.JSONField(default=dict, blank=True)
+    derivatives_status = models.CharField(max_length=20, choices=Derivatives.choices, default=Derivatives.PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        """
+        新上傳的檔案先算 sha256 決定存放路徑；storage 已有相同內容時直接沿用，不再寫一份。
+        """
+        if self.file and not self.file._committed and not self.sha256:
+            upload = self.file.file
+            digest = hashlib.sha256()
+            for chunk in self.file.chunks():
+                digest.update(chunk)
+            self.sha256 = digest.hexdigest()
+            self.size = self.file.size
+            self.original_name = self.original_name or os.path.basename(self.file.name)
+            self.content_type = (self.content_type or getattr(upload, 'content_type', None)
+                                 or mimetypes.guess_type(self.original_name)[0] or 'application/octet-stream')
+            name = attachment_upload_to(self, self.original_name)
+            if self.file.storage.exists(name):
+                self.file.name = name
+                self.file._committed = True
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['issue']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['issue', 'created_at'], name='core_attach_issue_created_idx'),  # 時間軸
         ]
 
 class IssueEvent(models.Model):
     issue = models.ForeignKey('Issue', on_delete=models.CASCADE)
     event_type = models.CharField(max_length=50)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # 狀態事件記錄變更後的狀態；其他事件留空（core.analytics 只取有 to_value 的事件）
+    to_value = models.CharField(max_length=100, blank=True)
+    # 冪等鍵：stream 消費者重送時以此去重（見 core/event_stream.py）；舊資料為 NULL
+    event_key = models.CharField(max_length=32, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)  # 事件發生時間（request 當下），非寫入時間
 
-class Meta:
+    class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['issue']),
-            models.Index(fields=['created_at']),
-            models.Index(fields=['event_type']),
+            # 時間軸 / lookup 依問題取事件、以時間遞減分頁；issue 外鍵本身已有單欄索引，
+            # created_at / event_type 單欄索引沒有查詢會用到（見 manage.py index_advisor）
+            models.Index(fields=['issue', 'created_at'], name='core_event_issue_created_idx'),
+        ]
+
+
+class IssueStatusInterval(models.Model):
+    """
+    由 IssueEvent 推導出的狀態區間（分析用事實表，見 core/analytics.py）。
+    ended_at 為 NULL 表示目前仍在此狀態；project / asset / assignee 為重算當下的值。
+    """
+    # 不建外鍵約束：問題封存（core.archive）後區間仍保留，歷史 MTTR / 停留時間不受影響
+    issue = models.ForeignKey(Issue, related_name='status_intervals', on_delete=models.DO_NOTHING,
+                              db_constraint=False)
+    status = models.CharField(max_length=20)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    since_open_seconds = models.FloatField(default=0)  # started_at - issue.created_at
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True)
+    assignee = models.CharField(max_length=100, blank=True)
+    last_event_id = models.BigIntegerField()
+
+    class Meta:
+        ordering = ['issue', 'started_at']
+        indexes = [
+            models.Index(fields=['status', 'project']),
+            models.Index(fields=['status', 'asset']),
+            models.Index(fields=['status', 'assignee']),
+            models.Index(fields=['status', 'started_at']),
+            models.Index(fields=['last_event_id']),
+            models.Index(fields=['status'], condition=models.Q(ended_at__isnull=True), name='core_interval_current_idx'),
         ]
+
+
+class ArchivedIssue(models.Model):
+    """
+    已封存（冷資料）的問題：結案超過 ARCHIVE["AFTER_DAYS"] 天後由 core.archive 從主表移出。
+    data 為問題本身與其留言 / 附件 / 事件的完整快照，可原 id 還原；
+    title / status / project_id / customer 另存一份供搜尋。
+    """
+    class Source(models.TextChoices):
+        CORE = 'core', '專案問題 (core.Issue)'
+        ISSUES = 'issues', 'FAE 問題 (issues.Issue)'
+
+    source = models.CharField(max_length=10, choices=Source.choices)
+    original_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    status = models.CharField(max_length=20)
+    project_id = models.BigIntegerField(null=True, blank=True)
+    customer = models.CharField(max_length=200, blank=True)
+    closed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ['-closed_at']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'original_id'], name='core_archivedissue_source_id_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'closed_at']),
+            models.Index(fields=['project_id']),
+        ]
+
+    def __str__(self):
+        return f'[{self.source}] #{self.original_id} {self.title}'
+
+
+class AlarmFingerprint(models.Model):
+    """
+    設備告警的去重狀態（core/alarms.py）：每個 (設備, 告警碼) 一列，fingerprint 為兩者的雜湊。
+    issue 為目前承接此告警的問題；同一指紋在 last_event_at 之後 ALARMS["DEDUP_WINDOW"] 秒內
+    再次出現只累加 occurrences，超過時在同一問題追加一筆 alarm 事件，問題結案後才另開新問題。
+    """
+    fingerprint = models.CharField(max_length=40, unique=True)
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
+    code = models.CharField(max_length=50)
+    issue = models.ForeignKey(Issue, related_name='alarm_fingerprints', on_delete=models.SET_NULL,
+                              null=True, blank=True)
+    severity = models.CharField(max_length=20, blank=True)
+    message = models.CharField(max_length=500, blank=True)  # 最近一次的告警內容
+    occurrences = models.PositiveIntegerField(default=0)    # 目前這個問題累計的告警數
+    first_seen_at = models.DateTimeField()
+    last_seen_at = models.DateTimeField()
+    last_event_at = models.DateTimeField()                  # 最近一次開單或追加事件的告警時間
+
+    class Meta:
+        ordering = ['-last_seen_at']
+        indexes = [
+            models.Index(fields=['asset', 'code']),
+        ]
+
+    def __str__(self):
+        return f'{self.asset_id}:{self.code} ×{self.occurrences}'
+
+
+def webhook_secret():
+    return secrets.token_urlsafe(32)
+
+
+class WebhookSubscription(models.Model):
+    """
+    專案的 webhook 訂閱：問題事件以 HMAC 簽章的 POST 推送到客戶自己的系統（core/webhooks.py）。
+    events 為空表示訂閱全部事件；端點回 410 Gone 時自動停用。
+    """
+    EVENTS = [
+        ('created', '問題建立'),
+        ('status_changed', '狀態變更'),
+    ]
+
+    project = models.ForeignKey(Project, related_name='webhooks', on_delete=models.CASCADE)
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=100, default=webhook_secret)
+    events = models.JSONField(default=list, blank=True)
+    description = models.CharField(max_length=200, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['project', 'id']
+
+    def __str__(self):
+        return f'{self.project_id}: {self.url}'
+
+    def wants(self, event: str) -> bool:
+        return not self.events or event in self.events
@@ -0,0 +1,147 @@
+"""
+查詢數預算與執行計畫快照（測試用，見 issues/tests.py）。
+
+- assertQueryBudget：資料量由小到大各執行一次同一個請求，查詢數不得超過預算，
+  也不得隨資料列數成長（N+1）。計數不含 SAVEPOINT 等交易控制語句。
+- 記下最後一次執行的每個不同 SQL 並取得執行計畫：PostgreSQL 以 EXPLAIN (COSTS OFF)，
+  並先關閉 enable_seqscan，仍出現 Seq Scan 即代表沒有索引可用；SQLite 以 EXPLAIN QUERY PLAN。
+  大表（LARGE_TABLES）上的全表掃描標示為 "!! full scan"。
+- 計畫快照存於 core/query_plans/<vendor>/<預算名稱>.txt，與程式一起提交，review 時看 diff。
+  QUERY_PLANS=update 時重寫快照；否則與快照比對，不一致即失敗（尚無快照時略過比對）。
+"""
+import difflib
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import connections
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent / "query_plans"
+LARGE_TABLES = {
+    "core_issue", "core_issueevent", "core_attachment", "core_issuestatusinterval", "core_alarmfingerprint",
+    "core_archivedissue", "issues_issue", "issues_comment",
+}
+CONTROL_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+
+
+class QueryRecorder:
+    """connection.execute_wrapper：記下原始 SQL（含 %s 佔位符）與參數。"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(CONTROL_STATEMENTS):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def record_queries(using="default"):
+    recorder = QueryRecorder()
+    with connections[using].execute_wrapper(recorder):
+        yield recorder
+
+
+def normalize_sql(sql: str) -> str:
+    # IN (...) 的參數個數隨資料量變動，快照中合併為一種寫法
+    return IN_LIST.sub("IN (...)", " ".join(sql.split()))
+
+
+def _explain_postgresql(cursor, sql, params) -> list:
+    cursor.execute("SET enable_seqscan = off")
+    try:
+        cursor.execute(f"EXPLAIN (COSTS OFF) {sql}", params)
+        lines = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.execute("RESET enable_seqscan")
+    return [f"{line}  !! full scan" if (m := PG_SEQ_SCAN.search(line)) and m.group(1) in LARGE_TABLES else line
+            for line in lines]
+
+
+def _explain_sqlite(cursor, sql, params) -> list:
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    depth, lines = {0: -1}, []
+    for node_id, parent, _, detail in cursor.fetchall():
+        depth[node_id] = depth.get(parent, -1) + 1
+        m = SQLITE_SCAN.match(detail)
+        flagged = m and m.group(1) in LARGE_TABLES and "USING" not in m.group(2)
+        lines.append("  " * depth[node_id] + detail + ("  !! full scan" if flagged else ""))
+    return lines
+
+
+def explain(sql, params, using="default") -> list:
+    """回傳計畫文字（每行一筆）；非 SELECT 或不支援的資料庫回傳空清單。"""
+    connection = connections[using]
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return []
+    explain_vendor = {"postgresql": _explain_postgresql, "sqlite": _explain_sqlite}.get(connection.vendor)
+    if explain_vendor is None:
+        return []
+    with connection.cursor() as cursor:
+        return explain_vendor(cursor, sql, params)
+
+
+def plan_snapshot(name, queries, counts, using="default") -> str:
+    lines = [f"# {name}: " + ", ".join(f"N={n} → {c} queries" for n, c in counts.items()), ""]
+    seen = set()
+    for sql, params in queries:
+        normalized = normalize_sql(sql)
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        lines.append(normalized)
+        lines.extend(f"    {line}" for line in explain(sql, params, using))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def snapshot_path(name, using="default") -> Path:
+    return SNAPSHOT_DIR / connections[using].vendor / f"{name}.txt"
+
+
+def check_snapshot(name, text, using="default"):
+    """回傳與既有快照的 diff（相同或已更新時回傳空字串）。"""
+    path = snapshot_path(name, using)
+    if os.environ.get("QUERY_PLANS") == "update":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        return ""
+    if not path.exists():
+        return ""
+    expected = path.read_text(encoding="utf-8")
+    if expected == text:
+        return ""
+    return "".join(difflib.unified_diff(expected.splitlines(True), text.splitlines(True),
+                                        fromfile=str(path), tofile=f"{name} (this run)"))
+
+
+class QueryBudgetMixin:
+    """
+    TestCase 用。budget_sizes 為各輪的資料量；grow(n) 把資料補到 n 筆，run() 執行受測的請求。
+    每一輪先執行一次暖機（session、ContentType 等快取）再計數。
+    """
+    budget_sizes = (2, 8)
+
+    def assertQueryBudget(self, name, run, grow, max_queries, sizes=None):
+        counts, recorder = {}, None
+        for n in sizes or self.budget_sizes:
+            grow(n)
+            run()
+            with record_queries() as recorder:
+                run()
+            counts[n] = len(recorder.queries)
+
+        listing = "\n".join(f"  {normalize_sql(sql)}" for sql, _ in recorder.queries)
+        values = list(counts.values())
+        if values[-1] > values[0]:
+            self.fail(f"{name}: query count grows with rows {counts}\n{listing}")
+        if max(values) > max_queries:
+            self.fail(f"{name}: {max(values)} queries exceed the budget of {max_queries}\n{listing}")
+        diff = check_snapshot(name, plan_snapshot(name, recorder.queries, counts))
+        if diff:
+            self.fail(f"{name}: query plan changed (rerun with QUERY_PLANS=update and commit the snapshot)\n{diff}")
@@ -0,0 +1,86 @@
+"""
+Redis token bucket，由多個 web / worker 行程共用。
+
+整個「補充 → 扣除 → 回寫」在一段 Lua script 內完成（原子操作），
+時間取自 Redis 伺服器（TIME），避免各主機時鐘不一致。
+"""
+from .redis_client import get_redis
+
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4]) or 0
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local blocked_until = tonumber(state[3]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+-- reserve：扣除後至少須保留的 token（保留給優先的流量，見 core.throttling）
+local wait = 0
+if tokens - cost >= reserve then
+    tokens = tokens - cost
+else
+    wait = (cost + reserve - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+local ttl = math.ceil(capacity / rate) + 1
+redis.call('EXPIRE', KEYS[1], ttl)
+return tostring(wait)
+"""
+
+BLOCK_LUA = """
+local t = redis.call('TIME')
+local until_ts = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+local current = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+if until_ts > current then
+    -- 暫停期間不累積 token：解除後依 rate 重新補充，而不是立刻再送出一整個 burst
+    redis.call('HSET', KEYS[1], 'blocked_until', until_ts, 'tokens', 0, 'ts', until_ts)
+    local ttl = redis.call('TTL', KEYS[1])
+    if ttl < tonumber(ARGV[1]) + 1 then
+        redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])) + 1)
+    end
+end
+return 1
+"""
+
+
+class TokenBucket:
+    """
+    rate：每秒補充的 token 數；capacity：桶容量（可承受的瞬間量）。
+
+    acquire() 回傳需等待的秒數，0 代表已取得 token；
+    未取得時不扣 token，呼叫端自行決定要等待、重排或拒絕。
+    reserve > 0 時，只有扣除後仍剩 reserve 個 token 才算取得（低優先的流量用）。
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float, redis=None):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.redis = redis or get_redis()
+        self._acquire = self.redis.register_script(TOKEN_BUCKET_LUA)
+        self._block = self.redis.register_script(BLOCK_LUA)
+
+    def acquire(self, cost: float = 1, reserve: float = 0) -> float:
+        if cost + reserve > self.capacity:
+            raise ValueError("cost exceeds bucket capacity")
+        return float(self._acquire(keys=[self.key], args=[self.rate, self.capacity, cost, reserve]))
+
+    def block_for(self, seconds: float) -> None:
+        """
+        讓所有共用此桶的行程暫停 seconds 秒（例如收到 429 Retry-After）。
+        """
+        if seconds > 0:
+            self._block(keys=[self.key], args=[seconds])
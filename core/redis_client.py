@@ -0,0 +1,15 @@
+"""
+共用 Redis 連線（與 Celery broker 同一個 REDIS_URL）。
+
+每個行程只建立一個連線池；gunicorn / celery fork 後由 redis-py 依 pid 自動重建連線。
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    import redis  # 延遲 import：未啟用相關功能時不需要 redis 套件
+
+    return redis.Redis.from_url(settings.REDIS_URL, socket_timeout=5, health_check_interval=30)
@@ -0,0 +1,84 @@
+"""
+REST API 的 JSON 編解碼。
+
+- ORJSONRenderer / ORJSONParser：以 orjson 取代標準 json（C 實作，datetime / UUID 原生支援）。
+  未安裝 orjson 時退回 DRF 內建的 JSONRenderer / JSONParser 行為。
+- StreamingJSONRenderer（?format=stream）：匯出用的大型清單，
+  LeanListMixin 會回傳 StreamingHttpResponse，逐批編碼寫出，不把整個陣列放進記憶體。
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用；沒有時用標準 json
+    orjson = None
+
+STREAM_CHUNK_ROWS = 500
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # orjson 不認得的型別（Decimal、lazy 翻譯字串、QuerySet…）交給 DRF 的 encoder 處理
+    return _fallback_encoder.default(obj)
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return _fallback_encoder.encode(data).encode()
+
+
+def iter_json_array(rows, chunk_rows: int = STREAM_CHUNK_ROWS):
+    """
+    將 rows（可為 generator）編碼為 JSON 陣列的 bytes 片段，每 chunk_rows 筆產出一次。
+    """
+    yield b"["
+    buf, first = [], True
+    for row in rows:
+        buf.append(dumps(row))
+        if len(buf) >= chunk_rows:
+            yield (b"" if first else b",") + b",".join(buf)
+            buf, first = [], False
+    if buf:
+        yield (b"" if first else b",") + b",".join(buf)
+    yield b"]"
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read() if stream is not None else b"")
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class StreamingJSONRenderer(BaseRenderer):
+    """
+    只用於選擇格式（?format=stream）；實際串流由 LeanListMixin 回傳 StreamingHttpResponse。
+    錯誤回應等一般資料仍可正常 render。
+    """
+    media_type = "application/json"
+    format = "stream"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, (list, tuple)):
+            return b"".join(iter_json_array(data))
+        return dumps(data)
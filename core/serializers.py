@@ -1,27 +1,24 @@
 from rest_framework import serializers
-from .models import Issue, Attachment
+from .models import Asset, Issue, Attachment
+
+class AssetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Asset
+        fields = ["id","name","serial_no","location","project","updated_at"]
 
 class AttachmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attachment
-        fields = ["id","file","uploaded_by","uploaded_at"]
-        read_only_fields = ["uploaded_by","uploaded_at"]
+        # file 僅供上傳；下載與縮圖走 /attachments/<sha256>/<label>（derivatives 的 key，或 original）
+        fields = ["id","issue","file","original_name","content_type","size","sha256",
+                  "derivatives","derivatives_status","created_at"]
+        read_only_fields = ["content_type","size","sha256","derivatives","derivatives_status","created_at"]
+        extra_kwargs = {"file": {"write_only": True, "required": True}}
 
+# 清單端點走 core.lean 的 values() 路徑，欄位需與 Meta.fields 一致（皆為 model 欄位）
 class IssueSerializer(serializers.ModelSerializer):
-    attachments = AttachmentSerializer(many=True, read_only=True)
-    reporter_name = serializers.SerializerMethodField()
-    assignee_name = serializers.SerializerMethodField()
-
     class Meta:
         model = Issue
-        fields = ["id","project","asset","title","description","priority","status",
-                  "reporter","assignee","reporter_name","assignee_name","sla_due_at",
-                  "attachments","created_at","updated_at"]
-        read_only_fields = ["reporter","created_at","updated_at"]
-
-    def get_reporter_name(self, obj): return obj.reporter.get_full_name() or obj.reporter.username
-    def get_assignee_name(self, obj): return obj.assignee.get_full_name() if obj.assignee else None
-
-    def create(self, validated_data):
-        validated_data["reporter"] = self.context["request"].user
-        return super().create(validated_data)
+        fields = ["id","project","asset","title","priority","status","assignee",
+                  "created_at","updated_at"]
+        read_only_fields = ["created_at","updated_at"]
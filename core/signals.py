@@ -1,15 +1,28 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Issue, IssueEvent
-from .tasks import send_issue_update_to_teams
+from . import event_stream, timeline, webhooks
+from .models import Attachment, Issue
 
 @receiver(post_save, sender=Issue, dispatch_uid="core_issue_post_save_v1")
 def on_issue_save(sender, instance: Issue, created, **kwargs):
     action = 'created' if created else 'status_changed'
-    IssueEvent.objects.create(
-        issue=instance,
-        actor=(instance.reporter if created else (instance.assignee or instance.reporter)),
-        action=action,
-        to_value=instance.status
-    )
-    send_issue_update_to_teams.delay(instance.id, action)
+    # 事件經 Redis stream 批次寫入（core.event_stream）；event_key 同時作為通知的冪等鍵
+    event_key = event_stream.append(instance, action, to_value=instance.status)
+    from .tasks import notify_issue_event  # 延遲 import：web 行程啟動時不載入 celery
+    # commit 後才排入：worker 讀得到資料，rollback 的變更也不會發出通知
+    # webhook 排在前面且 robust：任一邊失敗都不影響另一邊
+    # 客戶可依事件篩選：標題、SLA 等其他欄位的修改不對外發出 status_changed
+    if created or instance.status_changed_on_save(kwargs.get('update_fields')):
+        transaction.on_commit(lambda: webhooks.publish([(instance, action, event_key)]), robust=True)
+    transaction.on_commit(lambda: notify_issue_event(instance, action, event_key))
+
+@receiver(post_save, sender=Attachment, dispatch_uid="core_attachment_derivatives_v1")
+def on_attachment_save(sender, instance: Attachment, created, **kwargs):
+    if created and instance.file:
+        from .tasks import schedule_attachment_derivatives
+        transaction.on_commit(lambda: schedule_attachment_derivatives(instance))
+
+@receiver([post_save, post_delete], sender=Attachment, dispatch_uid="core_attachment_timeline_v1")
+def on_attachment_change(sender, instance: Attachment, **kwargs):
+    timeline.bump_on_commit("core", instance.issue_id)
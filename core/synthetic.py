@@ -0,0 +1,379 @@
+"""
+正式環境量級的合成資料（manage.py seed_scale）：專案、資產、問題、事件與留言，百萬列等級。
+
+- 批次產生：每批先整欄抽樣（random.choices 一次抽 k 筆），SLA 到期 / 處理時間以
+  issues.sla 的 add_business_seconds_batch 整批計算（有 numpy 時為 searchsorted），再組成資料列；不經 ORM save()。
+- 寫入：PostgreSQL 以 COPY FROM STDIN，其他資料庫（SQLite）以 executemany；每批的父表與子表在同一個交易。
+- 主鍵預先配置（目前最大 id 之後的連續區段），子表直接引用已寫入的父列，外鍵皆成立；
+  完成後重設序列並 ANALYZE。請在沒有其他寫入的資料庫執行（壓測 / 效能分析用的資料庫）。
+- 同一組參數（seed、end 與各數量）在相同的起始資料上產生完全相同的資料。
+
+分布
+- 資產：Zipf（hot_skew）— 少數熱門機台佔大部分問題；各專案的資產數、各客戶的專案數也是長尾。
+- 建立時間：平日、工作時段為主，量隨時間成長。
+- SLA：到期時間依 SLA 目標（issues.sla.get_target）；處理時間為目標 × 對數常態係數，
+  各客戶的中位數不同（部分客戶長期逾期）。處理時間在 end 之前者已結案，其餘依權重分佈於各處理中狀態。
+- 留言串：Pareto 長尾，多數問題只有幾則，少數上百則（max_thread 為上限）。
+- 事件：core.Issue 依最終狀態補上狀態轉換（created → ... → 目前狀態），格式與 core.signals 寫入的相同。
+
+不觸發 signals：不會產生事件串流、通知與狀態區間；之後請執行 analytics_refresh --full。
+CONSOLIDATION_DUAL_WRITE 開啟時，收尾階段以 consolidation.copy_ids 分批建立 issues.Issue 的 core 鏡像列
+（與雙寫的結果相同，consolidate_issues verify 不會回報不一致）；未開啟時不建立，之後由 backfill 補上。
+"""
+import itertools
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from time import monotonic
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+PREFIX = "scale-"
+CUSTOMERS = ["ACME", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka", "Tyrell", "Cyberdyne",
+             "Soylent", "Vandelay", "Gringotts", "Oscorp", "Aperture", "Massive Dynamic"]
+SYMPTOMS = ["溫度異常", "壓力不足", "真空洩漏", "馬達過載", "感測器失效", "通訊中斷", "手臂定位偏移",
+            "冷卻水流量低", "電源跳脫", "軟體當機", "異音", "良率下降"]
+NOTES = ["現場確認", "已更換零件", "等待備品", "遠端排查", "重新校正", "客戶回報仍異常", "暫時排除", "持續觀察",
+         "已安排工程師", "原廠支援中"]
+PRIORITY_WEIGHTS = [5, 20, 50, 25]  # P0..P3
+HOUR_WEIGHTS = [1] * 7 + [4, 10, 12, 12, 10, 5, 10, 12, 12, 10, 8, 4] + [2] * 5  # 當地時間 0..23 時
+WEEKEND_WEIGHT = 0.25
+SLA_SIGMA = 0.9        # 處理時間 / SLA 目標的對數常態分布寬度
+MAX_SLA_FACTOR = 20.0
+STALLED_SHARE = 0.04   # 卡住的問題（等客戶、等原廠）：到 end 都未處理完，構成長期未結的 backlog
+THREAD_ALPHA = 1.3     # 留言數的 Pareto 指數：越小尾巴越長
+CLOSE_AFTER = timedelta(days=7)  # issues.Issue 解決超過此時間即 CLOSED
+CORE_OPEN_WEIGHTS = {"open": 20, "in_progress": 40, "waiting_parts": 25, "on_site": 15}
+CORE_OPEN_PATHS = {"open": [], "in_progress": ["in_progress"], "waiting_parts": ["in_progress", "waiting_parts"],
+                   "on_site": ["in_progress", "on_site"]}
+WEB_OPEN_WEIGHTS = {"NEW": 20, "TRIAGED": 15, "IN_PROGRESS": 35, "PENDING": 15, "ON_HOLD": 5, "REOPENED": 10}
+
+CORE_ISSUE_COLUMNS = ("id", "title", "priority", "assignee", "status", "created_at", "updated_at", "project_id",
+                      "asset_id", "description", "customer", "sla_due_at", "created_by_id", "assigned_to_id",
+                      "legacy_id")
+EVENT_COLUMNS = ("id", "issue_id", "event_type", "to_value", "event_key", "created_at")
+WEB_ISSUE_COLUMNS = ("id", "title", "description", "priority", "status", "created_by_id", "assigned_to_id",
+                     "customer", "sla_due_at", "created_at", "updated_at", "version")
+COMMENT_COLUMNS = ("id", "issue_id", "author_id", "text", "created_at")
+
+
+def zipf_cum(n: int, s: float) -> list:
+    """rank 1..n 的 Zipf 累計權重（給 random.choices 的 cum_weights）。"""
+    return list(itertools.accumulate(1.0 / rank ** s for rank in range(1, n + 1)))
+
+
+def _dt(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+
+
+class Loader:
+    """批次寫入：PostgreSQL 以 COPY，其他資料庫以 executemany。"""
+
+    def __init__(self, using="default"):
+        self.connection = connections[using]
+        self.counts = defaultdict(int)
+
+    def write(self, model, columns, rows):
+        if not rows:
+            return
+        qn = self.connection.ops.quote_name
+        table, names = qn(model._meta.db_table), ", ".join(qn(c) for c in columns)
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == "postgresql":
+                with cursor.copy(f"COPY {table} ({names}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                adapt = self.connection.ops.adapt_datetimefield_value
+                cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({', '.join(['%s'] * len(columns))})",
+                                   [tuple(adapt(v) if isinstance(v, datetime) else v for v in row) for row in rows])
+        self.counts[model._meta.label] += len(rows)
+
+
+class ScaleSeeder:
+    def __init__(self, *, seed=1, end=None, days=365, users=200, projects=40, assets=4000, issues=100_000,
+                 web_issues=100_000, comments=4.0, max_thread=300, hot_skew=0.9, batch_size=5000,
+                 using="default", log=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.using = using
+        self.log = log or logging.getLogger(__name__).info
+        self.batch_size = batch_size
+        self.n_users, self.n_projects, self.n_assets = users, projects, assets
+        self.n_issues, self.n_web_issues = issues, web_issues
+        self.comments, self.max_thread, self.hot_skew = comments, max_thread, hot_skew
+        self.loader = Loader(using)
+
+        tz = ZoneInfo(settings.TIME_ZONE)
+        end = end or datetime.combine(datetime.now(tz).date(), time.min, tz)
+        self.end_ts = end.timestamp()
+        first_day = (end - timedelta(days=days)).astimezone(tz).date()
+        self.day_starts = [datetime.combine(first_day + timedelta(days=d), time.min, tz).timestamp()
+                           for d in range(days)]
+        # 平日為主、量隨時間成長（最後一天約為第一天的 3 倍）
+        self.day_cum = list(itertools.accumulate(
+            (1.0 if (first_day + timedelta(days=d)).weekday() < 5 else WEEKEND_WEIGHT) * (0.5 + d / days)
+            for d in range(days)))
+        self.hour_cum = list(itertools.accumulate(HOUR_WEIGHTS))
+        self._targets = {}
+        self.web_ids = range(0)
+        self.mirrored = 0
+
+    # --- 主流程 ---------------------------------------------------------------
+
+    def run(self) -> dict:
+        started = monotonic()
+        self._users()
+        self._projects_and_assets()
+        self._core_issues()
+        self._web_issues()
+        self._finish()
+        self.log(f"done in {monotonic() - started:.0f}s")
+        counts = dict(self.loader.counts)
+        if self.mirrored:
+            counts["core.Issue mirrors"] = self.mirrored
+        return counts
+
+    def _next_id(self, model) -> int:
+        return (model._default_manager.using(self.using).aggregate(m=Max("pk"))["m"] or 0) + 1
+
+    def _batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def _progress(self, label, done, total, started):
+        rate = done / max(monotonic() - started, 1e-6)
+        self.log(f"{label}: {done}/{total} ({rate:.0f}/s)")
+
+    # --- 使用者、專案、資產 ---------------------------------------------------
+
+    def _users(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.hashers import make_password
+
+        User = get_user_model()
+        password = make_password(None)
+        User.objects.using(self.using).bulk_create(
+            [User(username=f"{PREFIX}{i}", password=password) for i in range(self.n_users)],
+            ignore_conflicts=True)
+        users = list(User.objects.using(self.using).filter(username__startswith=PREFIX)
+                     .order_by("pk").values_list("pk", "username")[:self.n_users])
+        self.rng.shuffle(users)
+        # 少數資深工程師承接大部分案件
+        self.users, self.user_cum = users, zipf_cum(len(users), 0.6)
+
+    def _projects_and_assets(self):
+        from .models import Asset, Project
+
+        now = _dt(self.end_ts)
+        customers = self.rng.choices(CUSTOMERS, cum_weights=zipf_cum(len(CUSTOMERS), 1.0), k=self.n_projects)
+        first = self._next_id(Project)
+        projects = [(first + i, f"Scale project {self.seed}-{i}", customers[i], now) for i in range(self.n_projects)]
+        project_ids = [p[0] for p in projects]
+        self.project_customer = {p[0]: p[2] for p in projects}
+
+        owners = self.rng.choices(project_ids, cum_weights=zipf_cum(len(project_ids), 0.8), k=self.n_assets)
+        first = self._next_id(Asset)
+        assets = [(first + i, f"EQ-{self.seed}-{i:06d}", f"SN{self.seed:03d}{i:07d}",
+                   f"F{self.rng.randint(1, 12)}-B{self.rng.randint(1, 40):02d}", owners[i], now)
+                  for i in range(self.n_assets)]
+        with transaction.atomic(using=self.using):
+            self.loader.write(Project, ("id", "name", "customer", "updated_at"), projects)
+            self.loader.write(Asset, ("id", "name", "serial_no", "location", "project_id", "updated_at"), assets)
+
+        # 熱門程度與 id 無關：打散後依 Zipf 排名
+        ranked = [(a[0], a[1], a[4]) for a in assets]
+        self.rng.shuffle(ranked)
+        self.assets, self.asset_cum = ranked, zipf_cum(len(ranked), self.hot_skew)
+        self.customers = sorted(set(customers))
+        self.customer_mu = {c: self.rng.gauss(-0.35, 0.4) for c in CUSTOMERS}
+        self.log(f"{len(projects)} projects, {len(assets)} assets, {len(self.users)} users")
+
+    # --- 共用抽樣 -------------------------------------------------------------
+
+    def _created(self, k) -> list:
+        days = self.rng.choices(self.day_starts, cum_weights=self.day_cum, k=k)
+        hours = self.rng.choices(range(24), cum_weights=self.hour_cum, k=k)
+        return [min(d + h * 3600 + self.rng.random() * 3600, self.end_ts - 1) for d, h in zip(days, hours)]
+
+    def _target(self, priority, customer):
+        from issues.sla import get_index, get_target
+
+        key = (priority, customer)
+        if key not in self._targets:
+            hours, calendar_id = get_target(priority, customer)
+            self._targets[key] = (hours * 3600, calendar_id, get_index(calendar_id, around=_dt(self.day_starts[0])))
+        return self._targets[key]
+
+    def _sla(self, priorities, customers, created):
+        """(到期時間, 處理完成時間)，皆為 epoch 秒（卡住的問題處理完成時間為 inf）；依 (優先度, 客戶) 分組整批計算。"""
+        from issues.sla import add_business_seconds_batch
+
+        n = len(created)
+        due, done = [0.0] * n, [0.0] * n
+        groups = defaultdict(list)
+        for i, key in enumerate(zip(priorities, customers)):
+            groups[key].append(i)
+        for (priority, customer), rows in groups.items():
+            seconds, calendar_id, index = self._target(priority, customer)
+            starts = [created[i] for i in rows]
+            mu = self.customer_mu[customer]
+            factors = [min(self.rng.lognormvariate(mu, SLA_SIGMA), MAX_SLA_FACTOR) for _ in rows]
+            stalled = [self.rng.random() < STALLED_SHARE for _ in rows]
+            dues = add_business_seconds_batch(starts, [seconds] * len(rows), calendar_id, index)
+            resolved = add_business_seconds_batch(starts, [seconds * f for f in factors], calendar_id, index)
+            for i, d, r, stuck in zip(rows, dues, resolved, stalled):
+                due[i], done[i] = d, float("inf") if stuck else r
+        return due, done
+
+    def _between(self, start, end, k) -> list:
+        return sorted(start + self.rng.random() * (end - start) for _ in range(k))
+
+    def _user(self, k) -> list:
+        return self.rng.choices(self.users, cum_weights=self.user_cum, k=k)
+
+    # --- core.Issue + IssueEvent ----------------------------------------------
+
+    def _core_issues(self):
+        from .models import Issue, IssueEvent
+
+        issue_id, event_id = self._next_id(Issue), self._next_id(IssueEvent)
+        open_states, open_weights = list(CORE_OPEN_WEIGHTS), list(CORE_OPEN_WEIGHTS.values())
+        done_rows, started = 0, monotonic()
+        for k in self._batches(self.n_issues):
+            assets = self.rng.choices(self.assets, cum_weights=self.asset_cum, k=k)
+            customers = [self.project_customer[a[2]] for a in assets]
+            priorities = self.rng.choices(range(4), weights=PRIORITY_WEIGHTS, k=k)
+            created = self._created(k)
+            due, resolved = self._sla(priorities, customers, created)
+            creators, assignees = self._user(k), self._user(k)
+            open_status = self.rng.choices(open_states, weights=open_weights, k=k)
+            symptoms = self.rng.choices(SYMPTOMS, k=k)
+
+            issues, events = [], []
+            for i in range(k):
+                asset_id, asset_name, project_id = assets[i]
+                if resolved[i] < self.end_ts:
+                    status, updated = "closed", resolved[i]
+                    path = ["in_progress"] + (["waiting_parts", "in_progress"] if self.rng.random() < 0.3 else []) \
+                        + (["on_site"] if self.rng.random() < 0.4 else []) + ["closed"]
+                else:
+                    status = open_status[i]
+                    updated = created[i] + self.rng.random() * (self.end_ts - created[i])
+                    path = CORE_OPEN_PATHS[status]
+                assignee = None if status == "open" and self.rng.random() < 0.6 else assignees[i]
+                issues.append((
+                    issue_id, f"{asset_name} {symptoms[i]}", f"P{priorities[i]}", assignee[1] if assignee else "",
+                    status, _dt(created[i]), _dt(updated), project_id, asset_id,
+                    f"{symptoms[i]}，{self.rng.choice(NOTES)}", customers[i], _dt(due[i]), creators[i][0],
+                    assignee[0] if assignee else None, None))
+                events.append((event_id, issue_id, "created", "open", None, _dt(created[i])))
+                event_id += 1
+                for value, ts in zip(path, self._between(created[i], updated, len(path) - 1) + [updated]):
+                    events.append((event_id, issue_id, "status_changed", value, None, _dt(ts)))
+                    event_id += 1
+                issue_id += 1
+
+            with transaction.atomic(using=self.using):
+                self.loader.write(Issue, CORE_ISSUE_COLUMNS, issues)
+                self.loader.write(IssueEvent, EVENT_COLUMNS, events)
+            done_rows += k
+            self._progress("core.Issue", done_rows, self.n_issues, started)
+
+    # --- issues.Issue + Comment -----------------------------------------------
+
+    def _thread_length(self) -> int:
+        # Pareto(α) - 1 的平均為 1 / (α - 1)；縮放到平均 comments 則
+        scale = self.comments * (THREAD_ALPHA - 1)
+        return min(int((self.rng.paretovariate(THREAD_ALPHA) - 1) * scale), self.max_thread)
+
+    def _web_issues(self):
+        from issues.models import Comment, Issue
+
+        issue_id, comment_id = self._next_id(Issue), self._next_id(Comment)
+        self.web_ids = range(issue_id, issue_id + self.n_web_issues)
+        open_states, open_weights = list(WEB_OPEN_WEIGHTS), list(WEB_OPEN_WEIGHTS.values())
+        close_after = CLOSE_AFTER.total_seconds()
+        customers_cum = zipf_cum(len(self.customers), 1.0)
+        done_rows, started = 0, monotonic()
+        for k in self._batches(self.n_web_issues):
+            customers = self.rng.choices(self.customers, cum_weights=customers_cum, k=k)
+            priorities = self.rng.choices(range(4), weights=PRIORITY_WEIGHTS, k=k)
+            created = self._created(k)
+            due, resolved = self._sla(priorities, customers, created)
+            creators, assignees = self._user(k), self._user(k)
+            open_status = self.rng.choices(open_states, weights=open_weights, k=k)
+            symptoms = self.rng.choices(SYMPTOMS, k=k)
+
+            issues, comments = [], []
+            for i in range(k):
+                if resolved[i] < self.end_ts:
+                    status = "CLOSED" if resolved[i] < self.end_ts - close_after else "RESOLVED"
+                    updated = resolved[i]
+                else:
+                    status = open_status[i]
+                    updated = created[i] + self.rng.random() * (self.end_ts - created[i])
+                assignee = None if status == "NEW" and self.rng.random() < 0.7 else assignees[i]
+                issues.append((
+                    issue_id, f"[{customers[i]}] {symptoms[i]}", f"{symptoms[i]}，{self.rng.choice(NOTES)}",
+                    priorities[i], status, creators[i][0], assignee[0] if assignee else None, customers[i],
+                    _dt(due[i]), _dt(created[i]), _dt(updated), 0))
+                # 留言多半來自開單者與負責人，長串的討論才會有其他人加入
+                length = self._thread_length()
+                people = [creators[i], assignee or creators[i]]
+                authors = self.rng.choices(people, k=length) if length < 10 else \
+                    [self.rng.choice(people) if self.rng.random() < 0.7 else self._user(1)[0] for _ in range(length)]
+                for author, ts in zip(authors, self._between(created[i], updated, length)):
+                    comments.append((comment_id, issue_id, author[0], f"{self.rng.choice(NOTES)}。", _dt(ts)))
+                    comment_id += 1
+                issue_id += 1
+
+            with transaction.atomic(using=self.using):
+                self.loader.write(Issue, WEB_ISSUE_COLUMNS, issues)
+                self.loader.write(Comment, COMMENT_COLUMNS, comments)
+            done_rows += k
+            self._progress("issues.Issue", done_rows, self.n_web_issues, started)
+
+    # --- 收尾 -----------------------------------------------------------------
+
+    def _finish(self):
+        from django.apps import apps
+
+        from issues.saved_views import bump
+
+        connection = connections[self.using]
+        labels = [label for label, count in self.loader.counts.items() if count]
+        models = [apps.get_model(label) for label in labels]
+        with connection.cursor() as cursor:
+            # 主鍵為預先配置的值，序列需推進到目前最大 id 之後
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        # 序列推進後才能建立鏡像列（core.Issue 的 id 由序列配置）
+        self._mirror_web_issues()
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                for model in models:
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+            elif connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+        bump("issues", "core", *(f"core:p{pid}" for pid in self.project_customer))
+
+    def _mirror_web_issues(self):
+        from . import consolidation
+
+        if not self.web_ids or not consolidation.dual_write_enabled():
+            return
+        if self.using != "default":
+            # consolidation 只在 default 資料庫上讀寫
+            self.log(f"dual-write is on but --database is {self.using}: run consolidate_issues backfill afterwards")
+            return
+        started = monotonic()
+        for start in range(self.web_ids.start, self.web_ids.stop, self.batch_size):
+            with transaction.atomic():
+                self.mirrored += consolidation.copy_ids(range(start, min(start + self.batch_size, self.web_ids.stop)))
+            self._progress("core.Issue mirrors", self.mirrored, len(self.web_ids), started)
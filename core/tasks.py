@@ -1,49 +1,87 @@
+import logging
 import os
-import requests
 from celery import shared_task
 
-GRAPH_BASE = "https://graph.microsoft.com/v1.0"
-
-def get_graph_token():
-    tenant = os.environ.get("GRAPH_TENANT_ID", "")
-    client_id = os.environ.get("GRAPH_CLIENT_ID", "")
-    client_secret = os.environ.get("GRAPH_CLIENT_SECRET", "")
-    if not (tenant and client_id and client_secret):
-        return None
-    url = f"https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
-    data = {
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "grant_type": "client_credentials",
-        "scope": "https://graph.microsoft.com/.default",
-    }
-    resp = requests.post(url, data=data, timeout=10)
-    resp.raise_for_status()
-    return resp.json().get("access_token")
-
-def post_channel_message(html_content: str):
-    token = get_graph_token()
-    team_id = os.environ.get("TEAMS_TEAM_ID", "")
-    channel_id = os.environ.get("TEAMS_CHANNEL_ID", "")
-    # 未設定 Graph/Teams 參數時安靜略過
-    if not (token and team_id and channel_id):
-        return
-    url = f"{GRAPH_BASE}/teams/{team_id}/channels/{channel_id}/messages"
-    payload = {"body": {"contentType": "html", "content": html_content}}
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    r = requests.post(url, json=payload, headers=headers, timeout=10)
-    r.raise_for_status()
-
-@shared_task
-def send_issue_update_to_teams(issue_id: int, event: str):
+from app import celery_app  # noqa: F401  確保任務綁定到專案的 Celery app（web 行程延遲載入）
+from .idempotency import enqueue_once, idempotent
+
+# Graph 呼叫與批次投遞集中在 core.teams；保留舊的匯入路徑
+from .teams import flush_outbox, get_graph_token, post_channel_message, schedule_flush  # noqa: F401
+
+log = logging.getLogger(__name__)
+
+@shared_task(ignore_result=True)
+def flush_teams_outbox():
+    next_in = flush_outbox()
+    if next_in is not None:
+        schedule_flush(countdown=next_in)
+
+@shared_task(ignore_result=True)
+def refresh_status_intervals():
+    from .analytics import REFRESH_FLAG_KEY, refresh
+    from .redis_client import get_redis
+    get_redis().delete(REFRESH_FLAG_KEY)
+    refresh()
+
+@shared_task(ignore_result=True)
+def ingest_alarms():
+    from .alarms import DRAIN_FLAG_KEY, drain
+    from .redis_client import get_redis
+    get_redis().delete(DRAIN_FLAG_KEY)
+    drain()
+
+@shared_task(ignore_result=True)
+def archive_closed_issues():
+    from .archive import archive_closed
+    archive_closed()
+
+# Redis 優先權：0 最先處理（見 app/celery.py 的 priority_steps）；P0 問題的通知插隊
+NOTIFY_PRIORITY = {"P0": 0, "P1": 2, "P2": 5, "P3": 7}
+
+def _event_key(issue_id: int, event: str, event_id=None):
+    return f"{issue_id}:{event_id if event_id is not None else event}"
+
+@shared_task(ignore_result=True)
+@idempotent(_event_key)
+def send_issue_update_to_teams(issue_id: int, event: str, event_id=None):
     from .models import Issue
     issue = Issue.objects.get(id=issue_id)
-    assignee_name = issue.assignee.get_full_name() if issue.assignee else "未指派"
+    assignee_name = issue.assignee or "未指派"
     base_url = os.environ.get("APP_BASE_URL", "http://localhost:8080")
     html = (
         f"<b>#{issue.id} {issue.title}</b><br/>"
-        f"事件：{event}｜狀態：{issue.get_status_display()}｜優先度：{issue.get_priority_display()}<br/>"
+        f"事件：{event}｜狀態：{issue.get_status_display()}｜優先度：{issue.priority}<br/>"
         f"指派：{assignee_name}<br/>"
-        f"{base_url}/admin/core/issue/{issue.id}/change/查看</a>"
+        f'<a href="{base_url}/admin/core/issue/{issue.id}/change/">查看</a>'
     )
     post_channel_message(html)
+
+@shared_task(ignore_result=True)
+@idempotent(lambda attachment_id: attachment_id)
+def generate_attachment_derivatives(attachment_id: int):
+    from .models import Attachment
+    from .thumbnails import UnsupportedAttachment, generate
+    attachment = Attachment.objects.filter(id=attachment_id).first()
+    if attachment is None:
+        return
+    try:
+        derivatives, status = generate(attachment), Attachment.Derivatives.READY
+    except UnsupportedAttachment as e:
+        log.info("attachment %s: %s", attachment_id, e)
+        derivatives, status = {}, Attachment.Derivatives.UNSUPPORTED
+    except Exception:
+        log.exception("attachment %s: derivative generation failed", attachment_id)
+        derivatives, status = {}, Attachment.Derivatives.FAILED
+    # 用 update() 寫回，不觸發 post_save，也不覆蓋其他欄位
+    Attachment.objects.filter(id=attachment_id).update(derivatives=derivatives, derivatives_status=status)
+
+def schedule_attachment_derivatives(attachment) -> bool:
+    return enqueue_once(generate_attachment_derivatives, args=(attachment.id,))
+
+def notify_issue_event(issue, event: str, event_id=None) -> bool:
+    """同一個 (issue, event) 只排入一次通知；event_id 為 IssueEvent.event_key。回傳是否真的排入。"""
+    return enqueue_once(
+        send_issue_update_to_teams,
+        args=(issue.id, event, event_id),
+        priority=NOTIFY_PRIORITY.get(str(issue.priority).upper(), 5),
+    )
@@ -0,0 +1,291 @@
+"""
+Teams 頻道訊息的批次投遞（Microsoft Graph JSON $batch）。
+
+流程：
+1. post_channel_message() 只把訊息推進 Redis outbox，並排程一次 flush。
+2. flush_outbox() 每次取最多 BATCH_SIZE（Graph 上限 20）則，
+   先向共用的 TokenBucket 取 token，再送出一個 $batch 請求。
+3. 整批或個別子請求回 429/503/504 時，依 Retry-After（無則指數退避）加上 jitter
+   放進 retry zset，並讓整個 bucket 暫停，避免其他 worker 繼續打爆 Graph。
+   每批大小採 AIMD：被節流時降為該批實際成功數（至少 1），整批成功則 +1，
+   讓批次大小自動貼近 Graph 目前願意接受的量。
+4. 超過 MAX_ATTEMPTS 或非暫時性錯誤的訊息移到 dead list，僅保留最近 1000 則。
+5. 取出時以 LMOVE 移到該次 flush 專屬的 teams:processing:<id> 清單，送出並結算後才刪除；
+   id 登記在 teams:processing（zset，score = 租約到期）。worker 中途當掉時，
+   之後的 flush 把租約過期的清單依原順序搬回 outbox 隊首，訊息不會遺失（至少一次）。
+每批大小不超過 token bucket 的容量（BURST），否則永遠取不到 token。
+"""
+import json
+import logging
+import random
+import time
+import uuid
+
+import requests
+from django.conf import settings
+
+from .ratelimit import TokenBucket
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+OUTBOX_KEY = "teams:outbox"
+RETRY_KEY = "teams:retry"
+DEAD_KEY = "teams:dead"
+FLUSH_FLAG_KEY = "teams:flush_scheduled"
+BUCKET_KEY = "teams:bucket"
+BATCH_LIMIT_KEY = "teams:batch_limit"
+PROCESSING_KEY = "teams:processing"
+PROCESSING_LIST_KEY = "teams:processing:{}"
+PROCESSING_LEASE = 120  # 秒；需大於一次 $batch 請求的逾時（30 秒）
+
+RETRYABLE_STATUS = {429, 503, 504}
+DEAD_KEEP = 1000
+
+_token_cache = {"token": None, "expires_at": 0.0}
+
+
+def _conf(name):
+    return settings.TEAMS_DELIVERY[name]
+
+
+def get_graph_token():
+    tenant = settings.GRAPH["TENANT_ID"]
+    client_id = settings.GRAPH["CLIENT_ID"]
+    client_secret = settings.GRAPH["CLIENT_SECRET"]
+    if not (tenant and client_id and client_secret):
+        return None
+    # client credentials token 有效期約 1 小時；提前 60 秒換新
+    if _token_cache["token"] and _token_cache["expires_at"] > time.time():
+        return _token_cache["token"]
+    url = f"{settings.GRAPH_LOGIN_BASE}/{tenant}/oauth2/v2.0/token"
+    data = {
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": "client_credentials",
+        "scope": "https://graph.microsoft.com/.default",
+    }
+    resp = requests.post(url, data=data, timeout=10)
+    resp.raise_for_status()
+    body = resp.json()
+    _token_cache["token"] = body.get("access_token")
+    _token_cache["expires_at"] = time.time() + int(body.get("expires_in", 3600)) - 60
+    return _token_cache["token"]
+
+
+def is_configured() -> bool:
+    return all(settings.GRAPH[name] for name in ("TENANT_ID", "CLIENT_ID", "CLIENT_SECRET", "TEAM_ID", "CHANNEL_ID"))
+
+
+def get_bucket() -> TokenBucket:
+    return TokenBucket(BUCKET_KEY, rate=_conf("RATE_PER_SEC"), capacity=_conf("BURST"))
+
+
+def retry_delay(attempt: int, retry_after: float = None) -> float:
+    """
+    有 Retry-After 時照辦並加上少量 jitter（錯開同時被擋下的 worker）；
+    否則用 full-jitter 指數退避。
+    """
+    if retry_after:
+        return retry_after + random.uniform(0, max(1.0, retry_after * 0.2))
+    return random.uniform(1.0, min(_conf("MAX_BACKOFF"), 2 ** attempt))
+
+
+def _parse_retry_after(headers) -> float:
+    value = (headers or {}).get("Retry-After") or (headers or {}).get("retry-after")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def post_channel_message(html_content: str):
+    """
+    將訊息排入 outbox，由 flush_teams_outbox 以 $batch 投遞。
+    未設定 Graph/Teams 參數時安靜略過。
+    """
+    if not is_configured():
+        return
+    r = get_redis()
+    r.rpush(OUTBOX_KEY, json.dumps({"html": html_content, "attempt": 0}))
+    schedule_flush()
+
+
+def schedule_flush(countdown: float = 0):
+    # 以 NX 旗標合併大量 enqueue，同一時間最多排一個 flush
+    if get_redis().set(FLUSH_FLAG_KEY, 1, nx=True, ex=max(60, int(countdown) + 60)):
+        from .tasks import flush_teams_outbox
+        flush_teams_outbox.apply_async(countdown=countdown)
+
+
+def _promote_due_retries(r):
+    due = r.zrangebyscore(RETRY_KEY, "-inf", time.time(), start=0, num=500)
+    for raw in due:
+        # ZREM 成功者才搬移，避免兩個 worker 重複投遞
+        if r.zrem(RETRY_KEY, raw):
+            r.rpush(OUTBOX_KEY, raw)
+
+
+def _next_retry_in(r):
+    head = r.zrange(RETRY_KEY, 0, 0, withscores=True)
+    if not head:
+        return None
+    return max(0.0, head[0][1] - time.time())
+
+
+def _retry_later(r, messages, retry_after: float = None):
+    for msg in messages:
+        msg["attempt"] += 1
+        if msg["attempt"] > _conf("MAX_ATTEMPTS"):
+            _dead_letter(r, msg, "max attempts exceeded")
+            continue
+        r.zadd(RETRY_KEY, {json.dumps(msg): time.time() + retry_delay(msg["attempt"], retry_after)})
+
+
+def _dead_letter(r, msg, reason):
+    log.error("Teams message dropped (%s) after %s attempts", reason, msg.get("attempt"))
+    msg["reason"] = reason
+    r.lpush(DEAD_KEY, json.dumps(msg))
+    r.ltrim(DEAD_KEY, 0, DEAD_KEEP - 1)
+
+
+def build_batch(messages) -> dict:
+    team_id = settings.GRAPH["TEAM_ID"]
+    channel_id = settings.GRAPH["CHANNEL_ID"]
+    return {
+        "requests": [
+            {
+                "id": str(i),
+                "method": "POST",
+                "url": f"/teams/{team_id}/channels/{channel_id}/messages",
+                "headers": {"Content-Type": "application/json"},
+                "body": {"body": {"contentType": "html", "content": msg["html"]}},
+            }
+            for i, msg in enumerate(messages)
+        ]
+    }
+
+
+def _batch_limit(r) -> int:
+    ceiling = min(_conf("BATCH_SIZE"), 20, _conf("BURST"))
+    value = r.get(BATCH_LIMIT_KEY)
+    return min(ceiling, int(value)) if value else ceiling
+
+
+def _adjust_batch_limit(r, sent: int, delivered: int):
+    if delivered >= sent:
+        limit = min(_batch_limit(r) + 1, _conf("BATCH_SIZE"), 20, _conf("BURST"))
+    else:
+        limit = max(1, delivered)
+    r.set(BATCH_LIMIT_KEY, limit, ex=3600)
+
+
+def send_batch(r, bucket, token, messages):
+    """
+    送出一個 $batch；回傳成功投遞的訊息數。失敗者已排入 retry 或 dead list。
+    """
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    try:
+        resp = requests.post(f"{settings.GRAPH_BASE_URL}/$batch", json=build_batch(messages),
+                             headers=headers, timeout=30)
+    except requests.RequestException as e:
+        log.warning("Graph $batch request failed: %s", e)
+        _retry_later(r, messages)
+        return 0
+
+    if resp.status_code in RETRYABLE_STATUS:
+        retry_after = _parse_retry_after(resp.headers)
+        bucket.block_for(retry_after)
+        _adjust_batch_limit(r, len(messages), 0)
+        _retry_later(r, messages, retry_after)
+        return 0
+    if resp.status_code == 401:
+        _token_cache["token"] = None
+        _retry_later(r, messages)
+        return 0
+    if resp.status_code >= 400:
+        for msg in messages:
+            _dead_letter(r, msg, f"batch HTTP {resp.status_code}")
+        return 0
+
+    delivered = 0
+    throttled, max_retry_after = [], 0.0
+    for sub in resp.json().get("responses", []):
+        msg = messages[int(sub["id"])]
+        status = int(sub.get("status", 500))
+        if status < 300:
+            delivered += 1
+        elif status in RETRYABLE_STATUS:
+            throttled.append(msg)
+            max_retry_after = max(max_retry_after, _parse_retry_after(sub.get("headers")))
+        else:
+            _dead_letter(r, msg, f"HTTP {status}")
+    if throttled:
+        bucket.block_for(max_retry_after)
+        _retry_later(r, throttled, max_retry_after)
+    _adjust_batch_limit(r, delivered + len(throttled), delivered)
+    return delivered
+
+
+def _take(r, processing, n) -> list:
+    """從 outbox 隊首搬最多 n 則到 processing 清單（LMOVE，逐則原子搬移）。"""
+    pipe = r.pipeline(transaction=False)
+    for _ in range(n):
+        pipe.lmove(OUTBOX_KEY, processing, "LEFT", "RIGHT")
+    return [raw for raw in pipe.execute() if raw is not None]
+
+
+def _put_back(r, processing):
+    """processing 清單依原順序搬回 outbox 隊首。"""
+    while r.lmove(processing, OUTBOX_KEY, "RIGHT", "LEFT") is not None:
+        pass
+
+
+def _recover_stale(r):
+    # 租約過期的 processing 清單（flush 途中 worker 當掉）：ZREM 成功者負責搬回，避免兩個 worker 重複搬
+    for flush_id in r.zrangebyscore(PROCESSING_KEY, "-inf", time.time()):
+        if r.zrem(PROCESSING_KEY, flush_id):
+            flush_id = flush_id.decode() if isinstance(flush_id, bytes) else flush_id
+            log.warning("recovering Teams messages from abandoned flush %s", flush_id)
+            _put_back(r, PROCESSING_LIST_KEY.format(flush_id))
+
+
+def flush_outbox(max_batches: int = 50):
+    """
+    投遞 outbox 中的訊息；回傳距離下次需要 flush 的秒數（None 表示已清空）。
+    """
+    r = get_redis()
+    r.delete(FLUSH_FLAG_KEY)
+    _recover_stale(r)
+    _promote_due_retries(r)
+    token = get_graph_token()
+    if not token:
+        return None
+    bucket = get_bucket()
+
+    flush_id = uuid.uuid4().hex
+    processing = PROCESSING_LIST_KEY.format(flush_id)
+    try:
+        for _ in range(max_batches):
+            r.zadd(PROCESSING_KEY, {flush_id: time.time() + PROCESSING_LEASE})
+            raw = _take(r, processing, _batch_limit(r))
+            if not raw:
+                break
+            wait = bucket.acquire(len(raw))
+            if wait > 0:
+                _put_back(r, processing)
+                return wait
+            send_batch(r, bucket, token, [json.loads(m) for m in raw])
+            r.delete(processing)  # 已送達、排入 retry 或 dead
+        else:
+            return 0
+    except Exception:
+        # 非預期錯誤：手上的訊息放回 outbox，由下一次 flush 重送
+        _put_back(r, processing)
+        raise
+    finally:
+        r.zrem(PROCESSING_KEY, flush_id)
+
+    if r.llen(OUTBOX_KEY):
+        return 0
+    return _next_retry_in(r)
@@ -0,0 +1,31 @@
+"""
+REST API 的 DRF throttle：與 HTML 頁面共用 core.throttling 的 Redis token bucket。
+
+DRF 取不到 token 時回 429，Retry-After 取自 wait()。
+view 可設定 throttle_scope 改用 THROTTLE["RATES"] 中的其他 scope。
+"""
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from . import throttling
+
+
+class ApiThrottle(BaseThrottle):
+    read_scope = "api"
+    write_scope = "api_write"
+
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope:
+            return scope
+        return self.read_scope if request.method in throttling.SAFE_METHODS else self.write_scope
+
+    def allow_request(self, request, view):
+        self._wait = 0.0
+        if not settings.THROTTLE["ENABLED"]:
+            return True
+        self._wait = throttling.check(self.get_scope(request, view), throttling.client_ident(request))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
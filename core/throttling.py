@@ -0,0 +1,100 @@
+"""
+請求節流與過載保護（Redis token bucket，見 core.ratelimit）。
+
+每個請求取兩個 token：
+1. 身分桶 throttle:<scope>:<ident>：ident 為登入使用者（u:<id>）或來源 IP（ip:<addr>），
+   scope 依流量類型：interactive（HTML 頁面）、form（HTML 表單送出）、api、api_write。
+2. 全域桶 throttle:global：代表整個 web 層（gunicorn worker）每秒可處理的量。
+   API 流量須在扣除後仍保留 API_RESERVE 比例的 token，interactive / form 可用到見底；
+   系統飽和時整合腳本先被擋下，操作頁面的使用者仍能取得 token。
+取不到 token 時立即回 429 + Retry-After，不進入 view。Redis 無法連線時放行。
+
+HTML 頁面由 ThrottleMiddleware 處理；/api/ 由 DRF 的 core.throttles.ApiThrottle 處理。
+"""
+import logging
+import math
+import re
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+KEY = "throttle:{}:{}"
+GLOBAL_KEY = "throttle:global"
+PRIORITY_SCOPES = ("interactive", "form")
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+PERIODS = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600}
+_RATE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*([a-z]+)\s*$")
+
+
+def _conf(name):
+    return settings.THROTTLE[name]
+
+
+def parse_rate(rate: str) -> tuple:
+    """"120/min" → (每秒補充 2.0, 容量 120)：整段時間的量可一次用完，之後依速率補充。"""
+    m = _RATE.match(rate or "")
+    if not m or m.group(2) not in PERIODS:
+        raise ValueError(f"invalid rate {rate!r}, expected e.g. '120/min'")
+    count = float(m.group(1))
+    return count / PERIODS[m.group(2)], count
+
+
+def client_ident(request) -> str:
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"u:{user.pk}"
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if forwarded and _conf("TRUST_X_FORWARDED_FOR"):
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def check(scope: str, ident: str) -> float:
+    """回傳需等待的秒數；0 代表放行。"""
+    try:
+        rate, capacity = parse_rate(_conf("RATES")[scope])
+        wait = TokenBucket(KEY.format(scope, ident), rate=rate, capacity=capacity).acquire()
+        if wait:
+            return wait
+        rate, capacity = parse_rate(_conf("GLOBAL_RATE"))
+        reserve = 0 if scope in PRIORITY_SCOPES else math.floor(capacity * _conf("API_RESERVE"))
+        return TokenBucket(GLOBAL_KEY, rate=rate, capacity=capacity).acquire(reserve=reserve)
+    except ValueError:
+        raise
+    except Exception as e:
+        log.warning("throttle check skipped (%s %s): %s", scope, ident, e)
+        return 0.0
+
+
+def retry_after(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+
+def too_many_requests(wait: float) -> HttpResponse:
+    response = HttpResponse("系統忙碌中，請稍後再試 (Too Many Requests)", status=429,
+                            content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = retry_after(wait)
+    return response
+
+
+class ThrottleMiddleware:
+    """
+    HTML 頁面的節流；需放在 AuthenticationMiddleware 之後。
+    /api/ 列在 EXEMPT_PREFIXES，交給 DRF throttle 處理，不重複扣 token。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if _conf("ENABLED") and not request.path.startswith(_conf("EXEMPT_PREFIXES")):
+            scope = "interactive" if request.method in SAFE_METHODS else "form"
+            wait = check(scope, client_ident(request))
+            if wait:
+                return too_many_requests(wait)
+        return self.get_response(request)
@@ -0,0 +1,160 @@
+"""
+附件縮圖 / 預覽產生（由 core.tasks.generate_attachment_derivatives 在背景執行）。
+
+- 圖片：依 EXIF 轉正後輸出 thumb（小圖）與 preview（大圖），各一份 WebP 與 JPEG。
+- PDF：以 pdftoppm 轉出第一頁，再照圖片流程輸出。
+- 文字 / log：取前 LOG_PREVIEW_BYTES 存成 preview.txt，並把前幾行畫成圖片。
+衍生檔與原檔放在同一個內容雜湊目錄（attachments/ab/<sha256>/），
+同內容的附件共用一份；路徑不變即內容不變，因此可用 immutable 快取（見 core.attachment_views）。
+"""
+import io
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+TEXT_TYPES = ("text/", "application/json", "application/xml", "application/x-ndjson")
+TEXT_EXTENSIONS = (".log", ".txt", ".csv", ".json", ".xml", ".ini", ".cfg", ".conf")
+
+
+class UnsupportedAttachment(Exception):
+    pass
+
+
+def _conf(name):
+    return settings.ATTACHMENT_DERIVATIVES[name]
+
+
+def kind_of(content_type: str, name: str) -> str:
+    content_type = (content_type or mimetypes.guess_type(name)[0] or "").lower()
+    ext = os.path.splitext(name)[1].lower()
+    if content_type.startswith("image/"):
+        return "image"
+    if content_type == "application/pdf" or ext == ".pdf":
+        return "pdf"
+    if content_type.startswith(TEXT_TYPES) or ext in TEXT_EXTENSIONS:
+        return "text"
+    return "other"
+
+
+def derivative_name(sha256: str, label: str) -> str:
+    return f"attachments/{sha256[:2]}/{sha256}/{label}"
+
+
+def _open_image(fp):
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = _conf("MAX_PIXELS")
+    image = Image.open(fp)
+    image.draft("RGB", (_conf("PREVIEW_SIZE"), _conf("PREVIEW_SIZE")))  # JPEG 直接以縮小解碼
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _pdf_first_page(path):
+    from PIL import Image
+
+    if not shutil.which("pdftoppm"):
+        raise UnsupportedAttachment("pdftoppm not installed (poppler-utils)")
+    proc = subprocess.run(
+        ["pdftoppm", "-f", "1", "-l", "1", "-singlefile", "-png",
+         "-scale-to", str(_conf("PREVIEW_SIZE")), path],
+        capture_output=True, timeout=60,
+    )
+    if proc.returncode != 0 or not proc.stdout:
+        raise UnsupportedAttachment(f"pdftoppm failed: {proc.stderr.decode(errors='replace')[:200]}")
+    return Image.open(io.BytesIO(proc.stdout)).convert("RGB")
+
+
+def _render_text(text: str):
+    from PIL import Image, ImageDraw, ImageFont
+
+    lines = text.splitlines()[:_conf("LOG_PREVIEW_LINES")]
+    font_path = _conf("FONT")
+    font = ImageFont.truetype(font_path, 14) if font_path else ImageFont.load_default()
+    line_height = 18
+    width = _conf("PREVIEW_SIZE")
+    image = Image.new("RGB", (width, max(1, len(lines)) * line_height + 16), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((8, 8 + i * line_height), line.expandtabs(4)[:200], fill="black", font=font)
+    return image
+
+
+def _encode(image, box: int) -> dict:
+    copy = image.copy()
+    copy.thumbnail((box, box))
+    out = {}
+    buf = io.BytesIO()
+    copy.save(buf, "WEBP", quality=80, method=4)
+    out["webp"] = buf.getvalue()
+    buf = io.BytesIO()
+    copy.save(buf, "JPEG", quality=82, optimize=True, progressive=True)
+    out["jpg"] = buf.getvalue()
+    return out
+
+
+def _store(storage, sha256, label, data: bytes) -> str:
+    name = derivative_name(sha256, label)
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:  # 同時有兩個 worker 產生同一份：保留先寫入的
+            storage.delete(saved)
+    return name
+
+
+def _image_for(attachment, kind):
+    storage = attachment.file.storage
+    if kind == "image":
+        with storage.open(attachment.file.name, "rb") as fp:
+            return _open_image(fp), {}
+    if kind == "pdf":
+        try:
+            path = storage.path(attachment.file.name)
+            return _pdf_first_page(path), {}
+        except NotImplementedError:  # 非本機 storage：先複製到暫存檔
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp, storage.open(attachment.file.name, "rb") as fp:
+                shutil.copyfileobj(fp, tmp)
+                tmp.flush()
+                return _pdf_first_page(tmp.name), {}
+    if kind == "text":
+        with storage.open(attachment.file.name, "rb") as fp:
+            raw = fp.read(_conf("LOG_PREVIEW_BYTES"))
+        text = raw.decode("utf-8", errors="replace")
+        return _render_text(text), {"preview.txt": text.encode()}
+    raise UnsupportedAttachment(f"no preview for {attachment.content_type or 'unknown type'}")
+
+
+def generate(attachment) -> dict:
+    """
+    產生並儲存衍生檔，回傳 {label: storage name}。同內容已產生過時直接沿用既有檔案。
+    """
+    if not attachment.file or not attachment.sha256:
+        raise UnsupportedAttachment("attachment has no stored file")
+    storage = attachment.file.storage
+    sha = attachment.sha256
+    labels = [f"{size}.{fmt}" for size in ("thumb", "preview") for fmt in ("webp", "jpg")]
+    kind = kind_of(attachment.content_type, attachment.original_name or attachment.file.name)
+    if kind == "text":
+        labels.append("preview.txt")
+    existing = {label: derivative_name(sha, label) for label in labels}
+    if all(storage.exists(name) for name in existing.values()):
+        return existing
+
+    image, extra = _image_for(attachment, kind)
+    result = {}
+    for label, box in (("thumb", _conf("THUMB_SIZE")), ("preview", _conf("PREVIEW_SIZE"))):
+        for fmt, data in _encode(image, box).items():
+            result[f"{label}.{fmt}"] = _store(storage, sha, f"{label}.{fmt}", data)
+    for label, data in extra.items():
+        result[label] = _store(storage, sha, label, data)
+    return result
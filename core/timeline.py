@@ -0,0 +1,204 @@
+"""
+問題時間軸：留言（issues.Comment）、事件（IssueEvent）、附件（Attachment）合併成一條，新到舊。
+
+- 一個 UNION ALL 查詢，每段只取時間軸需要的欄位；留言者以 JOIN 一併取回，不逐筆查詢。
+- 依 (created_at, kind, id) 遞減排序、以游標分頁（kind 讓不同表相同時間 / id 的列有固定順序）；
+  PostgreSQL 上每段先各自取 limit + 1 筆（走 (issue, created_at) 索引），再合併排序。
+- 第一頁快取在 Redis，以版本計數器失效：留言 / 附件的 signal、事件寫入（event_stream.after_insert）
+  commit 後遞增 timeline:ver:<core|issues>:<id>。尚在 stream 中的事件於讀取時併入。
+
+issues.Issue 的留言與 core.Issue 的事件 / 附件以 core.Issue.legacy_id 對應（core/consolidation.py）。
+"""
+import json
+import logging
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F, Value
+from django.utils.dateparse import parse_datetime
+
+from . import event_stream
+from .lookup import decode_cursor, encode_cursor
+from .models import Attachment, IssueEvent
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+VERSION_KEY = "timeline:ver:{}:{}"
+FIRST_PAGE_KEY = "timeline:first:{}:{}:{}"
+MAX_LIMIT = 100
+
+# kind 依字母序作為同一時間點的次要排序
+COMMENT, EVENT, ATTACHMENT = "comment", "event", "attachment"
+
+
+def _conf(name):
+    return settings.TIMELINE[name]
+
+
+def _text(value):
+    return Value(value, output_field=models.CharField())
+
+
+def _columns(kind, actor, body, detail, ref):
+    # 每段欄位順序需一致（UNION 依位置對應）
+    return {
+        "kind": _text(kind),
+        "entry_id": F("id"),
+        "ts": F("created_at"),
+        "actor": actor,
+        "body": body,
+        "detail": detail,
+        "ref": ref,
+    }
+
+
+def _parts(core_id, legacy_id) -> list:
+    parts = []
+    if legacy_id:
+        Comment = apps.get_model("issues", "Comment")
+        parts.append((COMMENT, Comment.objects.filter(issue_id=legacy_id), _columns(
+            COMMENT, F("author__username"), F("text"), _text(""), _text(""))))
+    if core_id:
+        parts.append((EVENT, IssueEvent.objects.filter(issue_id=core_id), _columns(
+            EVENT, _text(""), F("to_value"), F("event_type"), F("event_key"))))
+        parts.append((ATTACHMENT, Attachment.objects.filter(issue_id=core_id), _columns(
+            ATTACHMENT, _text(""), F("original_name"), F("content_type"), F("sha256"))))
+    return parts
+
+
+def _after(qs, kind, cursor):
+    """游標之後（較舊）的列：(created_at, kind, id) < (ts, cursor_kind, id)。"""
+    ts, cursor_kind, last_id = cursor
+    if kind < cursor_kind:
+        return qs.filter(created_at__lte=ts)
+    if kind > cursor_kind:
+        return qs.filter(created_at__lt=ts)
+    return qs.filter(created_at__lte=ts).exclude(created_at=ts, id__gte=last_id)
+
+
+def _query(core_id, legacy_id, cursor, limit) -> list:
+    parts = _parts(core_id, legacy_id)
+    if not parts:
+        return []
+    querysets = []
+    for kind, qs, columns in parts:
+        if cursor:
+            qs = _after(qs, kind, cursor)
+        qs = qs.order_by().values(**columns)
+        if connection.features.supports_slicing_ordering_in_compound:
+            qs = qs.order_by("-ts", "-entry_id")[:limit]
+        querysets.append(qs)
+    first, *rest = querysets
+    combined = first.union(*rest, all=True) if rest else first
+    return list(combined.order_by("-ts", "-kind", "-entry_id")[:limit])
+
+
+def _entry(row) -> dict:
+    return {
+        "kind": row["kind"],
+        "id": row["entry_id"],
+        "created_at": row["ts"],
+        "actor": row["actor"] or "",
+        "body": row["body"] or "",
+        "detail": row["detail"] or "",
+        "ref": row["ref"] or "",
+    }
+
+
+def _fetch(core_id, legacy_id, after, limit) -> dict:
+    cursor = decode_cursor(after, datetime, str, int) if after else None
+    rows = _query(core_id, legacy_id, cursor, limit + 1)
+    entries = [_entry(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = entries[-1]
+        next_cursor = encode_cursor(last["created_at"], last["kind"], last["id"])
+    return {"results": entries, "next": next_cursor}
+
+
+# ---------------------------------------------------------------- 第一頁快取
+
+def bump(scope: str, scope_id):
+    try:
+        get_redis().incr(VERSION_KEY.format(scope, scope_id))
+    except Exception as e:
+        # 漏掉的 bump 最多讓第一頁舊 CACHE_TTL 秒
+        log.warning("timeline version bump failed (%s %s): %s", scope, scope_id, e)
+
+
+def bump_on_commit(scope: str, *scope_ids):
+    for scope_id in {i for i in scope_ids if i}:
+        transaction.on_commit(lambda scope_id=scope_id: bump(scope, scope_id))
+
+
+def _cache_key(r, core_id, legacy_id) -> str:
+    versions = r.mget([VERSION_KEY.format("core", core_id or 0), VERSION_KEY.format("issues", legacy_id or 0)])
+    stamp = ".".join((v or b"0").decode() for v in versions)
+    return FIRST_PAGE_KEY.format(core_id or 0, legacy_id or 0, stamp)
+
+
+def _dumps(page) -> str:
+    return json.dumps({
+        "results": [{**e, "created_at": e["created_at"].isoformat()} for e in page["results"]],
+        "next": page["next"],
+    })
+
+
+def _loads(raw) -> dict:
+    page = json.loads(raw)
+    for e in page["results"]:
+        e["created_at"] = parse_datetime(e["created_at"])
+    return page
+
+
+def _first_page(core_id, legacy_id, limit) -> dict:
+    try:
+        r = get_redis()
+        key = _cache_key(r, core_id, legacy_id)
+        raw = r.get(key)
+    except Exception as e:
+        log.warning("timeline cache unavailable: %s", e)
+        r = key = raw = None
+    if raw is not None:
+        return _loads(raw)
+
+    page = _fetch(core_id, legacy_id, None, limit)
+    if r is not None:
+        try:
+            r.set(key, _dumps(page), ex=_conf("CACHE_TTL"))
+        except Exception as e:
+            log.warning("timeline cache write failed: %s", e)
+    return page
+
+
+def _merge_pending(page, core_id) -> dict:
+    # 尚在 Redis stream 中的事件（id 為 None）；有下一頁時只併入不早於本頁最後一筆者
+    seen = {e["ref"] for e in page["results"] if e["kind"] == EVENT}
+    floor = page["results"][-1]["created_at"] if page["next"] and page["results"] else None
+    pending = [
+        {"kind": EVENT, "id": None, "created_at": e["created_at"], "actor": "",
+         "body": e["to_value"], "detail": e["event_type"], "ref": e["event_key"]}
+        for e in event_stream.merge_recent([], "issue", core_id)
+        if e["event_key"] not in seen and (floor is None or e["created_at"] >= floor)
+    ]
+    if pending:
+        page = {**page, "results": sorted(page["results"] + pending, key=lambda e: e["created_at"], reverse=True)}
+    return page
+
+
+def issue_timeline(core_id=None, legacy_id=None, after: str = None, limit: int = None) -> dict:
+    """
+    core_id：core.Issue 的 id（事件、附件）；legacy_id：issues.Issue 的 id（留言）。
+    回傳 {"results": [...], "next": 游標或 None}；每筆含 kind、id、created_at、actor、body、detail、ref。
+    """
+    page_size = _conf("PAGE_SIZE")
+    limit = max(1, min(limit or page_size, MAX_LIMIT))
+    if after:
+        return _fetch(core_id, legacy_id, after, limit)
+    page = _first_page(core_id, legacy_id, limit) if limit == page_size else _fetch(core_id, legacy_id, None, limit)
+    if core_id and settings.EVENT_STREAM["ENABLED"]:
+        page = _merge_pending(page, core_id)
+    return page
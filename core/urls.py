@@ -1,8 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import IssueViewSet, AttachmentViewSet
+from .views import AlarmViewSet, AssetViewSet, DispatchViewSet, IssueAnalyticsViewSet, IssueViewSet, AttachmentViewSet
 
 router = DefaultRouter()
+router.register(r'assets', AssetViewSet, basename='asset')
 router.register(r'issues', IssueViewSet, basename='issue')
 router.register(r'attachments', AttachmentViewSet, basename='attachment')
+router.register(r'analytics', IssueAnalyticsViewSet, basename='analytics')
+router.register(r'alarms', AlarmViewSet, basename='alarm')
+router.register(r'dispatch', DispatchViewSet, basename='dispatch')
 urlpatterns = [ path('', include(router.urls)) ]
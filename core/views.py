@@ -1,23 +1,249 @@
-from rest_framework import viewsets, permissions
-from .models import Issue, Attachment
-from .serializers import IssueSerializer, AttachmentSerializer
+import logging
+
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from django.utils.dateparse import parse_datetime
+from . import alarms, analytics, archive, timeline
+from .lean import LeanListMixin
+from .lookup import InvalidCursor, asset_history, issue_events, typeahead_assets
+from .models import ArchivedIssue, Asset, Issue, Attachment
+from .redis_client import get_redis
+from .serializers import AssetSerializer, IssueSerializer, AttachmentSerializer
+
+log = logging.getLogger(__name__)
 
 class IsReporterOrManager(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
         if isinstance(obj, Issue):
-            return obj.reporter_id == request.user.id or (obj.assignee_id == request.user.id)
+            return request.user.id in (obj.created_by_id, obj.assigned_to_id)
         return False
 
-class IssueViewSet(viewsets.ModelViewSet):
-    queryset = Issue.objects.select_related("project","asset","reporter","assignee").all().order_by("-id")
+def _int_param(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValidationError({name: "must be an integer"})
+
+class AssetViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Asset.objects.select_related("project").all()
+    serializer_class = AssetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=["get"])
+    def lookup(self, request):
+        # GET /api/assets/lookup/?q=SN12&limit=10 —— 現場掃碼 / 輸入序號時的 typeahead
+        rows = typeahead_assets(request.query_params.get("q", ""), _int_param(request, "limit", 10))
+        return Response({"results": rows})
+
+    @action(detail=True, methods=["get"])
+    def history(self, request, pk=None):
+        # GET /api/assets/<id>/history/?issues_after=...&events_after=...&limit=20
+        asset = self.get_object()
+        try:
+            data = asset_history(
+                asset.id,
+                issues_after=request.query_params.get("issues_after"),
+                events_after=request.query_params.get("events_after"),
+                limit=_int_param(request, "limit", 20),
+            )
+        except InvalidCursor:
+            raise ValidationError({"cursor": "invalid cursor"})
+        data["asset"] = AssetSerializer(asset).data
+        return Response(data)
+
+def _datetime_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: "must be an ISO 8601 datetime"})
+    return parsed
+
+class IssueAnalyticsViewSet(viewsets.ViewSet):
+    """
+    /api/analytics/... —— 只讀 IssueStatusInterval 事實表，不掃描事件歷史。
+    共用參數：group_by=project|asset|assignee|customer、project、asset、customer、since、until
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _filters(self, request):
+        return {
+            "project": _int_param(request, "project", 0) or None,
+            "asset": _int_param(request, "asset", 0) or None,
+            "customer": request.query_params.get("customer") or None,
+            "since": _datetime_param(request, "since"),
+            "until": _datetime_param(request, "until"),
+        }
+
+    def _respond(self, request, func, default_group, **kwargs):
+        group_by = request.query_params.get("group_by", default_group)
+        if group_by not in analytics.DIMENSIONS:
+            raise ValidationError({"group_by": f"must be one of {', '.join(analytics.DIMENSIONS)}"})
+        rows = func(group_by=group_by, **kwargs, **self._filters(request))
+        return Response({"group_by": group_by, "unit": "seconds", "results": rows})
+
+    @action(detail=False, methods=["get"], url_path="time-in-status")
+    def time_in_status(self, request):
+        # GET /api/analytics/time-in-status/?status=waiting_parts,on_site&group_by=asset
+        statuses = [s for s in request.query_params.get("status", "").split(",") if s]
+        if not statuses:
+            raise ValidationError({"status": "required"})
+        return self._respond(request, analytics.time_in_status, "project", statuses=statuses)
+
+    @action(detail=False, methods=["get"])
+    def mttr(self, request):
+        return self._respond(request, analytics.mttr, "project")
+
+    @action(detail=False, methods=["get"])
+    def aging(self, request):
+        return self._respond(request, analytics.aging, "customer")
+
+class AlarmViewSet(viewsets.ViewSet):
+    """
+    POST /api/alarms/ —— 監控系統批次送入設備告警（core/alarms.py），body 為告警陣列或 {"alarms": [...]}。
+    收下即回 202，由背景任務去重並開單 / 追加事件；積壓過多時回 503 + Retry-After。
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = "alarms"
+
+    def create(self, request):
+        items = request.data.get("alarms") if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"alarms": "must be a non-empty list"})
+        if len(items) > settings.ALARMS["MAX_PER_REQUEST"]:
+            raise ValidationError({"alarms": f"at most {settings.ALARMS['MAX_PER_REQUEST']} per request"})
+        valid, errors = alarms.validate(items)
+        if not valid:
+            raise ValidationError({"alarms": errors})
+        try:
+            result = alarms.enqueue(valid)
+        except alarms.Backpressure as e:
+            return Response({"detail": "alarm backlog is full, retry later", "backlog": e.backlog},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={"Retry-After": str(e.retry_after)})
+        return Response({**result, "rejected": errors}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"])
+    def backlog(self, request):
+        # GET /api/alarms/backlog/ —— 積壓量與最近處理速率（送方可據此自行降速）
+        try:
+            r = get_redis()
+            alarms.ensure_group(r)
+            return Response(alarms.backlog(r))
+        except Exception as e:
+            log.warning("alarm backlog unavailable: %s", e)
+            return Response({"detail": "alarm stream unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+class DispatchViewSet(viewsets.ViewSet):
+    """
+    POST /api/dispatch/claim/ —— 領取下一件未指派的 FAE 問題（issues/dispatch.py），body 可選 customer、priority_max。
+    領到回 200 與問題內容；沒有可領取的問題時回 204。
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=["post"])
+    def claim(self, request):
+        from issues import dispatch
+
+        priority_max = request.data.get("priority_max")
+        if priority_max not in (None, ""):
+            try:
+                priority_max = int(priority_max)
+            except (TypeError, ValueError):
+                raise ValidationError({"priority_max": "must be an integer"})
+        else:
+            priority_max = None
+        issue = dispatch.claim_next(request.user, customer=request.data.get("customer") or None,
+                                    priority_max=priority_max)
+        if issue is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({"issue": dispatch.as_dict(issue)})
+
+class IssueViewSet(LeanListMixin, viewsets.ModelViewSet):
+    # issues.Issue 的鏡像列（legacy_id 非空）在切換前不對外，見 core/consolidation.py
+    queryset = Issue.objects.select_related("project","asset").filter(legacy_id__isnull=True).order_by("-id")
     serializer_class = IssueSerializer
+    lean_fields = IssueSerializer.Meta.fields
     permission_classes = [permissions.IsAuthenticated, IsReporterOrManager]
 
-class AttachmentViewSet(viewsets.ModelViewSet):
-    queryset = Attachment.objects.select_related("issue","uploaded_by").all()
+    def list(self, request, *args, **kwargs):
+        # GET /api/issues/?view=<saved view id>&page=2 —— id 清單走 Redis 快取，只查當頁
+        view_id = request.query_params.get("view")
+        if not view_id:
+            return super().list(request, *args, **kwargs)
+        from issues.models import SavedView
+        view = get_object_or_404(SavedView, pk=_int_param(request, "view", 0), owner=request.user,
+                                 target=SavedView.Target.CORE)
+        result = view.open_page(page=_int_param(request, "page", 1))
+        return Response({
+            "count": result["count"],
+            "truncated": result["truncated"],
+            "page": result["page"],
+            "pages": result["pages"],
+            "results": self.get_serializer(result["items"], many=True).data,
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # 已封存：由 core.archive 的快照唯讀回應
+            pk = str(self.kwargs.get(self.lookup_field, ""))
+            issue, related = archive.load(ArchivedIssue.Source.CORE, int(pk)) if pk.isdigit() else (None, {})
+            if issue is None:
+                raise
+            self.check_object_permissions(request, issue)
+            return Response({
+                **self.get_serializer(issue).data,
+                "archived": True,
+                "archived_at": issue.archived_at,
+                "events": [{"event_type": e.event_type, "to_value": e.to_value, "created_at": e.created_at}
+                           for e in related["core.IssueEvent"]],
+            })
+
+    @action(detail=False, methods=["get"])
+    def archived(self, request):
+        # GET /api/issues/archived/?q=<標題關鍵字或 #id>&limit=50 —— 搜尋已封存的問題（非 staff 只看自己的）
+        rows = archive.search(request.query_params.get("q", ""), source=ArchivedIssue.Source.CORE,
+                              limit=max(1, min(_int_param(request, "limit", 50), 200)), user=request.user)
+        return Response({"results": [
+            {"id": row.original_id, "title": row.title, "status": row.status, "project": row.project_id,
+             "closed_at": row.closed_at, "archived_at": row.archived_at}
+            for row in rows
+        ]})
+
+    @action(detail=True, methods=["get"])
+    def events(self, request, pk=None):
+        # GET /api/issues/<id>/events/?after=...&limit=20 —— 含尚未寫入資料庫的事件（id 為 null）
+        issue = self.get_object()
+        try:
+            data = issue_events(issue.id, after=request.query_params.get("after"),
+                                limit=_int_param(request, "limit", 20))
+        except InvalidCursor:
+            raise ValidationError({"cursor": "invalid cursor"})
+        return Response(data)
+
+    @action(detail=True, methods=["get"])
+    def timeline(self, request, pk=None):
+        # GET /api/issues/<id>/timeline/?after=...&limit=30 —— 留言、事件、附件合併，新到舊
+        issue = self.get_object()
+        try:
+            data = timeline.issue_timeline(issue.id, issue.legacy_id, after=request.query_params.get("after"),
+                                           limit=_int_param(request, "limit", 0) or None)
+        except InvalidCursor:
+            raise ValidationError({"cursor": "invalid cursor"})
+        return Response(data)
+
+class AttachmentViewSet(LeanListMixin, viewsets.ModelViewSet):
+    queryset = Attachment.objects.select_related("issue").all()
     serializer_class = AttachmentSerializer
     permission_classes = [permissions.IsAuthenticated, IsReporterOrManager]
-    def perform_create(self, serializer):
-        serializer.save(uploaded_by=self.request.user)
+    lean_fields = [f for f in AttachmentSerializer.Meta.fields if f != "file"]  # file 為 write-only
@@ -0,0 +1,464 @@
+"""
+客戶端 webhook：問題事件依專案的訂閱（WebhookSubscription）推送到客戶自己的系統。
+
+    commit ──publish()──▶ webhooks:queue（zset，score = 到期時間）──▶ manage.py webhook_worker
+                                                                       └─ asyncio + PooledClient 並行 POST
+
+- 每個訂閱一筆投遞；本文在排入時序列化，重送時內容不變。接收端以 X-Webhook-Delivery 去重（至少一次）。
+- 簽章：X-Webhook-Signature: t=<unix 秒>,v1=<hex(HMAC-SHA256(secret, "<t>.<本文>"))>；接收端可用 verify_signature()。
+- 取出（CLAIM_LUA）時把投遞的 score 延到租約到期：worker 當掉時，其他 worker 在租約到期後重送。
+- 失敗：連線錯誤、逾時、408 / 5xx 以 full-jitter 指數退避重送（有 Retry-After 時照辦），
+  超過 MAX_ATTEMPTS 或 MAX_AGE、或其他 4xx 進入 webhooks:dead（保留最近 DEAD_KEEP 筆）；410 Gone 停用訂閱。
+- 斷路器（每個訂閱一個 webhooks:breaker:<id>）：連續 BREAKER_THRESHOLD 次失敗後暫停該端點，
+  暫停時間由 BREAKER_COOLDOWN 起倍增；到期後只放一筆試探（半開），成功才恢復。
+  429 只依 Retry-After 暫停端點，不計入失敗次數。
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .async_http import HTTPError, PooledClient
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+QUEUE_KEY = "webhooks:queue"
+DEAD_KEY = "webhooks:dead"
+BREAKER_KEY = "webhooks:breaker:{}"
+PROBE_KEY = "webhooks:probe:{}"
+
+DEAD_KEEP = 1000
+ERROR_MAX_BACKOFF = 30.0  # worker 遇到 Redis / 資料庫錯誤時的最長退避（秒）
+RETRYABLE_STATUS = {408, 425, 500, 502, 503, 504}
+USER_AGENT = "fae-issue-report-webhooks/1"
+
+CLAIM_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[1], ARGV[3], member)
+end
+return due
+"""
+
+_scripts = {}
+
+
+def _conf(name):
+    return settings.WEBHOOKS[name]
+
+
+def _lease() -> float:
+    # 超過單次請求的逾時即可；過短會在慢端點上重複投遞
+    return _conf("TIMEOUT") * 2 + 30
+
+
+# ---------------------------------------------------------------- 簽章
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    mac = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={mac}"
+
+
+def verify_signature(secret: str, header: str, body: bytes, tolerance: int = None, now: float = None) -> bool:
+    """接收端驗證：簽章相符且時間戳在 tolerance 秒內（防重放）。"""
+    try:
+        fields = dict(part.split("=", 1) for part in (header or "").split(","))
+        timestamp = int(fields["t"])
+    except (KeyError, ValueError):
+        return False
+    tolerance = _conf("SIGNATURE_TOLERANCE") if tolerance is None else tolerance
+    if abs((now or time.time()) - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), f"t={timestamp},v1={fields.get('v1', '')}")
+
+
+# ---------------------------------------------------------------- 排入
+
+def issue_payload(issue) -> dict:
+    base_url = os.environ.get("APP_BASE_URL", "http://localhost:8080")
+    return {
+        "id": issue.pk,
+        "title": issue.title,
+        "status": issue.status,
+        "priority": issue.priority,
+        "assignee": issue.assignee,
+        "customer": issue.customer,
+        "project_id": issue.project_id,
+        "asset_id": issue.asset_id,
+        "sla_due_at": issue.sla_due_at,
+        "created_at": issue.created_at,
+        "updated_at": issue.updated_at,
+        "url": f"{base_url}/admin/core/issue/{issue.pk}/change/",
+    }
+
+
+def publish(events) -> int:
+    """
+    events：[(core.Issue, event, event_key)]，commit 之後呼叫（core/signals.py、core/alarms.py）。
+    每個符合的訂閱排入一筆投遞，回傳排入筆數；Redis 無法連線時記錄 warning 後略過。
+    """
+    from .models import WebhookSubscription
+
+    project_ids = {issue.project_id for issue, _, _ in events if issue.project_id}
+    if not project_ids:
+        return 0
+    subscriptions = {}
+    for sub in WebhookSubscription.objects.filter(project_id__in=project_ids, is_active=True) \
+            .only("id", "project_id", "events"):
+        subscriptions.setdefault(sub.project_id, []).append(sub)
+    if not subscriptions:
+        return 0
+
+    now = time.time()
+    occurred_at = timezone.now()
+    queued = {}
+    for issue, event, event_key in events:
+        targets = [sub for sub in subscriptions.get(issue.project_id, ()) if sub.wants(event)]
+        if not targets:
+            continue
+        event_key = event_key or uuid.uuid4().hex
+        body = json.dumps({"id": event_key, "event": event, "occurred_at": occurred_at,
+                           "issue": issue_payload(issue)}, cls=DjangoJSONEncoder, separators=(",", ":"))
+        for sub in targets:
+            queued[json.dumps({"id": f"{event_key}-{sub.pk}", "sub": sub.pk, "event": event,
+                               "body": body, "attempt": 0, "at": now})] = now
+    if not queued:
+        return 0
+    try:
+        get_redis().zadd(QUEUE_KEY, queued)
+    except Exception as e:
+        log.warning("webhook queue unavailable, %d deliveries dropped: %s", len(queued), e)
+        return 0
+    return len(queued)
+
+
+# ---------------------------------------------------------------- 取出 / 結算（同步，由 worker 經 sync_to_async 呼叫）
+
+class Job(NamedTuple):
+    raw: str
+    delivery: dict
+    subscription: object
+
+
+class Outcome(NamedTuple):
+    kind: str  # ok / retry / dead / gone
+    status: int = None
+    error: str = ""
+    delay: float = 0.0  # Retry-After（秒）
+    failure: bool = False  # 計入斷路器
+
+
+def retry_delay(attempt: int, retry_after: float = 0.0) -> float:
+    if retry_after:
+        return retry_after + random.uniform(0, max(1.0, retry_after * 0.2))
+    return random.uniform(1.0, max(1.0, min(_conf("MAX_BACKOFF"), 2 ** attempt)))
+
+
+def _claim_script(r):
+    if _scripts.get("claim_client") is not r:
+        _scripts["claim"] = r.register_script(CLAIM_LUA)
+        _scripts["claim_client"] = r
+    return _scripts["claim"]
+
+
+def _dead_entry(delivery, subscription, reason, status=None) -> str:
+    log.warning("webhook %s to subscription %s dropped: %s", delivery["id"], delivery["sub"], reason)
+    return json.dumps({**delivery, "url": getattr(subscription, "url", ""), "status": status,
+                       "reason": reason, "dead_at": time.time()})
+
+
+def claim(r, limit: int, stats: Counter = None) -> list:
+    """
+    取出最多 limit 筆到期的投遞（同時延到租約到期），回傳可送出的 [Job]。
+    斷路中的端點延後；半開的端點只放一筆試探；訂閱已停用或刪除的丟棄；超過 MAX_AGE 的進入 dead。
+    """
+    from .models import WebhookSubscription
+
+    now = time.time()
+    raws = _claim_script(r)(keys=[QUEUE_KEY], args=[now, limit, now + _lease()])
+    if not raws:
+        return []
+    jobs = [(raw, json.loads(raw)) for raw in raws]
+    sub_ids = sorted({delivery["sub"] for _, delivery in jobs})
+    subscriptions = WebhookSubscription.objects.filter(pk__in=sub_ids, is_active=True).in_bulk()
+    pipe = r.pipeline(transaction=False)
+    for sub_id in sub_ids:
+        pipe.hmget(BREAKER_KEY.format(sub_id), "failures", "open_until")
+    states = {sub_id: [float(v or 0) for v in state] for sub_id, state in zip(sub_ids, pipe.execute())}
+
+    ready, later, dropped, dead = [], {}, [], []
+    probes = {}
+    for raw, delivery in jobs:
+        sub = subscriptions.get(delivery["sub"])
+        if sub is None:
+            dropped.append(raw)
+            continue
+        if now - delivery.get("at", now) > _conf("MAX_AGE"):
+            dropped.append(raw)
+            dead.append(_dead_entry(delivery, sub, "max age exceeded"))
+            continue
+        failures, open_until = states[sub.pk]
+        if open_until > now:
+            later[raw] = open_until + random.uniform(0, 1)
+            continue
+        if failures >= _conf("BREAKER_THRESHOLD"):
+            # 半開：同一時間只有一個 worker 送出一筆試探，其餘等試探結果
+            if sub.pk not in probes:
+                probes[sub.pk] = bool(r.set(PROBE_KEY.format(sub.pk), 1, nx=True, ex=int(_lease())))
+                if probes[sub.pk]:
+                    ready.append(Job(raw, delivery, sub))
+                    continue
+            later[raw] = now + _conf("TIMEOUT") + random.uniform(0, 1)
+            continue
+        ready.append(Job(raw, delivery, sub))
+
+    if stats is not None:
+        stats.update(deferred=len(later), dropped=len(dropped) - len(dead), dead=len(dead))
+    if later or dropped or dead:
+        pipe = r.pipeline()
+        if later:
+            pipe.zadd(QUEUE_KEY, later, xx=True)
+        if dropped:
+            pipe.zrem(QUEUE_KEY, *dropped)
+        if dead:
+            pipe.lpush(DEAD_KEY, *dead)
+            pipe.ltrim(DEAD_KEY, 0, DEAD_KEEP - 1)
+        pipe.execute()
+    return ready
+
+
+def settle(r, results) -> Counter:
+    """結算一批 [(Job, Outcome)]：移出佇列、排入重送或 dead、更新斷路器。回傳各結果的計數。"""
+    from .models import WebhookSubscription
+
+    now = time.time()
+    stats = Counter()
+    succeeded, failed, paused, gone = set(), Counter(), {}, set()
+    errors = {}
+    pipe = r.pipeline()  # MULTI：舊的投遞移除與重送的投遞加入一起生效
+    for job, outcome in results:
+        delivery, sub = job.delivery, job.subscription
+        pipe.zrem(QUEUE_KEY, job.raw)
+        if outcome.kind == "ok":
+            stats["ok"] += 1
+            succeeded.add(sub.pk)
+            continue
+        if outcome.failure:
+            failed[sub.pk] += 1
+            errors[sub.pk] = outcome.error
+        if outcome.delay and not outcome.failure:
+            paused[sub.pk] = max(paused.get(sub.pk, 0), outcome.delay)
+        if outcome.kind == "retry":
+            delivery = {**delivery, "attempt": delivery["attempt"] + 1}
+            if delivery["attempt"] < _conf("MAX_ATTEMPTS"):
+                stats["retry"] += 1
+                pipe.zadd(QUEUE_KEY, {json.dumps(delivery): now + retry_delay(delivery["attempt"], outcome.delay)})
+                continue
+            outcome = outcome._replace(error=f"{outcome.error} (max attempts exceeded)")
+        elif outcome.kind == "gone":
+            gone.add(sub.pk)
+        stats["dead"] += 1
+        pipe.lpush(DEAD_KEY, _dead_entry(delivery, sub, outcome.error, outcome.status))
+        pipe.ltrim(DEAD_KEY, 0, DEAD_KEEP - 1)
+    pipe.execute()
+
+    _update_breakers(r, now, succeeded, failed, errors, paused)
+    if gone:
+        log.warning("webhook subscriptions %s returned 410 Gone, deactivating", sorted(gone))
+        WebhookSubscription.objects.filter(pk__in=gone).update(is_active=False)
+    return stats
+
+
+def _update_breakers(r, now, succeeded, failed, errors, paused):
+    keep = max(3600, _conf("BREAKER_MAX_COOLDOWN") * 2)
+    pipe = r.pipeline(transaction=False)
+    for sub_id in succeeded:
+        pipe.delete(BREAKER_KEY.format(sub_id), PROBE_KEY.format(sub_id))
+    failing = [sub_id for sub_id in failed if sub_id not in succeeded]
+    for sub_id in failing:
+        pipe.hincrby(BREAKER_KEY.format(sub_id), "failures", failed[sub_id])
+    counts = pipe.execute()[len(succeeded):]
+
+    pipe = r.pipeline(transaction=False)
+    for sub_id, count in zip(failing, counts):
+        key = BREAKER_KEY.format(sub_id)
+        mapping = {"last_error": errors[sub_id][:200], "last_failure_at": now}
+        if count >= _conf("BREAKER_THRESHOLD"):
+            cooldown = min(_conf("BREAKER_MAX_COOLDOWN"),
+                           _conf("BREAKER_COOLDOWN") * 2 ** (count - _conf("BREAKER_THRESHOLD")))
+            mapping["open_until"] = now + cooldown
+            pipe.delete(PROBE_KEY.format(sub_id))
+            log.warning("webhook subscription %s: circuit open for %ds after %d failures (%s)",
+                        sub_id, cooldown, count, errors[sub_id])
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, keep)
+    for sub_id, delay in paused.items():
+        if sub_id not in succeeded:
+            # 429：依 Retry-After 暫停端點（open_until 取較晚者）
+            key = BREAKER_KEY.format(sub_id)
+            pipe.hset(key, "open_until", max(now + delay, float(r.hget(key, "open_until") or 0)))
+            pipe.expire(key, keep)
+    pipe.execute()
+
+
+def status(r) -> dict:
+    now = time.time()
+    breakers = {}
+    for key in r.scan_iter(match=BREAKER_KEY.format("*"), count=1000):
+        key = key.decode() if isinstance(key, bytes) else key
+        state = {k.decode(): v.decode() for k, v in r.hgetall(key).items()}
+        failures, open_until = int(state.get("failures", 0)), float(state.get("open_until", 0))
+        if failures or open_until > now:
+            breakers[key.rsplit(":", 1)[1]] = {
+                "failures": failures,
+                "open_for": max(0, round(open_until - now)),
+                "last_error": state.get("last_error", ""),
+            }
+    return {
+        "queued": r.zcard(QUEUE_KEY),
+        "due": r.zcount(QUEUE_KEY, "-inf", now),
+        "dead": r.llen(DEAD_KEY),
+        "breakers": breakers,
+    }
+
+
+# ---------------------------------------------------------------- 投遞（asyncio）
+
+def classify(response) -> Outcome:
+    status = response.status
+    if status < 300:
+        return Outcome("ok", status)
+    retry_after = _parse_retry_after(response.headers.get("retry-after"))
+    if status == 429:
+        return Outcome("retry", status, "HTTP 429", delay=retry_after or _conf("BREAKER_COOLDOWN"))
+    if status in RETRYABLE_STATUS:
+        return Outcome("retry", status, f"HTTP {status}", delay=retry_after, failure=True)
+    if status == 410:
+        return Outcome("gone", status, "HTTP 410 Gone")
+    return Outcome("dead", status, f"HTTP {status}")
+
+
+def _parse_retry_after(value) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def deliver(client, job: Job):
+    delivery, sub = job.delivery, job.subscription
+    body = delivery["body"].encode()
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": USER_AGENT,
+        "X-Webhook-Event": delivery["event"],
+        "X-Webhook-Delivery": delivery["id"],
+        "X-Webhook-Signature": sign(sub.secret, int(time.time()), body),
+    }
+    try:
+        response = await client.post(sub.url, body, headers)
+    except HTTPError as e:
+        return job, Outcome("retry", None, str(e), failure=True)
+    except Exception as e:
+        # 不預期的錯誤（例如無法處理的 URL）：這筆進入 dead，不影響同一批的其他投遞與 worker
+        log.exception("webhook %s to subscription %s failed unexpectedly", delivery["id"], sub.pk)
+        return job, Outcome("dead", None, f"{type(e).__name__}: {e}")
+    return job, classify(response)
+
+
+class Worker:
+    """
+    持續補滿最多 CONCURRENCY 筆進行中的投遞；連線由 PooledClient 依主機共用。
+    Redis 與資料庫操作（claim / settle）以 sync_to_async 在同一條執行緒上執行，不阻塞事件迴圈。
+    """
+
+    def __init__(self, concurrency=None, per_host=None, timeout=None, batch_size=None, idle=1.0):
+        self.concurrency = concurrency or _conf("CONCURRENCY")
+        self.per_host = per_host or _conf("PER_HOST")
+        self.timeout = timeout or _conf("TIMEOUT")
+        self.batch_size = batch_size or _conf("BATCH_SIZE")
+        self.idle = idle
+        self.stats = Counter()
+
+    def _claim(self, limit):
+        from django.db import close_old_connections
+        close_old_connections()
+        return claim(get_redis(), limit, self.stats)
+
+    def _settle(self, results):
+        self.stats.update(settle(get_redis(), results))
+
+    async def run(self, stop: asyncio.Event, drain: bool = False) -> Counter:
+        """
+        stop 設定後不再取出新的投遞，等進行中的完成後結束；drain 時佇列沒有到期的投遞即結束。
+        claim / settle 失敗（Redis 或資料庫暫時無法連線）時記錄並退避後重試，worker 不結束；
+        尚未結算的結果保留到下次成功為止，期間不再取出新的投遞。
+        """
+        from asgiref.sync import sync_to_async
+
+        claim_jobs, settle_jobs = sync_to_async(self._claim), sync_to_async(self._settle)
+        client = PooledClient(per_host=self.per_host, timeout=self.timeout)
+        inflight, unsettled = set(), []
+        errors = 0
+
+        async def guarded(what, call, *args):
+            nonlocal errors
+            try:
+                result = await call(*args)
+            except Exception as e:
+                errors += 1
+                self.stats["errors"] += 1
+                delay = min(ERROR_MAX_BACKOFF, self.idle * 2 ** errors)
+                log.warning("webhook worker: %s failed, retrying in %.1fs: %s", what, delay, e)
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                except TimeoutError:
+                    pass
+                return False, None
+            errors = 0
+            return True, result
+
+        try:
+            while not stop.is_set():
+                if unsettled:
+                    settled, _ = await guarded("settle", settle_jobs, unsettled)
+                    if not settled:
+                        continue
+                    unsettled = []
+                room = self.concurrency - len(inflight)
+                if not inflight or room >= max(1, min(self.batch_size, self.concurrency) // 2):
+                    claimed, jobs = await guarded("claim", claim_jobs, min(room, self.batch_size))
+                    if not claimed and not inflight:
+                        continue
+                    inflight.update(asyncio.create_task(deliver(client, job)) for job in jobs or ())
+                if not inflight:
+                    if drain:
+                        break
+                    try:
+                        await asyncio.wait_for(stop.wait(), self.idle)
+                    except TimeoutError:
+                        pass
+                    continue
+                done, inflight = await asyncio.wait(inflight, timeout=self.idle,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+                unsettled += [task.result() for task in done]
+            if inflight:
+                done, _ = await asyncio.wait(inflight)
+                unsettled += [task.result() for task in done]
+            if unsettled and not (await guarded("settle", settle_jobs, unsettled))[0]:
+                log.warning("webhook worker: %d results not settled, redelivered after the lease", len(unsettled))
+        finally:
+            await client.aclose()
+        return self.stats
@@ -0,0 +1,29 @@
+"""
+gunicorn 設定（於 /app 執行時自動載入；命令列參數優先）。
+
+GUNICORN_PRELOAD=true（預設）時 master 先載入 Django 與 URLconf（見 app/startup.py），
+worker fork 後不必各自 import，滾動重啟與擴充 worker 時更快可服務。
+fork 前後的 DB / Redis 連線處理見 pre_fork / post_fork。
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "120"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "2"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+accesslog = "-"
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from app.startup import close_before_fork
+        close_before_fork()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.startup import reset_after_fork
+        reset_after_fork()
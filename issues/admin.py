@@ -1,13 +1,70 @@
-from django.contrib import admin
-from .models import Issue, Comment
+from django import forms
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from .models import BusinessCalendar, Comment, Holiday, Issue, IssueVersionConflict, SavedView, SlaTarget, WorkingHours
+
+class IssueAdminForm(forms.ModelForm):
+    # 開啟編輯頁時的 version 隨表單送回；存檔時以此比對（樂觀鎖，見 Issue.save）
+    class Meta:
+        model = Issue
+        fields = "__all__"
+        widgets = {"version": forms.HiddenInput}
+
+    def clean(self):
+        cleaned = super().clean()
+        if self.instance.pk and "version" in cleaned:
+            current = Issue.objects.filter(pk=self.instance.pk).values_list("version", flat=True).first()
+            if current is not None and current != cleaned["version"]:
+                raise forms.ValidationError("此問題已被他人修改，請重新載入後再編輯。")
+        return cleaned
 
 @admin.register(Issue)
 class IssueAdmin(admin.ModelAdmin):
+    form = IssueAdminForm
     list_display = ("id", "title", "priority", "status", "assigned_to", "created_by", "created_at")
     list_filter = ("priority", "status", "assigned_to")
+    list_select_related = ("assigned_to", "created_by")  # assigned_to 可為空，admin 不會自動 JOIN
     search_fields = ("title", "description")
     autocomplete_fields = ("assigned_to", "created_by")
 
+    def save_model(self, request, obj, form, change):
+        obj._actor = request.user  # 收件匣：動作者本人不算未讀（issues/inbox.py）
+        super().save_model(request, obj, form, change)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        # clean() 與 save() 之間被他人修改：交易已回滾，回到編輯頁重新載入最新內容
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except IssueVersionConflict:
+            self.message_user(request, "儲存時此問題已被他人修改，未儲存您的變更；請確認最新內容後再編輯。",
+                              messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ("id", "issue", "author", "created_at")
+
+class WorkingHoursInline(admin.TabularInline):
+    model = WorkingHours
+    extra = 0
+
+class HolidayInline(admin.TabularInline):
+    model = Holiday
+    extra = 0
+
+@admin.register(BusinessCalendar)
+class BusinessCalendarAdmin(admin.ModelAdmin):
+    # 工作時段 / 假日以 inline 編輯：存檔時會更新日曆的 updated_at，讓各行程的 SLA 索引重建
+    list_display = ("id", "name", "timezone", "is_default", "updated_at")
+    inlines = [WorkingHoursInline, HolidayInline]
+
+@admin.register(SlaTarget)
+class SlaTargetAdmin(admin.ModelAdmin):
+    list_display = ("id", "priority", "customer", "business_hours", "calendar")
+    list_filter = ("priority", "calendar")
+
+@admin.register(SavedView)
+class SavedViewAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "owner", "target", "updated_at")
+    list_filter = ("target",)
+    search_fields = ("name", "owner__username")
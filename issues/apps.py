@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class IssuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'issues'
+
+    def ready(self):
+        from . import signals  # noqa: F401  已儲存檢視的快取版本遞增
@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import inbox as _inbox
+
+
+def inbox(request):
+    """頁首的收件匣徽章：模板用到 inbox_badge 時才查 Redis（兩次 ZCARD）。"""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"inbox_badge": SimpleLazyObject(lambda: _inbox.badge(user))}
@@ -0,0 +1,86 @@
+"""
+派工佇列：領取下一件未指派的問題。
+
+順序為優先度（P0 最先）→ SLA 到期時間（早者先，未設定者最後）→ id，
+對應 issues_issue_claimable_idx 部分索引（只含未指派且狀態可領取的列），
+領取只讀索引最前面的一小段。
+
+PostgreSQL 上以 SELECT ... FOR UPDATE SKIP LOCKED 取列：多個派工者同時領取時，
+被別人鎖住的列直接跳過，不互相等待，也不會領到同一件。
+其他資料庫沒有 SKIP LOCKED，改靠 Issue.version 的樂觀鎖：衝突時換下一件重試。
+"""
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Issue, IssueVersionConflict
+
+log = logging.getLogger(__name__)
+
+CLAIMABLE_STATUSES = (Issue.Status.NEW, Issue.Status.TRIAGED, Issue.Status.REOPENED)
+MAX_ATTEMPTS = 5
+
+
+def claimable():
+    return Issue.objects.filter(assigned_to__isnull=True, status__in=CLAIMABLE_STATUSES)
+
+
+def claim_order(qs):
+    return qs.order_by("priority", F("sla_due_at").asc(nulls_last=True), "id")
+
+
+def claim_next(user, customer: str = None, priority_max: int = None):
+    """
+    把下一件可領取的問題指派給 user 並回傳；沒有可領取的問題時回傳 None。
+    customer / priority_max 可限定範圍（例如只接某客戶、只接 P0–P1）。
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        qs = claimable()
+        if customer:
+            qs = qs.filter(customer=customer)
+        if priority_max is not None:
+            qs = qs.filter(priority__lte=priority_max)
+        try:
+            with transaction.atomic():
+                qs = claim_order(qs)
+                if connection.vendor == "postgresql":
+                    qs = qs.select_for_update(skip_locked=True)
+                issue = qs.first()
+                if issue is None:
+                    return None
+                issue.assigned_to = user
+                issue._actor = user  # 收件匣：自己領取的不算未讀
+                issue.save(update_fields=["assigned_to", "updated_at"])
+                return issue
+        except IssueVersionConflict:
+            log.info("claim conflict for %s (attempt %d), trying the next issue", user, attempt + 1)
+    return None
+
+
+def pick_assignee(users):
+    """派工 worker 用：從 users 中選出目前未結案指派數最少者。"""
+    open_statuses = [s for s in Issue.Status.values if s not in (Issue.Status.RESOLVED, Issue.Status.CLOSED)]
+    loads = dict(
+        Issue.objects.filter(assigned_to__in=users, status__in=open_statuses)
+        .values_list("assigned_to").annotate(n=Count("id"))
+    )
+    return min(users, key=lambda u: (loads.get(u.pk, 0), u.pk)) if users else None
+
+
+def backlog_count(customer: str = None) -> int:
+    qs = claimable()
+    return qs.filter(customer=customer).count() if customer else qs.count()
+
+
+def as_dict(issue) -> dict:
+    return {
+        "id": issue.pk,
+        "title": issue.title,
+        "priority": issue.priority,
+        "status": issue.status,
+        "customer": issue.customer,
+        "sla_due_at": issue.sla_due_at,
+        "assigned_to": issue.assigned_to_id,
+        "version": issue.version,
+    }
@@ -1,24 +1,16 @@
 from django import forms
-from django.utils import timezone
 from .models import Issue, Comment
 
 class IssueForm(forms.ModelForm):
-    # 覆寫 sla_due_at，提供 datetime-local 輸入與相容的 input_formats
     title = forms.CharField(
         widget=forms.TextInput(attrs={'class': 'mt-1 block w-full border border-gray-300 rounded-md shadow-sm p-2 focus:ring-blue-500 focus:border-blue-500 text-gray-900'})
     )
-    
-    sla_due_at = forms.DateTimeField(
-        required=False,
-        widget=forms.DateTimeInput(
-            attrs={'type': 'datetime-local', 'class': 'vDateTimeInput'}
-        ),
-        input_formats=['%Y-%m-%dT%H:%M']
-    )
+
 
     class Meta:
         model = Issue
-        fields = ['title', 'description', 'priority', 'status', 'assigned_to', 'sla_due_at']
+        # sla_due_at 由 issues.sla 依優先度 / 客戶的工作時數目標自動計算，不再手動輸入
+        fields = ['title', 'description', 'priority', 'status', 'assigned_to', 'customer']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'vTextField', 'placeholder': 'Short summary'}),
             'description': forms.Textarea(attrs={'rows': 6, 'class': 'vLargeTextField', 'placeholder': 'Details, steps, expected/actual...'}),
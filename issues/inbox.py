@@ -0,0 +1,314 @@
+"""
+個人收件匣：指派給我的問題，以及我關注的問題有哪些新動態（留言、狀態變更、指派）。
+
+Redis 結構（皆可由資料庫重建：manage.py inbox_rebuild）
+- inbox:u:<user>:assigned    zset  指派給此人且未結案的問題 → 最近動態時間
+- inbox:u:<user>:unread      zset  有未讀動態的問題 → 最近一筆未讀動態時間
+- inbox:u:<user>:unread_n    hash  問題 → 未讀則數
+- inbox:i:<issue>            hash  問題摘要（標題、狀態、優先度、客戶、SLA、最近動態）
+- inbox:i:<issue>:watchers   set   關注者：開單者、負責人、留言者
+
+- 動態在 commit 後寫入（issues/signals.py）；動作者本人不算未讀。動作者取自 instance._actor
+  （admin / dispatch 會設定；新建時為開單者），沒有時通知所有關注者。
+- 已讀標記（LastSeen）存在資料庫：開啟問題詳細頁時 upsert，並清除該問題的未讀。
+- 頁首徽章只做兩次 ZCARD；收件匣頁面以 ZREVRANGE 分頁再批次 HGETALL 摘要，都不掃描問題 / 留言表
+  （摘要遺失時才以主鍵補查並寫回）。
+- Redis 無法連線時：動態略過（log.warning，之後以 inbox_rebuild 補回），
+  徽章不顯示，頁面退回以資料庫列出指派給我的問題。
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+ASSIGNED_KEY = "inbox:u:{}:assigned"
+UNREAD_KEY = "inbox:u:{}:unread"
+UNREAD_COUNT_KEY = "inbox:u:{}:unread_n"
+ISSUE_KEY = "inbox:i:{}"
+WATCHERS_KEY = "inbox:i:{}:watchers"
+
+CLOSED_STATUSES = ("RESOLVED", "CLOSED")
+BOXES = ("unread", "assigned")
+KIND_LABELS = {"created": "新問題", "comment": "留言", "status": "狀態變更", "assigned": "指派"}
+
+
+def _conf(name):
+    return settings.INBOX[name]
+
+
+def _ts(value) -> float:
+    return (value or timezone.now()).timestamp()
+
+
+def summary(issue) -> dict:
+    return {
+        "id": issue.pk,
+        "title": issue.title,
+        "status": issue.status,
+        "priority": issue.priority,
+        "customer": issue.customer or "",
+        "sla_due_at": _ts(issue.sla_due_at) if issue.sla_due_at else "",
+    }
+
+
+def _is_open(issue) -> bool:
+    return issue.status not in CLOSED_STATUSES
+
+
+# ---------------------------------------------------------------- 寫入（signals）
+
+def record(issue, kind, actor_id=None, actor="", at=None, detail="", extra_watchers=()):
+    """
+    記下一筆動態：更新摘要、加入關注者，關注者（動作者除外）的未讀 +1。
+    負責人的指派清單同時更新最近動態時間。
+    """
+    at = _ts(at)
+    watchers = {w for w in (issue.created_by_id, issue.assigned_to_id, actor_id, *extra_watchers) if w}
+    try:
+        r = get_redis()
+        pipe = r.pipeline()
+        pipe.hset(ISSUE_KEY.format(issue.pk), mapping={
+            **summary(issue), "last_kind": kind, "last_actor": actor, "last_at": at, "last_detail": detail[:200]})
+        pipe.sadd(WATCHERS_KEY.format(issue.pk), *watchers)
+        pipe.smembers(WATCHERS_KEY.format(issue.pk))
+        members = {int(w) for w in pipe.execute()[-1]}
+
+        pipe = r.pipeline(transaction=False)
+        for user_id in members - {actor_id}:
+            pipe.zadd(UNREAD_KEY.format(user_id), {issue.pk: at})
+            pipe.hincrby(UNREAD_COUNT_KEY.format(user_id), issue.pk, 1)
+        if issue.assigned_to_id and _is_open(issue):
+            pipe.zadd(ASSIGNED_KEY.format(issue.assigned_to_id), {issue.pk: at})
+        pipe.execute()
+    except Exception as e:
+        log.warning("inbox update for issue %s failed: %s", issue.pk, e)
+
+
+def on_issue_saved(issue, created, previous_status, previous_assignee):
+    user = getattr(issue, "_actor", None) or (issue.created_by if created else None)
+    actor_id, actor = (user.pk, user.get_username()) if user else (None, "")
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        if previous_assignee and previous_assignee != issue.assigned_to_id:
+            pipe.zrem(ASSIGNED_KEY.format(previous_assignee), issue.pk)
+        if issue.assigned_to_id and not _is_open(issue):
+            pipe.zrem(ASSIGNED_KEY.format(issue.assigned_to_id), issue.pk)
+        pipe.execute()
+    except Exception as e:
+        log.warning("inbox update for issue %s failed: %s", issue.pk, e)
+
+    if created:
+        record(issue, "created", actor_id, actor, issue.created_at, issue.title)
+    elif issue.assigned_to_id != previous_assignee:
+        record(issue, "assigned", actor_id, actor, issue.updated_at,
+               "已指派" if issue.assigned_to_id else "取消指派")
+    elif issue.status != previous_status:
+        record(issue, "status", actor_id, actor, issue.updated_at, issue.get_status_display())
+    else:
+        # 其他欄位（標題、優先度…）只更新摘要，不算新動態
+        try:
+            get_redis().hset(ISSUE_KEY.format(issue.pk), mapping=summary(issue))
+        except Exception as e:
+            log.warning("inbox update for issue %s failed: %s", issue.pk, e)
+
+
+def on_comment(comment):
+    issue = comment.issue
+    record(issue, "comment", comment.author_id, comment.author.get_username(), comment.created_at, comment.text)
+
+
+def on_issue_deleted(issue_id, assigned_to_id):
+    try:
+        r = get_redis()
+        watchers = r.smembers(WATCHERS_KEY.format(issue_id))
+        pipe = r.pipeline(transaction=False)
+        for user_id in {int(w) for w in watchers} | ({assigned_to_id} if assigned_to_id else set()):
+            pipe.zrem(ASSIGNED_KEY.format(user_id), issue_id)
+            pipe.zrem(UNREAD_KEY.format(user_id), issue_id)
+            pipe.hdel(UNREAD_COUNT_KEY.format(user_id), issue_id)
+        pipe.delete(ISSUE_KEY.format(issue_id), WATCHERS_KEY.format(issue_id))
+        pipe.execute()
+    except Exception as e:
+        log.warning("inbox cleanup for issue %s failed: %s", issue_id, e)
+
+
+# ---------------------------------------------------------------- 讀取
+
+def mark_seen(user, issue_id):
+    """開啟問題詳細頁：upsert 已讀標記（一個查詢），清除該問題的未讀。"""
+    from .models import LastSeen
+
+    LastSeen.objects.bulk_create([LastSeen(user=user, issue_id=issue_id, seen_at=timezone.now())],
+                                 update_conflicts=True, unique_fields=["user", "issue"], update_fields=["seen_at"])
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zrem(UNREAD_KEY.format(user.pk), issue_id)
+        pipe.hdel(UNREAD_COUNT_KEY.format(user.pk), issue_id)
+        pipe.execute()
+    except Exception as e:
+        log.warning("inbox mark seen failed: %s", e)
+
+
+def badge(user):
+    """{"unread": 有未讀動態的問題數, "assigned": 指派給我的未結案問題數}；Redis 無法連線時回傳 None。"""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zcard(UNREAD_KEY.format(user.pk))
+        pipe.zcard(ASSIGNED_KEY.format(user.pk))
+        unread, assigned = pipe.execute()
+    except Exception as e:
+        log.warning("inbox badge failed: %s", e)
+        return None
+    return {"unread": unread, "assigned": assigned}
+
+
+def _item(issue_id, data, unread_count, score) -> dict:
+    due = data.get("sla_due_at")
+    last_at = data.get("last_at")
+    return {
+        "id": issue_id,
+        "title": data.get("title", ""),
+        "status": data.get("status", ""),
+        "priority": int(data["priority"]) if data.get("priority", "") != "" else None,
+        "customer": data.get("customer", ""),
+        "sla_due_at": datetime.fromtimestamp(float(due), tz=dt_timezone.utc) if due else None,
+        "last_kind": KIND_LABELS.get(data.get("last_kind"), ""),
+        "last_actor": data.get("last_actor", ""),
+        "last_detail": data.get("last_detail", ""),
+        "last_at": datetime.fromtimestamp(float(last_at or score), tz=dt_timezone.utc),
+        "unread": int(unread_count or 0),
+    }
+
+
+def _decode(raw: dict) -> dict:
+    return {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+            for k, v in raw.items()}
+
+
+def _fill_missing(r, ids) -> dict:
+    """摘要遺失（Redis 重啟、過去未記錄）的問題：以主鍵補查並寫回；已刪除的回傳不含該 id。"""
+    from .models import Issue
+
+    found = {}
+    pipe = r.pipeline(transaction=False)
+    for issue in Issue.objects.filter(pk__in=ids):
+        found[issue.pk] = {k: str(v) for k, v in summary(issue).items()}
+        pipe.hset(ISSUE_KEY.format(issue.pk), mapping=found[issue.pk])
+    pipe.execute()
+    return found
+
+
+def open_page(user, box="unread", page=1) -> dict:
+    """收件匣的一頁：items 依最近動態新到舊；degraded 表示 Redis 無法連線、改由資料庫列出。"""
+    size = _conf("PAGE_SIZE")
+    page = max(1, page)
+    key = (UNREAD_KEY if box == "unread" else ASSIGNED_KEY).format(user.pk)
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        pipe.zcard(key)
+        pipe.zrevrange(key, (page - 1) * size, page * size - 1, withscores=True)
+        total, rows = pipe.execute()
+        ids = [int(member) for member, _ in rows]
+        summaries, counts = {}, {}
+        if ids:
+            pipe = r.pipeline(transaction=False)
+            for issue_id in ids:
+                pipe.hgetall(ISSUE_KEY.format(issue_id))
+            pipe.hmget(UNREAD_COUNT_KEY.format(user.pk), ids)
+            *raws, unread = pipe.execute()
+            summaries = {issue_id: _decode(raw) for issue_id, raw in zip(ids, raws) if raw}
+            counts = dict(zip(ids, unread))
+
+        missing = [issue_id for issue_id in ids if issue_id not in summaries]
+        if missing:
+            summaries.update(_fill_missing(r, missing))
+            gone = [issue_id for issue_id in missing if issue_id not in summaries]
+            if gone:
+                r.zrem(key, *gone)
+                total -= len(gone)
+        items = [_item(issue_id, summaries[issue_id], counts.get(issue_id), score)
+                 for (member, score), issue_id in zip(rows, ids) if issue_id in summaries]
+    except Exception as e:
+        log.warning("inbox page failed, falling back to the database: %s", e)
+        return _db_page(user, box, page, size)
+    return {"box": box, "items": items, "total": total, "page": page,
+            "pages": max(1, -(-total // size)), "degraded": False}
+
+
+def _db_page(user, box, page, size) -> dict:
+    from .models import Issue
+
+    if box != "assigned":
+        return {"box": box, "items": [], "total": 0, "page": 1, "pages": 1, "degraded": True}
+    qs = Issue.objects.filter(assigned_to=user).exclude(status__in=CLOSED_STATUSES).order_by("-updated_at")
+    total = qs.count()
+    items = [_item(issue.pk, summary(issue), 0, issue.updated_at.timestamp())
+             for issue in qs[(page - 1) * size: page * size]]
+    return {"box": box, "items": items, "total": total, "page": page,
+            "pages": max(1, -(-total // size)), "degraded": True}
+
+
+# ---------------------------------------------------------------- 重建
+
+def rebuild(user_ids=None, batch_size=1000) -> dict:
+    """
+    由資料庫重建收件匣（Redis 資料遺失、大量匯入或 signals 被略過之後）。
+    未結案問題的開單者、負責人、留言者為關注者；已讀標記之後他人的留言算未讀，
+    沒有標記時只算最近 INBOX["REBUILD_DAYS"] 天。user_ids 指定時只重建這些人。
+    """
+    from .models import Comment, Issue, LastSeen
+
+    cutoff = timezone.now() - timedelta(days=_conf("REBUILD_DAYS"))
+    r = get_redis()
+    wanted = set(user_ids) if user_ids else None
+    if wanted:
+        for user_id in wanted:
+            r.delete(ASSIGNED_KEY.format(user_id), UNREAD_KEY.format(user_id), UNREAD_COUNT_KEY.format(user_id))
+    else:
+        for pattern in ("inbox:u:*", "inbox:i:*"):
+            keys = list(r.scan_iter(match=pattern, count=1000))
+            for i in range(0, len(keys), 1000):
+                r.delete(*keys[i:i + 1000])
+
+    issues_done = unread_total = 0
+    qs = Issue.objects.exclude(status__in=CLOSED_STATUSES).order_by("pk")
+    last_pk = 0
+    while True:
+        batch = list(qs.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        ids = [issue.pk for issue in batch]
+        comments = {}
+        for issue_id, author_id, created_at in (Comment.objects.filter(issue_id__in=ids)
+                                                .values_list("issue_id", "author_id", "created_at")):
+            comments.setdefault(issue_id, []).append((author_id, created_at))
+        seen = {(user_id, issue_id): seen_at for user_id, issue_id, seen_at in
+                LastSeen.objects.filter(issue_id__in=ids).values_list("user_id", "issue_id", "seen_at")}
+
+        pipe = r.pipeline(transaction=False)
+        for issue in batch:
+            thread = comments.get(issue.pk, [])
+            watchers = {w for w in (issue.created_by_id, issue.assigned_to_id) if w} | {a for a, _ in thread}
+            last_at = max([issue.updated_at] + [c for _, c in thread])
+            pipe.hset(ISSUE_KEY.format(issue.pk), mapping={**summary(issue), "last_at": last_at.timestamp()})
+            pipe.sadd(WATCHERS_KEY.format(issue.pk), *watchers)
+            if issue.assigned_to_id and (wanted is None or issue.assigned_to_id in wanted):
+                pipe.zadd(ASSIGNED_KEY.format(issue.assigned_to_id), {issue.pk: last_at.timestamp()})
+            for user_id in watchers if wanted is None else watchers & wanted:
+                since = seen.get((user_id, issue.pk), cutoff)
+                unread = [c for a, c in thread if a != user_id and c > since]
+                if unread:
+                    pipe.zadd(UNREAD_KEY.format(user_id), {issue.pk: max(unread).timestamp()})
+                    pipe.hset(UNREAD_COUNT_KEY.format(user_id), issue.pk, len(unread))
+                    unread_total += 1
+        pipe.execute()
+        issues_done += len(batch)
+    return {"issues": issues_done, "unread": unread_total}
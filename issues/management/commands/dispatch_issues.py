@@ -0,0 +1,51 @@
+"""
+派工 worker：持續把未指派的問題分給一組值班人員（issues/dispatch.py）。
+
+    python manage.py dispatch_issues --assignee alice --assignee bob          # 分完目前的佇列後結束
+    python manage.py dispatch_issues --assignee alice --loop --interval 10    # 常駐；可同時啟動多個
+    python manage.py dispatch_issues --assignee alice --customer ACME --priority-max 1
+
+每次領取一件並交給目前未結案指派數最少的人；多個 worker 並行時由 SKIP LOCKED 分開，不會重複指派。
+"""
+import signal
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from issues import dispatch
+
+
+class Command(BaseCommand):
+    help = "Assign unassigned issues to the least-loaded of the given users, one claim at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assignee", action="append", required=True, help="username (repeatable)")
+        parser.add_argument("--customer", default=None)
+        parser.add_argument("--priority-max", type=int, default=None, help="only claim P0..N")
+        parser.add_argument("--loop", action="store_true", help="keep polling when the queue is empty")
+        parser.add_argument("--interval", type=float, default=5.0, help="seconds to wait when the queue is empty")
+        parser.add_argument("--max", type=int, default=None, help="stop after N assignments")
+
+    def handle(self, *args, **opts):
+        users = list(get_user_model().objects.filter(username__in=opts["assignee"], is_active=True))
+        missing = set(opts["assignee"]) - {u.get_username() for u in users}
+        if missing:
+            raise CommandError(f"unknown or inactive users: {', '.join(sorted(missing))}")
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        assigned = 0
+        while not stopping and (opts["max"] is None or assigned < opts["max"]):
+            close_old_connections()
+            user = dispatch.pick_assignee(users)
+            issue = dispatch.claim_next(user, customer=opts["customer"], priority_max=opts["priority_max"])
+            if issue is None:
+                if not opts["loop"]:
+                    break
+                time.sleep(opts["interval"])
+                continue
+            assigned += 1
+            self.stdout.write(f"  #{issue.pk} P{issue.priority} → {user.get_username()}")
+        self.stdout.write(self.style.SUCCESS(f"{assigned} issues assigned"))
@@ -0,0 +1,35 @@
+"""
+由資料庫重建收件匣的 Redis 資料（issues/inbox.py）：Redis 清空 / 遺失、大量匯入或 signals 曾被略過之後執行。
+
+    python manage.py inbox_rebuild                    # 全部重建
+    python manage.py inbox_rebuild --user alice       # 只重建指定使用者的未讀 / 指派清單
+
+沒有已讀標記的問題只計算最近 INBOX["REBUILD_DAYS"] 天的留言為未讀。
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from issues import inbox
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user inbox (unread and assigned sets) in Redis from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", help="username (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        user_ids = None
+        if opts["users"]:
+            users = get_user_model().objects.filter(username__in=opts["users"])
+            user_ids = [u.pk for u in users]
+            missing = set(opts["users"]) - {u.get_username() for u in users}
+            if missing:
+                raise CommandError(f"unknown users: {', '.join(sorted(missing))}")
+        try:
+            result = inbox.rebuild(user_ids, batch_size=opts["batch_size"])
+        except Exception as e:
+            raise CommandError(f"inbox rebuild failed: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['issues']} open issues indexed, {result['unread']} unread entries"))
@@ -0,0 +1,35 @@
+"""
+建立 / 補齊重複偵測用的 MinHash 簽章與 LSH 分桶（既有資料上線時執行一次；之後由 signal 增量更新）。
+
+    python manage.py similarity_index            # 只處理文字有變動或尚未建立的問題
+    python manage.py similarity_index --rebuild  # 調整 similarity 參數後全部重建
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from issues import similarity
+from issues.models import Issue, IssueSignature, IssueSimilarityBucket
+
+
+class Command(BaseCommand):
+    help = "Build or refresh MinHash signatures and LSH buckets for duplicate-issue detection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="drop existing signatures first")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        if opts["rebuild"]:
+            IssueSimilarityBucket.objects.all().delete()
+            IssueSignature.objects.all().delete()
+        qs = Issue.objects.only("id", "title", "description").order_by("id")
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(qs.filter(id__gt=last_id)[:opts["batch_size"]])
+            if not batch:
+                break
+            with transaction.atomic():
+                updated += sum(similarity.index_issue(issue) for issue in batch)
+            last_id = batch[-1].id
+        self.stdout.write(self.style.SUCCESS(f"{updated} issues indexed"))
@@ -0,0 +1,20 @@
+"""
+日曆、假日或 SLA 目標調整後，批次重算所有未結案問題的 sla_due_at。
+
+    python manage.py sla_recompute
+"""
+from django.core.management.base import BaseCommand
+
+from issues import sla
+
+
+class Command(BaseCommand):
+    help = "Recompute sla_due_at for all open issues from the current SLA calendars and targets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        sla.invalidate()
+        count = sla.recompute_open_issues(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{count} issues updated"))
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0003_alter_comment_options_alter_issue_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('timezone', models.CharField(default='Asia/Taipei', max_length=64)),
+                ('is_default', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='customer',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.CreateModel(
+            name='WorkingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Mon'), (1, 'Tue'), (2, 'Wed'), (3, 'Thu'), (4, 'Fri'), (5, 'Sat'), (6, 'Sun')])),
+                ('start', models.TimeField()),
+                ('end', models.TimeField()),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to='issues.businesscalendar')),
+            ],
+            options={
+                'ordering': ['calendar', 'weekday', 'start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='issues.businesscalendar')),
+            ],
+            options={
+                'ordering': ['calendar', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('calendar', 'date'), name='issues_holiday_calendar_date_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlaTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('priority', models.IntegerField(choices=[(0, 'P0 - Critical'), (1, 'P1 - High'), (2, 'P2 - Medium'), (3, 'P3 - Low')])),
+                ('customer', models.CharField(blank=True, max_length=200)),
+                ('business_hours', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('calendar', models.ForeignKey(blank=True, help_text='留空使用預設日曆', null=True, on_delete=django.db.models.deletion.SET_NULL, to='issues.businesscalendar')),
+            ],
+            options={
+                'ordering': ['customer', 'priority'],
+                'constraints': [models.UniqueConstraint(fields=('priority', 'customer'), name='issues_slatarget_priority_customer_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0005_saved_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueSignature',
+            fields=[
+                ('issue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='issues.issue')),
+                ('signature', models.BinaryField()),
+                ('text_digest', models.CharField(max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IssueSimilarityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_buckets', to='issues.issue')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'issue'], name='issues_simbucket_key_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issues', '0007_comment_timeline_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('assigned_to__isnull', True), ('status__in', ['NEW', 'TRIAGED', 'REOPENED'])), fields=['priority', 'sla_due_at', 'id'], name='issues_issue_claimable_idx'),
+        ),
+    ]
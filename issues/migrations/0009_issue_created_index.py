@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+import core.migration_operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('issues', '0008_issue_version_dispatch'),
+    ]
+
+    operations = [
+        core.migration_operations.AddIndexConcurrently(
+            model_name='issue',
+            index=models.Index(fields=['created_at'], name='issues_issue_created_idx'),
+        ),
+    ]
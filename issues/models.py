@@ -4,6 +4,10 @@ from django.contrib.auth import get_user_model
 # Get the custom user model (or default User)
 User = get_user_model()
 
+class IssueVersionConflict(Exception):
+    """儲存時資料庫中的 version 已被他人更新（樂觀鎖）；需重新載入後再修改。"""
+
+
 class Issue(models.Model):
     """Represents a tracked issue or bug report."""
     class Priority(models.IntegerChoices):
@@ -28,12 +32,192 @@ class Issue(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.NEW)
     created_by = models.ForeignKey(User, related_name="issues_created", on_delete=models.PROTECT)
     assigned_to = models.ForeignKey(User, related_name="issues_assigned", on_delete=models.SET_NULL, null=True, blank=True)
+    customer = models.CharField(max_length=200, blank=True)
     sla_due_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # 樂觀鎖：每次 save() 遞增，UPDATE 時比對讀取當下的值（見 _do_update）
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # 派工佇列（issues/dispatch.py）：只索引未指派、可領取的問題，依領取順序排列
+            models.Index(
+                fields=["priority", "sla_due_at", "id"], name="issues_issue_claimable_idx",
+                condition=models.Q(assigned_to__isnull=True, status__in=["NEW", "TRIAGED", "REOPENED"]),
+            ),
+            # 首頁列表依建立時間遞減取前 10 筆（manage.py index_advisor 的建議）
+            models.Index(fields=["created_at"], name="issues_issue_created_idx"),
+        ]
 
     def __str__(self):
-        return f'{self.author} 於 {self.created_at.strftime("%Y-%m-%d %H:%M")} 留言'
+        return f'#{self.pk} {self.title}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        # 記下載入時的優先度，save() 時判斷是否需要重算 SLA；狀態 / 負責人給收件匣判斷動態（issues/inbox.py）
+        instance._loaded_priority = loaded.get("priority")
+        instance._loaded_status = loaded.get("status")
+        instance._loaded_assigned_to_id = loaded.get("assigned_to_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        建立時自動計算 sla_due_at（未手動指定時）；優先度變更時依新目標重算。
+        更新時 version + 1，資料庫中的 version 已不是讀取時的值則丟出 IssueVersionConflict。
+        """
+        creating = self._state.adding
+        priority_changed = not creating and self.priority != getattr(self, "_loaded_priority", self.priority)
+        extra_fields = []
+        if (creating and self.sla_due_at is None) or priority_changed:
+            from .sla import compute_due_at
+            self.sla_due_at = compute_due_at(self)
+            extra_fields.append("sla_due_at")
+        if not creating:
+            self._expected_version = self.version
+            self.version += 1
+            extra_fields.append("version")
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = [*update_fields, *(f for f in extra_fields if f not in update_fields)]
+        try:
+            super().save(*args, **kwargs)
+        except IssueVersionConflict:
+            self.version = self._expected_version
+            raise
+        finally:
+            self._expected_version = None
+        self._loaded_priority = self.priority
+        self._loaded_status, self._loaded_assigned_to_id = self.status, self.assigned_to_id
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # UPDATE ... WHERE id = %s AND version = <讀取時的值>；0 列且該列仍存在即為衝突
+        expected = getattr(self, "_expected_version", None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        updated = super()._do_update(base_qs.filter(version=expected), using, pk_val, values,
+                                     update_fields, forced_update)
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise IssueVersionConflict(f"issue {pk_val} was modified by someone else (expected version {expected})")
+        return updated
+
+
+class BusinessCalendar(models.Model):
+    """SLA 計時用的工作日曆（工作時段 + 假日）。"""
+    name = models.CharField(max_length=100, unique=True)
+    timezone = models.CharField(max_length=64, default="Asia/Taipei")
+    is_default = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class WorkingHours(models.Model):
+    calendar = models.ForeignKey(BusinessCalendar, related_name="working_hours", on_delete=models.CASCADE)
+    weekday = models.IntegerField(choices=[(0, "Mon"), (1, "Tue"), (2, "Wed"), (3, "Thu"),
+                                           (4, "Fri"), (5, "Sat"), (6, "Sun")])
+    start = models.TimeField()
+    end = models.TimeField()
+
+    class Meta:
+        ordering = ["calendar", "weekday", "start"]
+
+
+class Holiday(models.Model):
+    calendar = models.ForeignKey(BusinessCalendar, related_name="holidays", on_delete=models.CASCADE)
+    date = models.DateField()
+    name = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ["calendar", "date"]
+        constraints = [
+            models.UniqueConstraint(fields=["calendar", "date"], name="issues_holiday_calendar_date_uniq"),
+        ]
+
+
+class SlaTarget(models.Model):
+    """
+    每個優先度（可再依客戶覆寫）的解決時限，以工作時數計。customer 留空為通用目標。
+    """
+    priority = models.IntegerField(choices=Issue.Priority.choices)
+    customer = models.CharField(max_length=200, blank=True)
+    business_hours = models.DecimalField(max_digits=6, decimal_places=2)
+    calendar = models.ForeignKey(BusinessCalendar, null=True, blank=True, on_delete=models.SET_NULL,
+                                 help_text="留空使用預設日曆")
+
+    class Meta:
+        ordering = ["customer", "priority"]
+        constraints = [
+            models.UniqueConstraint(fields=["priority", "customer"], name="issues_slatarget_priority_customer_uniq"),
+        ]
+
+
+class SavedView(models.Model):
+    """
+    使用者儲存的篩選條件。filters 存正規化後的結果（見 issues/saved_views.py）。
+    """
+    class Target(models.TextChoices):
+        ISSUES = "issues", "FAE 問題 (issues.Issue)"
+        CORE = "core", "專案問題 (core.Issue)"
+
+    owner = models.ForeignKey(User, related_name="saved_views", on_delete=models.CASCADE)
+    name = models.CharField(max_length=100)
+    target = models.CharField(max_length=10, choices=Target.choices, default=Target.ISSUES)
+    filters = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["owner", "name"]
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "name"], name="issues_savedview_owner_name_uniq"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        from .saved_views import normalize_filters
+        self.filters = normalize_filters(self.target, self.filters, self.owner if self.owner_id else None)
+
+    def open_page(self, page=1, page_size=None):
+        from .saved_views import open_page
+        return open_page(self.target, self.filters, page=page, page_size=page_size)
+
+
+class IssueSignature(models.Model):
+    """問題標題 + 描述的 MinHash 簽章（見 issues/similarity.py）。"""
+    issue = models.OneToOneField(Issue, primary_key=True, related_name="signature", on_delete=models.CASCADE)
+    signature = models.BinaryField()
+    text_digest = models.CharField(max_length=40)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class IssueSimilarityBucket(models.Model):
+    """LSH 分桶：每個問題每段簽章一列，依 key 查出候選問題。"""
+    issue = models.ForeignKey(Issue, related_name="similarity_buckets", on_delete=models.CASCADE)
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["key", "issue"], name="issues_simbucket_key_idx"),
+        ]
+
+class LastSeen(models.Model):
+    """收件匣的已讀標記：使用者最後一次開啟問題詳細頁的時間（見 issues/inbox.py）。"""
+    # 唯一約束 (user, issue) 的索引已涵蓋依 user 的查詢，不另建外鍵索引
+    user = models.ForeignKey(User, related_name="issue_last_seen", on_delete=models.CASCADE, db_index=False)
+    issue = models.ForeignKey(Issue, related_name="last_seen", on_delete=models.CASCADE)
+    seen_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "issue"], name="issues_lastseen_user_issue_uniq"),
+        ]
+
 
 # --- New Model Added to fix admin.py import error and SystemCheckError (E108) ---
 class Comment(models.Model):
@@ -59,5 +243,8 @@ class Comment(models.Model):
         verbose_name = '留言'
         verbose_name_plural = '留言'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['issue', 'created_at'], name='issues_comment_issue_ts_idx'),  # 時間軸（core/timeline.py）
+        ]
     def __str__(self):
         return f'{self.author} 於 {self.created_at.strftime("%Y-%m-%d %H:%M")} 留言'
@@ -0,0 +1,242 @@
+"""
+使用者儲存的問題檢視（SavedView）與結果集快取。
+
+- 篩選條件先正規化（白名單欄位、排序後的清單、"me" 換成使用者 id），
+  取 sha1 作為 filter hash；相同條件的檢視（不論誰存的）共用同一份快取。
+- 快取內容只有符合條件的 id 清單（依檢視排序，最多 SAVED_VIEW_CACHE["MAX_IDS"] 筆），
+  key = sv:ids:<target>:<filter hash>:<版本>。開啟檢視 = 一次 GET + 當頁 id 的主鍵查詢。
+- 版本計數器依範圍遞增：
+    issues.Issue 沒有專案欄位，整張表共用 "issues"；
+    core.Issue 寫入時遞增 "core:p<project_id>" 與 "core"，
+    有指定專案的檢視只看那幾個專案的版本，其他專案的寫入不會讓它失效。
+  計數器在 transaction commit 後才遞增（見 issues.signals），舊版本的 key 交給 TTL 回收。
+  core.Issue 換專案時只遞增新專案，舊專案的檢視最多延遲 TTL 秒。
+- queryset.update() / bulk_update 不會觸發 signal，呼叫端需自行 bump()。
+- Redis 無法連線時直接查資料庫，不影響頁面。
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from core.redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+VERSION_KEY = "sv:ver:{}"
+IDS_KEY = "sv:ids:{}:{}:{}"
+
+ISSUES_ORDERINGS = ("-created_at", "created_at", "-priority", "priority", "sla_due_at", "-updated_at")
+CORE_ORDERINGS = ("-updated_at", "-created_at", "created_at", "priority", "-id")
+
+
+def _conf(name):
+    return settings.SAVED_VIEW_CACHE[name]
+
+
+def _model(target):
+    if target == "core":
+        from core.models import Issue
+    else:
+        from .models import Issue
+    return Issue
+
+
+def _str_list(value):
+    if value in (None, "", []):
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = str(value).split(",")
+    return sorted({str(v).strip() for v in value if str(v).strip()})
+
+
+def _int_list(value, name):
+    try:
+        return sorted({int(v) for v in _str_list(value)})
+    except ValueError:
+        raise ValidationError({name: "必須是整數"})
+
+
+def _user_ref(value, user, name):
+    # "me" 在正規化時就換成實際 id：不同使用者的「指派給我」是不同的結果集
+    if value in (None, ""):
+        return None
+    if value == "none":
+        return "none"
+    if value == "me":
+        if user is None or not user.is_authenticated:
+            raise ValidationError({name: "需登入才能使用 me"})
+        return user.pk
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "必須是使用者 id、me 或 none"})
+
+
+def normalize_filters(target, raw, user=None) -> dict:
+    """
+    將表單 / querystring / JSON 的篩選條件轉成固定格式；未知欄位忽略，空值移除。
+    """
+    raw = raw or {}
+    get = raw.get
+    if hasattr(raw, "getlist"):  # QueryDict：?status=NEW&status=TRIAGED
+        get = lambda k: raw.getlist(k) if len(raw.getlist(k)) > 1 else raw.get(k)  # noqa: E731
+
+    out = {"q": (get("q") or "").strip()}
+    if target == "core":
+        statuses = {c for c, _ in _model("core").STATUS_CHOICES}
+        out["status"] = [s for s in _str_list(get("status")) if s in statuses]
+        out["priority"] = _str_list(get("priority"))
+        out["project"] = _int_list(get("project"), "project")
+        out["asset"] = _int_list(get("asset"), "asset")
+        assignee = (get("assignee") or "").strip()
+        if assignee == "me" and user is not None and user.is_authenticated:
+            assignee = user.get_username()
+        out["assignee"] = assignee
+        orderings = CORE_ORDERINGS
+    else:
+        Issue = _model("issues")
+        out["status"] = [s for s in _str_list(get("status")) if s in Issue.Status.values]
+        out["priority"] = [p for p in _int_list(get("priority"), "priority") if p in Issue.Priority.values]
+        out["assigned_to"] = _user_ref(get("assigned_to"), user, "assigned_to")
+        out["created_by"] = _user_ref(get("created_by"), user, "created_by")
+        out["customer"] = (get("customer") or "").strip()
+        out["open"] = str(get("open") or "").lower() in ("1", "true", "on")
+        orderings = ISSUES_ORDERINGS
+
+    order = get("order") or orderings[0]
+    out["order"] = order if order in orderings else orderings[0]
+    return {k: v for k, v in out.items() if v not in (None, "", [], False)}
+
+
+def filter_hash(target, filters) -> str:
+    payload = json.dumps([target, filters], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def build_queryset(target, filters):
+    Issue = _model(target)
+    qs = Issue.objects.all()
+    if filters.get("q"):
+        qs = qs.filter(title__icontains=filters["q"])
+    if filters.get("status"):
+        qs = qs.filter(status__in=filters["status"])
+    if filters.get("priority"):
+        qs = qs.filter(priority__in=filters["priority"])
+
+    if target == "core":
+        # issues.Issue 的鏡像列（legacy_id 非空）在切換前不對外，與 IssueViewSet.queryset 相同
+        qs = qs.filter(legacy_id__isnull=True)
+        if filters.get("project"):
+            qs = qs.filter(project_id__in=filters["project"])
+        if filters.get("asset"):
+            qs = qs.filter(asset_id__in=filters["asset"])
+        if filters.get("assignee"):
+            qs = qs.filter(assignee=filters["assignee"])
+    else:
+        for field in ("assigned_to", "created_by"):
+            value = filters.get(field)
+            if value == "none":
+                qs = qs.filter(**{f"{field}__isnull": True})
+            elif value is not None:
+                qs = qs.filter(**{f"{field}_id": value})
+        if filters.get("customer"):
+            qs = qs.filter(customer=filters["customer"])
+        if filters.get("open"):
+            qs = qs.exclude(status__in=[Issue.Status.RESOLVED, Issue.Status.CLOSED])
+
+    order = filters.get("order", "-id")
+    # 以 id 作為次要排序，讓同一時間建立的問題順序固定
+    return qs.order_by(order, "-id") if order != "-id" else qs.order_by("-id")
+
+
+def version_scopes(target, filters) -> list:
+    if target == "core":
+        if filters.get("project"):
+            return [f"core:p{pid}" for pid in filters["project"]]
+        return ["core"]
+    return ["issues"]
+
+
+def bump(*scopes):
+    """遞增版本計數器；所有以這些範圍為基礎的快取立即失效。"""
+    if not scopes:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(VERSION_KEY.format(scope))
+        pipe.execute()
+    except Exception as e:
+        # 漏掉的 bump 最多讓檢視舊 TTL 秒
+        log.warning("saved view version bump failed: %s", e)
+
+
+def bump_for_issue(target, project_ids=()):
+    if target == "core":
+        bump("core", *(f"core:p{pid}" for pid in project_ids if pid))
+    else:
+        bump("issues")
+
+
+def _cache_key(r, target, filters):
+    scopes = version_scopes(target, filters)
+    versions = r.mget([VERSION_KEY.format(s) for s in scopes])
+    stamp = ".".join((v or b"0").decode() for v in versions)
+    return IDS_KEY.format(target, filter_hash(target, filters), stamp)
+
+
+def result_ids(target, filters):
+    """
+    回傳 (id 清單, 是否來自快取)。清單長度上限為 MAX_IDS。
+    """
+    limit = _conf("MAX_IDS")
+    try:
+        r = get_redis()
+        key = _cache_key(r, target, filters)
+        packed = r.get(key)
+    except Exception as e:
+        log.warning("saved view cache unavailable: %s", e)
+        r = key = packed = None
+
+    if packed is not None:
+        return ([int(i) for i in packed.split(b",")] if packed else []), True
+
+    ids = list(build_queryset(target, filters).values_list("id", flat=True)[:limit])
+    if r is not None:
+        try:
+            r.set(key, ",".join(map(str, ids)), ex=_conf("TTL"))
+        except Exception as e:
+            log.warning("saved view cache write failed: %s", e)
+    return ids, False
+
+
+def open_page(target, filters, page=1, page_size=None):
+    """
+    取得檢視的某一頁：id 清單（通常來自快取）切片後以主鍵查詢當頁資料，並依清單順序排列。
+    """
+    page_size = page_size or _conf("PAGE_SIZE")
+    ids, cached = result_ids(target, filters)
+    pages = max(1, -(-len(ids) // page_size))
+    page = min(max(1, page), pages)
+    page_ids = ids[(page - 1) * page_size:page * page_size]
+
+    Issue = _model(target)
+    qs = Issue.objects.filter(pk__in=page_ids)
+    if target == "core":
+        # 當頁只回傳 core 自己的問題：快取的 id 清單即使含鏡像列（legacy_id 非空）也不會顯示
+        qs = qs.filter(legacy_id__isnull=True).select_related("project", "asset")
+    else:
+        qs = qs.select_related("assigned_to", "created_by")
+    by_id = {obj.pk: obj for obj in qs}
+    return {
+        # 快取之後才被刪除的問題直接略過，下一次版本遞增後就會消失
+        "items": [by_id[i] for i in page_ids if i in by_id],
+        "count": len(ids),
+        "truncated": len(ids) >= _conf("MAX_IDS"),
+        "page": page,
+        "pages": pages,
+        "cached": cached,
+    }
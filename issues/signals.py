@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import consolidation, timeline
+from core.models import Issue as CoreIssue
+from . import inbox, saved_views, similarity, sla
+from .models import BusinessCalendar, Comment, Holiday, Issue, SlaTarget, WorkingHours
+
+
+# commit 之後才遞增版本：避免讀取端在 commit 前以新版本快取到舊資料
+@receiver([post_save, post_delete], sender=Issue, dispatch_uid="issues_saved_view_bump_v1")
+def bump_issue_views(sender, instance, **kwargs):
+    transaction.on_commit(lambda: saved_views.bump_for_issue("issues"))
+
+
+@receiver([post_save, post_delete], sender=CoreIssue, dispatch_uid="core_issue_saved_view_bump_v1")
+def bump_core_issue_views(sender, instance, **kwargs):
+    project_id = instance.project_id
+    transaction.on_commit(lambda: saved_views.bump_for_issue("core", [project_id]))
+
+
+@receiver(post_save, sender=Issue, dispatch_uid="issues_similarity_index_v1")
+def index_issue_signature(sender, instance, raw=False, **kwargs):
+    # 只在 update_fields 不含標題 / 描述時略過；簽章計算為毫秒級，直接在同一交易內寫入
+    update_fields = kwargs.get("update_fields")
+    if raw or (update_fields is not None and not {"title", "description"} & set(update_fields)):
+        return
+    similarity.index_issue(instance)
+
+
+# 合併遷移的雙寫：同一交易內 upsert / 刪除 core.Issue 的鏡像列（core/consolidation.py）
+@receiver([post_save, post_delete], sender=Issue, dispatch_uid="issues_consolidation_dual_write_v1")
+def mirror_to_core_issue(sender, instance, raw=False, **kwargs):
+    if raw or not consolidation.dual_write_enabled():
+        return
+    with transaction.atomic():
+        consolidation.copy_ids([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Comment, dispatch_uid="issues_comment_timeline_v1")
+def bump_comment_timeline(sender, instance, **kwargs):
+    timeline.bump_on_commit("issues", instance.issue_id)
+
+
+# 收件匣：commit 後寫入 Redis；先取出修改前的狀態 / 負責人（Issue.from_db 記錄，save 之後才更新）
+@receiver(post_save, sender=Issue, dispatch_uid="issues_inbox_issue_v1")
+def inbox_issue_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = (getattr(instance, "_loaded_status", None), getattr(instance, "_loaded_assigned_to_id", None))
+    transaction.on_commit(lambda: inbox.on_issue_saved(instance, created, *previous))
+
+
+@receiver(post_delete, sender=Issue, dispatch_uid="issues_inbox_issue_deleted_v1")
+def inbox_issue_deleted(sender, instance, **kwargs):
+    issue_id, assigned_to_id = instance.pk, instance.assigned_to_id
+    transaction.on_commit(lambda: inbox.on_issue_deleted(issue_id, assigned_to_id))
+
+
+@receiver(post_save, sender=Comment, dispatch_uid="issues_inbox_comment_v1")
+def inbox_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: inbox.on_comment(instance))
+
+
+# SLA 設定調整：commit 後排程一次未結案問題的到期時間重算（issues/sla.py）
+@receiver([post_save, post_delete], sender=BusinessCalendar, dispatch_uid="issues_sla_calendar_v1")
+@receiver([post_save, post_delete], sender=SlaTarget, dispatch_uid="issues_sla_target_v1")
+def sla_settings_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(sla.schedule_recompute)
+
+
+@receiver([post_save, post_delete], sender=WorkingHours, dispatch_uid="issues_sla_working_hours_v1")
+@receiver([post_save, post_delete], sender=Holiday, dispatch_uid="issues_sla_holiday_v1")
+def sla_calendar_rows_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # 更新日曆的 updated_at（各行程的索引快取版本），不經 admin 的修改也會讓索引重建
+    BusinessCalendar.objects.filter(pk=instance.calendar_id).update(updated_at=timezone.now())
+    transaction.on_commit(sla.schedule_recompute)
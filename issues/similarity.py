@@ -0,0 +1,150 @@
+"""
+建立問題時的「可能重複」偵測：MinHash 簽章 + LSH 分桶。
+
+- shingle：英數字取單字；中日韓文字忽略空白與標點後取相鄰兩字（不需斷詞，
+  「3 號機台」與「3號機台」視為相同）。
+- MinHash：NUM_PERM 組雜湊各取最小值，兩份簽章相同位置相等的比例 ≈ Jaccard 相似度。
+  每個問題存兩份簽章：只有標題、標題 + 描述；草稿通常只有標題，長描述會稀釋相似度。
+- LSH：每份簽章切成 BANDS 段，每段雜湊成一個 bucket key 存進 IssueSimilarityBucket；
+  查詢時只取與草稿至少有一段相同 bucket 的問題（索引查詢），再以簽章估算相似度排序。
+  BANDS=16、ROWS=4 時，相似度約 0.5 以上的問題大多會成為候選。
+簽章在 issues.Issue 儲存時增量更新（見 issues/signals.py），標題與描述沒變就略過。
+"""
+import hashlib
+import re
+import struct
+import unicodedata
+from collections import Counter
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MAX_TEXT = 4000          # 超長描述只取前段，控制簽章計算時間
+MIN_SCORE = 0.3
+PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+TITLE, FULL = 0, 1       # 簽章種類；bucket key 含種類，兩種簽章的分桶互不相撞
+
+# 固定種子產生的雜湊參數：簽章會存進資料庫，參數不能隨行程改變
+_PARAMS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % PRIME)
+    for i in range(NUM_PERM)
+]
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+
+def shingles(text: str) -> set:
+    text = unicodedata.normalize("NFKC", (text or "")[:MAX_TEXT]).lower()
+    result = set(_WORD.findall(text))
+    cjk = "".join(_CJK.findall(text))
+    if len(cjk) == 1:
+        result.add(cjk)
+    result.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return result
+
+
+def _hash32(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "big")
+
+
+def minhash(text: str) -> list:
+    values = [_hash32(s) for s in shingles(text)]
+    if not values:
+        return []
+    return [min((a * v + b) % PRIME for v in values) & MAX_HASH for a, b in _PARAMS]
+
+
+def signatures(title: str, description: str = "") -> tuple:
+    """(標題簽章, 標題 + 描述簽章)；沒有描述時兩者相同。"""
+    title_sig = minhash(title)
+    return title_sig, (minhash(f"{title} {description}") if description.strip() else title_sig)
+
+
+def pack(sig: list) -> bytes:
+    return struct.pack(f">{len(sig)}I", *sig)
+
+
+def unpack(data: bytes) -> list:
+    return list(struct.unpack(f">{len(data) // 4}I", bytes(data)))
+
+
+def band_keys(sig: list, kind: int) -> list:
+    """每段簽章的 bucket key（帶種類與段號，不同段的相同值不會撞在一起）；64-bit 有號整數。"""
+    if len(sig) != NUM_PERM:
+        return []
+    keys = []
+    for band in range(BANDS):
+        chunk = struct.pack(f">BH{ROWS}I", kind, band, *sig[band * ROWS:(band + 1) * ROWS])
+        keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big", signed=True))
+    return keys
+
+
+def estimate(a: list, b: list) -> float:
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def score(draft: tuple, stored: list) -> float:
+    """stored 為 unpack 後的「標題簽章 + 全文簽章」；取兩種比對中較高者。"""
+    return max(estimate(draft[TITLE], stored[:NUM_PERM]), estimate(draft[FULL], stored[NUM_PERM:]))
+
+
+def _all_keys(sigs: tuple) -> set:
+    return set(band_keys(sigs[TITLE], TITLE)) | set(band_keys(sigs[FULL], FULL))
+
+
+def text_digest(title: str, description: str) -> str:
+    return hashlib.sha1(f"{title}\0{description}".encode()).hexdigest()
+
+
+def index_issue(issue):
+    """建立 / 更新單一問題的簽章與 bucket；文字沒變時不寫入。"""
+    from .models import IssueSignature, IssueSimilarityBucket
+
+    digest = text_digest(issue.title, issue.description)
+    current = IssueSignature.objects.filter(issue_id=issue.pk).values_list("text_digest", flat=True).first()
+    if current == digest:
+        return False
+    sigs = signatures(issue.title, issue.description)
+    IssueSignature.objects.update_or_create(
+        issue_id=issue.pk, defaults={"signature": pack(sigs[TITLE] + sigs[FULL]), "text_digest": digest},
+    )
+    IssueSimilarityBucket.objects.filter(issue_id=issue.pk).delete()
+    IssueSimilarityBucket.objects.bulk_create(
+        [IssueSimilarityBucket(issue_id=issue.pk, key=key) for key in _all_keys(sigs)]
+    )
+    return True
+
+
+def similar_open_issues(title: str, description: str = "", limit: int = 5, exclude=None,
+                        min_score: float = MIN_SCORE) -> list:
+    """
+    回傳 [(score, issue)]，依估計相似度由高到低，只含未結案問題。
+    """
+    from .models import Issue, IssueSignature, IssueSimilarityBucket
+
+    sigs = signatures(title, description)
+    keys = _all_keys(sigs)
+    if not keys:
+        return []
+    buckets = (IssueSimilarityBucket.objects
+               .filter(key__in=keys)
+               .exclude(issue__status__in=[Issue.Status.RESOLVED, Issue.Status.CLOSED]))
+    if exclude:
+        buckets = buckets.exclude(issue_id=exclude)
+    # 共同 bucket 數越多越可能相似；只對前段候選讀簽章，常見片語造成的大量碰撞不會拖慢查詢
+    hits = Counter(buckets.values_list("issue_id", flat=True))
+    candidates = [issue_id for issue_id, _ in hits.most_common(limit * 20)]
+    scored = []
+    for issue_id, data in IssueSignature.objects.filter(issue_id__in=candidates).values_list("issue_id", "signature"):
+        value = score(sigs, unpack(data))
+        if value >= min_score:
+            scored.append((value, issue_id))
+    scored.sort(reverse=True)
+    scored = scored[:limit]
+    issues = Issue.objects.in_bulk([issue_id for _, issue_id in scored])
+    return [(value, issues[issue_id]) for value, issue_id in scored if issue_id in issues]
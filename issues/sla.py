@@ -0,0 +1,307 @@
+"""
+工作時數 SLA 計算。
+
+每個工作日曆預先展開成排序好的工作區間 [start, end)（epoch 秒），並建立累計工作秒數的前綴和：
+    cum[i] = 區間 i 之前的工作秒數總和
+- business_seconds(t)：bisect 找到 t 所在區間，O(log n)
+- add_business_seconds(t, s)：bisect 累計值找到落點區間，O(log n)
+- remaining：兩個時間點的累計值相減
+
+日曆在行程內快取，以 BusinessCalendar.updated_at 作為版本；工作時段 / 假日異動時
+由 admin 存檔更新 updated_at。批次模式在有 numpy 時以 searchsorted 向量化處理；
+超出索引範圍（HORIZON_BACK_DAYS / HORIZON_AHEAD_DAYS）時與逐筆計算一樣拋出 OverflowError，
+add_business_seconds_batch 則改以各自的日曆範圍逐筆計算，不會默默截到範圍邊界。
+"""
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+log = logging.getLogger(__name__)
+
+HORIZON_BACK_DAYS = 400
+HORIZON_AHEAD_DAYS = 730
+DUE_TOLERANCE = 1.0  # 秒；批次與逐筆計算的浮點誤差不算改變
+RECOMPUTE_FLAG_KEY = "sla:recompute_scheduled"
+RECOMPUTE_DELAY = 5  # 秒；等同一次 admin 存檔的其他列（inline）也 commit
+
+_index_cache = {}  # calendar key -> CalendarIndex
+_np = False  # 尚未載入；None 表示未安裝
+
+
+def _numpy():
+    """numpy 為選用且 import 成本高：第一次批次計算時才載入，沒有時退回逐筆 bisect。"""
+    global _np
+    if _np is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _np = numpy
+    return _np
+
+
+class CalendarIndex:
+    def __init__(self, tz, hours_by_weekday, holidays, first_day: date, last_day: date, version=None):
+        self.tz = ZoneInfo(tz)
+        self.hours_by_weekday = hours_by_weekday
+        self.holidays = set(holidays)
+        self.version = version
+        self.first_day, self.last_day = first_day, last_day
+        self._build()
+
+    def _build(self):
+        starts, ends, cum = [], [], []
+        total = 0.0
+        day = self.first_day
+        while day <= self.last_day:
+            if day not in self.holidays:
+                for start, end in self.hours_by_weekday.get(day.weekday(), ()):
+                    s = datetime.combine(day, start, self.tz).timestamp()
+                    e = datetime.combine(day, end, self.tz).timestamp()
+                    if e > s:
+                        starts.append(s)
+                        ends.append(e)
+                        cum.append(total)
+                        total += e - s
+            day += timedelta(days=1)
+        if not starts:
+            raise ValueError("calendar has no working hours")
+        self.starts, self.ends, self.cum, self.total = starts, ends, cum, total
+        self.lo = datetime.combine(self.first_day, time.min, self.tz).timestamp()
+        self.hi = datetime.combine(self.last_day + timedelta(days=1), time.min, self.tz).timestamp()
+        self._arrays = None
+
+    def _as_arrays(self, np):
+        if self._arrays is None:
+            self._arrays = (np.array(self.starts), np.array(self.ends), np.array(self.cum))
+        return self._arrays
+
+    def covers(self, ts: float) -> bool:
+        return self.lo <= ts < self.hi
+
+    def business_seconds(self, ts: float) -> float:
+        """自日曆起點到 ts 的累計工作秒數。"""
+        i = bisect_right(self.starts, ts) - 1
+        if i < 0:
+            return 0.0
+        return self.cum[i] + min(ts - self.starts[i], self.ends[i] - self.starts[i])
+
+    def at_business_seconds(self, target: float) -> float:
+        """business_seconds 的反函數：累計值達到 target 的最早時間點。"""
+        # 找 cum[i] < target <= cum[i] + 區間長度；剛好用完時回傳該區間的結束點，而非下一段的開始
+        i = max(0, min(bisect_left(self.cum, target) - 1, len(self.starts) - 1))
+        return min(self.starts[i] + (target - self.cum[i]), self.ends[i])
+
+    def add_business_seconds(self, ts: float, seconds: float) -> float:
+        target = self.business_seconds(ts) + seconds
+        if target > self.total:
+            raise OverflowError("beyond calendar horizon")
+        return self.at_business_seconds(target)
+
+    def business_seconds_many(self, ts_list):
+        np = _numpy()
+        if np is None:
+            return [self.business_seconds(t) for t in ts_list]
+        starts, ends, cum = self._as_arrays(np)
+        ts = np.asarray(ts_list, dtype=float)
+        i = np.searchsorted(starts, ts, side="right") - 1
+        valid = i >= 0
+        j = np.clip(i, 0, None)
+        out = cum[j] + np.minimum(ts - starts[j], ends[j] - starts[j])
+        return np.where(valid, out, 0.0).tolist()
+
+    def add_business_seconds_many(self, ts_list, seconds_list):
+        """add_business_seconds 的批次版；任一筆的起點或結果超出索引範圍時拋出 OverflowError。"""
+        if any(not self.covers(t) for t in ts_list):
+            raise OverflowError("start outside calendar horizon")
+        base = self.business_seconds_many(ts_list)
+        targets = [b + s for b, s in zip(base, seconds_list)]
+        if any(t > self.total for t in targets):
+            raise OverflowError("beyond calendar horizon")
+        np = _numpy()
+        if np is None:
+            return [self.at_business_seconds(t) for t in targets]
+        starts, ends, cum = self._as_arrays(np)
+        t = np.asarray(targets, dtype=float)
+        i = np.clip(np.searchsorted(cum, t, side="left") - 1, 0, len(starts) - 1)
+        return np.minimum(starts[i] + (t - cum[i]), ends[i]).tolist()
+
+
+def _default_hours():
+    hours = {}
+    for weekday, start, end in settings.SLA_DEFAULTS["WORKING_HOURS"]:
+        hours.setdefault(weekday, []).append((time.fromisoformat(start), time.fromisoformat(end)))
+    return hours
+
+
+def _load_calendar(calendar_id):
+    from .models import BusinessCalendar
+
+    qs = BusinessCalendar.objects.filter(pk=calendar_id) if calendar_id else \
+        BusinessCalendar.objects.filter(is_default=True)
+    return qs.order_by("id").first()
+
+
+def get_index(calendar_id=None, around: datetime = None) -> CalendarIndex:
+    """
+    取得（必要時建立）日曆索引。calendar_id 為 None 時用預設日曆；
+    資料庫沒有任何日曆時使用 settings.SLA_DEFAULTS 的工作時段。
+    """
+    around = around or timezone.now()
+    calendar = _load_calendar(calendar_id)
+    key = calendar.pk if calendar else None
+    version = calendar.updated_at if calendar else None
+
+    cached = _index_cache.get(key)
+    if cached and cached.version == version and cached.covers(around.timestamp()):
+        return cached
+
+    if calendar:
+        hours = {}
+        for wh in calendar.working_hours.all():
+            hours.setdefault(wh.weekday, []).append((wh.start, wh.end))
+        holidays = list(calendar.holidays.values_list("date", flat=True))
+        tz = calendar.timezone
+    else:
+        hours, holidays, tz = _default_hours(), [], settings.TIME_ZONE
+    if not hours:
+        hours = _default_hours()
+
+    center = around.astimezone(ZoneInfo(tz)).date()
+    index = CalendarIndex(tz, hours, holidays,
+                          center - timedelta(days=HORIZON_BACK_DAYS),
+                          center + timedelta(days=HORIZON_AHEAD_DAYS),
+                          version=version)
+    _index_cache[key] = index
+    return index
+
+
+def get_target(priority, customer=""):
+    """
+    回傳 (工作時數, calendar_id)：客戶專屬目標優先，其次通用目標，最後為 settings 預設值。
+    """
+    from .models import SlaTarget
+
+    targets = {t.customer: t for t in SlaTarget.objects.filter(priority=priority, customer__in={customer or "", ""})}
+    target = targets.get(customer) or targets.get("")
+    if target:
+        return float(target.business_hours), target.calendar_id
+    return float(settings.SLA_DEFAULTS["TARGET_HOURS"][int(priority)]), None
+
+
+def add_business_hours(start: datetime, hours: float, calendar_id=None) -> datetime:
+    index = get_index(calendar_id, around=start)
+    ts = index.add_business_seconds(start.timestamp(), hours * 3600)
+    return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+
+
+def add_business_seconds_batch(ts_list, seconds_list, calendar_id=None, index: CalendarIndex = None) -> list:
+    """
+    批次計算到期時間（epoch 秒）：先以涵蓋最早起點的索引一次算完；
+    有超出範圍的項目時改為依起點排序逐筆計算，需要時以該起點為中心重建索引。
+    重建後仍超出（工時過長）時拋出 OverflowError，與 add_business_hours 相同。
+    """
+    if not ts_list:
+        return []
+    index = index or get_index(calendar_id, around=datetime.fromtimestamp(min(ts_list), tz=dt_timezone.utc))
+    try:
+        return index.add_business_seconds_many(ts_list, seconds_list)
+    except OverflowError:
+        pass
+    out = [None] * len(ts_list)
+    for i in sorted(range(len(ts_list)), key=ts_list.__getitem__):
+        ts, seconds = ts_list[i], seconds_list[i]
+        try:
+            if not index.covers(ts):
+                raise OverflowError("start outside calendar horizon")
+            out[i] = index.add_business_seconds(ts, seconds)
+        except OverflowError:
+            index = get_index(calendar_id, around=datetime.fromtimestamp(ts, tz=dt_timezone.utc))
+            out[i] = index.add_business_seconds(ts, seconds)
+    return out
+
+
+def business_seconds_between(start: datetime, end: datetime, calendar_id=None) -> float:
+    """end 早於 start 時為負值（例如已逾期）。"""
+    index = get_index(calendar_id, around=start)
+    return index.business_seconds(end.timestamp()) - index.business_seconds(start.timestamp())
+
+
+def compute_due_at(issue) -> datetime:
+    hours, calendar_id = get_target(issue.priority, getattr(issue, "customer", ""))
+    start = issue.created_at or timezone.now()
+    return add_business_hours(start, hours, calendar_id)
+
+
+def remaining_many(due_list, now: datetime = None, calendar_id=None) -> list:
+    """
+    批次計算多筆 sla_due_at 的剩餘工作秒數（逾期為負值，None 保持 None）。
+    重新評估大量未結案問題時使用，一次 searchsorted 取代逐筆迴圈。
+    """
+    if all(d is None for d in due_list):
+        return [None] * len(due_list)
+    now = now or timezone.now()
+    index = get_index(calendar_id, around=now)
+    base = index.business_seconds(now.timestamp())
+    present = [d.timestamp() for d in due_list if d is not None]
+    values = iter(index.business_seconds_many(present))
+    return [None if d is None else next(values) - base for d in due_list]
+
+
+def recompute_open_issues(queryset=None, batch_size=1000) -> int:
+    """
+    重新計算未結案問題的 sla_due_at（日曆或 SLA 目標調整後，見 schedule_recompute）。
+    依 (priority, customer) 分組，每組以一次向量化運算算出所有到期時間；
+    只 bulk_update 到期時間實際改變的列，回傳更新的列數。
+    """
+    from .models import Issue
+
+    if queryset is None:
+        queryset = Issue.objects.exclude(status__in=[Issue.Status.RESOLVED, Issue.Status.CLOSED])
+    rows = list(queryset.values_list("id", "priority", "customer", "created_at", "sla_due_at"))
+
+    groups = {}
+    for pk, priority, customer, created_at, stored in rows:
+        groups.setdefault((priority, customer), []).append((pk, created_at, stored))
+
+    updates = []
+    for (priority, customer), items in groups.items():
+        hours, calendar_id = get_target(priority, customer)
+        due = add_business_seconds_batch([c.timestamp() for _, c, _ in items], [hours * 3600] * len(items),
+                                         calendar_id)
+        # version 只在到期時間改變的列遞增：重算前讀取的畫面之後再存檔會得到版本衝突，而不是蓋回舊的到期時間
+        updates += [Issue(pk=pk, sla_due_at=datetime.fromtimestamp(ts, tz=dt_timezone.utc), version=F("version") + 1)
+                    for (pk, _, stored), ts in zip(items, due)
+                    if stored is None or abs(stored.timestamp() - ts) >= DUE_TOLERANCE]
+
+    Issue.objects.bulk_update(updates, ["sla_due_at", "version"], batch_size=batch_size)
+    if updates:
+        # bulk_update 不觸發 post_save；依 sla_due_at 排序的已儲存檢視需要失效
+        from .saved_views import bump
+        bump("issues")
+    return len(updates)
+
+
+def schedule_recompute(countdown: float = RECOMPUTE_DELAY):
+    """
+    日曆、工作時段、假日或 SLA 目標存檔後排程一次重算（issues/signals.py，commit 之後呼叫）。
+    以 NX 旗標合併 admin 一次存檔觸發的多個 signal；Redis 無法連線時照常排程。
+    """
+    from core.redis_client import get_redis
+
+    try:
+        if not get_redis().set(RECOMPUTE_FLAG_KEY, 1, nx=True, ex=int(countdown) + 60):
+            return
+    except Exception as e:
+        log.warning("SLA recompute flag unavailable: %s", e)
+    from .tasks import recompute_sla_due
+    recompute_sla_due.apply_async(countdown=countdown)
+
+
+def invalidate():
+    _index_cache.clear()
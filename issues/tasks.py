@@ -0,0 +1,22 @@
+import logging
+
+from celery import shared_task
+
+from app import celery_app  # noqa: F401  確保任務綁定到專案的 Celery app
+
+from . import sla
+
+log = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def recompute_sla_due():
+    """日曆或 SLA 目標調整後重算未結案問題的 sla_due_at（scans 佇列，由 sla.schedule_recompute 排程）。"""
+    from core.redis_client import get_redis
+
+    try:
+        get_redis().delete(sla.RECOMPUTE_FLAG_KEY)  # 重算期間的再次調整需要另一次重算
+    except Exception as e:
+        log.warning("SLA recompute flag unavailable: %s", e)
+    sla.invalidate()
+    sla.recompute_open_issues()
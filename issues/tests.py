@@ -1,3 +1,970 @@
-from django.test import TestCase
+import importlib.util
+import json
+import time
+from collections import Counter
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import webhooks
+from core.async_http import Response
+from core.models import Asset, Attachment, Issue as CoreIssue, Project, WebhookSubscription
+from core.querybudget import QueryBudgetMixin
+from .models import Comment, Issue, IssueVersionConflict
+
+User = get_user_model()
+HAS_DRF = importlib.util.find_spec("rest_framework") is not None
+HAS_FAKEREDIS = importlib.util.find_spec("fakeredis") is not None
+
+
+def fake_redis():
+    import fakeredis
+
+    return fakeredis.FakeRedis()
+
+
+# 測試不跑 collectstatic：改用不需 manifest 的 storage
+@override_settings(STORAGES={**settings.STORAGES, "staticfiles": {
+    "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}})
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    各頁面 / 端點的查詢數預算：資料量增加時查詢數必須固定（見 core/querybudget.py）。
+    計畫快照：QUERY_PLANS=update python manage.py test issues，並提交 core/query_plans/ 的變更。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("budget-admin", "admin@example.com", "pw")
+        cls.project = Project.objects.create(name="P", customer="ACME")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _user(self, i):
+        return User.objects.get_or_create(username=f"budget-{i}")[0]
+
+    def grow_issues(self, n):
+        for i in range(Issue.objects.count(), n):
+            Issue.objects.create(title=f"issue {i}", created_by=self._user(i), assigned_to=self._user(i + 1),
+                                 customer="ACME")
+
+    def grow_core_issues(self, n):
+        for i in range(CoreIssue.objects.count(), n):
+            asset = Asset.objects.create(name=f"A{i}", serial_no=f"SN{i}", location="F1", project=self.project)
+            CoreIssue.objects.create(title=f"core {i}", priority="P2", assignee="", project=self.project, asset=asset)
+
+    def test_home(self):
+        self.assertQueryBudget("issues.home", lambda: self.client.get("/"), self.grow_issues, 8)
+
+    def test_detail(self):
+        self.grow_issues(1)
+        issue = Issue.objects.get()
+
+        def grow(n):
+            for i in range(issue.comments.count(), n):
+                Comment.objects.create(issue=issue, author=self._user(i), text=f"comment {i}")
+
+        self.assertQueryBudget("issues.detail", lambda: self.client.get(f"/{issue.pk}/"), grow, 8)
+
+    def test_admin_issue_changelist(self):
+        self.assertQueryBudget("admin.issues.issue", lambda: self.client.get("/admin/issues/issue/"),
+                               self.grow_issues, 12)
+
+    def test_admin_comment_changelist(self):
+        self.grow_issues(1)
+        issue = Issue.objects.get()
+
+        def grow(n):
+            for i in range(Comment.objects.count(), n):
+                Comment.objects.create(issue=issue, author=self._user(i), text=f"comment {i}")
+
+        self.assertQueryBudget("admin.issues.comment", lambda: self.client.get("/admin/issues/comment/"), grow, 10)
+
+    def test_admin_core_issue_changelist(self):
+        self.assertQueryBudget("admin.core.issue", lambda: self.client.get("/admin/core/issue/"),
+                               self.grow_core_issues, 12)
+
+    def test_admin_asset_changelist(self):
+        self.assertQueryBudget("admin.core.asset", lambda: self.client.get("/admin/core/asset/"),
+                               self.grow_core_issues, 10)
+
+    def test_admin_attachment_changelist(self):
+        def grow(n):
+            self.grow_core_issues(n)
+            for issue in CoreIssue.objects.filter(attachment__isnull=True)[:max(0, n - Attachment.objects.count())]:
+                Attachment.objects.create(issue=issue, original_name=f"{issue.pk}.txt", content_type="text/plain")
+
+        self.assertQueryBudget("admin.core.attachment", lambda: self.client.get("/admin/core/attachment/"), grow, 10)
+
+    @skipUnless(HAS_DRF, "djangorestframework is not installed")
+    def test_issue_serializer(self):
+        from core.serializers import IssueSerializer
+        from core.views import IssueViewSet
+
+        self.assertQueryBudget("api.IssueSerializer",
+                               lambda: IssueSerializer(IssueViewSet.queryset.all(), many=True).data,
+                               self.grow_core_issues, 1)
+
+    @skipUnless(settings.API_ENABLED, "API_ENABLED is off")
+    def test_api_issue_list(self):
+        self.assertQueryBudget("api.issues.list", lambda: self.client.get("/api/issues/"),
+                               self.grow_core_issues, 4)
+
+
+class BackupTests(SimpleTestCase):
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.media = self.root / "media"
+        (self.media / "docs").mkdir(parents=True)
+        (self.media / "docs" / "a.txt").write_bytes(b"log line\n" * 1000)
+        (self.media / "docs" / "copy.txt").write_bytes(b"log line\n" * 1000)
+        (self.media / "photo.png").write_bytes(b"\x89PNG" + bytes(range(256)) * 4)
+        settings_override = override_settings(BACKUP_ROOT=str(self.root / "backups"), MEDIA_ROOT=str(self.media))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_incremental_snapshot_restores_identical_media(self):
+        from core import backup
+
+        first, stats = backup.create_snapshot(include_db=False, workers=2)
+        self.assertEqual((stats["media"]["files"], stats["media"]["hashed"], stats["media"]["stored"]), (3, 3, 2))
+        second, stats = backup.create_snapshot(include_db=False, workers=2)
+        self.assertEqual((stats["media"]["hashed"], stats["media"]["stored"]), (0, 0))
+        self.assertEqual(backup.list_snapshots(), [first, second])
+
+        entries = backup.load_manifest(second)["media"]
+        self.assertEqual({e["codec"] for e in entries.values()}, {"gzip", "none"})
+        self.assertEqual(backup.verify_media(entries, workers=2), [])
+        target = self.root / "restored"
+        backup.restore_media(entries, target, workers=2)
+        for rel in entries:
+            self.assertEqual((target / rel).read_bytes(), (self.media / rel).read_bytes())
+
+        backup.object_path(entries["photo.png"]["object"]).write_bytes(b"corrupt")
+        self.assertEqual(backup.verify_media(entries, workers=2), ["photo.png"])
+
+
+class AttachmentTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media = override_settings(MEDIA_ROOT=tmp.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.owner, self.stranger = User.objects.create_user("owner"), User.objects.create_user("stranger")
+        project = Project.objects.create(name="T", customer="ACME")
+        self.issue = CoreIssue.objects.create(title="photo", priority="P2", assignee="", project=project,
+                                              created_by=self.owner)
+
+    def _attach(self, name, data, content_type):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return Attachment.objects.create(issue=self.issue, file=SimpleUploadedFile(name, data, content_type))
+
+    def _png(self, size):
+        import io
+
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new("RGB", size, (200, 30, 30)).save(buf, "PNG")
+        return buf.getvalue()
+
+    def test_image_and_text_derivatives(self):
+        from PIL import Image
+
+        from core import thumbnails
+
+        image = self._attach("wafer.png", self._png((2000, 1000)), "image/png")
+        result = thumbnails.generate(image)
+        self.assertEqual(sorted(result), ["preview.jpg", "preview.webp", "thumb.jpg", "thumb.webp"])
+        with image.file.storage.open(result["thumb.webp"], "rb") as fp:
+            self.assertEqual(Image.open(fp).size, (320, 160))
+        self.assertEqual(thumbnails.generate(image), result)  # 同內容直接沿用
+
+        log_file = self._attach("tool.log", b"ERROR chamber 3 pressure low\n" * 10, "text/plain")
+        result = thumbnails.generate(log_file)
+        with log_file.file.storage.open(result["preview.txt"], "rb") as fp:
+            self.assertTrue(fp.read().startswith(b"ERROR chamber 3"))
+
+        with self.assertRaises(thumbnails.UnsupportedAttachment):
+            thumbnails.generate(self._attach("blob.bin", b"\x00" * 10, "application/octet-stream"))
+
+    def test_download_requires_access_to_the_issue(self):
+        from core import thumbnails
+
+        attachment = self._attach("wafer.png", self._png((100, 100)), "image/png")
+        attachment.derivatives = thumbnails.generate(attachment)
+        attachment.save(update_fields=["derivatives"])
+        url = f"/attachments/{attachment.sha256}/thumb.webp"
+
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.owner)
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "image/webp"))
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(f"/attachments/{attachment.sha256}/nope.webp").status_code, 404)
+
+
+@skipUnless(HAS_DRF, "djangorestframework is not installed")
+class ApiRenderingTests(TestCase):
+    def test_json_array_is_emitted_in_chunks(self):
+        from core.renderers import iter_json_array
+
+        chunks = list(iter_json_array(({"n": n} for n in range(5)), chunk_rows=2))
+        self.assertEqual(len(chunks), 5)  # "[", 3 批, "]"
+        self.assertEqual(json.loads(b"".join(chunks)), [{"n": n} for n in range(5)])
+        self.assertEqual(b"".join(iter_json_array([])), b"[]")
+
+    @skipUnless(settings.API_ENABLED, "API_ENABLED is off")
+    def test_stream_format_matches_the_lean_list(self):
+        project = Project.objects.create(name="lean")
+        for i in range(3):
+            CoreIssue.objects.create(title=f"lean {i}", priority="P2", assignee="", project=project)
+        self.client.force_login(User.objects.create_superuser("lean-admin", "lean@example.com", "pw"))
+        listed = self.client.get("/api/issues/").json()
+        response = self.client.get("/api/issues/", {"format": "stream"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), listed)
+        self.assertEqual([row["title"] for row in listed], ["lean 2", "lean 1", "lean 0"])
+
+
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fake_redis()
+        patcher = mock.patch("core.idempotency.get_redis", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_redelivery_with_same_task_id_takes_over(self):
+        from core import idempotency
+
+        self.assertTrue(idempotency.begin("idem:t:1", owner="task-a"))
+        # worker 當掉：broker 以同一個 task id 重送，可接手；其他 task id 的重複訊息略過
+        self.assertTrue(idempotency.begin("idem:t:1", owner="task-a"))
+        self.assertFalse(idempotency.begin("idem:t:1", owner="task-b"))
+        idempotency.finish("idem:t:1")
+        self.assertFalse(idempotency.begin("idem:t:1", owner="task-a"))
+
+    def test_queued_marker_expires(self):
+        from core import idempotency
+
+        task = mock.Mock()
+        task.run.build_key.return_value = "idem:t:2"
+        self.assertTrue(idempotency.enqueue_once(task, args=(2,), countdown=60))
+        self.assertFalse(idempotency.enqueue_once(task, args=(2,)))
+        task_id = task.apply_async.call_args.kwargs["task_id"]
+        self.assertEqual(self.redis.get("idem:t:2").decode(), f"queued:{task_id}")
+        self.assertLessEqual(self.redis.ttl("idem:t:2"), settings.IDEMPOTENCY_QUEUED_LEASE + 60)
+        self.assertTrue(idempotency.begin("idem:t:2", owner=task_id))
+
+
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+@override_settings(WEBHOOKS={**settings.WEBHOOKS, "BREAKER_THRESHOLD": 2, "BREAKER_COOLDOWN": 30, "MAX_ATTEMPTS": 3})
+class WebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(name="W", customer="ACME")
+        cls.sub = WebhookSubscription.objects.create(project=cls.project, url="http://example.com/hook", secret="s")
+
+    def setUp(self):
+        self.redis = fake_redis()
+        self.breaker = webhooks.BREAKER_KEY.format(self.sub.pk)
+
+    def _publish(self, n):
+        issues = [CoreIssue(pk=i + 1, title=f"#{i}", priority="P2", assignee="", project=self.project)
+                  for i in range(n)]
+        with mock.patch("core.webhooks.get_redis", return_value=self.redis):
+            self.assertEqual(webhooks.publish([(issue, "created", None) for issue in issues]), n)
+
+    def _make_due(self):
+        self.redis.zadd(webhooks.QUEUE_KEY, {member: 0 for member in self.redis.zrange(webhooks.QUEUE_KEY, 0, -1)})
+
+    def test_signature(self):
+        body = b'{"id":1}'
+        header = webhooks.sign("s", 1000, body)
+        self.assertTrue(webhooks.verify_signature("s", header, body, now=1010))
+        self.assertFalse(webhooks.verify_signature("other", header, body, now=1010))
+        self.assertFalse(webhooks.verify_signature("s", header, body + b" ", now=1010))
+        self.assertFalse(webhooks.verify_signature("s", header, body, tolerance=5, now=1010))  # 重放
+        self.assertFalse(webhooks.verify_signature("s", "garbage", body, now=1010))
+        self.assertFalse(webhooks.verify_signature("s", None, body, now=1010))
+
+    def test_classify(self):
+        def classify(status, **headers):
+            return webhooks.classify(Response(status, headers, b""))
+
+        self.assertEqual(classify(204).kind, "ok")
+        throttled = classify(429, **{"retry-after": "7"})
+        self.assertEqual((throttled.kind, throttled.delay, throttled.failure), ("retry", 7.0, False))
+        unavailable = classify(503, **{"retry-after": "soon"})
+        self.assertEqual((unavailable.kind, unavailable.delay, unavailable.failure), ("retry", 0.0, True))
+        self.assertEqual(classify(410).kind, "gone")
+        self.assertEqual(classify(400).kind, "dead")
+
+    def test_breaker_opens_then_lets_one_probe_through(self):
+        self._publish(3)
+        jobs = webhooks.claim(self.redis, 10)
+        self.assertEqual(len(jobs), 3)
+        failure = webhooks.Outcome("retry", 503, "HTTP 503", failure=True)
+        self.assertEqual(webhooks.settle(self.redis, [(job, failure) for job in jobs])["retry"], 3)
+        self.assertEqual(int(self.redis.hget(self.breaker, "failures")), 3)
+        self.assertGreater(float(self.redis.hget(self.breaker, "open_until")), time.time())
+
+        # 斷路中：到期的重送也延後
+        self._make_due()
+        stats = Counter()
+        self.assertEqual(webhooks.claim(self.redis, 10, stats), [])
+        self.assertEqual(stats["deferred"], 3)
+
+        # 冷卻結束（半開）：只放一筆試探，成功後恢復
+        self.redis.hset(self.breaker, "open_until", 0)
+        self._make_due()
+        probe = webhooks.claim(self.redis, 10)
+        self.assertEqual(len(probe), 1)
+        webhooks.settle(self.redis, [(probe[0], webhooks.Outcome("ok", 204))])
+        self.assertFalse(self.redis.exists(self.breaker))
+        self._make_due()
+        self.assertEqual(len(webhooks.claim(self.redis, 10)), 2)
+
+    def test_throttled_pauses_without_counting_failures(self):
+        self._publish(1)
+        jobs = webhooks.claim(self.redis, 10)
+        webhooks.settle(self.redis, [(jobs[0], webhooks.Outcome("retry", 429, "HTTP 429", delay=60))])
+        self.assertIsNone(self.redis.hget(self.breaker, "failures"))
+        self.assertGreater(float(self.redis.hget(self.breaker, "open_until")), time.time() + 50)
+
+    def test_dead_and_gone(self):
+        self._publish(2)
+        jobs = webhooks.claim(self.redis, 10)
+        stats = webhooks.settle(self.redis, [(jobs[0], webhooks.Outcome("dead", 400, "HTTP 400")),
+                                             (jobs[1], webhooks.Outcome("gone", 410, "HTTP 410 Gone"))])
+        self.assertEqual(stats["dead"], 2)
+        self.assertEqual(self.redis.zcard(webhooks.QUEUE_KEY), 0)
+        self.assertEqual(self.redis.llen(webhooks.DEAD_KEY), 2)
+        self.sub.refresh_from_db()
+        self.assertFalse(self.sub.is_active)
+
+    def test_status_changed_only_when_status_changes(self):
+        issue = CoreIssue.objects.create(title="t", priority="P2", assignee="", project=self.project)
+        issue = CoreIssue.objects.get(pk=issue.pk)
+        with mock.patch("core.webhooks.publish") as publish, mock.patch("core.tasks.notify_issue_event"):
+            with self.captureOnCommitCallbacks(execute=True):
+                issue.title = "renamed"
+                issue.save()
+            publish.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                issue.status = "closed"
+                issue.save()
+            self.assertEqual(publish.call_args.args[0][0][1], "status_changed")
+            with self.captureOnCommitCallbacks(execute=True):
+                issue.save(update_fields=["title"])
+            self.assertEqual(publish.call_count, 1)
+
+
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+@override_settings(ALARMS={**settings.ALARMS, "MAX_DELIVERIES": 2, "CLAIM_IDLE_MS": 0})
+class AlarmStreamTests(TestCase):
+    def setUp(self):
+        from core import alarms
+
+        self.redis = fake_redis()
+        alarms.ensure_group(self.redis)
+        project = Project.objects.create(name="A", customer="ACME")
+        self.asset = Asset.objects.create(name="Pump", serial_no="SN-1", location="F1", project=project)
+
+    def test_bad_alarm_is_dead_lettered_without_blocking_the_batch(self):
+        from core import alarms
+
+        good = alarms.normalize({"asset": self.asset.pk, "code": "E1"})
+        bad = {**good, "code": "E2", "occurred_at": "not a date"}
+        for alarm in (good, bad):
+            self.redis.xadd(alarms.STREAM_KEY, {"alarm": json.dumps(alarm)})
+
+        with mock.patch("core.alarms.transaction.on_commit"):
+            alarms.consume_once(self.redis, "c1")
+            self.assertEqual(CoreIssue.objects.filter(asset=self.asset).count(), 1)
+            self.assertEqual((self.redis.xlen(alarms.STREAM_KEY), self.redis.xlen(alarms.DEAD_KEY)), (1, 0))
+            alarms.consume_once(self.redis, "c1")  # 第二次投遞仍失敗：移到 dead
+        self.assertEqual((self.redis.xlen(alarms.STREAM_KEY), self.redis.xlen(alarms.DEAD_KEY)), (0, 1))
+        self.assertEqual(alarms.backlog(self.redis)["pending"], 0)
+
+
+class SavedViewTests(TestCase):
+    def test_core_views_hide_consolidation_mirrors(self):
+        from . import saved_views
+
+        project = Project.objects.create(name="S", customer="ACME")
+        visible = CoreIssue.objects.create(title="core", priority="P2", assignee="", project=project)
+        CoreIssue.objects.create(title="mirror", priority="P2", assignee="", project=project, legacy_id=1)
+        qs = saved_views.build_queryset("core", {"project": [project.pk]})
+        self.assertEqual(list(qs.values_list("pk", flat=True)), [visible.pk])
+
+
+@override_settings(STORAGES={**settings.STORAGES, "staticfiles": {
+    "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}})
+class DispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("dispatch-admin", "admin@example.com", "pw")
+        cls.first, cls.second = User.objects.create_user("fae-1"), User.objects.create_user("fae-2")
+
+    def test_only_one_claim_wins(self):
+        from . import dispatch
+
+        issue = Issue.objects.create(title="claim me", priority=0, created_by=self.admin)
+        self.assertEqual(dispatch.claim_next(self.first).pk, issue.pk)
+        self.assertIsNone(dispatch.claim_next(self.second))
+        self.assertEqual(Issue.objects.get(pk=issue.pk).assigned_to, self.first)
+
+    @skipUnless(settings.API_ENABLED, "API_ENABLED is off")
+    def test_api_claim(self):
+        issue = Issue.objects.create(title="api claim", priority=1, created_by=self.admin)
+        self.client.force_login(self.first)
+        response = self.client.post("/api/dispatch/claim/", {"priority_max": 1})
+        self.assertEqual((response.status_code, response.json()["issue"]["id"]), (200, issue.pk))
+        self.assertEqual(self.client.post("/api/dispatch/claim/").status_code, 204)
+        self.assertEqual(self.client.post("/api/dispatch/claim/", {"priority_max": "x"}).status_code, 400)
+
+    def test_claim_retries_after_a_version_conflict(self):
+        from . import dispatch
+
+        issue = Issue.objects.create(title="contended", priority=0, created_by=self.admin)
+        real_save, calls = Issue.save, []
+
+        def racing_save(instance, *args, **kwargs):
+            calls.append(instance.pk)
+            if len(calls) == 1:
+                raise IssueVersionConflict("lost the race")  # 另一個派工者在讀取與寫入之間先存檔
+            return real_save(instance, *args, **kwargs)
+
+        with mock.patch.object(Issue, "save", racing_save):
+            claimed = dispatch.claim_next(self.second)
+        self.assertEqual((claimed.pk, len(calls)), (issue.pk, 2))
+        self.assertEqual(Issue.objects.get(pk=issue.pk).assigned_to, self.second)
+
+    def test_stale_save_raises_version_conflict(self):
+        issue = Issue.objects.create(title="v", created_by=self.admin)
+        stale = Issue.objects.get(pk=issue.pk)
+        fresh = Issue.objects.get(pk=issue.pk)
+        fresh.title = "fresh"
+        fresh.save()
+        stale.title = "stale"
+        with self.assertRaises(IssueVersionConflict), transaction.atomic():
+            stale.save()
+        self.assertEqual(stale.version, issue.version)
+        self.assertEqual(Issue.objects.get(pk=issue.pk).title, "fresh")
+
+    def _admin_post(self, issue, version, title):
+        self.client.force_login(self.admin)
+        return self.client.post(f"/admin/issues/issue/{issue.pk}/change/", {
+            "title": title, "description": "", "priority": issue.priority, "status": issue.status,
+            "created_by": self.admin.pk, "assigned_to": "", "customer": "",
+            "sla_due_at_0": "", "sla_due_at_1": "", "version": version,
+        })
+
+    def test_admin_rejects_stale_version(self):
+        issue = Issue.objects.create(title="admin", created_by=self.admin)
+        Issue.objects.get(pk=issue.pk).save()  # 他人先存檔
+        response = self._admin_post(issue, issue.version, "mine")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "此問題已被他人修改")
+        self.assertEqual(Issue.objects.get(pk=issue.pk).title, "admin")
+
+    def test_admin_conflict_after_clean_is_reported(self):
+        from .admin import IssueAdminForm
+
+        issue = Issue.objects.create(title="admin", created_by=self.admin)
+        real_clean = IssueAdminForm.clean
+
+        def clean_then_concurrent_write(form):
+            cleaned = real_clean(form)
+            Issue.objects.filter(pk=issue.pk).update(title="theirs", version=F("version") + 1)
+            return cleaned
+
+        with mock.patch.object(IssueAdminForm, "clean", clean_then_concurrent_write):
+            response = self._admin_post(issue, issue.version, "mine")
+        self.assertRedirects(response, f"/admin/issues/issue/{issue.pk}/change/")
+        self.assertIn("儲存時此問題已被他人修改", [str(m) for m in get_messages(response.wsgi_request)][0])
+        self.assertEqual(Issue.objects.get(pk=issue.pk).title, "admin")  # 同一交易內模擬的寫入一併回滾
+
+
+class AnalyticsTests(TestCase):
+    def test_resolved_counts_as_resolved_and_mirrors_are_skipped(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from core import analytics
+        from core.models import IssueEvent
+
+        project = Project.objects.create(name="M", customer="ACME")
+        start = timezone.now() - timedelta(hours=3)
+        issue = CoreIssue.objects.create(title="resolved", priority="P2", assignee="", project=project)
+        mirror = CoreIssue.objects.create(title="mirror", priority="P2", assignee="", project=project, legacy_id=7)
+        IssueEvent.objects.all().delete()  # 以下自行建立固定時間的狀態事件
+        for target in (issue, mirror):
+            CoreIssue.objects.filter(pk=target.pk).update(created_at=start)
+            IssueEvent.objects.create(issue=target, event_type="created", to_value="open", created_at=start)
+            IssueEvent.objects.create(issue=target, event_type="status_changed", to_value="resolved",
+                                      created_at=start + timedelta(hours=2))
+
+        analytics.refresh(full=True)
+        rows = analytics.mttr()
+        self.assertEqual([(row["key"], row["count"], row["mean"]) for row in rows], [(project.pk, 1, 7200.0)])
+        self.assertEqual(analytics.aging(), [])
+
+
+class LookupTests(TestCase):
+    def test_issue_events_pages_by_created_at_and_id(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from core import lookup
+        from core.models import IssueEvent
+
+        project = Project.objects.create(name="L", customer="ACME")
+        issue = CoreIssue.objects.create(title="paged", priority="P2", assignee="", project=project)
+        other = CoreIssue.objects.create(title="other", priority="P2", assignee="", project=project)
+        IssueEvent.objects.all().delete()
+        base = timezone.now() - timedelta(days=1)
+        # 同一時間點的事件跨頁時以 id 決定順序，不重複也不遺漏
+        for minutes in (0, 0, 0, 1, 1, 2, 3):
+            IssueEvent.objects.create(issue=issue, event_type="comment", created_at=base + timedelta(minutes=minutes))
+        IssueEvent.objects.create(issue=other, event_type="comment", created_at=base)
+        expected = list(IssueEvent.objects.filter(issue=issue).order_by("-created_at", "-id")
+                        .values_list("id", flat=True))
+
+        seen, after, pages = [], None, 0
+        while True:
+            page = lookup.issue_events(issue.pk, after=after, limit=3)
+            seen += [row["id"] for row in page["results"]]
+            pages += 1
+            after = page["next"]
+            if after is None:
+                break
+        self.assertEqual((seen, pages), (expected, 3))
+        with self.assertRaises(lookup.InvalidCursor):
+            lookup.issue_events(issue.pk, after="not-a-cursor")
+
+
+    def test_typeahead_prefers_serial_prefix_over_contains(self):
+        from core import lookup
+
+        project = Project.objects.create(name="T", customer="ACME")
+        for name, serial, location in (("etcher", "SN-100", "F1"), ("cvd", "sn-101", "F2"),
+                                       ("stepper", "XX-SN-1", "F3"), ("wet bench", "WB-9", "Fab SN bay")):
+            Asset.objects.create(name=name, serial_no=serial, location=location, project=project)
+
+        self.assertEqual([row["serial_no"] for row in lookup.typeahead_assets("sn-10")], ["SN-100", "sn-101"])
+        self.assertEqual([row["serial_no"] for row in lookup.typeahead_assets("sn", limit=10)],
+                         ["SN-100", "sn-101", "WB-9", "XX-SN-1"])
+        self.assertEqual(lookup.typeahead_assets("s"), [])
+        self.assertEqual(len(lookup.typeahead_assets("sn", limit=1)), 1)
+
+
+class IndexAdvisorTests(TestCase):
+    def test_suggests_an_index_for_an_unindexed_filter(self):
+        import tempfile
+
+        from core import index_advisor
+
+        table = '"core_issueevent"'
+        workload = "\n".join([
+            "# workload",
+            f"SELECT {table}.\"id\" FROM {table} WHERE {table}.\"event_type\" = %s "
+            f"ORDER BY {table}.\"created_at\" DESC LIMIT 20",
+            f"SELECT {table}.\"id\" FROM {table} WHERE {table}.\"issue_id\" = %s "
+            f"ORDER BY {table}.\"created_at\" DESC LIMIT 20",
+        ])
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write(workload + "\n")
+            f.flush()
+            report = index_advisor.analyse(sql_files=[f.name])
+
+        self.assertEqual((report["queries"], report["analysed"]), (2, 2))
+        self.assertEqual([(m["model"], m["fields"]) for m in report["missing"]],
+                         [("core.IssueEvent", ["event_type", "created_at"])])
+        unused = {index["name"] for index in report["unused"] if index["table"] == "core_issueevent"}
+        self.assertNotIn("core_event_issue_created_idx", unused)  # 第二個查詢用到
+
+        added = [op for op in index_advisor.migration_operations(report)["core"] if hasattr(op, "index")]
+        self.assertEqual([(op.model_name, op.index.fields) for op in added],
+                         [("issueevent", ["event_type", "created_at"])])
+
+
+class SimilarityTests(TestCase):
+    def test_ranks_open_near_duplicates_first(self):
+        from . import similarity
+
+        user = User.objects.create_user("reporter")
+        exact = Issue.objects.create(title="Chamber 3 vacuum leak on etcher",
+                                     description="pressure rises after pump down", created_by=user)
+        close = Issue.objects.create(title="Vacuum leak on etcher chamber 3 again", created_by=user)
+        Issue.objects.create(title="Robot arm position offset", description="teach again", created_by=user)
+        closed = Issue.objects.create(title="Chamber 3 vacuum leak on etcher", status=Issue.Status.CLOSED,
+                                      created_by=user)
+        Issue.objects.create(title="腔體真空洩漏", description="抽真空後壓力上升", created_by=user)
+
+        matches = similarity.similar_open_issues("Chamber 3 vacuum leak on etcher", "pressure rises after pump down")
+        self.assertEqual([issue.pk for _, issue in matches], [exact.pk, close.pk])
+        self.assertEqual(matches[0][0], 1.0)
+        self.assertGreater(matches[0][0], matches[1][0])
+        self.assertNotIn(closed.pk, [issue.pk for _, issue in matches])
+
+        self.assertEqual([issue.pk for _, issue in similarity.similar_open_issues(
+            "Chamber 3 vacuum leak on etcher", exclude=exact.pk)][:1], [close.pk])
+        self.assertEqual(similarity.similar_open_issues("Robot arm position offset")[0][1].title,
+                         "Robot arm position offset")
+        chinese = similarity.similar_open_issues("真空洩漏")
+        self.assertEqual([issue.title for _, issue in chinese], ["腔體真空洩漏"])
+
+
+class SlaBatchTests(TestCase):
+    def test_batch_matches_scalar_beyond_the_calendar_horizon(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+
+        from . import sla
+
+        first = datetime(2024, 1, 3, 9, 30, tzinfo=dt_timezone.utc)
+        starts = [first + timedelta(days=d) for d in (0, 200, sla.HORIZON_AHEAD_DAYS + 100)]
+        batch = sla.add_business_seconds_batch([s.timestamp() for s in starts], [8 * 3600] * len(starts))
+        self.assertEqual(batch, [sla.add_business_hours(s, 8).timestamp() for s in starts])
+
+        index = sla.get_index(around=first)
+        with self.assertRaises(OverflowError):
+            index.add_business_seconds_many([s.timestamp() for s in starts], [8 * 3600] * len(starts))
+
+
+    def test_recompute_only_touches_changed_due_dates(self):
+        from . import sla
+        from .models import SlaTarget
+
+        user = User.objects.create_user("sla-user")
+        p1 = Issue.objects.create(title="p1", priority=1, created_by=user)
+        p2 = Issue.objects.create(title="p2", priority=2, created_by=user)
+        self.assertEqual(sla.recompute_open_issues(), 0)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            SlaTarget.objects.create(priority=1, business_hours=1)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(sla.recompute_open_issues(), 1)
+        p1_after, p2_after = Issue.objects.get(pk=p1.pk), Issue.objects.get(pk=p2.pk)
+        self.assertEqual(p1_after.version, p1.version + 1)
+        self.assertEqual(p1_after.sla_due_at, sla.add_business_hours(p1.created_at, 1))
+        self.assertEqual((p2_after.version, p2_after.sla_due_at), (p2.version, p2.sla_due_at))
+
+
+@override_settings(CONSOLIDATION={**settings.CONSOLIDATION, "DUAL_WRITE": True})
+class ArchiveTests(TestCase):
+    def test_archive_and_restore_keep_the_dual_written_mirror(self):
+        from core import archive, consolidation
+        from core.models import ArchivedIssue, IssueEvent
+
+        user = User.objects.create_user("archiver")
+        issue = Issue.objects.create(title="old", status=Issue.Status.CLOSED, created_by=user)
+        Comment.objects.create(issue=issue, author=user, text="done")
+        mirror = CoreIssue.objects.get(legacy_id=issue.pk)
+        event = IssueEvent.objects.create(issue=mirror, event_type="status_changed", to_value="closed")
+        attachment = Attachment.objects.create(issue=mirror, original_name="log.txt", content_type="text/plain")
+
+        self.assertEqual(archive.archive_closed(source=ArchivedIssue.Source.ISSUES, days=0),
+                         {ArchivedIssue.Source.ISSUES: 1})
+        self.assertFalse(CoreIssue.objects.filter(pk=mirror.pk).exists())
+        self.assertFalse(IssueEvent.objects.filter(pk=event.pk).exists())
+
+        archive.restore(ArchivedIssue.Source.ISSUES, issue.pk)
+        restored = CoreIssue.objects.get(legacy_id=issue.pk)
+        self.assertEqual(restored.pk, mirror.pk)
+        self.assertEqual(list(restored.issueevent_set.values_list("pk", "to_value")), [(event.pk, "closed")])
+        self.assertEqual(list(restored.attachment_set.values_list("pk", flat=True)), [attachment.pk])
+        self.assertEqual(Comment.objects.filter(issue_id=issue.pk).count(), 1)
+        self.assertEqual(consolidation.verify()["mismatched_ids"], [])
+
+
+    def _archived_core_issue(self):
+        from core import archive
+        from core.models import ArchivedIssue
+
+        owner, stranger = User.objects.create_user("owner"), User.objects.create_user("stranger")
+        project = Project.objects.create(name="A", customer="ACME")
+        issue = CoreIssue.objects.create(title="archived core", priority="P2", assignee="", project=project,
+                                         status="closed", created_by=owner)
+        archive.archive_closed(source=ArchivedIssue.Source.CORE, days=0)
+        return issue, owner, stranger
+
+    def test_archive_search_is_limited_to_visible_issues(self):
+        from core import archive
+
+        issue, owner, stranger = self._archived_core_issue()
+        self.assertEqual([row.original_id for row in archive.search(user=owner)], [issue.pk])
+        self.assertEqual(list(archive.search(user=stranger)), [])
+
+    @skipUnless(settings.API_ENABLED, "API_ENABLED is off")
+    def test_api_archived_issue_requires_object_permission(self):
+        issue, owner, stranger = self._archived_core_issue()
+        self.client.force_login(stranger)
+        self.assertEqual(self.client.get(f"/api/issues/{issue.pk}/").status_code, 403)
+        self.assertEqual(self.client.get("/api/issues/archived/").json()["results"], [])
+        self.client.force_login(owner)
+        response = self.client.get(f"/api/issues/{issue.pk}/")
+        self.assertEqual((response.status_code, response.json()["archived"]), (200, True))
+        self.assertEqual([row["id"] for row in self.client.get("/api/issues/archived/").json()["results"]],
+                         [issue.pk])
+
+
+@override_settings(CONSOLIDATION={**settings.CONSOLIDATION, "DUAL_WRITE": True})
+class SeedScaleTests(TestCase):
+    def test_seeded_web_issues_get_core_mirrors(self):
+        from core import consolidation
+        from core.synthetic import ScaleSeeder
+
+        with mock.patch("issues.saved_views.bump"):
+            counts = ScaleSeeder(users=3, projects=2, assets=5, issues=20, web_issues=30, batch_size=8, days=30,
+                                 log=lambda msg: None).run()
+        self.assertEqual(counts["core.Issue mirrors"], 30)
+        self.assertEqual(CoreIssue.objects.filter(legacy_id__isnull=False).count(), 30)
+        report = consolidation.verify()
+        self.assertEqual(report["mismatched_ids"], [])
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+@override_settings(EVENT_STREAM={**settings.EVENT_STREAM, "MAX_DELIVERIES": 2, "CLAIM_IDLE_MS": 0})
+class EventStreamTests(TestCase):
+    def test_poison_message_is_dead_lettered_without_blocking_the_batch(self):
+        from core import event_stream
+
+        r = fake_redis()
+        event_stream.ensure_group(r)
+        for value in ("ok", "poison", "ok"):
+            r.xadd(event_stream.STREAM_KEY, {"key": value})
+        written = []
+
+        def write_batch(entries):
+            if any(fields[b"key"] == b"poison" for _, fields in entries):
+                raise ValueError("poison")
+            written.extend(entries)
+
+        with mock.patch("core.event_stream.write_batch", side_effect=write_batch):
+            event_stream.consume_once(r, "c1", block_ms=0)
+            self.assertEqual(len(written), 2)
+            self.assertEqual(event_stream.backlog(r)["pending"], 1)
+            event_stream.consume_once(r, "c1", block_ms=0)  # 第二次投遞仍失敗：移到 dead
+        self.assertEqual((event_stream.backlog(r)["pending"], r.xlen(event_stream.DEAD_KEY)), (0, 1))
+
+
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+class TeamsOutboxTests(SimpleTestCase):
+    def test_abandoned_flush_is_put_back_in_order(self):
+        from core import teams
+
+        r = fake_redis()
+        for i in range(3):
+            r.rpush(teams.OUTBOX_KEY, json.dumps({"html": str(i), "attempt": 0}))
+        self.assertEqual(len(teams._take(r, teams.PROCESSING_LIST_KEY.format("crashed"), 2)), 2)
+        r.zadd(teams.PROCESSING_KEY, {"crashed": time.time() - 1})
+        teams._recover_stale(r)
+        self.assertEqual([json.loads(m)["html"] for m in r.lrange(teams.OUTBOX_KEY, 0, -1)], ["0", "1", "2"])
+        self.assertEqual(r.zcard(teams.PROCESSING_KEY), 0)
+
+    @override_settings(TEAMS_DELIVERY={**settings.TEAMS_DELIVERY, "BATCH_SIZE": 20, "BURST": 5})
+    def test_batch_never_exceeds_bucket_capacity(self):
+        from core import teams
+
+        self.assertEqual(teams._batch_limit(fake_redis()), 5)
+
+
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+class InboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter, cls.engineer = User.objects.create_user("inbox-reporter"), User.objects.create_user("inbox-fae")
+
+    def setUp(self):
+        patcher = mock.patch("issues.inbox.get_redis", return_value=fake_redis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unread_counts_and_mark_seen(self):
+        from . import inbox
+
+        with self.captureOnCommitCallbacks(execute=True):
+            issue = Issue.objects.create(title="inbox", priority=1, created_by=self.reporter)
+        self.assertEqual(inbox.badge(self.reporter), {"unread": 0, "assigned": 0})  # 開單者本人不算未讀
+
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.assigned_to = self.engineer
+            issue.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(issue=issue, author=self.reporter, text="還是會重現")
+        self.assertEqual(inbox.badge(self.engineer), {"unread": 1, "assigned": 1})
+        page = inbox.open_page(self.engineer, "unread")
+        self.assertEqual([(item["id"], item["unread"], item["last_kind"]) for item in page["items"]],
+                         [(issue.pk, 2, "留言")])
+
+        inbox.mark_seen(self.engineer, issue.pk)
+        self.assertEqual(inbox.badge(self.engineer), {"unread": 0, "assigned": 1})
+        self.assertEqual(inbox.open_page(self.engineer, "unread")["items"], [])
+        self.assertEqual(inbox.badge(self.reporter)["unread"], 1)  # 指派動態沒有動作者：開單者也收到
+
+    def test_redis_down_hides_the_badge(self):
+        from . import inbox
+
+        with mock.patch("issues.inbox.get_redis", side_effect=ConnectionError("redis down")):
+            self.assertIsNone(inbox.badge(self.engineer))
+
+
+@skipUnless(HAS_FAKEREDIS, "fakeredis is not installed")
+@override_settings(THROTTLE={**settings.THROTTLE, "ENABLED": True, "GLOBAL_RATE": "10/min", "API_RESERVE": 0.5,
+                             "RATES": {**settings.THROTTLE["RATES"], "interactive": "2/min", "api": "100/min"}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch("core.ratelimit.get_redis", return_value=fake_redis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_middleware_returns_429_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get("/no-such-page/").status_code, 404)
+        response = self.client.get("/no-such-page/")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")  # 2/min：30 秒補回一個 token
+
+    def test_api_throttle_keeps_a_reserve_for_interactive_traffic(self):
+        from rest_framework.response import Response as DrfResponse
+        from rest_framework.test import APIRequestFactory
+        from rest_framework.views import APIView
+
+        from core.throttles import ApiThrottle
+
+        class Ping(APIView):
+            permission_classes = []
+            throttle_classes = [ApiThrottle]
+
+            def get(self, request):
+                return DrfResponse({"ok": True})
+
+        factory, view = APIRequestFactory(), Ping.as_view()
+        # 全域桶 10 個 token、保留一半：API 只能用到剩 5 個
+        statuses = [view(factory.get("/api/ping/")).status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+        response = view(factory.get("/api/ping/"))
+        self.assertEqual((response.status_code, response["Retry-After"]), (429, "6"))
+        self.assertEqual(self.client.get("/no-such-page/").status_code, 404)  # HTML 頁面仍可用保留的 token
+
+
+class StartupTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        from core.management.commands.startup_profile import parse_importtime
+
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |     django.utils\n"
+                  "import time:       300 |        420 |   django\n"
+                  "some other warning\n")
+        self.assertEqual(parse_importtime(stderr), [("django.utils", 120, 120, 2), ("django", 300, 420, 1)])
+
+    def test_bad_set_option_is_rejected(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaisesMessage(CommandError, "--set expects KEY=VALUE"):
+            call_command("startup_profile", "--set", "API_ENABLED")
+
+    def test_reset_after_fork_drops_inherited_connections(self):
+        from app.startup import reset_after_fork
+        from core.redis_client import get_redis
+
+        inherited = mock.Mock(connection=object())
+        before = get_redis()
+        with mock.patch("django.db.connections") as connections:
+            connections.all.return_value = [inherited]
+            reset_after_fork()
+        connections.all.assert_called_once_with(initialized_only=True)
+        self.assertIsNone(inherited.connection)  # 只丟棄物件，不對共用 socket 送 close
+        self.assertIsNot(get_redis(), before)
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def test_percentiles_and_error_rates_per_endpoint(self):
+        from loadtest import report
+
+        stats = report.Stats()
+        for ms in range(1, 101):
+            stats.record("detail", ms / 1000)
+        stats.record("comment", 0.2)
+        stats.record("comment", 0.4, error="HTTP 500")
+        summary = report.summarize(stats, elapsed=10.0)
+
+        detail, comment, total = summary["endpoints"][1], summary["endpoints"][0], report.total(summary)
+        self.assertEqual((detail["p50_ms"], detail["p95_ms"], detail["p99_ms"]), (50, 95, 99))
+        self.assertEqual((comment["requests"], comment["error_rate"], comment["max_ms"]), (2, 0.5, 400))
+        self.assertEqual((total["requests"], total["rps"]), (102, 10.2))
+        self.assertEqual(summary["errors"], {"comment": {"HTTP 500": 1}})
+        self.assertIn("comment: HTTP 500 ×1", report.format_table(summary))
+        self.assertEqual(report.percentile([], 99), 0.0)
+
+
+@override_settings(REPLICA_DATABASES=["replica_0"], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        from core import db_router
+
+        self.db_router = db_router
+        self.router = db_router.ReplicaRouter()
+        patcher = mock.patch("core.db_router.replica_lag", return_value=0.0)
+        self.lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        with self.db_router.request_routing(use_replica=True):
+            self.assertEqual(self.router.db_for_read(CoreIssue), "replica_0")
+            self.assertEqual(self.router.db_for_write(CoreIssue), "default")
+            # 同一請求寫入之後讀 primary
+            self.assertEqual(self.router.db_for_read(CoreIssue), "default")
+        self.assertEqual(self.router.db_for_read(CoreIssue), "default")  # 請求以外
+
+    def test_lagging_replica_and_sessions_use_primary(self):
+        from django.contrib.sessions.models import Session
+
+        with self.db_router.request_routing(use_replica=True):
+            self.assertEqual(self.router.db_for_read(Session), "default")
+            self.lag.return_value = float("inf")
+            self.assertEqual(self.router.db_for_read(CoreIssue), "default")
+
+    def test_write_pins_the_client_to_primary(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(CoreIssue))
+            if request.method == "POST":
+                self.router.db_for_write(CoreIssue)
+            return HttpResponse()
+
+        middleware = self.db_router.ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        self.assertNotIn(self.db_router.PIN_COOKIE, middleware(factory.get("/")).cookies)
+        pin = middleware(factory.post("/")).cookies[self.db_router.PIN_COOKIE].value
+        request = factory.get("/")
+        request.COOKIES[self.db_router.PIN_COOKIE] = pin
+        middleware(request)
+        self.assertEqual(seen, ["replica_0", "default", "default"])
+
+    def test_migrations_only_run_on_primary(self):
+        self.assertIs(self.router.allow_migrate("replica_0", "core"), False)
+        self.assertIsNone(self.router.allow_migrate("default", "core"))
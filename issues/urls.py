@@ -6,5 +6,12 @@ app_name = 'issues'
 urlpatterns = [
     path('', views.home, name='home'),
     path('create/', views.create, name='create'),
+    path('similar/', views.similar, name='similar'),
+    path('claim/', views.claim, name='claim'),
+    path('inbox/', views.inbox_view, name='inbox'),
     path('<int:pk>/', views.detail, name='detail'),
+    path('<int:pk>/restore/', views.restore, name='restore'),
+    path('views/', views.saved_view_create, name='saved_view_create'),
+    path('views/<int:pk>/', views.saved_view_open, name='saved_view'),
+    path('views/<int:pk>/delete/', views.saved_view_delete, name='saved_view_delete'),
 ]
@@ -1,15 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.utils import timezone 
 from django.db.utils import DatabaseError
-from datetime import timedelta, datetime
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import QueryDict
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 
 
 # Assuming forms.py is in the same app directory
-from .models import Issue, Comment
+from .models import Issue, Comment, SavedView
 from .forms import IssueForm , CommentForm
+from . import sla
+from . import saved_views
+from . import similarity
+from . import dispatch
+from . import inbox
 
 from django.contrib.auth.decorators import login_required # 確保只有登入者可以留言
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import get_user_model
+from django.contrib import messages
+
+from core import archive, timeline
+from core.lookup import InvalidCursor
+from core.models import ArchivedIssue, Issue as CoreIssue
 
 # 處理新增問題的 View
 def create(request):
@@ -47,17 +63,62 @@ def create(request):
     })
 
 
+@login_required
+def similar(request):
+    """
+    GET /similar/?title=...&description=...&exclude=<id> —— 建立頁面的「可能重複」提示。
+    以 LSH 分桶取候選，不掃描整張表。
+    """
+    title = request.GET.get('title', '')[:200]
+    description = request.GET.get('description', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 5)), 1), 20)
+        exclude = int(request.GET['exclude']) if request.GET.get('exclude') else None
+    except ValueError:
+        return JsonResponse({'error': 'limit and exclude must be integers'}, status=400)
+    matches = similarity.similar_open_issues(title, description, limit=limit, exclude=exclude)
+    return JsonResponse({'results': [
+        {
+            'id': issue.pk,
+            'title': issue.title,
+            'status': issue.get_status_display(),
+            'score': round(score, 2),
+            'url': reverse('issues:detail', args=[issue.pk]),
+        }
+        for score, issue in matches
+    ]})
+
+
 # 處理單個問題詳細頁面的 View
 @login_required # 通常留言需要登入
 def detail(request, pk):
     """
     處理單個問題的詳細視圖。
     """
-    # 查找問題，找不到則返回 404
-    issue = get_object_or_404(Issue, pk=pk) 
+    issue = Issue.objects.filter(pk=pk).first()
+    if issue is None:
+        # 已封存的問題：由 core.archive 的快照唯讀顯示
+        issue, related = archive.load(ArchivedIssue.Source.ISSUES, pk)
+        if issue is None:
+            raise Http404('問題不存在')
+        comments = sorted(related['issues.Comment'], key=lambda c: c.created_at, reverse=True)
+        authors = get_user_model().objects.in_bulk({c.author_id for c in comments})
+        return render(request, 'issues/detail.html', {
+            'issue': issue,
+            'entries': [
+                {'kind': 'comment', 'id': c.id, 'created_at': c.created_at, 'body': c.text,
+                 'actor': authors[c.author_id].username if c.author_id in authors else ''}
+                for c in comments
+            ],
+            'archived': True,
+        })
 
-    # 獲取所有留言
-    comments = issue.comments.all()
+    # 留言、事件、附件合併的時間軸（第一頁來自快取），?after= 載入較舊的一頁
+    core_id = CoreIssue.objects.filter(legacy_id=issue.pk).values_list('id', flat=True).first()
+    try:
+        entries = timeline.issue_timeline(core_id, issue.pk, after=request.GET.get('after'))
+    except InvalidCursor:
+        return redirect('issues:detail', pk=issue.pk)
 
     if request.method == 'POST':
         comment_form = CommentForm(request.POST)
@@ -69,10 +130,12 @@ def detail(request, pk):
             return redirect('issues:detail', pk=issue.pk)
     else:
         comment_form = CommentForm()
+        inbox.mark_seen(request.user, issue.pk)
 
     context = {
         'issue': issue,
-        'comments': comments,      # 傳遞所有留言
+        'entries': entries['results'],
+        'next_cursor': entries['next'],
         'comment_form': comment_form, # 傳遞留言表單
     }
     
@@ -81,6 +144,67 @@ def detail(request, pk):
     return render(request, 'issues/detail.html', context)
 
 
+@login_required
+@require_POST
+def claim(request):
+    """
+    首頁「領取下一件」按鈕：領取下一件未指派的問題（issues/dispatch.py）並導向該問題。
+    程式呼叫請用 POST /api/dispatch/claim/（core/views.py 的 DispatchViewSet）。
+    可選參數：customer、priority_max。
+    """
+    try:
+        priority_max = int(request.POST['priority_max']) if request.POST.get('priority_max') else None
+    except ValueError:
+        messages.error(request, 'priority_max 必須是整數')
+        return redirect('issues:home')
+    issue = dispatch.claim_next(request.user, customer=request.POST.get('customer') or None,
+                                priority_max=priority_max)
+    if issue is None:
+        messages.info(request, '目前沒有可領取的問題')
+        return redirect('issues:home')
+    return redirect('issues:detail', pk=issue.pk)
+
+
+@staff_member_required
+@require_POST
+def restore(request, pk):
+    """
+    將已封存的問題還原回主表（原 id）。
+    """
+    try:
+        archive.restore(ArchivedIssue.Source.ISSUES, pk)
+    except archive.ArchiveError:
+        raise Http404('問題未封存')
+    return redirect('issues:detail', pk=pk)
+
+
+def _annotate_due(issues, now=None):
+    """
+    為列表上的問題加上 due_label / due_style。
+    """
+    now = now or timezone.now()
+    # 剩餘「工作時間」一次批次計算（issues.sla 的區間索引），不再逐筆做 timedelta / 時區換算
+    remaining = sla.remaining_many([issue.sla_due_at for issue in issues], now=now)
+    warning_seconds = settings.SLA_DEFAULTS["WARNING_BUSINESS_HOURS"] * 3600
+
+    for issue, seconds in zip(issues, remaining):
+        if seconds is None:
+            issue.due_label = "N/A"
+            issue.due_style = 'default'
+        elif issue.sla_due_at <= now:
+            days_overdue = (now - issue.sla_due_at).days
+            issue.due_label = f"{days_overdue}天" if days_overdue >= 1 else "已過期"
+            issue.due_style = 'danger'
+        elif seconds < warning_seconds:
+            hours, minutes = int(seconds // 3600), int((seconds % 3600) // 60)
+            issue.due_label = f"{hours}時{minutes}分"
+            issue.due_style = 'warning'
+        else:
+            issue.due_label = f"{max(1, (issue.sla_due_at - now).days)}天"
+            issue.due_style = 'success'
+    return issues
+
+
 def home(request):
     """
     處理首頁，顯示問題列表並應用篩選器。
@@ -100,39 +224,81 @@ def home(request):
     except DatabaseError as e:
         print(f"Database Error in home view: {e}")
         
-    now = timezone.now()
-
-    for issue in recent_issues:
-        if hasattr(issue, 'sla_due_at') and issue.sla_due_at:
-            if issue.sla_due_at.tzinfo is None or issue.sla_due_at.tzinfo.utcoffset(issue.sla_due_at) is None:
-                issue_sla_due_at = timezone.make_aware(issue.sla_due_at, timezone.get_current_timezone())
-            else:
-                issue_sla_due_at = issue.sla_due_at
-
-            time_diff = issue_sla_due_at - now
-            
-            if time_diff < timedelta(0):
-                days_overdue = abs(time_diff.days)
-                issue.due_label = f"{days_overdue}天" if days_overdue >= 1 else "已過期"
-                issue.due_style = 'danger'
-            elif time_diff < timedelta(days=1):
-                seconds = time_diff.total_seconds()
-                hours = int(seconds // 3600)
-                minutes = int((seconds % 3600) // 60)
-                issue.due_label = f"{hours}時{minutes}分"
-                issue.due_style = 'warning'
-            else:
-                issue.due_label = f"{time_diff.days}天"
-                issue.due_style = 'success'
-        else:
-            issue.due_label = "N/A"
-            issue.due_style = 'default'
+    recent_issues = _annotate_due(list(recent_issues))
+    saved = list(request.user.saved_views.all()) if request.user.is_authenticated else []
 
     context = {
         'recent_issues': recent_issues,
         'recent_count': recent_count,
         'issue_status_choices': issue_status_choices,
         'current_filter': request.GET.get('status', 'all'),
+        'saved_views': saved,
     }
     
     return render(request, 'issues/home.html', context)
+
+
+@login_required
+@require_POST
+def saved_view_create(request):
+    """
+    把目前列表的篩選條件（querystring）存成檢視；同名則覆寫。
+    """
+    name = request.POST.get('name', '').strip()[:100]
+    target = request.POST.get('target', SavedView.Target.ISSUES)
+    if not name or target not in SavedView.Target.values:
+        return redirect('issues:home')
+    try:
+        filters = saved_views.normalize_filters(target, QueryDict(request.POST.get('query', '')), request.user)
+    except ValidationError:
+        return redirect('issues:home')
+    view, _ = SavedView.objects.update_or_create(
+        owner=request.user, name=name, defaults={'target': target, 'filters': filters},
+    )
+    return redirect('issues:saved_view', pk=view.pk)
+
+
+@login_required
+def saved_view_open(request, pk):
+    """
+    開啟已儲存的檢視：id 清單多半來自 Redis，只查當頁的問題。
+    """
+    view = get_object_or_404(SavedView, pk=pk, owner=request.user)
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    result = view.open_page(page=page)
+    if view.target == SavedView.Target.ISSUES:
+        _annotate_due(result['items'])
+
+    return render(request, 'issues/saved_view.html', {
+        'view': view,
+        'result': result,
+        'saved_views': request.user.saved_views.all(),
+    })
+
+
+@login_required
+@require_POST
+def saved_view_delete(request, pk):
+    get_object_or_404(SavedView, pk=pk, owner=request.user).delete()
+    return redirect('issues:home')
+
+
+@login_required
+def inbox_view(request):
+    """
+    個人收件匣：未讀動態 / 指派給我（issues/inbox.py，清單來自 Redis）。
+    """
+    box = request.GET.get('box', 'unread')
+    if box not in inbox.BOXES:
+        box = 'unread'
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    return render(request, 'issues/inbox.html', {
+        'result': inbox.open_page(request.user, box, page),
+        'inbox_badge': inbox.badge(request.user),  # 蓋過 context processor，頁首與分頁籤共用
+    })
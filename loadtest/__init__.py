@@ -0,0 +1,13 @@
+"""
+對執行中的站台做壓力測試：模擬工程師與協調人員的實際操作，依端點統計延遲與錯誤率。
+
+    python -m loadtest seed --users 40                          # 建立測試帳號 / 問題，寫出 loadtest-sessions.json
+    python -m loadtest run --base-url http://127.0.0.1:8000 --users 20 --duration 60
+    python -m loadtest sweep --workers 1,2,4 --worker-class sync,gthread,asgi --users 5,10,20,40
+
+- seed 在本機以 Django ORM 寫入（需與受測站台使用同一個 DATABASE_URL），並直接建立登入 session，
+  不依賴 OIDC；帳號名稱以 lt- 開頭，可用 --reset 清除。
+- run 以執行緒模擬虛擬使用者（scenarios.py），每個端點輸出 p50 / p95 / p99、吞吐量與錯誤率。
+- sweep 依序以不同 worker 數與 worker 類型啟動 gunicorn（sync、gthread、ASGI），
+  逐步加壓找出飽和點：吞吐量不再成長、p95 超過 --slo-p95 或錯誤率超過 1%。
+"""
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import sys
+
+from . import report
+
+DEFAULT_SESSIONS = "loadtest-sessions.json"
+
+
+def _ints(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _load_sessions(path):
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found; run `python -m loadtest seed` first")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__import__("loadtest").__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("seed", help="create load-test users, issues and sessions")
+    p.add_argument("--users", type=int, default=40)
+    p.add_argument("--coordinators", type=float, default=0.25, help="share of coordinator accounts")
+    p.add_argument("--issues", type=int, default=500)
+    p.add_argument("--comments", type=int, default=3, help="average comments per issue")
+    p.add_argument("--reset", action="store_true", help="delete lt-* users and their data first")
+    p.add_argument("--output", default=DEFAULT_SESSIONS)
+
+    p = sub.add_parser("run", help="drive a running server")
+    p.add_argument("--base-url", default="http://127.0.0.1:8000")
+    p.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    p.add_argument("--duration", type=float, default=60.0, help="seconds, after ramp-up")
+    p.add_argument("--ramp-up", type=float, default=5.0)
+    p.add_argument("--think-time", type=float, default=1.0, help="mean seconds between tasks; 0 = none")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--seed", type=int, default=None, help="random seed for reproducible task mixes")
+    p.add_argument("--sessions", default=DEFAULT_SESSIONS)
+    p.add_argument("--json", default=None, help="also write the summary to this file")
+
+    p = sub.add_parser("sweep", help="start gunicorn with each configuration and ramp users until saturation")
+    p.add_argument("--worker-class", default="sync,gthread,asgi")
+    p.add_argument("--workers", type=_ints, default=[1, 2, 4])
+    p.add_argument("--threads", type=int, default=4, help="threads per gthread worker")
+    p.add_argument("--users", type=_ints, default=[5, 10, 20, 40, 80])
+    p.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    p.add_argument("--think-time", type=float, default=0.5)
+    p.add_argument("--bind", default="127.0.0.1:8099")
+    p.add_argument("--slo-p95", type=float, default=1000.0, help="ms; a level above this counts as saturated")
+    p.add_argument("--sessions", default=DEFAULT_SESSIONS)
+    p.add_argument("--json", default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        from .seed import reset, seed, setup_django
+        setup_django()
+        if args.reset:
+            print(f"removed {reset()} rows")
+        data = seed(users=args.users, coordinators=args.coordinators, issues=args.issues,
+                    comments=args.comments, output=args.output)
+        print(f"{len(data['users'])} users, {len(data['issue_ids'])} issues → {args.output}")
+
+    elif args.command == "run":
+        from .runner import run
+        summary = run(args.base_url, _load_sessions(args.sessions), users=args.users, duration=args.duration,
+                      ramp_up=args.ramp_up, think_time=args.think_time, timeout=args.timeout, seed=args.seed)
+        print(report.format_table(summary))
+        if args.json:
+            report.write_json(args.json, summary)
+
+    elif args.command == "sweep":
+        from .sweep import capacity, sweep
+        results = sweep(_load_sessions(args.sessions), worker_classes=args.worker_class.split(","),
+                        worker_counts=args.workers, user_levels=args.users, duration=args.duration,
+                        threads=args.threads, bind=args.bind, slo_p95_ms=args.slo_p95,
+                        think_time=args.think_time)
+        print("\ncapacity (highest req/s before saturation):")
+        for server, rps in capacity(results).items():
+            print(f"  {server:<26} {rps:>7.1f} req/s")
+        if args.json:
+            report.write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+壓測結果彙整：依端點計算請求數、吞吐量、錯誤率與 p50 / p95 / p99 延遲（毫秒）。
+"""
+import json
+import math
+import threading
+from collections import defaultdict
+
+TOTAL = "(total)"
+
+
+class Stats:
+    """執行緒安全的樣本收集器；每筆樣本為 (延遲秒數, 是否錯誤)。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)
+        self._errors = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, seconds: float, error: str = None):
+        with self._lock:
+            self._samples[name].append((seconds, error is not None))
+            if error:
+                self._errors[name][error] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._errors.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {k: list(v) for k, v in self._samples.items()}, {k: dict(v) for k, v in self._errors.items()}
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _row(name, samples, elapsed) -> dict:
+    latencies = sorted(s for s, _ in samples)
+    errors = sum(1 for _, failed in samples if failed)
+    return {
+        "endpoint": name,
+        "requests": len(samples),
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def summarize(stats: Stats, elapsed: float) -> dict:
+    samples, errors = stats.snapshot()
+    rows = [_row(name, samples[name], elapsed) for name in sorted(samples)]
+    rows.append(_row(TOTAL, [s for v in samples.values() for s in v], elapsed))
+    return {"elapsed": elapsed, "endpoints": rows, "errors": errors}
+
+
+def total(summary: dict) -> dict:
+    return next(row for row in summary["endpoints"] if row["endpoint"] == TOTAL)
+
+
+def format_table(summary: dict) -> str:
+    header = f"{'endpoint':<20} {'reqs':>7} {'req/s':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    lines = [header, "-" * len(header)]
+    for row in summary["endpoints"]:
+        lines.append(
+            f"{row['endpoint']:<20} {row['requests']:>7} {row['rps']:>8.1f} {row['error_rate'] * 100:>6.1f} "
+            f"{row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f} {row['max_ms']:>8.0f}"
+        )
+    if summary.get("disabled"):
+        lines.append(f"  disabled: {', '.join(summary['disabled'])}")
+    for name, by_kind in sorted(summary["errors"].items()):
+        lines.append(f"  {name}: " + ", ".join(f"{kind} ×{n}" for kind, n in sorted(by_kind.items())))
+    return "\n".join(lines)
+
+
+def write_json(path: str, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,116 @@
+"""
+以執行緒模擬虛擬使用者：每人一個 requests.Session（帶 seed 建立的 sessionid），
+依角色權重抽選 scenarios 中的 task，task 之間以指數分布的思考時間間隔。
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+import requests
+
+from . import scenarios
+from .report import Stats, summarize
+
+LOGIN_PATHS = ("/oidc/authenticate/", "/login/")
+
+
+@dataclass
+class Context:
+    rng: random.Random
+    issue_ids: list
+    customers: list = field(default_factory=list)
+
+    def issue_id(self) -> int:
+        # 偏向較新的問題（列表前段被點開的機率較高）
+        return self.issue_ids[min(len(self.issue_ids) - 1, int(self.rng.expovariate(1 / 50)))]
+
+
+class Client:
+    """包住 requests.Session：每個請求記錄延遲與結果到 Stats。"""
+
+    def __init__(self, base_url: str, sessionid: str, stats: Stats, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.cookies.set("sessionid", sessionid)
+
+    def _request(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=self.timeout,
+                                        allow_redirects=False, **kwargs)
+        except requests.RequestException as e:
+            self.stats.record(name, time.perf_counter() - started, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - started
+        error = None
+        if resp.status_code >= 400:
+            error = f"HTTP {resp.status_code}"
+        elif resp.is_redirect and any(p in resp.headers.get("Location", "") for p in LOGIN_PATHS):
+            error = "login redirect"  # session 失效（例如 seed 與站台不是同一個資料庫）
+        self.stats.record(name, elapsed, error)
+        return resp
+
+    def get(self, name, path):
+        return self._request(name, "GET", path)
+
+    def post(self, name, path, data):
+        # 表單已帶 csrfmiddlewaretoken；HTTPS 站台另需 Referer
+        return self._request(name, "POST", path, data=data, headers={"Referer": self.base_url + path})
+
+
+def api_enabled(base_url: str, sessionid: str, timeout: float) -> bool:
+    # /api/ 只在 API_ENABLED 時掛載（app/urls.py）
+    try:
+        resp = requests.get(base_url.rstrip("/") + "/api/", cookies={"sessionid": sessionid}, timeout=timeout)
+    except requests.RequestException:
+        return False
+    return resp.status_code != 404
+
+
+def _user_loop(client, role, ctx, stop: threading.Event, think_time: float, disabled):
+    while not stop.is_set():
+        _, func = scenarios.pick(role, ctx.rng, disabled)
+        func(client, ctx)
+        if think_time:
+            stop.wait(ctx.rng.expovariate(1 / think_time))
+
+
+def run(base_url: str, sessions: dict, users: int, duration: float, ramp_up: float = 5.0,
+        think_time: float = 1.0, timeout: float = 30.0, seed: int = None) -> dict:
+    """
+    以 users 個虛擬使用者持續 duration 秒（不含 ramp_up）；帳號輪流取自 sessions["users"]。
+    回傳 report.summarize 的結果。
+    """
+    accounts = sessions["users"]
+    if not accounts or not sessions["issue_ids"]:
+        raise ValueError("sessions file has no users or issues; run `python -m loadtest seed` first")
+    disabled = set() if api_enabled(base_url, accounts[0]["sessionid"], timeout) else {"poll_api"}
+    stats = Stats()
+    stop = threading.Event()
+    threads = []
+    for i in range(users):
+        account = accounts[i % len(accounts)]
+        ctx = Context(rng=random.Random(None if seed is None else seed + i),
+                      issue_ids=sessions["issue_ids"], customers=sessions.get("customers") or [""])
+        client = Client(base_url, account["sessionid"], stats, timeout)
+        t = threading.Thread(target=_user_loop, args=(client, account["role"], ctx, stop, think_time, disabled),
+                             daemon=True)
+        threads.append(t)
+
+    # ramp_up 期間逐一啟動；統計從全部啟動後才開始計算
+    for t in threads:
+        t.start()
+        time.sleep(ramp_up / max(1, users))
+    stats.reset()
+    started = time.monotonic()
+    stop.wait(duration)
+    elapsed = time.monotonic() - started
+    stop.set()
+    summary = summarize(stats, elapsed)  # 停止後才完成的請求不計入
+    summary["disabled"] = sorted(disabled)
+    for t in threads:
+        t.join(timeout + think_time * 5)
+    return summary
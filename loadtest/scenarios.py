@@ -0,0 +1,80 @@
+"""
+虛擬使用者的操作腳本。每個 task 以權重抽選；name 為報表上的端點名稱（同一路由不同 id 合併統計）。
+
+工程師：多半在看列表與問題、留言回報進度，偶爾開單、輪詢 API。
+協調人員：常開單、依客戶 / 狀態篩選列表、輪詢 API 看整體狀況。
+"""
+import random
+import re
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+TASKS = {}
+
+
+def task(weight_engineer: int, weight_coordinator: int):
+    def register(func):
+        TASKS[func.__name__] = (func, {"engineer": weight_engineer, "coordinator": weight_coordinator})
+        return func
+    return register
+
+
+def pick(role: str, rng: random.Random, disabled=()):
+    names = [name for name, (_, weights) in TASKS.items() if weights[role] and name not in disabled]
+    name = rng.choices(names, weights=[TASKS[n][1][role] for n in names])[0]
+    return name, TASKS[name][0]
+
+
+def _csrf(html: str):
+    match = CSRF_INPUT.search(html or "")
+    return match.group(1) if match else None
+
+
+@task(30, 20)
+def browse_home(client, ctx):
+    client.get("home", "/")
+
+
+@task(10, 20)
+def browse_home_filtered(client, ctx):
+    status = ctx.rng.choice(["NEW", "IN_PROGRESS", "PENDING", "RESOLVED"])
+    client.get("home?status", f"/?status={status}")
+
+
+@task(30, 20)
+def open_detail(client, ctx):
+    client.get("detail", f"/{ctx.issue_id()}/")
+
+
+@task(15, 5)
+def post_comment(client, ctx):
+    issue_id = ctx.issue_id()
+    resp = client.get("detail", f"/{issue_id}/")
+    token = _csrf(resp.text if resp is not None else "")
+    if token:
+        client.post("detail:comment", f"/{issue_id}/",
+                    {"csrfmiddlewaretoken": token, "text": f"壓測留言 {ctx.rng.randint(1, 10**6)}"})
+
+
+@task(3, 15)
+def create_issue(client, ctx):
+    resp = client.get("create", "/create/")
+    token = _csrf(resp.text if resp is not None else "")
+    if token:
+        client.post("create:post", "/create/", {
+            "csrfmiddlewaretoken": token,
+            "title": f"[loadtest] 新問題 {ctx.rng.randint(1, 10**6)}",
+            "description": "壓測建立",
+            "priority": ctx.rng.choice(["0", "1", "2", "3"]),
+            "status": "NEW",
+            "customer": ctx.rng.choice(ctx.customers),
+        })
+
+
+@task(10, 20)
+def poll_api(client, ctx):
+    # API 未啟用（API_ENABLED=false）時 runner 會停用此 task
+    if ctx.rng.random() < 0.7:
+        client.get("api:issues", "/api/issues/")
+    else:
+        client.get("api:aging", "/api/analytics/aging/")
@@ -0,0 +1,94 @@
+"""
+建立壓測用資料與登入 session（在受測站台以外的行程執行，需指向同一個資料庫）。
+
+工程師帳號 lt-eng-N 為一般使用者，協調人員 lt-coord-N 為 staff（可開 admin 列表）。
+session 直接寫入 SessionStore，因此不論站台是否啟用 OIDC 都能登入。
+"""
+import json
+import os
+import random
+
+PREFIX = "lt-"
+CUSTOMERS = ["ACME", "Globex", "Initech", "Umbrella", "Hooli"]
+
+
+def setup_django():
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    django.setup()
+
+
+def _session_for(user) -> str:
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from importlib import import_module
+
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.set_expiry(7 * 86400)
+    store.save()
+    return store.session_key
+
+
+def reset():
+    from django.contrib.auth import get_user_model
+    from issues.models import Comment, Issue
+
+    users = get_user_model().objects.filter(username__startswith=PREFIX)
+    Comment.objects.filter(author__in=users).delete()
+    Issue.objects.filter(created_by__in=users).delete()
+    return users.delete()[0]
+
+
+def seed(users: int = 40, coordinators: float = 0.25, issues: int = 500, comments: int = 3,
+         output: str = "loadtest-sessions.json", seed_value: int = 1) -> dict:
+    """
+    建立 users 個帳號（其中 coordinators 比例為協調人員）、issues 件問題（每件約 comments 則留言），
+    並把各帳號的 sessionid 與問題 id 寫到 output，供 run / sweep 使用。
+    """
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from issues.models import Comment, Issue
+
+    rng = random.Random(seed_value)
+    User = get_user_model()
+    n_coord = max(1, round(users * coordinators))
+    accounts = []
+    for i in range(users):
+        role = "coordinator" if i < n_coord else "engineer"
+        username = f"{PREFIX}{'coord' if role == 'coordinator' else 'eng'}-{i}"
+        user, created = User.objects.get_or_create(username=username, defaults={"is_staff": role == "coordinator"})
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=["password"])
+        accounts.append((user, role))
+
+    existing = Issue.objects.filter(created_by__username__startswith=PREFIX).count()
+    with transaction.atomic():
+        for i in range(existing, issues):
+            author, _ = rng.choice(accounts)
+            issue = Issue.objects.create(
+                title=f"[loadtest] 設備異常 #{i}",
+                description="壓測資料：" + " ".join(rng.choice(["溫度", "壓力", "真空", "馬達", "感測器"]) for _ in range(20)),
+                priority=rng.choice([0, 1, 1, 2, 2, 2, 3]),
+                status=rng.choice(list(Issue.Status.values)),
+                created_by=author,
+                assigned_to=rng.choice([None, *[u for u, _ in accounts]]),
+                customer=rng.choice(CUSTOMERS),
+            )
+            Comment.objects.bulk_create([
+                Comment(issue=issue, author=rng.choice(accounts)[0], text=f"更新 {j}：已確認現場狀況")
+                for j in range(rng.randint(0, comments * 2))
+            ])
+
+    data = {
+        "users": [{"username": u.username, "role": role, "sessionid": _session_for(u)} for u, role in accounts],
+        "issue_ids": list(Issue.objects.filter(created_by__username__startswith=PREFIX)
+                          .order_by("-id").values_list("id", flat=True)[:issues]),
+        "customers": CUSTOMERS,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    return data
@@ -0,0 +1,127 @@
+"""
+以不同的 gunicorn 設定啟動站台，逐步增加虛擬使用者找出飽和點。
+
+worker 類型：
+- sync：每個 worker 一次處理一個請求（docker-compose.yml 目前的設定）
+- gthread：每個 worker --threads 條執行緒
+- asgi：uvicorn.workers.UvicornWorker + app/asgi.py（需安裝 uvicorn，未安裝時略過）
+
+同一組設定下，吞吐量比上一級成長不到 MIN_GAIN、p95 超過 SLO 或錯誤率超過 MAX_ERROR_RATE 即視為飽和，
+不再加壓；報表中最後一個未飽和的等級即為該設定的可用容量。
+"""
+import importlib.util
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from . import runner
+from .report import total
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIN_GAIN = 0.05
+MAX_ERROR_RATE = 0.01
+APPS = {"asgi": "app.asgi:application"}
+WORKER_MODULES = {"asgi": "uvicorn"}
+
+
+def server_command(worker_class: str, workers: int, threads: int, bind: str) -> list:
+    cmd = [sys.executable, "-m", "gunicorn", APPS.get(worker_class, "app.wsgi:application"),
+           "--config", os.path.join(ROOT, "gunicorn.conf.py"), "--bind", bind, "--workers", str(workers),
+           "--access-logfile", os.devnull]
+    if worker_class == "gthread":
+        cmd += ["--worker-class", "gthread", "--threads", str(threads)]
+    elif worker_class == "asgi":
+        cmd += ["--worker-class", "uvicorn.workers.UvicornWorker"]
+    else:
+        cmd += ["--worker-class", "sync"]
+    return cmd
+
+
+def wait_ready(host: str, port: int, timeout: float = 60.0) -> bool:
+    # socket 就緒輪詢（每 0.5 秒，最多 timeout 秒）再開始打 HTTP
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def stop_server(proc, timeout: float = 30.0):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def available(worker_class: str) -> bool:
+    module = WORKER_MODULES.get(worker_class)
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def sweep(sessions: dict, worker_classes, worker_counts, user_levels, duration: float, threads: int = 4,
+          bind: str = "127.0.0.1:8099", slo_p95_ms: float = 1000.0, think_time: float = 0.5,
+          ramp_up: float = 3.0, log=print) -> list:
+    """回傳每個 (worker 類型, worker 數, 使用者數) 的整體結果列。"""
+    host, port = bind.rsplit(":", 1)
+    results = []
+    for worker_class in worker_classes:
+        if not available(worker_class):
+            log(f"skip {worker_class}: {WORKER_MODULES[worker_class]} is not installed")
+            continue
+        for workers in worker_counts:
+            label = f"{worker_class} ×{workers}" + (f" ({threads} threads)" if worker_class == "gthread" else "")
+            proc = subprocess.Popen(server_command(worker_class, workers, threads, bind),
+                                    cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not wait_ready(host, int(port)):
+                    log(f"skip {label}: server did not start")
+                    continue
+                previous_rps = 0.0
+                for users in user_levels:
+                    summary = runner.run(f"http://{bind}", sessions, users=users, duration=duration,
+                                         ramp_up=ramp_up, think_time=think_time)
+                    row = {"server": label, "worker_class": worker_class, "workers": workers,
+                           "users": users, **{k: v for k, v in total(summary).items() if k != "endpoint"}}
+                    reason = _saturation(row, previous_rps, slo_p95_ms)
+                    row["saturated"] = reason
+                    results.append(row)
+                    log(format_row(row))
+                    if reason:
+                        break
+                    previous_rps = row["rps"]
+            finally:
+                stop_server(proc)
+    return results
+
+
+def _saturation(row, previous_rps, slo_p95_ms):
+    if row["error_rate"] > MAX_ERROR_RATE:
+        return f"errors {row['error_rate'] * 100:.1f}%"
+    if row["p95_ms"] > slo_p95_ms:
+        return f"p95 > {slo_p95_ms:.0f} ms"
+    if previous_rps and row["rps"] < previous_rps * (1 + MIN_GAIN):
+        return "throughput flat"
+    return ""
+
+
+def format_row(row) -> str:
+    return (f"{row['server']:<26} users {row['users']:>4}  {row['rps']:>7.1f} req/s  "
+            f"p50 {row['p50_ms']:>6.0f}  p95 {row['p95_ms']:>6.0f}  p99 {row['p99_ms']:>6.0f} ms  "
+            f"err {row['error_rate'] * 100:>5.1f}%  {('saturated: ' + row['saturated']) if row['saturated'] else ''}")
+
+
+def capacity(results) -> dict:
+    """每個設定在未飽和前達到的最高吞吐量。"""
+    best = {}
+    for row in results:
+        if not row["saturated"]:
+            best[row["server"]] = max(best.get(row["server"], 0.0), row["rps"])
+    return best